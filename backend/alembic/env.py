@@ -22,11 +22,18 @@ from pathlib import Path
 # Add the app directory to sys.path
 sys.path.append(str(Path(__file__).parent.parent))
 
+from app.config import settings
 from app.database import Base
-from app.models import User, Credential, ModelConfig, RequestLog
+from app.models import (
+    User, Credential, ModelConfig, RequestLog, BatchJob,
+    UsageRollupMinute, UsageRollupHour, UsageRollupDay, TokenQuotaUsage
+)
 
 target_metadata = Base.metadata
 
+# 与应用使用同一个数据库（DATABASE_URL）
+config.set_main_option("sqlalchemy.url", settings.database_url)
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
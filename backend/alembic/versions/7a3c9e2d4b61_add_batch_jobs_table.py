@@ -0,0 +1,45 @@
+"""Add batch_jobs table
+
+Revision ID: 7a3c9e2d4b61
+Revises: 564ffaf138b2
+Create Date: 2026-10-19 10:12:40.118263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3c9e2d4b61'
+down_revision: Union[str, None] = '564ffaf138b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('batch_jobs',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('model_config_id', sa.String(length=36), nullable=False),
+    sa.Column('api_format', sa.String(length=20), nullable=False),
+    sa.Column('endpoint', sa.String(length=100), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('input_file_path', sa.Text(), nullable=False),
+    sa.Column('output_file_path', sa.Text(), nullable=False),
+    sa.Column('total_count', sa.Integer(), nullable=True),
+    sa.Column('completed_count', sa.Integer(), nullable=True),
+    sa.Column('failed_count', sa.Integer(), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['model_config_id'], ['model_configs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_batch_jobs_status'), 'batch_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_batch_jobs_status'), table_name='batch_jobs')
+    op.drop_table('batch_jobs')
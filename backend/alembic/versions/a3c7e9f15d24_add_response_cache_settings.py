@@ -0,0 +1,28 @@
+"""Add near-duplicate response cache settings to model_configs
+
+Revision ID: a3c7e9f15d24
+Revises: f2b8d6e41a07
+Create Date: 2026-10-19 19:48:13.602517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c7e9f15d24'
+down_revision: Union[str, None] = 'f2b8d6e41a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('model_configs', sa.Column('response_cache_enabled', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.add_column('model_configs', sa.Column('response_cache_threshold', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('model_configs', 'response_cache_threshold')
+    op.drop_column('model_configs', 'response_cache_enabled')
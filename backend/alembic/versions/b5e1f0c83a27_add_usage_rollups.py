@@ -0,0 +1,50 @@
+"""Add usage rollup tables and token split on request_logs
+
+Revision ID: b5e1f0c83a27
+Revises: 7a3c9e2d4b61
+Create Date: 2026-10-19 14:03:52.406117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e1f0c83a27'
+down_revision: Union[str, None] = '7a3c9e2d4b61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUP_TABLES = ('usage_rollups_minute', 'usage_rollups_hour', 'usage_rollups_day')
+LATENCY_BUCKETS = ('100', '250', '500', '1000', '2500', '5000', '10000', '30000', 'inf')
+
+
+def upgrade() -> None:
+    op.add_column('request_logs', sa.Column('prompt_tokens', sa.Integer(), nullable=True))
+    op.add_column('request_logs', sa.Column('completion_tokens', sa.Integer(), nullable=True))
+
+    for table_name in ROLLUP_TABLES:
+        op.create_table(table_name,
+        sa.Column('model_config_id', sa.String(length=36), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('request_count', sa.Integer(), nullable=False),
+        sa.Column('error_count', sa.Integer(), nullable=False),
+        sa.Column('prompt_tokens', sa.BigInteger(), nullable=False),
+        sa.Column('completion_tokens', sa.BigInteger(), nullable=False),
+        sa.Column('latency_ms_sum', sa.BigInteger(), nullable=False),
+        *[sa.Column(f'latency_le_{bound}', sa.Integer(), nullable=False) for bound in LATENCY_BUCKETS],
+        sa.ForeignKeyConstraint(['model_config_id'], ['model_configs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('model_config_id', 'bucket_start')
+        )
+        op.create_index(op.f(f'ix_{table_name}_bucket_start'), table_name, ['bucket_start'], unique=False)
+
+
+def downgrade() -> None:
+    for table_name in reversed(ROLLUP_TABLES):
+        op.drop_index(op.f(f'ix_{table_name}_bucket_start'), table_name=table_name)
+        op.drop_table(table_name)
+
+    op.drop_column('request_logs', 'completion_tokens')
+    op.drop_column('request_logs', 'prompt_tokens')
@@ -0,0 +1,30 @@
+"""Add conversation trimming settings to model_configs
+
+Revision ID: b9d4e2a7c310
+Revises: a3c7e9f15d24
+Create Date: 2026-10-19 21:12:40.318025
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d4e2a7c310'
+down_revision: Union[str, None] = 'a3c7e9f15d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('model_configs', sa.Column('trim_strategy', sa.String(length=20), nullable=True))
+    op.add_column('model_configs', sa.Column('trim_keep_turns', sa.Integer(), nullable=True))
+    op.add_column('model_configs', sa.Column('trim_token_budget', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('model_configs', 'trim_token_budget')
+    op.drop_column('model_configs', 'trim_keep_turns')
+    op.drop_column('model_configs', 'trim_strategy')
@@ -0,0 +1,26 @@
+"""Add error_type to request_logs
+
+Revision ID: c4f8a1d6e2b9
+Revises: b9d4e2a7c310
+Create Date: 2026-10-19 22:04:17.530442
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f8a1d6e2b9'
+down_revision: Union[str, None] = 'b9d4e2a7c310'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('request_logs', sa.Column('error_type', sa.String(length=30), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('request_logs', 'error_type')
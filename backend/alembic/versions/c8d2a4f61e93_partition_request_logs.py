@@ -0,0 +1,105 @@
+"""Partition request_logs by day and drop its model_configs foreign key
+
+Revision ID: c8d2a4f61e93
+Revises: b5e1f0c83a27
+Create Date: 2026-10-19 16:27:08.913554
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8d2a4f61e93'
+down_revision: Union[str, None] = 'b5e1f0c83a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _request_logs_table(with_foreign_key: bool) -> sa.Table:
+    """request_logs的表结构（SQLite批量重建时使用）"""
+    args = [
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('model_config_id', sa.String(length=36), nullable=False),
+        sa.Column('request_id', sa.String(length=100), nullable=True),
+        sa.Column('method', sa.String(length=10), nullable=True),
+        sa.Column('path', sa.Text(), nullable=True),
+        sa.Column('source_format', sa.String(length=50), nullable=True),
+        sa.Column('target_format', sa.String(length=50), nullable=True),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('response_time_ms', sa.Integer(), nullable=True),
+        sa.Column('tokens_used', sa.Integer(), nullable=True),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+        sa.Column('completion_tokens', sa.Integer(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    ]
+    if with_foreign_key:
+        args.append(sa.ForeignKeyConstraint(['model_config_id'], ['model_configs.id']))
+    return sa.Table('request_logs', sa.MetaData(), *args)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        # 转换为按created_at划分的分区表，当天之前的数据进入默认分区，由保留任务按时间清理
+        op.execute("ALTER TABLE request_logs DROP CONSTRAINT IF EXISTS request_logs_model_config_id_fkey")
+        op.execute("ALTER TABLE request_logs RENAME TO request_logs_legacy")
+        op.execute("ALTER TABLE request_logs_legacy RENAME CONSTRAINT request_logs_pkey TO request_logs_legacy_pkey")
+        op.execute("UPDATE request_logs_legacy SET created_at = now() WHERE created_at IS NULL")
+        op.execute(
+            "CREATE TABLE request_logs (LIKE request_logs_legacy INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (created_at)"
+        )
+        op.execute("ALTER TABLE request_logs ALTER COLUMN created_at SET NOT NULL")
+        op.execute("ALTER TABLE request_logs ADD CONSTRAINT request_logs_pkey PRIMARY KEY (id, created_at)")
+        op.execute("CREATE TABLE request_logs_default PARTITION OF request_logs DEFAULT")
+        # 当天的日分区在迁移时创建，当天已有的日志直接进入该分区；之后的日分区由保留任务提前创建
+        today = datetime.utcnow()
+        start = datetime(today.year, today.month, today.day)
+        op.execute(
+            f"CREATE TABLE request_logs_p{start.strftime('%Y%m%d')} PARTITION OF request_logs "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{(start + timedelta(days=1)).isoformat()}')"
+        )
+        op.execute("INSERT INTO request_logs SELECT * FROM request_logs_legacy")
+        op.execute("DROP TABLE request_logs_legacy")
+    else:
+        with op.batch_alter_table(
+            'request_logs',
+            recreate='always',
+            copy_from=_request_logs_table(with_foreign_key=False)
+        ):
+            pass
+
+    op.create_index(op.f('ix_request_logs_model_config_id'), 'request_logs', ['model_config_id'], unique=False)
+    op.create_index(op.f('ix_request_logs_created_at'), 'request_logs', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_request_logs_created_at'), table_name='request_logs')
+    op.drop_index(op.f('ix_request_logs_model_config_id'), table_name='request_logs')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("ALTER TABLE request_logs RENAME TO request_logs_partitioned")
+        op.execute("ALTER TABLE request_logs_partitioned RENAME CONSTRAINT request_logs_pkey TO request_logs_partitioned_pkey")
+        op.execute("CREATE TABLE request_logs (LIKE request_logs_partitioned INCLUDING DEFAULTS)")
+        op.execute("ALTER TABLE request_logs ALTER COLUMN created_at DROP NOT NULL")
+        op.execute("ALTER TABLE request_logs ADD CONSTRAINT request_logs_pkey PRIMARY KEY (id)")
+        op.execute("INSERT INTO request_logs SELECT * FROM request_logs_partitioned")
+        op.execute("DROP TABLE request_logs_partitioned CASCADE")
+        op.execute(
+            "DELETE FROM request_logs WHERE model_config_id NOT IN (SELECT id FROM model_configs)"
+        )
+        op.create_foreign_key(
+            'request_logs_model_config_id_fkey', 'request_logs', 'model_configs', ['model_config_id'], ['id']
+        )
+    else:
+        with op.batch_alter_table(
+            'request_logs',
+            recreate='always',
+            copy_from=_request_logs_table(with_foreign_key=True)
+        ):
+            pass
@@ -0,0 +1,43 @@
+"""Add keyset pagination and filter indexes on request_logs
+
+Revision ID: d41f7b9e0c52
+Revises: c8d2a4f61e93
+Create Date: 2026-10-19 18:45:31.270846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f7b9e0c52'
+down_revision: Union[str, None] = 'c8d2a4f61e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        # 数据库默认值写入的时间不带微秒，统一格式后键集分页的比较才准确
+        op.execute(
+            "UPDATE request_logs SET created_at = created_at || '.000000' "
+            "WHERE length(created_at) = 19"
+        )
+
+    op.drop_index(op.f('ix_request_logs_created_at'), table_name='request_logs')
+    op.drop_index(op.f('ix_request_logs_model_config_id'), table_name='request_logs')
+    op.create_index('ix_request_logs_created_at_id', 'request_logs', ['created_at', 'id'], unique=False)
+    op.create_index('ix_request_logs_config_created_at', 'request_logs', ['model_config_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_request_logs_status_created_at', 'request_logs', ['status_code', 'created_at'], unique=False)
+    op.create_index('ix_request_logs_latency', 'request_logs', ['model_config_id', 'response_time_ms'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_request_logs_latency', table_name='request_logs')
+    op.drop_index('ix_request_logs_status_created_at', table_name='request_logs')
+    op.drop_index('ix_request_logs_config_created_at', table_name='request_logs')
+    op.drop_index('ix_request_logs_created_at_id', table_name='request_logs')
+    op.create_index(op.f('ix_request_logs_model_config_id'), 'request_logs', ['model_config_id'], unique=False)
+    op.create_index(op.f('ix_request_logs_created_at'), 'request_logs', ['created_at'], unique=False)
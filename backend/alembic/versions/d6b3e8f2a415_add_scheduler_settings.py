@@ -0,0 +1,28 @@
+"""Add upstream scheduling settings to model_configs
+
+Revision ID: d6b3e8f2a415
+Revises: c4f8a1d6e2b9
+Create Date: 2026-10-19 23:05:17.482931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6b3e8f2a415'
+down_revision: Union[str, None] = 'c4f8a1d6e2b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('model_configs', sa.Column('priority_class', sa.String(length=20), nullable=True))
+    op.add_column('model_configs', sa.Column('scheduler_weight', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('model_configs', 'scheduler_weight')
+    op.drop_column('model_configs', 'priority_class')
@@ -0,0 +1,40 @@
+"""Add per-key token quotas
+
+Revision ID: e7a5c3d92b18
+Revises: d41f7b9e0c52
+Create Date: 2026-10-19 18:21:07.531284
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a5c3d92b18'
+down_revision: Union[str, None] = 'd41f7b9e0c52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('model_configs', sa.Column('daily_token_quota', sa.Integer(), nullable=True))
+    op.add_column('model_configs', sa.Column('monthly_token_quota', sa.Integer(), nullable=True))
+
+    op.create_table('token_quota_usage',
+    sa.Column('model_config_id', sa.String(length=36), nullable=False),
+    sa.Column('period', sa.String(length=10), nullable=False),
+    sa.Column('period_key', sa.String(length=10), nullable=False),
+    sa.Column('used_tokens', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['model_config_id'], ['model_configs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('model_config_id', 'period', 'period_key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('token_quota_usage')
+
+    op.drop_column('model_configs', 'monthly_token_quota')
+    op.drop_column('model_configs', 'daily_token_quota')
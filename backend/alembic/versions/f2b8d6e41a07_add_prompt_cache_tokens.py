@@ -0,0 +1,28 @@
+"""Add prompt cache token counts to request_logs
+
+Revision ID: f2b8d6e41a07
+Revises: e7a5c3d92b18
+Create Date: 2026-10-19 19:05:42.118903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8d6e41a07'
+down_revision: Union[str, None] = 'e7a5c3d92b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('request_logs', sa.Column('cache_read_tokens', sa.Integer(), nullable=True))
+    op.add_column('request_logs', sa.Column('cache_creation_tokens', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('request_logs', 'cache_creation_tokens')
+    op.drop_column('request_logs', 'cache_read_tokens')
@@ -1,7 +1,17 @@
 from .base import AbstractLLMAdapter
-from .openai_adapter import OpenAIAdapter
-from .anthropic_adapter import AnthropicAdapter
-from .claude_code_adapter import ClaudeCodeAdapter
 from .factory import LLMAdapterFactory
 
-__all__ = ["AbstractLLMAdapter", "OpenAIAdapter", "AnthropicAdapter", "ClaudeCodeAdapter", "LLMAdapterFactory"]
\ No newline at end of file
+__all__ = ["AbstractLLMAdapter", "OpenAIAdapter", "AnthropicAdapter", "ClaudeCodeAdapter", "LLMAdapterFactory"]
+
+_LAZY_ADAPTERS = {
+    "OpenAIAdapter": "openai",
+    "AnthropicAdapter": "anthropic",
+    "ClaudeCodeAdapter": "claude_code",
+}
+
+
+def __getattr__(name):
+    # 适配器类按需导入，避免导入包时加载所有提供商
+    if name in _LAZY_ADAPTERS:
+        return LLMAdapterFactory.get_adapter_class(_LAZY_ADAPTERS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
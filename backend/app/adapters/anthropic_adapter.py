@@ -1,5 +1,7 @@
 from typing import Dict, Any, List, Optional
 from .base import AbstractLLMAdapter, LLMRequest, LLMResponse
+from .multimodal import prepend_text
+from .prompt_cache import apply_anthropic_cache_control, anthropic_usage
 import time
 import uuid
 import logging
@@ -11,6 +13,8 @@ logger = logging.getLogger(__name__)
 class AnthropicAdapter(AbstractLLMAdapter):
     """Anthropic适配器"""
 
+    wire_format = "anthropic"
+
     def __init__(self, api_key: str, api_url: Optional[str] = None):
         self.api_key = api_key
         self.api_url = api_url or self.get_default_api_url()
@@ -65,6 +69,17 @@ class AnthropicAdapter(AbstractLLMAdapter):
             "claude-3-7-sonnet-20250219"
         ]
 
+    async def probe_model(self, model_name: str) -> bool:
+        """通过模型元数据接口探测模型（不消耗token）"""
+        try:
+            await self.send_get_request(f"models/{model_name}")
+            return True
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return False
+            # 不支持模型元数据接口的中转服务，退回到补全请求探测
+            return await self.validate_model(model_name)
+
     def transform_request_to_openai(self, request: LLMRequest) -> Dict[str, Any]:
         """转换Anthropic格式请求为OpenAI格式"""
         messages = self._ensure_message_format(request.messages)
@@ -89,7 +104,7 @@ class AnthropicAdapter(AbstractLLMAdapter):
 
             if first_user_msg is not None:
                 original_content = filtered_messages[first_user_msg]["content"]
-                filtered_messages[first_user_msg]["content"] = f"{system_content}\n\n{original_content}"
+                filtered_messages[first_user_msg]["content"] = prepend_text(original_content, system_content)
 
         return {
             "model": request.model,
@@ -102,7 +117,7 @@ class AnthropicAdapter(AbstractLLMAdapter):
     def transform_request_to_anthropic(self, request: LLMRequest) -> Dict[str, Any]:
         """转换请求为Anthropic格式（已经是Anthropic格式）"""
         system_message, messages = self._extract_system_message(request.messages)
-        formatted_messages = self._ensure_message_format(messages)
+        formatted_messages = self._ensure_anthropic_message_format(messages)
 
         anthropic_request = {
             "model": request.model,
@@ -115,6 +130,9 @@ class AnthropicAdapter(AbstractLLMAdapter):
         if system_message:
             anthropic_request["system"] = system_message
 
+        if request.prompt_cache:
+            anthropic_request = apply_anthropic_cache_control(anthropic_request)
+
         return anthropic_request
 
     def transform_response_from_openai(self, response: Dict[str, Any]) -> LLMResponse:
@@ -153,18 +171,11 @@ class AnthropicAdapter(AbstractLLMAdapter):
             "finish_reason": "stop"
         })
 
-        usage = response.get("usage", {})
-        openai_usage = {
-            "prompt_tokens": usage.get("input_tokens", 0),
-            "completion_tokens": usage.get("output_tokens", 0),
-            "total_tokens": usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
-        }
-
         return LLMResponse(
             id=response.get("id", str(uuid.uuid4())),
             model=response.get("model", "unknown"),
             choices=choices,
-            usage=openai_usage
+            usage=anthropic_usage(response.get("usage", {}))
         )
 
     def _map_model_to_openai(self, anthropic_model: str) -> str:
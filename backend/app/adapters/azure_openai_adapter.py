@@ -1,5 +1,7 @@
 from typing import Dict, Any, List, Optional
-from .base import AbstractLLMAdapter, LLMRequest, LLMResponse
+from .base import AbstractLLMAdapter, LLMRequest, LLMResponse, EmbeddingResponse
+from .multimodal import json_content
+from .prompt_cache import openai_usage
 import uuid
 import logging
 
@@ -9,6 +11,10 @@ logger = logging.getLogger(__name__)
 class AzureOpenAIAdapter(AbstractLLMAdapter):
     """Azure OpenAI适配器"""
 
+    wire_format = "openai"
+    supports_native_n = True
+    max_embedding_inputs = 2048
+
     def __init__(self, api_key: str, api_url: Optional[str] = None):
         """
         初始化Azure OpenAI适配器
@@ -65,7 +71,7 @@ class AzureOpenAIAdapter(AbstractLLMAdapter):
 
         try:
             import httpx
-            response = await self.client.post(url, json=azure_data, headers=headers)
+            response = await self.client.post(url, **json_content(azure_data, headers))
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
@@ -112,18 +118,21 @@ class AzureOpenAIAdapter(AbstractLLMAdapter):
         """转换Azure OpenAI格式请求为OpenAI格式（基本相同）"""
         messages = self._ensure_message_format(request.messages)
 
-        return {
+        openai_request = {
             "model": request.model,
             "messages": messages,
             "max_tokens": request.max_tokens,
             "temperature": request.temperature,
             "stream": request.stream
         }
+        if request.n > 1:
+            openai_request["n"] = request.n
+        return openai_request
 
     def transform_request_to_anthropic(self, request: LLMRequest) -> Dict[str, Any]:
         """转换Azure OpenAI格式请求为Anthropic格式"""
         system_message, messages = self._extract_system_message(request.messages)
-        formatted_messages = self._ensure_message_format(messages)
+        formatted_messages = self._ensure_anthropic_message_format(messages)
 
         anthropic_request = {
             "model": request.model,
@@ -143,7 +152,7 @@ class AzureOpenAIAdapter(AbstractLLMAdapter):
             id=response.get("id", str(uuid.uuid4())),
             model=response.get("model", "unknown"),
             choices=response.get("choices", []),
-            usage=response.get("usage", {})
+            usage=openai_usage(response.get("usage", {}))
         )
 
     def transform_response_from_anthropic(self, response: Dict[str, Any]) -> LLMResponse:
@@ -197,6 +206,15 @@ class AzureOpenAIAdapter(AbstractLLMAdapter):
         }
         return model_mapping.get(azure_model, "claude-3-5-sonnet-20241022")
 
+    async def create_embeddings(
+        self,
+        model: str,
+        inputs: List[str],
+        dimensions: Optional[int] = None
+    ) -> EmbeddingResponse:
+        """调用Azure OpenAI embeddings接口"""
+        return await self._create_openai_embeddings(model, inputs, dimensions)
+
     async def forward_to_openai(self, request: LLMRequest) -> LLMResponse:
         """转发到Azure OpenAI"""
         azure_request = self.transform_request_to_openai(request)
@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional
 from pydantic import BaseModel
+from .multimodal import json_content, to_anthropic_content, to_openai_content
 import httpx
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +16,8 @@ class LLMRequest(BaseModel):
     max_tokens: int = 1000
     temperature: float = 0.7
     stream: bool = False
+    n: int = 1  # 生成的候选数
+    prompt_cache: bool = False  # 是否为长前缀自动启用提供商原生的提示词缓存
 
 
 class LLMResponse(BaseModel):
@@ -24,9 +28,35 @@ class LLMResponse(BaseModel):
     usage: Dict[str, int]
 
 
+class StreamDelta(BaseModel):
+    """流式响应的通用增量事件"""
+    text: str = ""  # 本次新增的文本
+    finish_reason: Optional[str] = None  # 结束原因（OpenAI取值：stop / length），只在最后一个事件中出现
+    usage: Optional[Dict[str, int]] = None  # OpenAI格式的累计用量，以最后一次出现的为准
+
+
+class EmbeddingResponse(BaseModel):
+    """通用向量化响应（embeddings与输入一一对应）"""
+    model: str
+    embeddings: List[List[float]]
+    usage: Dict[str, int]
+
+
 class AbstractLLMAdapter(ABC):
     """LLM适配器抽象基类"""
 
+    # 上游原生接口格式（openai / anthropic / gemini / qwen / ernie），原生请求由 forward_to_<格式> 方法发送
+    wire_format: str = "openai"
+
+    # 上游接口是否原生支持一次生成多个候选（n>1），不支持时由代理并发请求后合并
+    supports_native_n: bool = False
+
+    # 单次向量化请求允许的最大输入条数，0表示不支持向量化
+    max_embedding_inputs: int = 0
+
+    # 是否实现了上游原生流式接口（stream_chat），不支持时由代理把完整响应转为流
+    supports_native_stream: bool = False
+
     def __init__(self, api_key: str, api_url: Optional[str] = None):
         self.api_key = api_key
         self.api_url = api_url or self.get_default_api_url()
@@ -48,36 +78,27 @@ class AbstractLLMAdapter(ABC):
         pass
 
     async def validate_model(self, model_name: str) -> bool:
-        """验证特定模型是否可用"""
+        """验证特定模型是否可用：通过上游原生接口发送一个极小的请求"""
         try:
-            # 创建一个简单的测试请求
-            test_request = {
-                "model": model_name,
-                "messages": [{"role": "user", "content": "Hi"}],
-                "max_tokens": 5
-            }
-
-            # 根据适配器类型选择合适的endpoint和请求格式
-            if hasattr(self, 'transform_request_to_anthropic'):
-                # Anthropic类型的适配器
-                transformed_request = self.transform_request_to_anthropic(
-                    LLMRequest(**test_request)
-                )
-                endpoint = "v1/messages"
-            else:
-                # OpenAI类型的适配器
-                transformed_request = self.transform_request_to_openai(
-                    LLMRequest(**test_request)
-                )
-                endpoint = "v1/chat/completions"
-
-            # 发送测试请求
-            response = await self.send_request(transformed_request, endpoint)
+            forward = getattr(self, self.native_forward_name())
+            await forward(LLMRequest(model=model_name, messages=[{"role": "user", "content": "Hi"}], max_tokens=5))
             return True
         except Exception as e:
             logger.warning(f"Model validation failed for {model_name}: {e}")
             return False
 
+    @classmethod
+    def native_forward_name(cls) -> str:
+        """发送原生请求的方法名，返回通用的LLMResponse"""
+        return f"forward_to_{cls.wire_format}"
+
+    async def probe_model(self, model_name: str) -> bool:
+        """以最低成本探测模型是否可用
+
+        默认发送一个极小的补全请求；能通过元数据接口判断模型可用性的适配器应覆盖此方法，避免消耗token。
+        """
+        return await self.validate_model(model_name)
+
     @abstractmethod
     def transform_request_to_openai(self, request: LLMRequest) -> Dict[str, Any]:
         """转换请求为OpenAI格式"""
@@ -104,7 +125,7 @@ class AbstractLLMAdapter(ABC):
         url = f"{self.api_url.rstrip('/')}/{endpoint.lstrip('/')}"
 
         try:
-            response = await self.client.post(url, json=data, headers=headers)
+            response = await self.client.post(url, **json_content(data, headers))
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
@@ -114,6 +135,70 @@ class AbstractLLMAdapter(ABC):
             logger.error(f"Request error: {e}")
             raise
 
+    async def send_get_request(self, endpoint: str) -> Dict[str, Any]:
+        """发送HTTP GET请求"""
+        headers = self.get_headers()
+        url = f"{self.api_url.rstrip('/')}/{endpoint.lstrip('/')}"
+
+        response = await self.client.get(url, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    def stream_chat(self, request: LLMRequest) -> AsyncIterator[StreamDelta]:
+        """调用上游原生流式接口，逐个产出通用增量事件"""
+        raise NotImplementedError(f"{type(self).__name__} does not support native streaming")
+
+    async def _iter_sse_json(self, url: str, data: Dict[str, Any], headers: Dict[str, str]) -> AsyncIterator[Dict[str, Any]]:
+        """发送流式请求，逐个产出SSE事件中的JSON数据
+
+        部分提供商出错时返回普通JSON响应体而非SSE事件，这类整行JSON同样会被产出。
+        """
+        async with self.client.stream("POST", url, **json_content(data, headers)) as response:
+            if response.is_error:
+                await response.aread()
+                logger.error(f"HTTP error: {response.status_code} - {response.text}")
+                response.raise_for_status()
+
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    payload = line[5:].strip()
+                elif line.startswith("{"):
+                    payload = line
+                else:
+                    continue
+                if payload and payload != "[DONE]":
+                    yield json.loads(payload)
+
+    async def create_embeddings(
+        self,
+        model: str,
+        inputs: List[str],
+        dimensions: Optional[int] = None
+    ) -> EmbeddingResponse:
+        """批量生成文本向量"""
+        raise NotImplementedError(f"{type(self).__name__} does not support embeddings")
+
+    async def _create_openai_embeddings(
+        self,
+        model: str,
+        inputs: List[str],
+        dimensions: Optional[int] = None
+    ) -> EmbeddingResponse:
+        """调用OpenAI兼容的embeddings接口"""
+        data = {"model": model, "input": inputs, "encoding_format": "float"}
+        if dimensions:
+            data["dimensions"] = dimensions
+        response = await self.send_request(data, "embeddings")
+
+        items = sorted(response.get("data", []), key=lambda item: item.get("index", 0))
+        usage = response.get("usage", {})
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        return EmbeddingResponse(
+            model=response.get("model", model),
+            embeddings=[item["embedding"] for item in items],
+            usage={"prompt_tokens": prompt_tokens, "total_tokens": usage.get("total_tokens", prompt_tokens)}
+        )
+
     @abstractmethod
     def get_headers(self) -> Dict[str, str]:
         """获取请求头"""
@@ -137,12 +222,19 @@ class AbstractLLMAdapter(ABC):
         return system_message, filtered_messages
 
     def _ensure_message_format(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """确保消息格式正确"""
+        """确保消息格式正确（OpenAI格式，内容块列表中的图片统一为image_url）"""
         formatted_messages = []
         for msg in messages:
             formatted_msg = {
                 "role": msg.get("role", "user"),
-                "content": str(msg.get("content", ""))
+                "content": to_openai_content(msg.get("content", ""))
             }
             formatted_messages.append(formatted_msg)
-        return formatted_messages
\ No newline at end of file
+        return formatted_messages
+
+    def _ensure_anthropic_message_format(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """确保消息格式正确（Anthropic格式，内容块列表中的图片统一为image）"""
+        return [
+            {"role": msg.get("role", "user"), "content": to_anthropic_content(msg.get("content", ""))}
+            for msg in messages
+        ]
\ No newline at end of file
@@ -1,5 +1,7 @@
 from typing import Dict, Any, List, Optional
 from .base import AbstractLLMAdapter, LLMRequest, LLMResponse
+from .multimodal import json_content, prepend_text
+from .prompt_cache import apply_anthropic_cache_control, anthropic_usage
 import time
 import uuid
 import logging
@@ -11,6 +13,8 @@ logger = logging.getLogger(__name__)
 class ClaudeCodeAdapter(AbstractLLMAdapter):
     """Claude Code专用适配器"""
 
+    wire_format = "anthropic"
+
     def __init__(self, api_key: str, api_url: Optional[str] = None):
         if not api_key.startswith("cr_"):
             raise ValueError("Claude Code adapter requires API key starting with 'cr_'")
@@ -47,8 +51,8 @@ class ClaudeCodeAdapter(AbstractLLMAdapter):
 
         try:
             # 创建一个全新的临时客户端，确保不会添加任何意外的headers
-            async with httpx.AsyncClient(timeout=60.0) as temp_client:
-                response = await temp_client.post(url, json=data, headers=headers)
+            async with httpx.AsyncClient(timeout=self.client.timeout) as temp_client:
+                response = await temp_client.post(url, **json_content(data, headers))
                 response.raise_for_status()
                 return response.json()
         except httpx.HTTPStatusError as e:
@@ -130,7 +134,7 @@ class ClaudeCodeAdapter(AbstractLLMAdapter):
 
             if first_user_msg is not None:
                 original_content = filtered_messages[first_user_msg]["content"]
-                filtered_messages[first_user_msg]["content"] = f"{system_content}\n\n{original_content}"
+                filtered_messages[first_user_msg]["content"] = prepend_text(original_content, system_content)
 
         return {
             "model": request.model,
@@ -143,7 +147,7 @@ class ClaudeCodeAdapter(AbstractLLMAdapter):
     def transform_request_to_anthropic(self, request: LLMRequest) -> Dict[str, Any]:
         """转换请求为Claude Code格式"""
         system_message, messages = self._extract_system_message(request.messages)
-        formatted_messages = self._ensure_message_format(messages)
+        formatted_messages = self._ensure_anthropic_message_format(messages)
 
         anthropic_request = {
             "model": request.model,
@@ -161,13 +165,22 @@ class ClaudeCodeAdapter(AbstractLLMAdapter):
             }
         }
 
+        # 自定义system消息和对话的缓存断点单独计算，Claude Code系统提示词已占用一个断点
         if system_message:
+            anthropic_request["system"] = system_message
+        if request.prompt_cache:
+            anthropic_request = apply_anthropic_cache_control(anthropic_request, reserved_breakpoints=1)
+
+        custom_system = anthropic_request.pop("system", None)
+        if isinstance(custom_system, list):
             # 如果有自定义system消息，添加到Claude Code系统提示词后
+            anthropic_request["system"] = [claude_code_system] + custom_system
+        elif custom_system:
             anthropic_request["system"] = [
                 claude_code_system,
                 {
                     "type": "text",
-                    "text": system_message
+                    "text": custom_system
                 }
             ]
         else:
@@ -212,18 +225,11 @@ class ClaudeCodeAdapter(AbstractLLMAdapter):
             "finish_reason": "stop"
         })
 
-        usage = response.get("usage", {})
-        openai_usage = {
-            "prompt_tokens": usage.get("input_tokens", 0),
-            "completion_tokens": usage.get("output_tokens", 0),
-            "total_tokens": usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
-        }
-
         return LLMResponse(
             id=response.get("id", str(uuid.uuid4())),
             model=response.get("model", "unknown"),
             choices=choices,
-            usage=openai_usage
+            usage=anthropic_usage(response.get("usage", {}))
         )
 
     def _map_model_to_openai(self, claude_code_model: str) -> str:
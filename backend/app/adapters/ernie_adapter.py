@@ -1,5 +1,7 @@
-from typing import Dict, Any, List, Optional
-from .base import AbstractLLMAdapter, LLMRequest, LLMResponse
+from typing import AsyncIterator, Dict, Any, List, Optional
+from .base import AbstractLLMAdapter, LLMRequest, LLMResponse, StreamDelta
+from .multimodal import content_text, has_images, json_content
+from app.exceptions import LLMProviderError
 import uuid
 import logging
 
@@ -9,6 +11,9 @@ logger = logging.getLogger(__name__)
 class ErnieAdapter(AbstractLLMAdapter):
     """百度文心一言适配器"""
 
+    wire_format = "ernie"
+    supports_native_stream = True
+
     def __init__(self, api_key: str, api_url: Optional[str] = None):
         # 百度使用API Key和Secret Key的组合，格式: "API_KEY:SECRET_KEY"
         if ":" in api_key:
@@ -66,7 +71,7 @@ class ErnieAdapter(AbstractLLMAdapter):
 
         try:
             import httpx
-            response = await self.client.post(url, json=data, headers=headers)
+            response = await self.client.post(url, **json_content(data, headers))
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
@@ -125,7 +130,7 @@ class ErnieAdapter(AbstractLLMAdapter):
     def transform_request_to_anthropic(self, request: LLMRequest) -> Dict[str, Any]:
         """转换文心一言格式请求为Anthropic格式"""
         system_message, messages = self._extract_system_message(request.messages)
-        formatted_messages = self._ensure_message_format(messages)
+        formatted_messages = self._ensure_anthropic_message_format(messages)
 
         anthropic_request = {
             "model": request.model,
@@ -141,6 +146,8 @@ class ErnieAdapter(AbstractLLMAdapter):
 
     def transform_request_to_ernie(self, request: LLMRequest) -> Dict[str, Any]:
         """转换标准请求为文心一言格式"""
+        if has_images(request.messages):
+            raise LLMProviderError("ERNIE does not support image input")
         messages = self._ensure_message_format(request.messages)
 
         # 文心一言的消息格式与OpenAI类似，但有细微差异
@@ -149,7 +156,7 @@ class ErnieAdapter(AbstractLLMAdapter):
 
         for msg in messages:
             role = msg.get("role", "user")
-            content = msg.get("content", "")
+            content = content_text(msg.get("content", ""))
 
             if role == "system":
                 # 文心一言不直接支持system角色，将其合并到第一条user消息
@@ -287,6 +294,34 @@ class ErnieAdapter(AbstractLLMAdapter):
         response = await self.send_request(ernie_request, endpoint)
         return self.transform_response_from_ernie(response, request.model)
 
+    async def stream_chat(self, request: LLMRequest) -> AsyncIterator[StreamDelta]:
+        """以stream模式转发到文心一言"""
+        ernie_request = self.transform_request_to_ernie(request)
+        ernie_request["stream"] = True
+
+        access_token = await self.get_access_token()
+        url = f"{self.api_url.rstrip('/')}/wenxinworkshop/chat/completions?access_token={access_token}"
+
+        async for event in self._iter_sse_json(url, ernie_request, self.get_headers()):
+            if "error_code" in event:
+                # 鉴权失败等错误以普通JSON响应体返回，HTTP状态码仍为200
+                raise LLMProviderError(f"ERNIE stream error: {event.get('error_code')} - {event.get('error_msg')}")
+
+            finish_reason = None
+            if event.get("is_end"):
+                finish_reason = "length" if event.get("is_truncated") else "stop"
+
+            usage = event.get("usage")
+            yield StreamDelta(
+                text=event.get("result", ""),
+                finish_reason=finish_reason,
+                usage={
+                    "prompt_tokens": usage.get("prompt_tokens", 0),
+                    "completion_tokens": usage.get("completion_tokens", 0),
+                    "total_tokens": usage.get("total_tokens", 0)
+                } if usage else None
+            )
+
     async def forward_to_openai_format(self, request: LLMRequest) -> Dict[str, Any]:
         """转发到OpenAI格式（不实际调用，只做转换）"""
         return self.transform_request_to_openai(request)
@@ -1,27 +1,48 @@
 from typing import Dict, Type, Optional
 from .base import AbstractLLMAdapter
-from .openai_adapter import OpenAIAdapter
-from .anthropic_adapter import AnthropicAdapter
-from .claude_code_adapter import ClaudeCodeAdapter
-from .gemini_adapter import GeminiAdapter
-from .ernie_adapter import ErnieAdapter
-from .qwen_adapter import QwenAdapter
-from .azure_openai_adapter import AzureOpenAIAdapter
+import importlib
+import weakref
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class LLMAdapterFactory:
-    """LLM适配器工厂"""
-
-    _adapters: Dict[str, Type[AbstractLLMAdapter]] = {
-        "openai": OpenAIAdapter,
-        "anthropic": AnthropicAdapter,
-        "claude_code": ClaudeCodeAdapter,
-        "gemini": GeminiAdapter,
-        "ernie": ErnieAdapter,
-        "qwen": QwenAdapter,
-        "azure_openai": AzureOpenAIAdapter,
+    """LLM适配器工厂
+
+    适配器模块在第一次使用时才导入，未使用的提供商不会增加启动耗时。
+    """
+
+    # 提供商 -> "模块:类名"
+    _registry: Dict[str, str] = {
+        "openai": "openai_adapter:OpenAIAdapter",
+        "anthropic": "anthropic_adapter:AnthropicAdapter",
+        "claude_code": "claude_code_adapter:ClaudeCodeAdapter",
+        "gemini": "gemini_adapter:GeminiAdapter",
+        "ernie": "ernie_adapter:ErnieAdapter",
+        "qwen": "qwen_adapter:QwenAdapter",
+        "azure_openai": "azure_openai_adapter:AzureOpenAIAdapter",
     }
 
+    # 已加载的适配器类
+    _adapters: Dict[str, Type[AbstractLLMAdapter]] = {}
+
+    # 尚未回收的适配器实例（停机时关闭其连接池）
+    _live: "weakref.WeakSet[AbstractLLMAdapter]" = weakref.WeakSet()
+
+    @classmethod
+    def get_adapter_class(cls, provider: str) -> Type[AbstractLLMAdapter]:
+        """获取提供商的适配器类（按需导入）"""
+        adapter_class = cls._adapters.get(provider)
+        if adapter_class is None:
+            if provider not in cls._registry:
+                raise ValueError(f"Unsupported provider: {provider}. Available: {cls.get_supported_providers()}")
+            module_name, class_name = cls._registry[provider].split(":")
+            module = importlib.import_module(f".{module_name}", __package__)
+            adapter_class = getattr(module, class_name)
+            cls._adapters[provider] = adapter_class
+        return adapter_class
+
     @classmethod
     def create_adapter(
         cls,
@@ -34,11 +55,31 @@ class LLMAdapterFactory:
         if provider == "anthropic" and api_key.startswith("cr_"):
             provider = "claude_code"
 
-        if provider not in cls._adapters:
-            raise ValueError(f"Unsupported provider: {provider}. Available: {list(cls._adapters.keys())}")
+        adapter_class = cls.get_adapter_class(provider)
+        adapter = adapter_class(api_key=api_key, api_url=api_url)
+        cls._live.add(adapter)
+        return adapter
 
-        adapter_class = cls._adapters[provider]
-        return adapter_class(api_key=api_key, api_url=api_url)
+    @classmethod
+    async def close_all(cls) -> int:
+        """关闭所有仍在使用的适配器连接池，返回关闭的数量"""
+        adapters = list(cls._live)
+        for adapter in adapters:
+            try:
+                await adapter.close()
+            except Exception as e:
+                logger.warning(f"Failed to close {type(adapter).__name__}: {e}")
+        cls._live.clear()
+        return len(adapters)
+
+    @classmethod
+    def preload(cls, providers: list[str]):
+        """预先导入指定提供商的适配器（启动预热使用）"""
+        for provider in providers:
+            if cls.is_provider_supported(provider):
+                cls.get_adapter_class(provider)
+                if provider == "anthropic":
+                    cls.get_adapter_class("claude_code")
 
     @classmethod
     def register_adapter(cls, provider: str, adapter_class: Type[AbstractLLMAdapter]):
@@ -48,9 +89,9 @@ class LLMAdapterFactory:
     @classmethod
     def get_supported_providers(cls) -> list[str]:
         """获取支持的提供商列表"""
-        return list(cls._adapters.keys())
+        return list(dict.fromkeys([*cls._registry, *cls._adapters]))
 
     @classmethod
     def is_provider_supported(cls, provider: str) -> bool:
         """检查是否支持某个提供商"""
-        return provider in cls._adapters
\ No newline at end of file
+        return provider in cls._registry or provider in cls._adapters
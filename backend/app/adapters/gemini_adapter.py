@@ -1,19 +1,37 @@
-from typing import Dict, Any, List, Optional
-from .base import AbstractLLMAdapter, LLMRequest, LLMResponse
+from typing import AsyncIterator, Dict, Any, List, Optional
+from .base import AbstractLLMAdapter, LLMRequest, LLMResponse, EmbeddingResponse, StreamDelta
+from .multimodal import json_content, to_gemini_parts
+from .prompt_cache import split_gemini_cache_prefix, cache_key
+from app.utils.tokens import estimate_text_tokens
+from app.utils.cache import AsyncTTLCache
 import uuid
 import logging
+import httpx
 
 logger = logging.getLogger(__name__)
 
+# 显式缓存内容的存活时间；本地记录提前一分钟过期，避免使用即将失效的缓存
+GEMINI_CACHE_TTL_SECONDS = 600
+
+# 稳定前缀 -> cachedContents资源名，同一前缀的并发请求只创建一次
+gemini_cached_contents = AsyncTTLCache(
+    "gemini_cached_contents",
+    ttl_seconds=GEMINI_CACHE_TTL_SECONDS - 60,
+    max_entries=256
+)
+
 
 class GeminiAdapter(AbstractLLMAdapter):
     """Google Gemini适配器"""
 
+    wire_format = "gemini"
+    max_embedding_inputs = 100
+    supports_native_stream = True
+
     def __init__(self, api_key: str, api_url: Optional[str] = None):
         self.api_key = api_key
         self.api_url = api_url or self.get_default_api_url()
         # Gemini使用API key作为查询参数，不需要特殊的HTTP客户端
-        import httpx
         self.client = httpx.AsyncClient(timeout=60.0)
 
     def get_default_api_url(self) -> str:
@@ -34,7 +52,7 @@ class GeminiAdapter(AbstractLLMAdapter):
 
         try:
             import httpx
-            response = await self.client.post(url, json=data, headers=headers)
+            response = await self.client.post(url, **json_content(data, headers))
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
@@ -44,6 +62,24 @@ class GeminiAdapter(AbstractLLMAdapter):
             logger.error(f"Request error: {e}")
             raise
 
+    async def send_get_request(self, endpoint: str) -> Dict[str, Any]:
+        """发送HTTP GET请求 - Gemini专用版本（API key作为查询参数）"""
+        url = f"{self.api_url.rstrip('/')}/{endpoint.lstrip('/')}?key={self.api_key}"
+        response = await self.client.get(url, headers=self.get_headers())
+        response.raise_for_status()
+        return response.json()
+
+    async def probe_model(self, model_name: str) -> bool:
+        """通过模型元数据接口探测模型（不消耗token）"""
+        import httpx
+        try:
+            await self.send_get_request(f"models/{model_name}")
+            return True
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return False
+            return await self.validate_model(model_name)
+
     async def validate_credentials(self) -> bool:
         """验证Gemini凭证"""
         try:
@@ -96,7 +132,7 @@ class GeminiAdapter(AbstractLLMAdapter):
     def transform_request_to_anthropic(self, request: LLMRequest) -> Dict[str, Any]:
         """转换Gemini格式请求为Anthropic格式"""
         system_message, messages = self._extract_system_message(request.messages)
-        formatted_messages = self._ensure_message_format(messages)
+        formatted_messages = self._ensure_anthropic_message_format(messages)
 
         anthropic_request = {
             "model": request.model,
@@ -111,29 +147,27 @@ class GeminiAdapter(AbstractLLMAdapter):
         return anthropic_request
 
     def transform_request_to_gemini(self, request: LLMRequest) -> Dict[str, Any]:
-        """转换标准请求为Gemini格式"""
-        messages = self._ensure_message_format(request.messages)
-
+        """转换标准请求为Gemini格式（图片转为inlineData/fileData，base64数据按引用传递）"""
         # Gemini使用不同的消息格式
         contents = []
         system_instruction = None
 
-        for msg in messages:
+        for msg in request.messages:
             role = msg.get("role", "user")
-            content = msg.get("content", "")
+            parts = to_gemini_parts(msg.get("content", ""))
 
             if role == "system":
                 # Gemini 1.5支持systemInstruction
-                system_instruction = {"parts": [{"text": content}]}
+                system_instruction = {"parts": parts}
             elif role == "user":
                 contents.append({
                     "role": "user",
-                    "parts": [{"text": content}]
+                    "parts": parts
                 })
             elif role == "assistant":
                 contents.append({
                     "role": "model",  # Gemini使用"model"代替"assistant"
-                    "parts": [{"text": content}]
+                    "parts": parts
                 })
 
         gemini_request = {
@@ -213,38 +247,39 @@ class GeminiAdapter(AbstractLLMAdapter):
             else:
                 text = ""
 
-            finish_reason = candidate.get("finishReason", "STOP").lower()
-            if finish_reason == "stop":
-                finish_reason = "stop"
-            elif finish_reason == "max_tokens":
-                finish_reason = "length"
-            else:
-                finish_reason = "stop"
-
             choices.append({
                 "index": 0,
                 "message": {
                     "role": "assistant",
                     "content": text
                 },
-                "finish_reason": finish_reason
+                "finish_reason": self._map_finish_reason(candidate.get("finishReason", "STOP"))
             })
 
-        # Gemini的使用情况统计
-        usage_metadata = response.get("usageMetadata", {})
-        openai_usage = {
-            "prompt_tokens": usage_metadata.get("promptTokenCount", 0),
-            "completion_tokens": usage_metadata.get("candidatesTokenCount", 0),
-            "total_tokens": usage_metadata.get("totalTokenCount", 0)
-        }
-
         return LLMResponse(
             id=str(uuid.uuid4()),
             model=model,
             choices=choices,
-            usage=openai_usage
+            usage=self._map_usage(response.get("usageMetadata", {}))
         )
 
+    @staticmethod
+    def _map_finish_reason(finish_reason: str) -> str:
+        """映射Gemini结束原因到OpenAI格式"""
+        if finish_reason.lower() == "max_tokens":
+            return "length"
+        return "stop"
+
+    @staticmethod
+    def _map_usage(usage_metadata: Dict[str, Any]) -> Dict[str, int]:
+        """Gemini的使用情况统计转为OpenAI格式"""
+        return {
+            "prompt_tokens": usage_metadata.get("promptTokenCount", 0),
+            "completion_tokens": usage_metadata.get("candidatesTokenCount", 0),
+            "total_tokens": usage_metadata.get("totalTokenCount", 0),
+            "cache_read_tokens": usage_metadata.get("cachedContentTokenCount", 0)
+        }
+
     def _map_model_to_openai(self, gemini_model: str) -> str:
         """映射Gemini模型名称到OpenAI"""
         model_mapping = {
@@ -267,15 +302,115 @@ class GeminiAdapter(AbstractLLMAdapter):
         }
         return model_mapping.get(gemini_model, "claude-3-5-sonnet-20241022")
 
+    async def _create_cached_content(self, model: str, cached: Dict[str, Any]) -> str:
+        """创建显式缓存内容，返回资源名"""
+        data = {"model": f"models/{model}", "ttl": f"{GEMINI_CACHE_TTL_SECONDS}s", **cached}
+        response = await self.send_request(data, "cachedContents")
+        return response["name"]
+
+    async def _apply_cached_content(self, request: LLMRequest, gemini_request: Dict[str, Any]) -> Optional[tuple]:
+        """将稳定前缀放入缓存内容，返回 (缓存键, 改写后的请求)"""
+        split = split_gemini_cache_prefix(gemini_request)
+        if split is None:
+            return None
+
+        cached, remaining = split
+        key = cache_key(self.api_url, self.api_key, request.model, cached)
+        try:
+            name = await gemini_cached_contents.get(
+                key, lambda: self._create_cached_content(request.model, cached)
+            )
+        except Exception as e:
+            logger.warning(f"Failed to create Gemini cached content, sending uncached request: {e}")
+            return None
+
+        remaining["cachedContent"] = name
+        return key, remaining
+
+    async def create_embeddings(
+        self,
+        model: str,
+        inputs: List[str],
+        dimensions: Optional[int] = None
+    ) -> EmbeddingResponse:
+        """调用Gemini batchEmbedContents接口"""
+        model_path = model if model.startswith("models/") else f"models/{model}"
+        requests = []
+        for text in inputs:
+            item = {"model": model_path, "content": {"parts": [{"text": text}]}}
+            if dimensions:
+                item["outputDimensionality"] = dimensions
+            requests.append(item)
+
+        response = await self.send_request({"requests": requests}, f"{model_path}:batchEmbedContents")
+
+        # Gemini向量化接口不返回用量，按本地估算计数
+        tokens = sum(estimate_text_tokens(text, "gemini") for text in inputs)
+        return EmbeddingResponse(
+            model=model,
+            embeddings=[embedding.get("values", []) for embedding in response.get("embeddings", [])],
+            usage={"prompt_tokens": tokens, "total_tokens": tokens}
+        )
+
     async def forward_to_gemini(self, request: LLMRequest) -> LLMResponse:
         """转发到Gemini"""
         gemini_request = self.transform_request_to_gemini(request)
         # 使用模型名称构建endpoint
         model_name = request.model
         endpoint = f"models/{model_name}:generateContent"
+
+        cached = await self._apply_cached_content(request, gemini_request) if request.prompt_cache else None
+        if cached is not None:
+            key, cached_request = cached
+            try:
+                response = await self.send_request(cached_request, endpoint)
+                return self.transform_response_from_gemini(response, request.model)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in (400, 403, 404):
+                    raise
+                # 缓存内容已失效，丢弃记录后按普通请求重发
+                gemini_cached_contents.invalidate(key)
+
         response = await self.send_request(gemini_request, endpoint)
         return self.transform_response_from_gemini(response, request.model)
 
+    async def stream_chat(self, request: LLMRequest) -> AsyncIterator[StreamDelta]:
+        """通过streamGenerateContent流式转发到Gemini"""
+        gemini_request = self.transform_request_to_gemini(request)
+        endpoint = f"models/{request.model}:streamGenerateContent"
+
+        cached = await self._apply_cached_content(request, gemini_request) if request.prompt_cache else None
+        if cached is not None:
+            key, cached_request = cached
+            try:
+                async for delta in self._stream_gemini(cached_request, endpoint):
+                    yield delta
+                return
+            except httpx.HTTPStatusError as e:
+                # 状态码错误只会在产出任何内容之前出现，可以安全地重发
+                if e.response.status_code not in (400, 403, 404):
+                    raise
+                gemini_cached_contents.invalidate(key)
+
+        async for delta in self._stream_gemini(gemini_request, endpoint):
+            yield delta
+
+    async def _stream_gemini(self, gemini_request: Dict[str, Any], endpoint: str) -> AsyncIterator[StreamDelta]:
+        """读取Gemini的SSE流（每个事件是一个GenerateContentResponse片段）"""
+        url = f"{self.api_url.rstrip('/')}/{endpoint.lstrip('/')}?alt=sse&key={self.api_key}"
+        async for chunk in self._iter_sse_json(url, gemini_request, self.get_headers()):
+            candidates = chunk.get("candidates", [])
+            candidate = candidates[0] if candidates else {}
+            parts = candidate.get("content", {}).get("parts", [])
+            finish_reason = candidate.get("finishReason")
+            usage_metadata = chunk.get("usageMetadata")
+
+            yield StreamDelta(
+                text="".join(part.get("text", "") for part in parts),
+                finish_reason=self._map_finish_reason(finish_reason) if finish_reason else None,
+                usage=self._map_usage(usage_metadata) if usage_metadata else None
+            )
+
     async def forward_to_openai_format(self, request: LLMRequest) -> Dict[str, Any]:
         """转发到OpenAI格式（不实际调用，只做转换）"""
         return self.transform_request_to_openai(request)
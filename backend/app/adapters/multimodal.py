@@ -0,0 +1,258 @@
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+from app.exceptions import LLMProviderError
+import hashlib
+import json
+import re
+import uuid
+
+# 发送请求体时每次编码的base64字符数，决定了图片数据在原始字符串之外的额外内存占用
+BASE64_CHUNK_SIZE = 64 * 1024
+
+# 只接受不需要JSON转义的data URL头部，保证引用的数据可以原样写入请求体
+_DATA_URL_HEADER = re.compile(r"data:([\w.+-]+/[\w.+-]+)((?:;[\w.+-]+=[\w.+-]+)*);base64,")
+_BASE64_BODY = re.compile(r"[A-Za-z0-9+/]*={0,2}")
+
+
+class Base64Payload:
+    """对请求中原始base64字符串的一段引用
+
+    图片数据不解码、不复制：转换请求格式时只记录原字符串和起止位置，
+    发送时按块切片编码写入请求体（见json_content）。prefix用于在数据前拼接data URL头部。
+    """
+
+    __slots__ = ("source", "start", "end", "prefix", "_fingerprint")
+
+    def __init__(self, source: str, start: int = 0, end: Optional[int] = None, prefix: str = ""):
+        self.source = source
+        self.start = start
+        self.end = len(source) if end is None else end
+        self.prefix = prefix
+        self._fingerprint = None
+
+    def __len__(self) -> int:
+        # base64与data URL头部都是ASCII字符，字符数即字节数
+        return len(self.prefix) + self.end - self.start
+
+    def iter_bytes(self, chunk_size: int = BASE64_CHUNK_SIZE) -> Iterator[bytes]:
+        if self.prefix:
+            yield self.prefix.encode("ascii")
+        for offset in range(self.start, self.end, chunk_size):
+            yield self.source[offset:min(offset + chunk_size, self.end)].encode("ascii")
+
+    def as_data_url(self, media_type: str) -> "Base64Payload":
+        """引用同一段数据，序列化为完整的data URL"""
+        return Base64Payload(self.source, self.start, self.end, prefix=f"data:{media_type};base64,")
+
+    def fingerprint(self) -> str:
+        """数据的摘要（分块计算，用于缓存键等需要区分图片的场景）"""
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for chunk in self.iter_bytes():
+                digest.update(chunk)
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def __str__(self) -> str:
+        return f"<base64 {len(self)} bytes sha256={self.fingerprint()}>"
+
+    __repr__ = __str__
+
+
+def parse_data_url(url: str) -> Optional[Tuple[str, Base64Payload]]:
+    """解析base64 data URL，返回 (媒体类型, 数据引用)；不是合法的base64 data URL时返回None"""
+    match = _DATA_URL_HEADER.match(url)
+    if match is None or _BASE64_BODY.fullmatch(url, match.end()) is None:
+        return None
+    return match.group(1), Base64Payload(url, match.end())
+
+
+def _base64_data(data: Any) -> Base64Payload:
+    if isinstance(data, Base64Payload):
+        return data
+    if not isinstance(data, str) or _BASE64_BODY.fullmatch(data) is None:
+        raise LLMProviderError("Image data is not valid base64")
+    return Base64Payload(data)
+
+
+ImageSource = Tuple[Optional[str], Union[Base64Payload, str]]
+
+
+def image_source(part: Dict[str, Any]) -> Optional[ImageSource]:
+    """从OpenAI image_url内容块或Anthropic image内容块中取出图片
+
+    返回 (媒体类型, 数据引用) 或 (None, 远程URL)；不是图片内容块时返回None。
+    """
+    part_type = part.get("type")
+    if part_type == "image_url":
+        image_url = part.get("image_url")
+        url = image_url.get("url", "") if isinstance(image_url, dict) else image_url or ""
+        if url.startswith("data:"):
+            parsed = parse_data_url(url)
+            if parsed is None:
+                raise LLMProviderError("Image data URL must be base64 encoded")
+            return parsed
+        return None, url
+    if part_type == "image":
+        source = part.get("source") or {}
+        if source.get("type") == "url":
+            return None, source.get("url", "")
+        return source.get("media_type") or "image/png", _base64_data(source.get("data"))
+    return None
+
+
+def has_images(messages: List[Dict[str, Any]]) -> bool:
+    """对话中是否包含图片内容块"""
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and part.get("type") in ("image_url", "image"):
+                    return True
+    return False
+
+
+def content_text(content: Any) -> str:
+    """拼接内容块中的文本"""
+    if isinstance(content, list):
+        return "\n".join(
+            part.get("text", "") for part in content
+            if isinstance(part, dict) and part.get("type", "text") == "text"
+        )
+    return "" if content is None else str(content)
+
+
+def prepend_text(content: Any, text: str) -> Any:
+    """在消息内容前加入一段文本（内容块列表时插入文本块，不修改原内容）"""
+    if isinstance(content, list):
+        return [{"type": "text", "text": text}, *content]
+    return f"{text}\n\n{content}"
+
+
+def to_openai_content(content: Any) -> Any:
+    """转为OpenAI消息内容：图片统一为image_url内容块，base64数据以data URL引用"""
+    if not isinstance(content, list):
+        return "" if content is None else str(content)
+
+    parts = []
+    for part in content:
+        source = image_source(part) if isinstance(part, dict) else None
+        if source is None:
+            parts.append(part)
+            continue
+        media_type, data = source
+        image_url = {"url": data.as_data_url(media_type) if media_type else data}
+        detail = part.get("image_url", {}).get("detail") if isinstance(part.get("image_url"), dict) else None
+        if detail:
+            image_url["detail"] = detail
+        parts.append({"type": "image_url", "image_url": image_url})
+    return parts
+
+
+def to_anthropic_content(content: Any) -> Any:
+    """转为Anthropic消息内容：图片转为image内容块，base64数据直接引用"""
+    if not isinstance(content, list):
+        return "" if content is None else str(content)
+
+    blocks = []
+    for part in content:
+        source = image_source(part) if isinstance(part, dict) else None
+        if source is None:
+            blocks.append(part)
+            continue
+        media_type, data = source
+        if media_type:
+            block_source = {"type": "base64", "media_type": media_type, "data": data}
+        else:
+            block_source = {"type": "url", "url": data}
+        blocks.append({"type": "image", "source": block_source})
+    return blocks
+
+
+def to_gemini_parts(content: Any) -> List[Dict[str, Any]]:
+    """转为Gemini parts：base64图片转为inlineData，远程图片转为fileData"""
+    if not isinstance(content, list):
+        return [{"text": "" if content is None else str(content)}]
+
+    parts = []
+    for part in content:
+        if not isinstance(part, dict):
+            continue
+        source = image_source(part)
+        if source is None:
+            if part.get("type", "text") == "text":
+                parts.append({"text": part.get("text", "")})
+            continue
+        media_type, data = source
+        if media_type:
+            parts.append({"inlineData": {"mimeType": media_type, "data": data}})
+        else:
+            # 远程文件的类型无法在本地确定，按扩展名猜测
+            parts.append({"fileData": {"mimeType": _guess_image_type(data), "fileUri": data}})
+    return parts
+
+
+def to_qwen_content(content: Any) -> List[Dict[str, Any]]:
+    """转为DashScope多模态消息内容：[{"image": URL或data URL}, {"text": ...}]"""
+    if not isinstance(content, list):
+        return [{"text": "" if content is None else str(content)}]
+
+    items = []
+    for part in content:
+        if not isinstance(part, dict):
+            continue
+        source = image_source(part)
+        if source is None:
+            if part.get("type", "text") == "text":
+                items.append({"text": part.get("text", "")})
+            continue
+        media_type, data = source
+        items.append({"image": data.as_data_url(media_type) if media_type else data})
+    return items
+
+
+def _guess_image_type(url: str) -> str:
+    extension = url.split("?", 1)[0].rsplit(".", 1)[-1].lower()
+    return {
+        "png": "image/png",
+        "gif": "image/gif",
+        "webp": "image/webp",
+    }.get(extension, "image/jpeg")
+
+
+def json_content(data: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+    """序列化JSON请求体，返回httpx请求的content和headers参数
+
+    请求中没有图片数据引用时与json=参数等价；有引用时请求体骨架只序列化一次，
+    图片数据按块从原始字符串切片编码后流式写出，并显式设置Content-Length（httpx据此不使用分块传输）。
+    额外内存占用不超过请求体骨架加上一个数据块的大小。
+    """
+    payloads: List[Base64Payload] = []
+    placeholder = f"base64-payload-{uuid.uuid4().hex}"
+
+    def default(value: Any) -> str:
+        if isinstance(value, Base64Payload):
+            payloads.append(value)
+            return placeholder
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    skeleton = json.dumps(data, default=default)
+    headers = {**headers, "Content-Type": "application/json"}
+    if not payloads:
+        body = skeleton.encode()
+        headers["Content-Length"] = str(len(body))
+        return {"content": body, "headers": headers}
+
+    segments = [segment.encode() for segment in skeleton.split(f'"{placeholder}"')]
+    # 每个数据引用在请求体中带一对引号
+    headers["Content-Length"] = str(sum(map(len, segments)) + sum(len(payload) + 2 for payload in payloads))
+
+    async def body() -> AsyncIterator[bytes]:
+        for segment, payload in zip(segments, payloads):
+            yield segment
+            yield b'"'
+            for chunk in payload.iter_bytes():
+                yield chunk
+            yield b'"'
+        yield segments[-1]
+
+    return {"content": body(), "headers": headers}
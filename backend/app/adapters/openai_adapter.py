@@ -1,5 +1,7 @@
-from typing import Dict, Any, List
-from .base import AbstractLLMAdapter, LLMRequest, LLMResponse
+from typing import Dict, Any, List, Optional
+from .base import AbstractLLMAdapter, LLMRequest, LLMResponse, EmbeddingResponse
+from .prompt_cache import openai_usage
+import asyncio
 import time
 import uuid
 import logging
@@ -10,6 +12,16 @@ logger = logging.getLogger(__name__)
 class OpenAIAdapter(AbstractLLMAdapter):
     """OpenAI适配器"""
 
+    wire_format = "openai"
+    supports_native_n = True
+    max_embedding_inputs = 2048
+
+    def __init__(self, api_key: str, api_url: Optional[str] = None):
+        super().__init__(api_key, api_url)
+        # 模型探测时缓存的模型列表
+        self._probe_lock = asyncio.Lock()
+        self._probe_model_ids: Optional[set] = None
+
     def get_default_api_url(self) -> str:
         return "https://api.openai.com/v1"
 
@@ -31,29 +43,44 @@ class OpenAIAdapter(AbstractLLMAdapter):
     async def get_available_models(self) -> List[str]:
         """获取OpenAI可用模型"""
         try:
-            response = await self.send_request({}, "models")
+            response = await self.send_get_request("models")
             models = [model["id"] for model in response.get("data", [])]
             return models
         except Exception as e:
             logger.error(f"Failed to get OpenAI models: {e}")
             return []
 
+    async def probe_model(self, model_name: str) -> bool:
+        """通过模型列表探测模型（一次列表请求覆盖所有模型，不消耗token）"""
+        async with self._probe_lock:
+            if self._probe_model_ids is None:
+                self._probe_model_ids = set(await self.get_available_models())
+
+        if self._probe_model_ids:
+            return model_name in self._probe_model_ids
+
+        # 部分OpenAI兼容服务不提供模型列表，退回到补全请求探测
+        return await self.validate_model(model_name)
+
     def transform_request_to_openai(self, request: LLMRequest) -> Dict[str, Any]:
         """转换请求为OpenAI格式（已经是OpenAI格式）"""
         messages = self._ensure_message_format(request.messages)
 
-        return {
+        openai_request = {
             "model": request.model,
             "messages": messages,
             "max_tokens": request.max_tokens,
             "temperature": request.temperature,
             "stream": request.stream
         }
+        if request.n > 1:
+            openai_request["n"] = request.n
+        return openai_request
 
     def transform_request_to_anthropic(self, request: LLMRequest) -> Dict[str, Any]:
         """转换OpenAI格式请求为Anthropic格式"""
         system_message, messages = self._extract_system_message(request.messages)
-        formatted_messages = self._ensure_message_format(messages)
+        formatted_messages = self._ensure_anthropic_message_format(messages)
 
         anthropic_request = {
             "model": request.model,
@@ -73,7 +100,7 @@ class OpenAIAdapter(AbstractLLMAdapter):
             id=response.get("id", str(uuid.uuid4())),
             model=response.get("model", "unknown"),
             choices=response.get("choices", []),
-            usage=response.get("usage", {})
+            usage=openai_usage(response.get("usage", {}))
         )
 
     def transform_response_from_anthropic(self, response: Dict[str, Any]) -> LLMResponse:
@@ -119,6 +146,15 @@ class OpenAIAdapter(AbstractLLMAdapter):
         }
         return model_mapping.get(openai_model, "claude-3-5-sonnet-20241022")
 
+    async def create_embeddings(
+        self,
+        model: str,
+        inputs: List[str],
+        dimensions: Optional[int] = None
+    ) -> EmbeddingResponse:
+        """调用OpenAI embeddings接口"""
+        return await self._create_openai_embeddings(model, inputs, dimensions)
+
     async def forward_to_openai(self, request: LLMRequest) -> LLMResponse:
         """转发到OpenAI"""
         openai_request = self.transform_request_to_openai(request)
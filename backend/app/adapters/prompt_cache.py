@@ -0,0 +1,144 @@
+from typing import Any, Dict, List, Optional, Tuple
+from app.utils.tokens import estimate_text_tokens
+import hashlib
+import json
+
+# Anthropic单个请求最多允许4个cache_control断点
+ANTHROPIC_MAX_BREAKPOINTS = 4
+# 低于该长度的前缀不会被Anthropic缓存（Haiku系列要求更长）
+ANTHROPIC_MIN_CACHE_TOKENS = 1024
+ANTHROPIC_HAIKU_MIN_CACHE_TOKENS = 2048
+# Gemini显式上下文缓存的最小长度
+GEMINI_MIN_CACHE_TOKENS = 4096
+
+EPHEMERAL = {"type": "ephemeral"}
+
+
+def anthropic_min_cache_tokens(model: str) -> int:
+    """获取Anthropic模型可缓存前缀的最小token数"""
+    return ANTHROPIC_HAIKU_MIN_CACHE_TOKENS if "haiku" in (model or "") else ANTHROPIC_MIN_CACHE_TOKENS
+
+
+def _text_blocks(content: Any) -> List[Dict[str, Any]]:
+    """将字符串内容转换为内容块列表"""
+    if isinstance(content, list):
+        return [dict(block) for block in content]
+    return [{"type": "text", "text": "" if content is None else str(content)}]
+
+
+def _blocks_tokens(blocks: List[Dict[str, Any]]) -> int:
+    return sum(estimate_text_tokens(block.get("text", "")) for block in blocks if isinstance(block, dict))
+
+
+def _has_cache_control(system: Any, messages: List[Dict[str, Any]]) -> bool:
+    """客户端已自行设置缓存断点时不再自动添加"""
+    parts = list(system) if isinstance(system, list) else []
+    for message in messages:
+        if isinstance(message.get("content"), list):
+            parts.extend(message["content"])
+    return any(isinstance(part, dict) and "cache_control" in part for part in parts)
+
+
+def apply_anthropic_cache_control(
+    anthropic_request: Dict[str, Any],
+    reserved_breakpoints: int = 0
+) -> Dict[str, Any]:
+    """为稳定的长前缀自动添加cache_control断点
+
+    - system提示足够长时，在其最后一个块上设置断点
+    - 整个提示足够长时，在最后一条消息上设置断点；下一轮请求会通过前缀回溯命中本轮写入的缓存
+    reserved_breakpoints 为调用方已经占用的断点数。
+    """
+    system = anthropic_request.get("system")
+    messages = anthropic_request.get("messages", [])
+    if not messages or _has_cache_control(system, messages):
+        return anthropic_request
+
+    min_tokens = anthropic_min_cache_tokens(anthropic_request.get("model", ""))
+    available = ANTHROPIC_MAX_BREAKPOINTS - reserved_breakpoints
+
+    prefix_tokens = 0
+    if system:
+        system_blocks = _text_blocks(system)
+        prefix_tokens = _blocks_tokens(system_blocks)
+        if prefix_tokens >= min_tokens and available > 0:
+            system_blocks[-1]["cache_control"] = dict(EPHEMERAL)
+            anthropic_request["system"] = system_blocks
+            available -= 1
+
+    messages_tokens = sum(_blocks_tokens(_text_blocks(message.get("content"))) for message in messages)
+    if prefix_tokens + messages_tokens >= min_tokens and available > 0:
+        last = dict(messages[-1])
+        blocks = _text_blocks(last.get("content"))
+        blocks[-1]["cache_control"] = dict(EPHEMERAL)
+        last["content"] = blocks
+        anthropic_request["messages"] = messages[:-1] + [last]
+
+    return anthropic_request
+
+
+def split_gemini_cache_prefix(
+    gemini_request: Dict[str, Any],
+    min_tokens: int = GEMINI_MIN_CACHE_TOKENS
+) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """拆分出可以放入Gemini缓存内容的稳定前缀
+
+    取达到最小长度的最短前缀（systemInstruction加上最早的若干轮对话），最早的轮次在后续请求中不会变化，
+    因此同一会话的后续请求都能复用同一份缓存。最后一条消息永远不放入缓存。
+    返回 (缓存内容, 剩余请求)，前缀不够长时返回None。
+    """
+    contents = gemini_request.get("contents", [])
+    system_instruction = gemini_request.get("systemInstruction")
+
+    def parts_tokens(item: Optional[Dict[str, Any]]) -> int:
+        if not item:
+            return 0
+        return sum(estimate_text_tokens(part.get("text", "")) for part in item.get("parts", []))
+
+    prefix_tokens = parts_tokens(system_instruction)
+    split = 0
+    while prefix_tokens < min_tokens and split < len(contents) - 1:
+        prefix_tokens += parts_tokens(contents[split])
+        split += 1
+
+    if prefix_tokens < min_tokens:
+        return None
+
+    cached = {"contents": contents[:split]}
+    if system_instruction:
+        cached["systemInstruction"] = system_instruction
+
+    remaining = {key: value for key, value in gemini_request.items() if key != "systemInstruction"}
+    remaining["contents"] = contents[split:]
+    return cached, remaining
+
+
+def cache_key(*parts: Any) -> str:
+    """根据前缀内容生成缓存键"""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def anthropic_usage(usage: Dict[str, Any]) -> Dict[str, int]:
+    """将Anthropic用量转换为统一格式（input_tokens不含缓存部分，需要加回）"""
+    cache_read = usage.get("cache_read_input_tokens") or 0
+    cache_creation = usage.get("cache_creation_input_tokens") or 0
+    prompt_tokens = (usage.get("input_tokens") or 0) + cache_read + cache_creation
+    completion_tokens = usage.get("output_tokens") or 0
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "cache_read_tokens": cache_read,
+        "cache_creation_tokens": cache_creation,
+    }
+
+
+def openai_usage(usage: Dict[str, Any]) -> Dict[str, int]:
+    """展开OpenAI用量中的嵌套明细（自动缓存命中记为cache_read_tokens）"""
+    flattened = {key: value for key, value in usage.items() if isinstance(value, int)}
+    details = usage.get("prompt_tokens_details") or {}
+    cached = details.get("cached_tokens") if isinstance(details, dict) else None
+    if cached:
+        flattened["cache_read_tokens"] = cached
+    return flattened
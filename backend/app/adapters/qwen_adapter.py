@@ -1,14 +1,24 @@
-from typing import Dict, Any, List, Optional
-from .base import AbstractLLMAdapter, LLMRequest, LLMResponse
+from typing import AsyncIterator, Dict, Any, List, Optional
+from .base import AbstractLLMAdapter, LLMRequest, LLMResponse, EmbeddingResponse, StreamDelta
+from .multimodal import content_text, has_images, to_qwen_content
+from app.exceptions import LLMProviderError
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
+QWEN_TEXT_ENDPOINT = "services/aigc/text-generation/generation"
+QWEN_MULTIMODAL_ENDPOINT = "services/aigc/multimodal-generation/generation"
+
 
 class QwenAdapter(AbstractLLMAdapter):
     """阿里通义千问适配器"""
 
+    wire_format = "qwen"
+    # DashScope文本向量接口单次最多10条
+    max_embedding_inputs = 10
+    supports_native_stream = True
+
     def __init__(self, api_key: str, api_url: Optional[str] = None):
         self.api_key = api_key
         self.api_url = api_url or self.get_default_api_url()
@@ -78,7 +88,7 @@ class QwenAdapter(AbstractLLMAdapter):
     def transform_request_to_anthropic(self, request: LLMRequest) -> Dict[str, Any]:
         """转换通义千问格式请求为Anthropic格式"""
         system_message, messages = self._extract_system_message(request.messages)
-        formatted_messages = self._ensure_message_format(messages)
+        formatted_messages = self._ensure_anthropic_message_format(messages)
 
         anthropic_request = {
             "model": request.model,
@@ -93,16 +103,20 @@ class QwenAdapter(AbstractLLMAdapter):
         return anthropic_request
 
     def transform_request_to_qwen(self, request: LLMRequest) -> Dict[str, Any]:
-        """转换标准请求为通义千问格式"""
-        messages = self._ensure_message_format(request.messages)
+        """转换标准请求为通义千问格式
+
+        包含图片时使用多模态接口的消息格式，所有消息内容都是 [{"image": ...}, {"text": ...}] 列表。
+        """
+        multimodal = has_images(request.messages)
 
         # 通义千问的消息格式
         qwen_messages = []
         system_content = None
 
-        for msg in messages:
+        for msg in request.messages:
             role = msg.get("role", "user")
             content = msg.get("content", "")
+            content = to_qwen_content(content) if multimodal else content_text(content)
 
             if role == "system":
                 # 通义千问支持system角色
@@ -193,7 +207,7 @@ class QwenAdapter(AbstractLLMAdapter):
         if qwen_choices and len(qwen_choices) > 0:
             choice = qwen_choices[0]
             message = choice.get("message", {})
-            content = message.get("content", "")
+            content = self._content_text(message.get("content", ""))
             finish_reason = choice.get("finish_reason", "stop")
 
             choices.append({
@@ -205,21 +219,29 @@ class QwenAdapter(AbstractLLMAdapter):
                 "finish_reason": finish_reason
             })
 
-        # 通义千问的使用情况统计
-        usage = response.get("usage", {})
-        openai_usage = {
-            "prompt_tokens": usage.get("input_tokens", 0),
-            "completion_tokens": usage.get("output_tokens", 0),
-            "total_tokens": usage.get("total_tokens", 0)
-        }
-
         return LLMResponse(
             id=response.get("request_id", str(uuid.uuid4())),
             model=model,
             choices=choices,
-            usage=openai_usage
+            usage=self._map_usage(response.get("usage", {}))
         )
 
+    @staticmethod
+    def _content_text(content: Any) -> str:
+        """多模态接口返回的内容是 [{"text": ...}] 列表"""
+        if isinstance(content, list):
+            return "".join(item.get("text", "") for item in content if isinstance(item, dict))
+        return content or ""
+
+    @staticmethod
+    def _map_usage(usage: Dict[str, Any]) -> Dict[str, int]:
+        """通义千问的使用情况统计转为OpenAI格式"""
+        return {
+            "prompt_tokens": usage.get("input_tokens", 0),
+            "completion_tokens": usage.get("output_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0)
+        }
+
     def _map_model_to_openai(self, qwen_model: str) -> str:
         """映射通义千问模型名称到OpenAI"""
         model_mapping = {
@@ -244,13 +266,67 @@ class QwenAdapter(AbstractLLMAdapter):
         }
         return model_mapping.get(qwen_model, "claude-3-5-sonnet-20241022")
 
+    async def create_embeddings(
+        self,
+        model: str,
+        inputs: List[str],
+        dimensions: Optional[int] = None
+    ) -> EmbeddingResponse:
+        """调用DashScope文本向量接口"""
+        data = {"model": model, "input": {"texts": inputs}, "parameters": {"text_type": "document"}}
+        if dimensions:
+            data["parameters"]["dimension"] = dimensions
+
+        endpoint = "services/embeddings/text-embedding/text-embedding"
+        response = await self.send_request(data, endpoint)
+
+        items = sorted(response.get("output", {}).get("embeddings", []), key=lambda item: item.get("text_index", 0))
+        total_tokens = response.get("usage", {}).get("total_tokens", 0)
+        return EmbeddingResponse(
+            model=model,
+            embeddings=[item["embedding"] for item in items],
+            usage={"prompt_tokens": total_tokens, "total_tokens": total_tokens}
+        )
+
+    @staticmethod
+    def _generation_endpoint(request: LLMRequest) -> str:
+        """包含图片的请求需要使用多模态生成接口"""
+        if has_images(request.messages):
+            return QWEN_MULTIMODAL_ENDPOINT
+        return QWEN_TEXT_ENDPOINT
+
     async def forward_to_qwen(self, request: LLMRequest) -> LLMResponse:
         """转发到通义千问"""
         qwen_request = self.transform_request_to_qwen(request)
-        endpoint = "services/aigc/text-generation/generation"
+        endpoint = self._generation_endpoint(request)
         response = await self.send_request(qwen_request, endpoint)
         return self.transform_response_from_qwen(response, request.model)
 
+    async def stream_chat(self, request: LLMRequest) -> AsyncIterator[StreamDelta]:
+        """通过DashScope SSE流式转发到通义千问（incremental_output使每个事件只包含新增文本）"""
+        qwen_request = self.transform_request_to_qwen(request)
+        qwen_request["parameters"]["incremental_output"] = True
+
+        url = f"{self.api_url.rstrip('/')}/{self._generation_endpoint(request)}"
+        headers = {**self.get_headers(), "X-DashScope-SSE": "enable"}
+
+        async for event in self._iter_sse_json(url, qwen_request, headers):
+            if "output" not in event:
+                # 流中的错误事件: {"code": "...", "message": "...", "request_id": "..."}
+                raise LLMProviderError(f"Qwen stream error: {event.get('code')} - {event.get('message')}")
+
+            choices = event["output"].get("choices", [])
+            choice = choices[0] if choices else {}
+            # 未结束时finish_reason为字符串"null"
+            finish_reason = choice.get("finish_reason")
+            usage = event.get("usage")
+
+            yield StreamDelta(
+                text=self._content_text(choice.get("message", {}).get("content", "")),
+                finish_reason=finish_reason if finish_reason not in (None, "null") else None,
+                usage=self._map_usage(usage) if usage else None
+            )
+
     async def forward_to_openai_format(self, request: LLMRequest) -> Dict[str, Any]:
         """转发到OpenAI格式（不实际调用，只做转换）"""
         return self.transform_request_to_openai(request)
@@ -15,7 +15,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """用户注册"""
     try:
         auth_service = AuthService(db)
-        user = auth_service.register_user(user_data)
+        user = await auth_service.register_user(user_data)
         return user
     except AuthenticationError as e:
         raise HTTPException(
@@ -29,7 +29,7 @@ async def login(login_data: UserLogin, db: Session = Depends(get_db)):
     """用户登录"""
     try:
         auth_service = AuthService(db)
-        token = auth_service.login_user(login_data)
+        token = await auth_service.login_user(login_data)
         return token
     except AuthenticationError as e:
         raise HTTPException(
@@ -44,7 +44,7 @@ async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
     """刷新令牌"""
     try:
         auth_service = AuthService(db)
-        token = auth_service.refresh_token(refresh_token)
+        token = await auth_service.refresh_token(refresh_token)
         return token
     except AuthenticationError as e:
         raise HTTPException(
@@ -0,0 +1,244 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File, Form
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from pathlib import Path
+from app.database import get_db
+from app.api.proxy import get_api_key_from_auth
+from app.models.model_config import ModelConfig
+from app.schemas.batch import AnthropicBatchCreate
+from app.services.proxy_service import ProxyService
+from app.services.batch_service import BatchService, batch_runner
+from app.exceptions import BatchError
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/v1", tags=["Batch"])
+
+
+def get_api_key_from_header(request: Request) -> str:
+    """从x-api-key头获取API密钥（Anthropic风格）"""
+    api_key = request.headers.get("x-api-key")
+    if not api_key:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing x-api-key header"
+        )
+    return api_key
+
+
+def _get_config(db: Session, api_key: str) -> ModelConfig:
+    """根据代理API密钥获取启用的模型配置"""
+    config = ProxyService(db).get_config_by_proxy_key(api_key)
+    if not config or not config.is_enabled:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or disabled API key"
+        )
+    return config
+
+
+def _batch_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Batch not found"
+    )
+
+
+def _output_file_response(path: str) -> FileResponse:
+    """返回批处理结果文件"""
+    if not Path(path).exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch output not available yet"
+        )
+    return FileResponse(path, media_type="application/jsonl")
+
+
+# ==================== OpenAI风格 ====================
+
+@router.post("/batches")
+async def create_openai_batch(
+    file: UploadFile = File(...),
+    endpoint: str = Form("/v1/chat/completions"),
+    api_key: str = Depends(get_api_key_from_auth),
+    db: Session = Depends(get_db)
+):
+    """创建OpenAI兼容的批处理任务（上传JSONL文件）"""
+    config = _get_config(db, api_key)
+
+    try:
+        batch_service = BatchService(db)
+        job = await batch_service.create_openai_batch(config, file.file, endpoint)
+    except BatchError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    batch_runner.start(job.id)
+    return batch_service.to_openai_batch(job)
+
+
+@router.get("/batches")
+async def list_openai_batches(
+    limit: int = 20,
+    api_key: str = Depends(get_api_key_from_auth),
+    db: Session = Depends(get_db)
+):
+    """列出批处理任务"""
+    config = _get_config(db, api_key)
+    batch_service = BatchService(db)
+    jobs = batch_service.list_batches(config, "openai", limit=min(limit, 100))
+
+    return {
+        "object": "list",
+        "data": [batch_service.to_openai_batch(job) for job in jobs]
+    }
+
+
+@router.get("/batches/{batch_id}")
+async def get_openai_batch(
+    batch_id: str,
+    api_key: str = Depends(get_api_key_from_auth),
+    db: Session = Depends(get_db)
+):
+    """查询批处理任务状态"""
+    config = _get_config(db, api_key)
+    batch_service = BatchService(db)
+    job = batch_service.get_batch(config, batch_id)
+
+    if not job or job.api_format != "openai":
+        raise _batch_not_found()
+
+    return batch_service.to_openai_batch(job)
+
+
+@router.post("/batches/{batch_id}/cancel")
+async def cancel_openai_batch(
+    batch_id: str,
+    api_key: str = Depends(get_api_key_from_auth),
+    db: Session = Depends(get_db)
+):
+    """取消批处理任务"""
+    config = _get_config(db, api_key)
+    batch_service = BatchService(db)
+    job = batch_service.get_batch(config, batch_id)
+
+    if not job or job.api_format != "openai":
+        raise _batch_not_found()
+
+    job = batch_service.cancel_batch(job)
+
+    return batch_service.to_openai_batch(job)
+
+
+@router.get("/batches/{batch_id}/output")
+async def get_openai_batch_output(
+    batch_id: str,
+    api_key: str = Depends(get_api_key_from_auth),
+    db: Session = Depends(get_db)
+):
+    """下载批处理结果（JSONL）"""
+    config = _get_config(db, api_key)
+    job = BatchService(db).get_batch(config, batch_id)
+
+    if not job or job.api_format != "openai":
+        raise _batch_not_found()
+
+    return _output_file_response(job.output_file_path)
+
+
+# ==================== Anthropic风格 ====================
+
+@router.post("/messages/batches")
+async def create_anthropic_batch(
+    batch_data: AnthropicBatchCreate,
+    api_key: str = Depends(get_api_key_from_header),
+    db: Session = Depends(get_db)
+):
+    """创建Anthropic兼容的消息批处理任务"""
+    config = _get_config(db, api_key)
+
+    try:
+        batch_service = BatchService(db)
+        job = await batch_service.create_anthropic_batch(
+            config, [item.model_dump() for item in batch_data.requests]
+        )
+    except BatchError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    batch_runner.start(job.id)
+    return batch_service.to_anthropic_batch(job)
+
+
+@router.get("/messages/batches")
+async def list_anthropic_batches(
+    limit: int = 20,
+    api_key: str = Depends(get_api_key_from_header),
+    db: Session = Depends(get_db)
+):
+    """列出消息批处理任务"""
+    config = _get_config(db, api_key)
+    batch_service = BatchService(db)
+    jobs = batch_service.list_batches(config, "anthropic", limit=min(limit, 100))
+
+    return {
+        "data": [batch_service.to_anthropic_batch(job) for job in jobs],
+        "has_more": False
+    }
+
+
+@router.get("/messages/batches/{batch_id}")
+async def get_anthropic_batch(
+    batch_id: str,
+    api_key: str = Depends(get_api_key_from_header),
+    db: Session = Depends(get_db)
+):
+    """查询消息批处理任务状态"""
+    config = _get_config(db, api_key)
+    batch_service = BatchService(db)
+    job = batch_service.get_batch(config, batch_id)
+
+    if not job or job.api_format != "anthropic":
+        raise _batch_not_found()
+
+    return batch_service.to_anthropic_batch(job)
+
+
+@router.post("/messages/batches/{batch_id}/cancel")
+async def cancel_anthropic_batch(
+    batch_id: str,
+    api_key: str = Depends(get_api_key_from_header),
+    db: Session = Depends(get_db)
+):
+    """取消消息批处理任务"""
+    config = _get_config(db, api_key)
+    batch_service = BatchService(db)
+    job = batch_service.get_batch(config, batch_id)
+
+    if not job or job.api_format != "anthropic":
+        raise _batch_not_found()
+
+    job = batch_service.cancel_batch(job)
+
+    return batch_service.to_anthropic_batch(job)
+
+
+@router.get("/messages/batches/{batch_id}/results")
+async def get_anthropic_batch_results(
+    batch_id: str,
+    api_key: str = Depends(get_api_key_from_header),
+    db: Session = Depends(get_db)
+):
+    """下载消息批处理结果（JSONL）"""
+    config = _get_config(db, api_key)
+    job = BatchService(db).get_batch(config, batch_id)
+
+    if not job or job.api_format != "anthropic":
+        raise _batch_not_found()
+
+    return _output_file_response(job.output_file_path)
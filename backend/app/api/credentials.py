@@ -8,9 +8,11 @@ from app.schemas.credential import (
     CredentialCreate,
     CredentialUpdate,
     CredentialResponse,
-    CredentialValidate
+    CredentialValidate,
+    CredentialValidationJob
 )
 from app.services.credential_service import CredentialService
+from app.services.validation_service import validation_queue
 from app.exceptions import CredentialValidationError
 
 router = APIRouter(prefix="/api/credentials", tags=["Credentials"])
@@ -25,6 +27,7 @@ async def get_credentials(
     """获取用户的所有凭证"""
     credential_service = CredentialService(db)
     credentials = credential_service.get_user_credentials(current_user)
+    masked_keys = await credential_service.mask_api_keys(credentials)
 
     # 转换为响应格式，包含遮盖的API密钥
     response_credentials = []
@@ -42,7 +45,7 @@ async def get_credentials(
             validation_error=cred.validation_error,
             created_at=cred.created_at,
             updated_at=cred.updated_at,
-            api_key_masked=credential_service.mask_api_key(cred.api_key_encrypted)
+            api_key_masked=masked_keys[cred.id]
         )
         response_credentials.append(response_cred)
 
@@ -59,7 +62,8 @@ async def create_credential(
     """创建新凭证"""
     try:
         credential_service = CredentialService(db)
-        credential = credential_service.create_credential(current_user, credential_data)
+        credential = await credential_service.create_credential(current_user, credential_data)
+        masked_keys = await credential_service.mask_api_keys([credential])
 
         return CredentialResponse(
             id=credential.id,
@@ -74,7 +78,7 @@ async def create_credential(
             validation_error=credential.validation_error,
             created_at=credential.created_at,
             updated_at=credential.updated_at,
-            api_key_masked=credential_service.mask_api_key(credential.api_key_encrypted)
+            api_key_masked=masked_keys[credential.id]
         )
     except CredentialValidationError as e:
         raise HTTPException(
@@ -99,6 +103,8 @@ async def get_credential(
             detail="Credential not found"
         )
 
+    masked_keys = await credential_service.mask_api_keys([credential])
+
     return CredentialResponse(
         id=credential.id,
         user_id=credential.user_id,
@@ -112,7 +118,7 @@ async def get_credential(
         validation_error=credential.validation_error,
         created_at=credential.created_at,
         updated_at=credential.updated_at,
-        api_key_masked=credential_service.mask_api_key(credential.api_key_encrypted)
+        api_key_masked=masked_keys[credential.id]
     )
 
 
@@ -126,7 +132,7 @@ async def update_credential(
     """更新凭证"""
     try:
         credential_service = CredentialService(db)
-        credential = credential_service.update_credential(current_user, credential_id, update_data)
+        credential = await credential_service.update_credential(current_user, credential_id, update_data)
 
         if not credential:
             raise HTTPException(
@@ -134,6 +140,8 @@ async def update_credential(
                 detail="Credential not found"
             )
 
+        masked_keys = await credential_service.mask_api_keys([credential])
+
         return CredentialResponse(
             id=credential.id,
             user_id=credential.user_id,
@@ -147,7 +155,7 @@ async def update_credential(
             validation_error=credential.validation_error,
             created_at=credential.created_at,
             updated_at=credential.updated_at,
-            api_key_masked=credential_service.mask_api_key(credential.api_key_encrypted)
+            api_key_masked=masked_keys[credential.id]
         )
     except CredentialValidationError as e:
         raise HTTPException(
@@ -179,13 +187,14 @@ async def delete_credential(
 @router.post("/{credential_id}/validate", response_model=CredentialValidate)
 async def validate_credential(
     credential_id: str,
+    force: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """验证凭证"""
+    """验证凭证（等待验证完成）"""
     try:
         credential_service = CredentialService(db)
-        result = await credential_service.validate_credential(current_user, credential_id)
+        result = await credential_service.validate_credential(current_user, credential_id, force=force)
         return result
     except CredentialValidationError as e:
         raise HTTPException(
@@ -194,19 +203,83 @@ async def validate_credential(
         )
 
 
+@router.post(
+    "/{credential_id}/validation-jobs",
+    response_model=CredentialValidationJob,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def start_validation_job(
+    credential_id: str,
+    force: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """提交后台验证任务（立即返回，通过轮询获取进度）"""
+    credential_service = CredentialService(db)
+    credential = credential_service.get_credential_by_id(current_user, credential_id)
+
+    if not credential:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Credential not found"
+        )
+
+    job = validation_queue.submit(credential.id, force=force)
+    return job.to_response()
+
+
+@router.get("/{credential_id}/validation-jobs/latest", response_model=CredentialValidationJob)
+async def get_latest_validation_job(
+    credential_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取最近一次验证任务的进度"""
+    credential_service = CredentialService(db)
+    credential = credential_service.get_credential_by_id(current_user, credential_id)
+    job = validation_queue.get_latest(credential_id) if credential else None
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Validation job not found"
+        )
+
+    return job.to_response()
+
+
 @router.get("/{credential_id}/models")
 async def get_credential_available_models(
     credential_id: str,
+    refresh: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取凭证支持的可用模型"""
+    """获取凭证支持的可用模型（默认返回缓存的模型目录）"""
     try:
         credential_service = CredentialService(db)
-        models = await credential_service.get_available_models(current_user, credential_id)
+        models = await credential_service.get_available_models(current_user, credential_id, refresh=refresh)
         return {"models": models}
     except CredentialValidationError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/{credential_id}/models/refresh")
+async def refresh_credential_available_models(
+    credential_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """强制从上游刷新凭证的模型目录"""
+    try:
+        credential_service = CredentialService(db)
+        models = await credential_service.get_available_models(current_user, credential_id, refresh=True)
+        return {"models": models}
+    except CredentialValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
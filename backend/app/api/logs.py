@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Optional, Literal, Iterator
+from datetime import datetime
+from app.database import get_db, SessionLocal
+from app.dependencies import get_current_user
+from app.models.user import User
+from app.schemas.request_log import RequestLogPage
+from app.services.log_service import LogService, LogFilters
+from app.exceptions import InvalidCursorError
+
+router = APIRouter(prefix="/api/logs", tags=["Request Logs"])
+
+
+def get_log_filters(
+    config_id: Optional[str] = None,
+    status_code: Optional[int] = None,
+    source_format: Optional[str] = None,
+    target_format: Optional[str] = None,
+    min_latency_ms: Optional[int] = Query(None, ge=0),
+    max_latency_ms: Optional[int] = Query(None, ge=0),
+    error_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> LogFilters:
+    """解析日志过滤参数"""
+    return LogFilters(
+        config_id=config_id,
+        status_code=status_code,
+        source_format=source_format,
+        target_format=target_format,
+        min_latency_ms=min_latency_ms,
+        max_latency_ms=max_latency_ms,
+        error_type=error_type,
+        start=start,
+        end=end
+    )
+
+
+@router.get("/", response_model=RequestLogPage)
+@router.get("", response_model=RequestLogPage)
+async def list_logs(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    filters: LogFilters = Depends(get_log_filters),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """按 (created_at, id) 倒序分页获取请求日志，使用next_cursor获取下一页"""
+    try:
+        return LogService(db).list_logs(current_user, filters, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get("/export")
+async def export_logs(
+    format: Literal["csv", "jsonl"] = "jsonl",
+    filters: LogFilters = Depends(get_log_filters),
+    current_user: User = Depends(get_current_user)
+):
+    """流式导出请求日志（CSV或JSONL）"""
+    def generate() -> Iterator[str]:
+        # 同步生成器由Starlette放到线程池中迭代，使用独立的数据库会话
+        db = SessionLocal()
+        try:
+            service = LogService(db)
+            if format == "csv":
+                yield from service.export_csv(current_user, filters)
+            else:
+                yield from service.export_jsonl(current_user, filters)
+        finally:
+            db.close()
+
+    media_type = "text/csv" if format == "csv" else "application/jsonl"
+    filename = f"request_logs.{format}"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
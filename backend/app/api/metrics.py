@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends, Response
+from fastapi.security import HTTPAuthorizationCredentials
+from prometheus_client import CollectorRegistry, ProcessCollector, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import get_db
+from app.dependencies import security, get_current_user, get_current_superuser
+from app.exceptions import credentials_exception
+from app.services.loop_monitor_service import loop_monitor
+from app.services.scheduler_service import fair_scheduler
+from app.services.drain_service import drain_controller
+import hmac
+
+router = APIRouter(tags=["Metrics"])
+
+
+class BridgeCollector:
+    """抓取时从各服务的运行时状态生成指标"""
+
+    def collect(self):
+        loop_stats = loop_monitor.stats()
+
+        lag = GaugeMetricFamily(
+            "llmbridge_event_loop_lag_seconds",
+            "Event loop lag quantiles over the recent sample window",
+            labels=["quantile"]
+        )
+        for key, quantile in (("p50", "0.5"), ("p95", "0.95"), ("p99", "0.99"), ("max", "1")):
+            value = loop_stats["lag_ms"][key]
+            if value is not None:
+                lag.add_metric([quantile], value / 1000)
+        yield lag
+
+        yield GaugeMetricFamily(
+            "llmbridge_event_loop_recent_lag_seconds",
+            "Event loop lag used for admission control",
+            value=loop_stats["recent_lag_ms"] / 1000
+        )
+        yield CounterMetricFamily(
+            "llmbridge_event_loop_slow_callbacks",
+            "Times the event loop was blocked longer than the slow callback threshold",
+            value=loop_stats["slow_callbacks"]
+        )
+
+        shed = CounterMetricFamily(
+            "llmbridge_load_shed_requests", "Proxy requests rejected because of event loop lag", labels=["priority"]
+        )
+        for priority, count in loop_stats["shed"].items():
+            shed.add_metric([priority], count)
+        yield shed
+
+        scheduler_stats = fair_scheduler.stats()
+        wait = GaugeMetricFamily(
+            "llmbridge_scheduler_queue_wait_seconds",
+            "Upstream queue wait quantiles per priority class",
+            labels=["priority", "quantile"]
+        )
+        queued = GaugeMetricFamily(
+            "llmbridge_scheduler_queued_requests", "Requests waiting for an upstream slot", labels=["priority"]
+        )
+        for priority, stats in scheduler_stats["classes"].items():
+            for key, quantile in (("p50_wait_ms", "0.5"), ("p95_wait_ms", "0.95")):
+                if stats[key] is not None:
+                    wait.add_metric([priority, quantile], stats[key] / 1000)
+            queued.add_metric([priority], stats["queued"])
+        yield wait
+        yield queued
+
+        yield GaugeMetricFamily(
+            "llmbridge_inflight_requests", "Proxy requests in flight", value=drain_controller.inflight
+        )
+
+
+registry = CollectorRegistry()
+registry.register(BridgeCollector())
+ProcessCollector(registry=registry)
+
+
+def verify_metrics_access(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """配置了metrics_auth_token时校验该令牌，否则要求超级用户的访问令牌"""
+    if settings.metrics_auth_token:
+        if not hmac.compare_digest(credentials.credentials.encode(), settings.metrics_auth_token.encode()):
+            raise credentials_exception
+        return
+    get_current_superuser(get_current_user(credentials, db))
+
+
+@router.get("/metrics", dependencies=[Depends(verify_metrics_access)])
+async def metrics():
+    """Prometheus格式的运行时指标"""
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
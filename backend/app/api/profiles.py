@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from typing import Any, Dict, List
+from app.dependencies import get_current_superuser
+from app.models.user import User
+from app.services.profile_service import profile_store
+
+router = APIRouter(prefix="/api/profiles", tags=["Profiling"])
+
+
+@router.get("")
+async def list_profiles(current_user: User = Depends(get_current_superuser)) -> List[Dict[str, Any]]:
+    """最近的请求分析报告（最新的在前）"""
+    return profile_store.list()
+
+
+@router.get("/{report_id}")
+async def get_profile(report_id: str, current_user: User = Depends(get_current_superuser)) -> Dict[str, Any]:
+    """分析报告：累计耗时最高的函数与新增内存最多的分配位置"""
+    report = profile_store.get(report_id)
+    if report is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile report not found"
+        )
+    return report
+
+
+@router.get("/{report_id}/pstats")
+async def download_pstats(report_id: str, current_user: User = Depends(get_current_superuser)):
+    """下载pstats格式的完整函数耗时数据"""
+    data = profile_store.get_pstats(report_id)
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile report not found"
+        )
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="profile-{report_id}.pstats"'}
+    )
@@ -1,11 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from app.database import get_db
-from app.schemas.llm_request import OpenAIRequest, AnthropicRequest
+from app.schemas.llm_request import OpenAIRequest, AnthropicRequest, CountTokensRequest, EmbeddingRequest
 from app.services.proxy_service import ProxyService
-from app.exceptions import LLMProviderError, RateLimitError
+from app.services.catalog_service import get_proxy_models
+from app.services.drain_service import drain_controller
+from app.services.loop_monitor_service import loop_monitor
+from app.services.profile_service import RequestProfile, start_profile, PROFILE_HEADER, PROFILE_ID_HEADER
+from app.exceptions import (
+    LLMProviderError, RateLimitError, QuotaExceededError, ContextWindowExceededError, ServiceDrainingError,
+    UpstreamTimeoutError, ServiceOverloadedError
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,30 +22,108 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1", tags=["LLM Proxy"])
 security = HTTPBearer()
 
+# 关闭反向代理缓冲，保证增量内容及时到达客户端
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# 报告对话裁剪情况的响应头
+TRIM_HEADER = "X-Context-Trimmed"
+
+# 请求的排队优先级（interactive / standard / batch），只能低于模型配置的优先级
+PRIORITY_HEADER = "X-Priority"
+
+
+def _result_headers(proxy_service: ProxyService, profile: Optional[RequestProfile] = None) -> Dict[str, str]:
+    """代理结果附带的响应头"""
+    headers = {}
+    if proxy_service.trim_result is not None:
+        headers[TRIM_HEADER] = proxy_service.trim_result.header_value()
+    if profile is not None:
+        headers[PROFILE_ID_HEADER] = profile.id
+    return headers
+
+
+def _start_profile(
+    proxy_service: ProxyService,
+    api_key: str,
+    header_value: Optional[str],
+    path: str
+) -> Optional[RequestProfile]:
+    """请求头要求分析时检查代理密钥属于超级用户；未要求时按配置的比例抽样"""
+    requested = bool(header_value) and header_value.strip().lower() not in ("0", "false")
+    if requested:
+        config = proxy_service.get_config_by_proxy_key(api_key)
+        owner = config.credential.user if config is not None and config.credential is not None else None
+        if owner is None or not owner.is_superuser:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Profiling is only available to admin API keys"
+            )
+    return start_profile(path, requested)
+
 
 def get_api_key_from_auth(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     """从Authorization头获取API密钥"""
     return credentials.credentials
 
 
-@router.post("/chat/completions")
+async def track_inflight_request():
+    """排空期间拒绝新请求；响应（包括流式响应）发送完毕后才计为完成"""
+    try:
+        drain_controller.begin()
+    except ServiceDrainingError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1", "Connection": "close"}
+        )
+    try:
+        yield
+    finally:
+        drain_controller.end()
+
+
+@router.post("/chat/completions", dependencies=[Depends(track_inflight_request)])
 async def openai_chat_completions(
     request_data: OpenAIRequest,
+    response: Response,
     api_key: str = Depends(get_api_key_from_auth),
+    priority: Optional[str] = Header(None, alias=PRIORITY_HEADER),
+    profile_header: Optional[str] = Header(None, alias=PROFILE_HEADER),
     db: Session = Depends(get_db)
 ):
     """OpenAI兼容的聊天完成接口"""
+    proxy_service = ProxyService(db)
+    profile = _start_profile(proxy_service, api_key, profile_header, "/api/v1/chat/completions")
     try:
-        proxy_service = ProxyService(db)
-        response = await proxy_service.proxy_openai_request(api_key, request_data)
-        return response
+        call = proxy_service.proxy_openai_request(api_key, request_data, priority=priority)
+        result = await (call if profile is None else profile.run(call))
+        headers = _result_headers(proxy_service, profile)
+        if request_data.stream:
+            # 响应发送完毕或客户端断开后关闭流；流从未被迭代时由此释放上游名额、连接与配额
+            return StreamingResponse(
+                result, media_type="text/event-stream", headers={**STREAM_HEADERS, **headers},
+                background=BackgroundTask(result.aclose)
+            )
+        response.headers.update(headers)
+        return result
 
-    except RateLimitError as e:
+    except (RateLimitError, QuotaExceededError) as e:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail=str(e)
         )
-    except LLMProviderError as e:
+    except UpstreamTimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e)
+        )
+    except ServiceOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
+    except (LLMProviderError, ContextWindowExceededError) as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -49,10 +136,11 @@ async def openai_chat_completions(
         )
 
 
-@router.post("/messages")
+@router.post("/messages", dependencies=[Depends(track_inflight_request)])
 async def anthropic_messages(
     request_data: AnthropicRequest,
     request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """Anthropic兼容的消息接口"""
@@ -64,17 +152,40 @@ async def anthropic_messages(
             detail="Missing x-api-key header"
         )
 
+    proxy_service = ProxyService(db)
+    profile = _start_profile(proxy_service, api_key, request.headers.get(PROFILE_HEADER), "/api/v1/messages")
     try:
-        proxy_service = ProxyService(db)
-        response = await proxy_service.proxy_anthropic_request(api_key, request_data)
-        return response
+        call = proxy_service.proxy_anthropic_request(
+            api_key, request_data, priority=request.headers.get(PRIORITY_HEADER)
+        )
+        result = await (call if profile is None else profile.run(call))
+        headers = _result_headers(proxy_service, profile)
+        if request_data.stream:
+            # 响应发送完毕或客户端断开后关闭流；流从未被迭代时由此释放上游名额、连接与配额
+            return StreamingResponse(
+                result, media_type="text/event-stream", headers={**STREAM_HEADERS, **headers},
+                background=BackgroundTask(result.aclose)
+            )
+        response.headers.update(headers)
+        return result
 
-    except RateLimitError as e:
+    except (RateLimitError, QuotaExceededError) as e:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail=str(e)
         )
-    except LLMProviderError as e:
+    except UpstreamTimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e)
+        )
+    except ServiceOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
+    except (LLMProviderError, ContextWindowExceededError) as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -87,15 +198,65 @@ async def anthropic_messages(
         )
 
 
-@router.get("/models")
-async def list_models(
+@router.post("/embeddings", dependencies=[Depends(track_inflight_request)])
+async def create_embeddings(
+    request_data: EmbeddingRequest,
     api_key: str = Depends(get_api_key_from_auth),
     db: Session = Depends(get_db)
 ):
-    """获取可用模型列表（OpenAI兼容）"""
+    """OpenAI兼容的向量化接口"""
     try:
         proxy_service = ProxyService(db)
-        models = proxy_service.get_available_models(api_key)
+        return await proxy_service.proxy_embeddings(api_key, request_data)
+
+    except (RateLimitError, QuotaExceededError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+    except LLMProviderError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error in embeddings proxy: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+
+@router.post("/messages/count_tokens")
+async def count_message_tokens(
+    request_data: CountTokensRequest,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """Anthropic兼容的token计数接口（本地估算，不请求上游）"""
+    api_key = request.headers.get("x-api-key")
+    if not api_key:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing x-api-key header"
+        )
+
+    try:
+        return ProxyService(db).count_tokens(api_key, request_data)
+    except LLMProviderError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get("/models")
+async def list_models(
+    api_key: str = Depends(get_api_key_from_auth)
+):
+    """获取可用模型列表（OpenAI兼容，结果按密钥缓存）"""
+    try:
+        models = await get_proxy_models(api_key)
 
         # 返回OpenAI格式的模型列表
         model_objects = []
@@ -123,7 +284,7 @@ async def list_models(
 @router.get("/health")
 async def proxy_health_check():
     """代理服务健康检查"""
-    return {"status": "healthy", "service": "llm-proxy"}
+    return {"status": "healthy", "service": "llm-proxy", "event_loop": loop_monitor.stats()}
 
 
 # 添加一个简单的测试端点
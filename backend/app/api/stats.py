@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional, Literal
+from datetime import datetime, timedelta
+from app.database import get_db
+from app.dependencies import get_current_user
+from app.models.user import User
+from app.schemas.usage import UsageSeries, UsageSummary
+from app.services.usage_service import UsageService
+from app.utils.datetimes import to_utc_naive
+
+router = APIRouter(prefix="/api/stats", tags=["Statistics"])
+
+
+@router.get("/summary", response_model=UsageSummary)
+async def get_usage_summary(
+    hours: int = Query(24, ge=1, le=24 * 31),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取最近一段时间的用量汇总"""
+    return UsageService(db).get_summary(current_user, hours=hours)
+
+
+@router.get("/usage", response_model=UsageSeries)
+async def get_usage_series(
+    granularity: Literal["minute", "hour", "day"] = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    config_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取用量时间序列（时间为UTC）"""
+    end = to_utc_naive(end) or datetime.utcnow()
+    start = to_utc_naive(start) or end - timedelta(days=1)
+
+    points = UsageService(db).get_series(
+        current_user,
+        granularity=granularity,
+        start=start,
+        end=end,
+        config_id=config_id
+    )
+    return {"granularity": granularity, "points": points}
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional, List
+from typing import Optional, List, Literal
 import os
 
 
@@ -17,6 +17,14 @@ class Settings(BaseSettings):
     # Database
     database_url: str = "sqlite:///./llmbridge.db"
 
+    # Startup
+    startup_schema_check: str = "warn"  # 启动时检查数据库是否已迁移到最新版本: warn / strict(未迁移则拒绝启动) / off
+    startup_budget_seconds: float = 3.0  # 冷启动耗时预算，超出时记录警告
+
+    # Graceful shutdown
+    shutdown_readiness_delay_seconds: float = 5.0  # 收到SIGTERM后先让就绪检查失败，等待负载均衡摘除流量后再停止监听
+    shutdown_drain_timeout_seconds: float = 30.0  # 停止监听后等待进行中的请求和流式响应完成的最长时间
+
     # Security
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
@@ -32,9 +40,120 @@ class Settings(BaseSettings):
     # Redis
     redis_url: str = "redis://localhost:6379"
 
+    # Cache invalidation（多进程部署时用redis广播配置变更）
+    invalidation_bus_backend: str = "local"  # local: 只清理本进程缓存; redis: 通过pub/sub通知所有进程
+    invalidation_bus_channel: str = "llmbridge:invalidate"
+
     # Rate limiting
     rate_limit_per_minute: int = 100
 
+    # Token quotas
+    token_quota_flush_interval_seconds: float = 10.0  # 内存计数器写入数据库并同步其他进程用量的间隔
+    token_quota_default_max_tokens: int = 1024  # 请求未指定max_tokens时预留的输出token数
+
+    # n>1 fan-out（上游不支持n时并发请求后合并choices）
+    fanout_max_n: int = 16  # 需要并发拆分时允许的最大n
+    fanout_max_concurrency: int = 8  # 单个请求同时发往上游的请求数上限
+
+    # Embeddings micro-batching（合并并发调用方的输入为一次上游请求）
+    embedding_batch_window_ms: float = 5.0  # 第一条输入到达后等待其他输入的时间
+    embedding_batch_max_inputs: int = 256  # 单批最大输入条数（不超过提供商上限）
+    embedding_batch_max_tokens: int = 100000  # 单批最大估算token数
+
+    # Prompt caching
+    prompt_cache_enabled: bool = True  # 为长的稳定前缀自动启用Anthropic cache_control / Gemini缓存内容
+
+    # Near-duplicate response cache（按模型配置开启）
+    response_cache_max_entries: int = 10000  # 所有配置共享的最大缓存条目数，超出按LRU淘汰
+    response_cache_ttl_seconds: int = 3600
+    response_cache_default_threshold: float = 0.9  # 估算的Jaccard相似度阈值
+    response_cache_max_temperature: float = 0.3  # 只缓存低温度请求
+    response_cache_verify_sample_rate: float = 0.01  # 命中后仍请求上游以估计误命中率的比例
+
+    # Context window pre-flight
+    context_overflow_policy: Literal["clamp", "reject"] = "clamp"  # 提示词+max_tokens超出上下文窗口时：clamp缩小max_tokens，reject直接拒绝
+    context_estimate_margin: float = 0.1  # 本地token数只是估算，按该比例少算后才拒绝或缩小max_tokens
+
+    # Conversation trimming（按模型配置开启）
+    trim_default_keep_turns: int = 4  # 配置未指定时始终保留的最后对话轮数
+
+    # Adaptive upstream timeouts（按 (提供商, 模型) 的延迟分位数学习，限制在上下限之间）
+    upstream_connect_timeout_seconds: float = 10.0
+    upstream_first_byte_timeout_seconds: float = 60.0  # 样本不足时的默认值：流式请求收到第一个增量
+    upstream_first_byte_timeout_min_seconds: float = 5.0
+    upstream_first_byte_timeout_max_seconds: float = 180.0
+    upstream_inter_chunk_timeout_seconds: float = 30.0  # 流式请求相邻增量之间的最长间隔
+    upstream_inter_chunk_timeout_min_seconds: float = 2.0
+    upstream_inter_chunk_timeout_max_seconds: float = 120.0
+    upstream_total_timeout_seconds: float = 600.0  # 整个请求
+    upstream_total_timeout_min_seconds: float = 30.0
+    upstream_total_timeout_max_seconds: float = 1800.0
+    upstream_timeout_quantile: float = 0.99  # 由该分位数乘以倍数得到截止时间
+    upstream_timeout_multiplier: float = 3.0
+    upstream_latency_window: int = 200  # 每个 (提供商, 模型, 阶段) 保留的最近样本数
+    upstream_latency_min_samples: int = 20  # 样本数达到后才使用学习到的超时
+
+    # Upstream fair scheduling（并发已满时按优先级和代理密钥权重排队）
+    scheduler_max_concurrency_per_credential: int = 32  # 每个上游凭证的并发上限，0表示不限制
+    scheduler_quantum_tokens: int = 4096  # 差额轮询中权重为1的密钥每轮获得的token额度
+    scheduler_max_queue_wait_seconds: float = 60.0  # 排队超过该时长返回429
+
+    # Event loop lag monitoring（延迟超过阈值时按优先级拒绝代理请求，interactive不拒绝）
+    loop_lag_sample_interval_seconds: float = 0.1
+    loop_lag_window: int = 600  # 用于分位数统计的最近样本数
+    loop_slow_callback_seconds: float = 0.1  # 事件循环阻塞超过该时长时记录正在执行的协程，0表示关闭
+    loop_lag_shed_window: int = 10  # 准入判断取最近N个样本的最大值
+    loop_lag_shed_batch_ms: float = 200.0  # 超过该延迟拒绝batch请求，0表示不拒绝
+    loop_lag_shed_standard_ms: float = 500.0  # 超过该延迟拒绝standard请求，0表示不拒绝
+
+    # Prometheus /metrics
+    metrics_auth_token: Optional[str] = None  # 抓取/metrics使用的Bearer令牌；未设置时需要超级用户的访问令牌
+
+    # Per-request profiling（超级用户的代理密钥带 X-LLMBridge-Profile: 1 请求头时分析该请求）
+    profile_sample_rate: float = 0.0  # 自动抽样分析的代理请求比例（只分析函数耗时，不跟踪内存），0表示关闭
+    profile_max_reports: int = 50  # 内存中保留的最近分析报告数
+    profile_top_n: int = 30  # 报告中列出的函数和内存分配位置数
+
+    # Distributed tracing（W3C traceparent传播，span以OTLP/JSON导出）
+    tracing_exporter: str = "none"  # none / otlp / file；none时不记录span，只把收到的traceparent传给上游
+    tracing_sample_rate: float = 0.1  # 请求没有带traceparent时的采样比例；带了则沿用调用方的采样决定
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"  # OTLP/HTTP collector地址
+    tracing_file_path: str = "./data/traces.jsonl"  # file导出时每批span追加一行
+    tracing_service_name: str = "llmbridge"
+    tracing_export_interval_seconds: float = 5.0
+    tracing_max_export_batch: int = 512
+    tracing_max_queue_size: int = 8192  # 待导出span数超过该值时丢弃新的span
+
+    # CPU密集型加解密操作（bcrypt/Fernet/JWT）的线程池大小
+    crypto_executor_workers: int = 4
+
+    # Credential validation
+    validation_max_concurrency: int = 8  # 全局模型探测并发上限
+    validation_result_ttl_seconds: int = 3600  # 模型验证成功结果的复用时长
+
+    # Model catalog cache
+    catalog_ttl_seconds: int = 600  # 上游模型目录的新鲜期
+    catalog_stale_seconds: int = 3600  # 过期后继续返回旧目录并后台刷新的时长
+    proxy_models_cache_ttl_seconds: int = 30  # /api/v1/models 结果的缓存时长
+    proxy_models_cache_stale_seconds: int = 30
+
+    # Batch inference
+    batch_storage_dir: str = "./data/batches"
+    batch_concurrency_per_credential: int = 4  # 每个凭证的批处理并发上限
+    batch_max_requests: int = 50000  # 单个批处理文件的最大请求数
+    batch_max_retries: int = 3  # 遇到速率限制时的重试次数
+    batch_retry_delay_seconds: float = 5.0
+    batch_checkpoint_interval: int = 50  # 每完成多少条请求同步一次进度
+
+    # Request log retention
+    log_retention_days: int = 30  # 请求日志保留天数，0表示不清理
+    log_archive_enabled: bool = True  # 删除前导出为压缩的JSONL文件
+    log_archive_dir: str = "./data/log_archive"
+    log_retention_interval_seconds: int = 3600  # 保留任务运行间隔
+    log_partition_precreate_days: int = 3  # PostgreSQL提前创建的日分区数量
+    log_retention_delete_batch_size: int = 5000  # 无分区时每次删除的行数
+    usage_minute_retention_days: int = 7  # 分钟级用量汇总保留天数
+
     # Logging
     log_level: str = "INFO"
 
@@ -57,11 +176,4 @@ class Settings(BaseSettings):
         extra = "ignore"
 
 
-settings = Settings()
-
-# Generate encryption key if not provided
-if not settings.encryption_key:
-    from cryptography.fernet import Fernet
-    settings.encryption_key = Fernet.generate_key().decode()
-    print(f"Generated encryption key: {settings.encryption_key}")
-    print("Please add this to your .env file as ENCRYPTION_KEY")
\ No newline at end of file
+settings = Settings()
\ No newline at end of file
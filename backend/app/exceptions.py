@@ -26,6 +26,61 @@ class RateLimitError(LLMBridgeException):
     pass
 
 
+class BatchError(LLMBridgeException):
+    """Batch job related errors"""
+    pass
+
+
+class QuotaExceededError(LLMBridgeException):
+    """Token quota exceeded"""
+    pass
+
+
+class ContextWindowExceededError(LLMBridgeException):
+    """Prompt does not fit the model context window"""
+    pass
+
+
+class InvalidCursorError(LLMBridgeException):
+    """Invalid pagination cursor"""
+    pass
+
+
+class ServiceDrainingError(LLMBridgeException):
+    """Service is shutting down and not accepting new requests"""
+    pass
+
+
+class SchemaVersionError(LLMBridgeException):
+    """Database schema is not at the latest migration"""
+    pass
+
+
+class UpstreamTimeoutError(LLMBridgeException):
+    """Upstream provider missed a timeout deadline (connect / first_byte / inter_chunk / total)"""
+
+    def __init__(self, phase: str, timeout: float):
+        self.phase = phase
+        self.timeout = timeout
+        super().__init__(f"Upstream {phase} timeout after {timeout:.1f}s")
+
+    @property
+    def error_type(self) -> str:
+        """Classification stored in RequestLog.error_type"""
+        return f"{self.phase}_timeout"
+
+
+class ServiceOverloadedError(LLMBridgeException):
+    """Event loop lag is over the admission threshold for the request priority"""
+    pass
+
+
+class QueueTimeoutError(RateLimitError):
+    """Request waited too long for an upstream concurrency slot"""
+
+    error_type = "queue_timeout"
+
+
 # HTTP Exceptions
 credentials_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
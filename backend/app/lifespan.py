@@ -0,0 +1,184 @@
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from fastapi import FastAPI
+from sqlalchemy import text
+from app.config import settings
+from app.database import engine, SessionLocal
+from app.models.credential import Credential
+from app.models.model_config import ModelConfig
+from app.adapters.factory import LLMAdapterFactory
+from app.services.batch_service import batch_runner
+from app.services.log_retention_service import log_retention_job
+from app.services.quota_service import token_quota_manager
+from app.services.invalidation_service import invalidation_bus
+from app.services.catalog_service import proxy_models_cache
+from app.services.drain_service import drain_controller
+from app.services.loop_monitor_service import loop_monitor
+from app.services.tracing_service import span_exporter
+from app.services.dispatch_service import dispatch_table
+from app.utils.security import get_encryption_key, _get_fernet
+from app.utils.executor import crypto_executor
+from app.exceptions import SchemaVersionError
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+class StartupReport:
+    """记录启动与停机各阶段耗时"""
+
+    def __init__(self):
+        self.phases: List[Dict[str, Any]] = []
+        self.total_ms: Optional[float] = None
+        self.ready = False
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+            self.phases.append({"name": name, "ms": elapsed_ms})
+            logger.info(f"Lifecycle phase '{name}' finished in {elapsed_ms}ms")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "total_ms": self.total_ms, "phases": list(self.phases)}
+
+
+startup_report = StartupReport()
+
+
+def open_pools():
+    """建立第一个数据库连接并派生加密密钥，避免第一个请求承担这部分耗时"""
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    _get_fernet(get_encryption_key())
+
+
+def get_schema_revisions() -> Tuple[Set[str], Set[str]]:
+    """返回 (数据库当前迁移版本, 迁移脚本最新版本)"""
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    return current, heads
+
+
+def check_schema():
+    """检查数据库是否已迁移到最新版本（迁移由部署流程执行，worker启动时不修改表结构）"""
+    if settings.startup_schema_check == "off":
+        return
+    current, heads = get_schema_revisions()
+    if current == heads:
+        return
+
+    message = (
+        f"Database schema is at {sorted(current) or 'no revision'}, expected {sorted(heads)}. "
+        "Run `alembic upgrade head` before starting the application"
+    )
+    if settings.startup_schema_check == "strict":
+        raise SchemaVersionError(message)
+    logger.warning(message)
+
+
+def warm_caches() -> int:
+    """预热代理模型列表缓存，并预先导入在用提供商的适配器、生成其转发路由"""
+    db = SessionLocal()
+    try:
+        rows = db.query(ModelConfig.proxy_api_key, ModelConfig.model_name).filter(
+            ModelConfig.is_enabled == True
+        ).limit(proxy_models_cache.max_entries).all()
+        providers = [provider for (provider,) in db.query(Credential.provider).distinct()]
+    finally:
+        db.close()
+
+    for proxy_api_key, model_name in rows:
+        proxy_models_cache.set(proxy_api_key, [model_name])
+    LLMAdapterFactory.preload(providers)
+    dispatch_table.preload(providers)
+    return len(rows)
+
+
+async def start_background_jobs():
+    """恢复批处理任务并启动后台同步任务"""
+    loop_monitor.start()
+    await batch_runner.resume_pending()
+    log_retention_job.start()
+    token_quota_manager.start()
+    invalidation_bus.start()
+    span_exporter.start()
+
+
+async def stop_background_jobs():
+    """停止后台任务（批处理进度已通过检查点保存，配额用量在停止时写入）"""
+    await batch_runner.shutdown()
+    await log_retention_job.shutdown()
+    await token_quota_manager.shutdown()
+    await invalidation_bus.shutdown()
+    await loop_monitor.shutdown()
+    await span_exporter.shutdown()
+
+
+async def shutdown_sequence():
+    """停机顺序：就绪检查失败 -> 等待进行中的请求排空 -> 停止后台任务并写入缓冲数据 -> 关闭连接池"""
+    drain_controller.start_draining()
+
+    with startup_report.phase("shutdown_drain"):
+        await drain_controller.wait_idle(settings.shutdown_drain_timeout_seconds)
+
+    with startup_report.phase("shutdown_background_jobs"):
+        await stop_background_jobs()
+
+    with startup_report.phase("shutdown_pools"):
+        closed = await LLMAdapterFactory.close_all()
+        crypto_executor.shutdown()
+        await asyncio.to_thread(engine.dispose)
+        logger.info(f"Closed {closed} upstream connection pools")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动按阶段执行并记录耗时，导入模块本身没有副作用"""
+    report = startup_report
+    report.phases.clear()
+    drain_controller.reset()
+    started = time.perf_counter()
+
+    with report.phase("pools"):
+        await asyncio.to_thread(open_pools)
+
+    with report.phase("schema"):
+        await asyncio.to_thread(check_schema)
+
+    with report.phase("cache_warmup"):
+        try:
+            warmed = await asyncio.to_thread(warm_caches)
+            logger.info(f"Warmed {warmed} proxy model entries")
+        except Exception as e:
+            # 预热失败不影响启动，缓存会在请求时加载
+            logger.warning(f"Cache warmup skipped: {e}")
+
+    with report.phase("background_jobs"):
+        await start_background_jobs()
+
+    report.total_ms = round((time.perf_counter() - started) * 1000, 2)
+    report.ready = True
+    if report.total_ms > settings.startup_budget_seconds * 1000:
+        logger.warning(f"Startup took {report.total_ms}ms, over the {settings.startup_budget_seconds}s budget")
+
+    try:
+        yield
+    finally:
+        report.ready = False
+        await shutdown_sequence()
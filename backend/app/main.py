@@ -1,17 +1,26 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.config import settings
-from app.database import engine, Base
-from app.api import auth, credentials, models, proxy
-
-# 创建数据库表
-Base.metadata.create_all(bind=engine)
+from app.api import auth, credentials, models, proxy, batches, stats, logs, metrics, profiles
+from app.lifespan import lifespan, startup_report
+from app.utils.executor import crypto_executor
+from app.services.catalog_service import model_catalog_cache, proxy_models_cache
+from app.utils.tokens import token_cache_info
+from app.services.response_cache import response_cache
+from app.services.invalidation_service import invalidation_bus
+from app.services.drain_service import drain_controller
+from app.services.scheduler_service import fair_scheduler
+from app.services.loop_monitor_service import loop_monitor
+from app.services.embedding_service import embedding_batcher
+from app.services.tracing_service import TracingMiddleware, span_exporter
 
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
     debug=settings.debug,
     description="LLM服务转接平台 - 支持OpenAI和Anthropic格式互转",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -23,11 +32,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 为每个请求创建服务端span并延续traceparent
+app.add_middleware(TracingMiddleware)
+
 # 包含路由
 app.include_router(auth.router)
 app.include_router(credentials.router)
 app.include_router(models.router)
 app.include_router(proxy.router)
+app.include_router(batches.router)
+app.include_router(stats.router)
+app.include_router(logs.router)
+app.include_router(metrics.router)
+app.include_router(profiles.router)
 
 
 @app.get("/")
@@ -37,9 +54,32 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "version": settings.app_version}
+    return {
+        "status": "healthy",
+        "version": settings.app_version,
+        "startup": startup_report.to_dict(),
+        "crypto_executor": crypto_executor.stats(),
+        "caches": [model_catalog_cache.stats(), proxy_models_cache.stats(), token_cache_info(), response_cache.stats()],
+        "embedding_batcher": embedding_batcher.stats(),
+        "invalidation_bus": invalidation_bus.stats(),
+        "drain": drain_controller.stats(),
+        "scheduler": fair_scheduler.stats(),
+        "event_loop": loop_monitor.stats(),
+        "tracing": span_exporter.stats()
+    }
+
+
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查：启动完成且未开始停机时返回200，停机排空期间返回503"""
+    if not startup_report.ready or not drain_controller.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "draining" if not drain_controller.ready else "starting"}
+        )
+    return {"status": "ready", "inflight": drain_controller.inflight}
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host=settings.backend_host, port=settings.backend_port)
\ No newline at end of file
+    from app.server import run
+    run()
\ No newline at end of file
@@ -2,5 +2,9 @@ from .user import User
 from .credential import Credential
 from .model_config import ModelConfig
 from .request_log import RequestLog
+from .batch_job import BatchJob
+from .usage_rollup import UsageRollupMinute, UsageRollupHour, UsageRollupDay
+from .token_quota import TokenQuotaUsage
 
-__all__ = ["User", "Credential", "ModelConfig", "RequestLog"]
\ No newline at end of file
+__all__ = ["User", "Credential", "ModelConfig", "RequestLog", "BatchJob",
+           "UsageRollupMinute", "UsageRollupHour", "UsageRollupDay", "TokenQuotaUsage"]
\ No newline at end of file
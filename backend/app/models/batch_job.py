@@ -0,0 +1,30 @@
+import uuid
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    model_config_id = Column(String(36), ForeignKey("model_configs.id", ondelete="CASCADE"), nullable=False)
+    api_format = Column(String(20), nullable=False)  # 'openai', 'anthropic'
+    endpoint = Column(String(100), nullable=False)  # 例如 '/v1/chat/completions'
+    status = Column(String(20), nullable=False, default="validating", index=True)  # validating, in_progress, cancelling, cancelled, completed, failed
+    input_file_path = Column(Text, nullable=False)
+    output_file_path = Column(Text, nullable=False)
+    total_count = Column(Integer, default=0)
+    completed_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    error_message = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    completed_at = Column(DateTime(timezone=True))
+
+    # 关系
+    model_config = relationship("ModelConfig", back_populates="batch_jobs")
+
+    def __repr__(self):
+        return f"<BatchJob(id={self.id}, status={self.status}, total_count={self.total_count})>"
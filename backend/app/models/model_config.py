@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, Float, false
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -15,12 +15,26 @@ class ModelConfig(Base):
     is_enabled = Column(Boolean, default=True)
     proxy_api_key = Column(String(255), nullable=False)  # 用于访问转发服务的密钥
     rate_limit = Column(Integer, default=100)  # 每分钟请求限制
+    daily_token_quota = Column(Integer, nullable=True)  # 每日token配额，为空表示不限制
+    monthly_token_quota = Column(Integer, nullable=True)  # 每月token配额，为空表示不限制
+    response_cache_enabled = Column(Boolean, default=False, nullable=False, server_default=false())  # 近似重复请求缓存
+    response_cache_threshold = Column(Float, nullable=True)  # 相似度阈值，为空时使用全局默认值
+    trim_strategy = Column(String(20), nullable=True)  # 对话裁剪策略：drop / elide，为空表示不裁剪
+    trim_keep_turns = Column(Integer, nullable=True)  # 始终保留的最后对话轮数，为空时使用全局默认值
+    trim_token_budget = Column(Integer, nullable=True)  # 提示词token预算，为空时按上下文窗口减去max_tokens
+    priority_class = Column(String(20), nullable=True)  # 上游排队优先级：interactive / standard / batch，为空表示standard
+    scheduler_weight = Column(Integer, nullable=True)  # 同一优先级内的调度权重，为空表示1
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # 关系
     credential = relationship("Credential", back_populates="model_configs")
-    request_logs = relationship("RequestLog", back_populates="model_config", cascade="all, delete-orphan")
+    request_logs = relationship(
+        "RequestLog",
+        primaryjoin="ModelConfig.id == foreign(RequestLog.model_config_id)",
+        viewonly=True
+    )
+    batch_jobs = relationship("BatchJob", back_populates="model_config", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<ModelConfig(id={self.id}, model_name={self.model_name}, target_format={self.target_format})>"
\ No newline at end of file
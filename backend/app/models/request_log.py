@@ -1,5 +1,6 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, DateTime, Integer, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -8,8 +9,9 @@ from app.database import Base
 class RequestLog(Base):
     __tablename__ = "request_logs"
 
+    # 日志按天分区、按保留期归档删除，不设外键：删除模型配置时不级联扫描日志表
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    model_config_id = Column(String(36), ForeignKey("model_configs.id"), nullable=False)
+    model_config_id = Column(String(36), nullable=False)
     request_id = Column(String(100))
     method = Column(String(10))
     path = Column(Text)
@@ -18,11 +20,33 @@ class RequestLog(Base):
     status_code = Column(Integer)
     response_time_ms = Column(Integer)
     tokens_used = Column(Integer)
+    prompt_tokens = Column(Integer)
+    completion_tokens = Column(Integer)
+    cache_read_tokens = Column(Integer)  # 命中提示词缓存的输入token
+    cache_creation_tokens = Column(Integer)  # 写入提示词缓存的输入token
     error_message = Column(Text)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    error_type = Column(String(30))  # 错误分类，如 first_byte_timeout，供重试和降级判断
+    # 在应用侧生成时间戳，保证键集分页时的精度和格式一致
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now()
+    )
 
-    # 关系
-    model_config = relationship("ModelConfig", back_populates="request_logs")
+    # 键集分页按 (created_at, id) 倒序，过滤条件各自带上排序列
+    __table_args__ = (
+        Index("ix_request_logs_created_at_id", "created_at", "id"),
+        Index("ix_request_logs_config_created_at", "model_config_id", "created_at", "id"),
+        Index("ix_request_logs_status_created_at", "status_code", "created_at"),
+        Index("ix_request_logs_latency", "model_config_id", "response_time_ms"),
+    )
+
+    # 关系（只读）
+    model_config = relationship(
+        "ModelConfig",
+        primaryjoin="foreign(RequestLog.model_config_id) == ModelConfig.id",
+        viewonly=True
+    )
 
     def __repr__(self):
         return f"<RequestLog(id={self.id}, request_id={self.request_id}, status_code={self.status_code})>"
\ No newline at end of file
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, BigInteger
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class TokenQuotaUsage(Base):
+    """代理密钥在某个配额周期内已使用的token数（由内存计数器定期累加写入）"""
+    __tablename__ = "token_quota_usage"
+
+    model_config_id = Column(
+        String(36),
+        ForeignKey("model_configs.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    period = Column(String(10), primary_key=True)  # 'day', 'month'
+    period_key = Column(String(10), primary_key=True)  # 例如 '2026-10-19'、'2026-10'
+    used_tokens = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<TokenQuotaUsage(model_config_id={self.model_config_id}, period_key={self.period_key}, used_tokens={self.used_tokens})>"
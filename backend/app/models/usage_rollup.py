@@ -0,0 +1,50 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, BigInteger
+from app.database import Base
+
+# 延迟直方图的桶上界（毫秒），最后一个桶收集所有更慢的请求
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+LATENCY_BUCKET_COLUMNS = tuple(f"latency_le_{bound}" for bound in LATENCY_BUCKETS_MS) + ("latency_le_inf",)
+
+
+class UsageRollupMixin:
+    """用量汇总的公共字段，bucket_start为UTC时间的桶起点"""
+
+    model_config_id = Column(
+        String(36),
+        ForeignKey("model_configs.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    bucket_start = Column(DateTime, primary_key=True, index=True)
+    request_count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    completion_tokens = Column(BigInteger, nullable=False, default=0)
+    latency_ms_sum = Column(BigInteger, nullable=False, default=0)
+
+    latency_le_100 = Column(Integer, nullable=False, default=0)
+    latency_le_250 = Column(Integer, nullable=False, default=0)
+    latency_le_500 = Column(Integer, nullable=False, default=0)
+    latency_le_1000 = Column(Integer, nullable=False, default=0)
+    latency_le_2500 = Column(Integer, nullable=False, default=0)
+    latency_le_5000 = Column(Integer, nullable=False, default=0)
+    latency_le_10000 = Column(Integer, nullable=False, default=0)
+    latency_le_30000 = Column(Integer, nullable=False, default=0)
+    latency_le_inf = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__}(model_config_id={self.model_config_id}, "
+            f"bucket_start={self.bucket_start}, request_count={self.request_count})>"
+        )
+
+
+class UsageRollupMinute(UsageRollupMixin, Base):
+    __tablename__ = "usage_rollups_minute"
+
+
+class UsageRollupHour(UsageRollupMixin, Base):
+    __tablename__ = "usage_rollups_hour"
+
+
+class UsageRollupDay(UsageRollupMixin, Base):
+    __tablename__ = "usage_rollups_day"
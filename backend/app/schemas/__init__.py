@@ -1,11 +1,11 @@
 from .user import UserCreate, UserUpdate, UserResponse, UserLogin
-from .credential import CredentialCreate, CredentialUpdate, CredentialResponse, CredentialValidate
+from .credential import CredentialCreate, CredentialUpdate, CredentialResponse, CredentialValidate, CredentialValidationJob
 from .model_config import ModelConfigCreate, ModelConfigUpdate, ModelConfigResponse
 from .llm_request import LLMRequest, LLMResponse, OpenAIRequest, AnthropicRequest
 
 __all__ = [
     "UserCreate", "UserUpdate", "UserResponse", "UserLogin",
-    "CredentialCreate", "CredentialUpdate", "CredentialResponse", "CredentialValidate",
+    "CredentialCreate", "CredentialUpdate", "CredentialResponse", "CredentialValidate", "CredentialValidationJob",
     "ModelConfigCreate", "ModelConfigUpdate", "ModelConfigResponse",
     "LLMRequest", "LLMResponse", "OpenAIRequest", "AnthropicRequest"
 ]
\ No newline at end of file
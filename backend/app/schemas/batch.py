@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any
+
+
+class AnthropicBatchRequestItem(BaseModel):
+    """Anthropic批处理中的单条请求"""
+    custom_id: str = Field(..., min_length=1, max_length=64)
+    params: Dict[str, Any]
+
+
+class AnthropicBatchCreate(BaseModel):
+    """Anthropic格式批处理创建请求"""
+    requests: List[AnthropicBatchRequestItem] = Field(..., min_length=1)
@@ -61,4 +61,19 @@ class CredentialValidate(BaseModel):
     validation_summary: Optional[str] = None
 
     class Config:
-        protected_namespaces = ()
\ No newline at end of file
+        protected_namespaces = ()
+
+
+class CredentialValidationJob(BaseModel):
+    """后台凭证验证任务状态"""
+    id: str
+    credential_id: str
+    status: Literal["pending", "running", "completed", "failed"]
+    force: bool = False
+    total_models: int = 0
+    completed_models: int = 0
+    reused_models: int = 0
+    result: Optional[CredentialValidate] = None
+    error_message: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import Annotated, List, Dict, Any, Literal, Optional, Union
 import uuid
 
 
@@ -8,6 +8,62 @@ class Message(BaseModel):
     content: str
 
 
+class TextContentPart(BaseModel):
+    """文本内容块"""
+    type: Literal["text"]
+    text: str
+
+
+class ImageURL(BaseModel):
+    url: str  # 远程图片URL或base64 data URL
+    detail: Optional[str] = Field(default=None, pattern="^(auto|low|high)$")
+
+
+class ImageURLContentPart(BaseModel):
+    """OpenAI格式图片内容块"""
+    type: Literal["image_url"]
+    image_url: ImageURL
+
+
+class ImageSource(BaseModel):
+    type: Literal["base64", "url"]
+    media_type: Optional[str] = None
+    data: Optional[str] = None
+    url: Optional[str] = None
+
+
+class ImageContentPart(BaseModel):
+    """Anthropic格式图片内容块"""
+    model_config = ConfigDict(extra="allow")
+
+    type: Literal["image"]
+    source: ImageSource
+
+
+ContentPart = Annotated[
+    Union[TextContentPart, ImageURLContentPart, ImageContentPart],
+    Field(discriminator="type")
+]
+
+
+class ChatMessage(BaseModel):
+    """对话消息：内容为字符串或内容块列表"""
+    model_config = ConfigDict(extra="allow")
+
+    role: str
+    content: Union[str, List[ContentPart], None] = None
+
+
+def validate_chat_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按ChatMessage校验消息，校验通过后返回原始字典
+
+    图片的base64数据可能有数MB，保留原始对象供适配器按引用转发，避免复制。
+    """
+    for message in messages:
+        ChatMessage.model_validate(message)
+    return messages
+
+
 class LLMRequest(BaseModel):
     """通用LLM请求格式"""
     model: str
@@ -28,14 +84,20 @@ class LLMResponse(BaseModel):
 class OpenAIRequest(BaseModel):
     """OpenAI格式请求"""
     model: str
-    messages: List[Dict[str, str]]
+    messages: List[Dict[str, Any]]
     max_tokens: Optional[int] = 1000
     temperature: Optional[float] = 0.7
     stream: Optional[bool] = False
+    n: int = Field(default=1, ge=1, le=128)
     top_p: Optional[float] = None
     frequency_penalty: Optional[float] = None
     presence_penalty: Optional[float] = None
 
+    @field_validator("messages")
+    @classmethod
+    def validate_messages(cls, value: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return validate_chat_messages(value)
+
 
 class OpenAIResponse(BaseModel):
     """OpenAI格式响应"""
@@ -47,13 +109,40 @@ class OpenAIResponse(BaseModel):
     usage: Dict[str, int]
 
 
+class EmbeddingRequest(BaseModel):
+    """OpenAI格式向量化请求"""
+    model: str
+    input: Union[str, List[str]]
+    encoding_format: Optional[str] = Field(default="float", pattern="^(float|base64)$")
+    dimensions: Optional[int] = Field(default=None, ge=1)
+    user: Optional[str] = None
+
+
 class AnthropicRequest(BaseModel):
     """Anthropic格式请求"""
     model: str
-    messages: List[Dict[str, str]]
+    messages: List[Dict[str, Any]]
     max_tokens: int = 1000
     temperature: Optional[float] = 0.7
     system: Optional[str] = None
+    stream: Optional[bool] = False
+
+    @field_validator("messages")
+    @classmethod
+    def validate_messages(cls, value: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return validate_chat_messages(value)
+
+
+class CountTokensRequest(BaseModel):
+    """Anthropic格式的token计数请求"""
+    model: str
+    messages: List[Dict[str, Any]]
+    system: Optional[str] = None
+
+    @field_validator("messages")
+    @classmethod
+    def validate_messages(cls, value: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return validate_chat_messages(value)
 
 
 class AnthropicResponse(BaseModel):
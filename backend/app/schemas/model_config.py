@@ -8,6 +8,15 @@ class ModelConfigBase(BaseModel):
     target_format: Literal["openai", "anthropic"]
     is_enabled: bool = True
     rate_limit: int = Field(default=100, ge=1, le=10000)
+    daily_token_quota: Optional[int] = Field(default=None, ge=1, description="每日token配额，为空表示不限制")
+    monthly_token_quota: Optional[int] = Field(default=None, ge=1, description="每月token配额，为空表示不限制")
+    response_cache_enabled: bool = False
+    response_cache_threshold: Optional[float] = Field(default=None, ge=0.5, le=1.0, description="近似缓存的相似度阈值")
+    trim_strategy: Optional[Literal["drop", "elide"]] = Field(default=None, description="对话裁剪策略，为空表示不裁剪")
+    trim_keep_turns: Optional[int] = Field(default=None, ge=1, le=100, description="始终保留的最后对话轮数")
+    trim_token_budget: Optional[int] = Field(default=None, ge=1, description="提示词token预算，为空时按上下文窗口计算")
+    priority_class: Optional[Literal["interactive", "standard", "batch"]] = Field(default=None, description="上游排队优先级，为空表示standard")
+    scheduler_weight: Optional[int] = Field(default=None, ge=1, le=100, description="同一优先级内的调度权重，为空表示1")
 
 
 class ModelConfigCreate(ModelConfigBase):
@@ -24,6 +33,15 @@ class ModelConfigUpdate(BaseModel):
     target_format: Optional[Literal["openai", "anthropic"]] = None
     is_enabled: Optional[bool] = None
     rate_limit: Optional[int] = Field(None, ge=1, le=10000)
+    daily_token_quota: Optional[int] = Field(None, ge=0, description="0表示取消限制")
+    monthly_token_quota: Optional[int] = Field(None, ge=0, description="0表示取消限制")
+    response_cache_enabled: Optional[bool] = None
+    response_cache_threshold: Optional[float] = Field(None, ge=0.5, le=1.0)
+    trim_strategy: Optional[Literal["off", "drop", "elide"]] = Field(None, description="off表示关闭裁剪")
+    trim_keep_turns: Optional[int] = Field(None, ge=1, le=100)
+    trim_token_budget: Optional[int] = Field(None, ge=0, description="0表示按上下文窗口计算")
+    priority_class: Optional[Literal["interactive", "standard", "batch"]] = None
+    scheduler_weight: Optional[int] = Field(None, ge=1, le=100)
 
 
 class ModelConfigResponse(ModelConfigBase):
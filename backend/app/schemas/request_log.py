@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime
+
+
+class RequestLogResponse(BaseModel):
+    id: str
+    model_config_id: str
+    request_id: Optional[str] = None
+    method: Optional[str] = None
+    path: Optional[str] = None
+    source_format: Optional[str] = None
+    target_format: Optional[str] = None
+    status_code: Optional[int] = None
+    response_time_ms: Optional[int] = None
+    tokens_used: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cache_read_tokens: Optional[int] = None
+    cache_creation_tokens: Optional[int] = None
+    error_message: Optional[str] = None
+    error_type: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+        protected_namespaces = ()
+
+
+class RequestLogPage(BaseModel):
+    """键集分页结果，next_cursor为空表示没有更多数据"""
+    items: List[RequestLogResponse]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, List
+from datetime import datetime
+
+
+class UsageStats(BaseModel):
+    """用量统计指标"""
+    request_count: int = 0
+    error_count: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    avg_latency_ms: Optional[float] = None
+    p50_latency_ms: Optional[int] = None
+    p95_latency_ms: Optional[int] = None
+    latency_histogram: Dict[str, int] = {}
+
+
+class UsageSeriesPoint(UsageStats):
+    """单个时间桶的用量"""
+    bucket_start: datetime
+
+
+class UsageSeries(BaseModel):
+    """用量时间序列"""
+    granularity: str
+    points: List[UsageSeriesPoint]
+
+
+class UsageSummary(UsageStats):
+    """最近一段时间的用量汇总"""
+    hours: int
+    by_config: Dict[str, UsageStats] = {}
@@ -0,0 +1,61 @@
+from typing import Optional
+from types import FrameType
+from app.config import settings
+from app.services.drain_service import drain_controller
+import asyncio
+import signal
+import uvicorn
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class GracefulServer(uvicorn.Server):
+    """支持连接排空的uvicorn服务器
+
+    第一次收到SIGTERM/SIGINT时只让就绪检查失败，照常处理请求，继续监听
+    shutdown_readiness_delay_seconds 秒，让负载均衡有时间摘除本实例；之后才拒绝新的代理请求并停止监听，
+    由uvicorn在 timeout_graceful_shutdown 内等待已有连接完成，再执行lifespan的停机流程。
+    等待期间再次收到信号时跳过剩余的等待，立即拒绝新请求并停止监听（已有连接照常排空）；
+    停止监听之后再收到SIGINT时由uvicorn强制退出。
+    """
+
+    _exit_timer: Optional[asyncio.TimerHandle] = None
+
+    def handle_exit(self, sig: int, frame: Optional[FrameType]) -> None:
+        if not drain_controller.ready or settings.shutdown_readiness_delay_seconds <= 0:
+            self._drain_and_exit(sig, frame)
+            return
+
+        drain_controller.fail_readiness()
+        logger.info(
+            f"Received {signal.Signals(sig).name}, readiness is failing; "
+            f"draining and stopping listeners in {settings.shutdown_readiness_delay_seconds}s"
+        )
+        self._exit_timer = asyncio.get_event_loop().call_later(
+            settings.shutdown_readiness_delay_seconds, self._drain_and_exit, sig, frame
+        )
+
+    def _drain_and_exit(self, sig: int, frame: Optional[FrameType]) -> None:
+        """拒绝新请求并停止监听"""
+        # 提前执行时取消第一次信号设置的定时器，否则定时器到期时会被当作又一次信号（SIGINT会强制退出）
+        if self._exit_timer is not None:
+            self._exit_timer.cancel()
+            self._exit_timer = None
+        drain_controller.start_draining()
+        super().handle_exit(sig, frame)
+
+
+def run():
+    """以支持排空的方式启动服务"""
+    config = uvicorn.Config(
+        "app.main:app",
+        host=settings.backend_host,
+        port=settings.backend_port,
+        timeout_graceful_shutdown=int(settings.shutdown_drain_timeout_seconds)
+    )
+    GracefulServer(config).run()
+
+
+if __name__ == "__main__":
+    run()
@@ -1,7 +1,12 @@
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.schemas.user import UserCreate, UserLogin, Token
-from app.utils.security import get_password_hash, verify_password, create_access_token, create_refresh_token
+from app.utils.security import (
+    get_password_hash_async,
+    verify_password_async,
+    verify_token_async,
+    create_token_pair_async
+)
 from app.exceptions import AuthenticationError
 from datetime import timedelta
 from app.config import settings
@@ -11,7 +16,7 @@ class AuthService:
     def __init__(self, db: Session):
         self.db = db
 
-    def register_user(self, user_data: UserCreate) -> User:
+    async def register_user(self, user_data: UserCreate) -> User:
         """注册新用户"""
         # 检查用户名是否存在
         if self.db.query(User).filter(User.username == user_data.username).first():
@@ -21,11 +26,11 @@ class AuthService:
         if self.db.query(User).filter(User.email == user_data.email).first():
             raise AuthenticationError("Email already registered")
 
-        # 创建新用户
+        # 创建新用户（bcrypt哈希在加解密线程池中执行）
         user = User(
             username=user_data.username,
             email=user_data.email,
-            password_hash=get_password_hash(user_data.password)
+            password_hash=await get_password_hash_async(user_data.password)
         )
 
         # 第一个用户设为超级用户
@@ -38,14 +43,14 @@ class AuthService:
 
         return user
 
-    def authenticate_user(self, login_data: UserLogin) -> User:
+    async def authenticate_user(self, login_data: UserLogin) -> User:
         """验证用户"""
         user = self.db.query(User).filter(User.username == login_data.username).first()
 
         if not user:
             raise AuthenticationError("Invalid username or password")
 
-        if not verify_password(login_data.password, user.password_hash):
+        if not await verify_password_async(login_data.password, user.password_hash):
             raise AuthenticationError("Invalid username or password")
 
         if not user.is_active:
@@ -53,13 +58,12 @@ class AuthService:
 
         return user
 
-    def login_user(self, login_data: UserLogin) -> Token:
+    async def login_user(self, login_data: UserLogin) -> Token:
         """用户登录"""
-        user = self.authenticate_user(login_data)
+        user = await self.authenticate_user(login_data)
 
         # 创建访问令牌
-        access_token = create_access_token(data={"sub": user.username})
-        refresh_token = create_refresh_token(data={"sub": user.username})
+        access_token, refresh_token = await create_token_pair_async({"sub": user.username})
 
         return Token(
             access_token=access_token,
@@ -67,11 +71,9 @@ class AuthService:
             token_type="bearer"
         )
 
-    def refresh_token(self, refresh_token: str) -> Token:
+    async def refresh_token(self, refresh_token: str) -> Token:
         """刷新令牌"""
-        from app.utils.security import verify_token
-
-        payload = verify_token(refresh_token)
+        payload = await verify_token_async(refresh_token)
         if payload is None or payload.get("type") != "refresh":
             raise AuthenticationError("Invalid refresh token")
 
@@ -82,8 +84,7 @@ class AuthService:
             raise AuthenticationError("User not found or inactive")
 
         # 创建新的访问令牌
-        access_token = create_access_token(data={"sub": user.username})
-        new_refresh_token = create_refresh_token(data={"sub": user.username})
+        access_token, new_refresh_token = await create_token_pair_async({"sub": user.username})
 
         return Token(
             access_token=access_token,
@@ -0,0 +1,470 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional, Iterator, BinaryIO, Tuple
+from pathlib import Path
+from datetime import datetime
+from app.config import settings
+from app.database import SessionLocal
+from app.models.batch_job import BatchJob
+from app.models.model_config import ModelConfig
+from app.services.proxy_service import ProxyService
+from app.schemas.llm_request import OpenAIRequest, AnthropicRequest
+from app.exceptions import (
+    BatchError, LLMProviderError, RateLimitError, QuotaExceededError, ContextWindowExceededError, ServiceOverloadedError
+)
+import asyncio
+import json
+import shutil
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+OPENAI_BATCH_ENDPOINTS = {"/v1/chat/completions"}
+ANTHROPIC_BATCH_ENDPOINT = "/v1/messages"
+
+# 仍在执行中的状态（重启后需要恢复）
+ACTIVE_STATUSES = ("validating", "in_progress", "cancelling")
+
+
+def _iter_jsonl(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """逐行读取JSONL文件，跳过空行"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            yield line_no, json.loads(line)
+
+
+def _validate_input_file(path: str, api_format: str, endpoint: str) -> int:
+    """校验批处理输入文件，返回请求数量"""
+    seen_ids = set()
+    count = 0
+
+    try:
+        for line_no, item in _iter_jsonl(path):
+            if not isinstance(item, dict):
+                raise BatchError(f"Line {line_no}: each line must be a JSON object")
+
+            custom_id = item.get("custom_id")
+            if not isinstance(custom_id, str) or not custom_id:
+                raise BatchError(f"Line {line_no}: missing custom_id")
+            if custom_id in seen_ids:
+                raise BatchError(f"Line {line_no}: duplicate custom_id '{custom_id}'")
+            seen_ids.add(custom_id)
+
+            try:
+                if api_format == "openai":
+                    if item.get("url") != endpoint:
+                        raise BatchError(f"Line {line_no}: url must be '{endpoint}'")
+                    request = OpenAIRequest(**item.get("body", {}))
+                else:
+                    request = AnthropicRequest(**item.get("params", {}))
+            except BatchError:
+                raise
+            except Exception as e:
+                raise BatchError(f"Line {line_no}: invalid request body: {e}")
+
+            # 批处理结果按完整响应写入输出文件，不支持流式
+            if request.stream:
+                raise BatchError(f"Line {line_no}: streaming is not supported in batches")
+
+            count += 1
+            if count > settings.batch_max_requests:
+                raise BatchError(f"Batch exceeds the limit of {settings.batch_max_requests} requests")
+    except json.JSONDecodeError as e:
+        raise BatchError(f"Invalid JSONL: {e}")
+    except UnicodeDecodeError:
+        raise BatchError("Input file must be UTF-8 encoded")
+
+    if count == 0:
+        raise BatchError("Batch input file is empty")
+
+    return count
+
+
+def _load_checkpoint(path: str, api_format: str) -> Tuple[set, int, int]:
+    """读取输出文件作为检查点，返回(已完成的custom_id集合, 成功数, 失败数)
+
+    进程在写入过程中被中断时，文件末尾可能存在不完整的一行，这里会将其截断。
+    """
+    output_path = Path(path)
+    if not output_path.exists():
+        return set(), 0, 0
+
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+    done_ids = set()
+    succeeded = 0
+    failed = 0
+    for _, line in _iter_jsonl(path):
+        done_ids.add(line["custom_id"])
+        if _is_success_line(line, api_format):
+            succeeded += 1
+        else:
+            failed += 1
+
+    return done_ids, succeeded, failed
+
+
+def _is_success_line(line: Dict[str, Any], api_format: str) -> bool:
+    """判断输出行是否为成功结果"""
+    if api_format == "openai":
+        return line.get("error") is None
+    return line.get("result", {}).get("type") == "succeeded"
+
+
+def _format_success(api_format: str, custom_id: str, response: Dict[str, Any]) -> Dict[str, Any]:
+    """构建成功结果行"""
+    if api_format == "openai":
+        return {
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": custom_id,
+            "response": {
+                "status_code": 200,
+                "request_id": str(uuid.uuid4()),
+                "body": response
+            },
+            "error": None
+        }
+    return {
+        "custom_id": custom_id,
+        "result": {"type": "succeeded", "message": response}
+    }
+
+
+def _format_error(api_format: str, custom_id: str, status_code: int, message: str) -> Dict[str, Any]:
+    """构建失败结果行"""
+    if api_format == "openai":
+        return {
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": custom_id,
+            "response": None,
+            "error": {"code": str(status_code), "message": message}
+        }
+    return {
+        "custom_id": custom_id,
+        "result": {
+            "type": "errored",
+            "error": {"type": "api_error", "message": message}
+        }
+    }
+
+
+class BatchService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    async def create_openai_batch(self, config: ModelConfig, source: BinaryIO, endpoint: str) -> BatchJob:
+        """创建OpenAI格式批处理任务（输入为上传的JSONL文件）"""
+        if endpoint not in OPENAI_BATCH_ENDPOINTS:
+            raise BatchError(f"Unsupported endpoint: {endpoint}")
+
+        batch_id = str(uuid.uuid4())
+        input_path = self._get_batch_dir(batch_id) / "input.jsonl"
+
+        def _store() -> int:
+            with open(input_path, "wb") as f:
+                shutil.copyfileobj(source, f)
+            return _validate_input_file(str(input_path), "openai", endpoint)
+
+        return await self._create_job(config, batch_id, "openai", endpoint, _store)
+
+    async def create_anthropic_batch(self, config: ModelConfig, requests: List[Dict[str, Any]]) -> BatchJob:
+        """创建Anthropic格式批处理任务（请求列表写入本地JSONL文件）"""
+        batch_id = str(uuid.uuid4())
+        input_path = self._get_batch_dir(batch_id) / "input.jsonl"
+
+        def _store() -> int:
+            with open(input_path, "w", encoding="utf-8") as f:
+                for item in requests:
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            return _validate_input_file(str(input_path), "anthropic", ANTHROPIC_BATCH_ENDPOINT)
+
+        return await self._create_job(config, batch_id, "anthropic", ANTHROPIC_BATCH_ENDPOINT, _store)
+
+    async def _create_job(self, config: ModelConfig, batch_id: str, api_format: str, endpoint: str, store) -> BatchJob:
+        """写入并校验输入文件后创建任务记录"""
+        batch_dir = self._get_batch_dir(batch_id)
+        try:
+            # 大文件的复制与校验放到线程中执行，避免阻塞事件循环
+            total_count = await asyncio.to_thread(store)
+        except Exception:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            raise
+
+        job = BatchJob(
+            id=batch_id,
+            model_config_id=config.id,
+            api_format=api_format,
+            endpoint=endpoint,
+            status="validating",
+            input_file_path=str(batch_dir / "input.jsonl"),
+            output_file_path=str(batch_dir / "output.jsonl"),
+            total_count=total_count,
+            completed_count=0,
+            failed_count=0
+        )
+
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+
+        return job
+
+    def _get_batch_dir(self, batch_id: str) -> Path:
+        """获取批处理任务的存储目录"""
+        batch_dir = Path(settings.batch_storage_dir) / batch_id
+        batch_dir.mkdir(parents=True, exist_ok=True)
+        return batch_dir
+
+    def get_batch(self, config: ModelConfig, batch_id: str) -> Optional[BatchJob]:
+        """获取属于该配置的批处理任务"""
+        return self.db.query(BatchJob).filter(
+            BatchJob.id == batch_id,
+            BatchJob.model_config_id == config.id
+        ).first()
+
+    def list_batches(self, config: ModelConfig, api_format: str, limit: int = 20) -> List[BatchJob]:
+        """列出该配置的批处理任务"""
+        return self.db.query(BatchJob).filter(
+            BatchJob.model_config_id == config.id,
+            BatchJob.api_format == api_format
+        ).order_by(BatchJob.created_at.desc()).limit(limit).all()
+
+    def cancel_batch(self, job: BatchJob) -> BatchJob:
+        """取消批处理任务"""
+        if job.status in ("validating", "in_progress"):
+            job.status = "cancelling"
+            self.db.commit()
+            self.db.refresh(job)
+            batch_runner.cancel(job.id)
+
+        return job
+
+    def to_openai_batch(self, job: BatchJob) -> Dict[str, Any]:
+        """转换为OpenAI Batch对象"""
+        is_finished = job.status in ("completed", "cancelled", "failed")
+        return {
+            "id": job.id,
+            "object": "batch",
+            "endpoint": job.endpoint,
+            "errors": {"object": "list", "data": [{"message": job.error_message}]} if job.error_message else None,
+            "input_file_id": f"{job.id}-input",
+            "output_file_id": f"{job.id}-output" if is_finished else None,
+            "status": job.status,
+            "created_at": int(job.created_at.timestamp()) if job.created_at else None,
+            "completed_at": int(job.completed_at.timestamp()) if job.completed_at else None,
+            "request_counts": {
+                "total": job.total_count,
+                "completed": job.completed_count,
+                "failed": job.failed_count
+            }
+        }
+
+    def to_anthropic_batch(self, job: BatchJob) -> Dict[str, Any]:
+        """转换为Anthropic Message Batch对象"""
+        if job.status in ("completed", "cancelled", "failed"):
+            processing_status = "ended"
+        elif job.status == "cancelling":
+            processing_status = "canceling"
+        else:
+            processing_status = "in_progress"
+
+        remaining = max(job.total_count - job.completed_count - job.failed_count, 0)
+        return {
+            "id": job.id,
+            "type": "message_batch",
+            "processing_status": processing_status,
+            "request_counts": {
+                "processing": 0 if processing_status == "ended" else remaining,
+                "succeeded": job.completed_count,
+                "errored": job.failed_count + (remaining if job.status == "failed" else 0),
+                "canceled": remaining if job.status == "cancelled" else 0,
+                "expired": 0
+            },
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "ended_at": job.completed_at.isoformat() if job.completed_at else None,
+            "results_url": f"/api/v1/messages/batches/{job.id}/results" if processing_status == "ended" else None
+        }
+
+
+class BatchRunner:
+    """批处理后台执行器
+
+    每个任务在独立的后台协程中执行，同一凭证下的所有批处理共享一个并发上限。
+    输出文件即检查点：每条结果写入后立即落盘，重启后跳过已写入的custom_id继续执行。
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._cancelled: set = set()
+        self._credential_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def start(self, batch_id: str):
+        """启动批处理任务"""
+        task = self._tasks.get(batch_id)
+        if task and not task.done():
+            return
+
+        task = asyncio.create_task(self._run(batch_id))
+        self._tasks[batch_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(batch_id, None))
+
+    def cancel(self, batch_id: str):
+        """请求取消批处理任务（已发出的请求会执行完毕）"""
+        self._cancelled.add(batch_id)
+
+    async def resume_pending(self):
+        """恢复重启前未完成的任务"""
+        db = SessionLocal()
+        try:
+            jobs = db.query(BatchJob).filter(BatchJob.status.in_(ACTIVE_STATUSES)).all()
+            for job in jobs:
+                if job.status == "cancelling":
+                    self._cancelled.add(job.id)
+                logger.info(f"Resuming batch job {job.id} ({job.status})")
+                self.start(job.id)
+        finally:
+            db.close()
+
+    async def shutdown(self):
+        """停止所有后台任务，未完成的请求将在下次启动时从检查点恢复"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _get_credential_semaphore(self, credential_id: str) -> asyncio.Semaphore:
+        """获取凭证级并发信号量"""
+        semaphore = self._credential_semaphores.get(credential_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.batch_concurrency_per_credential)
+            self._credential_semaphores[credential_id] = semaphore
+        return semaphore
+
+    async def _run(self, batch_id: str):
+        """执行批处理任务"""
+        db = SessionLocal()
+        try:
+            job = db.query(BatchJob).filter(BatchJob.id == batch_id).first()
+            if not job:
+                return
+
+            config = job.model_config
+            api_format = job.api_format
+            proxy_api_key = config.proxy_api_key
+            semaphore = self._get_credential_semaphore(config.credential_id)
+
+            done_ids, succeeded, failed = _load_checkpoint(job.output_file_path, api_format)
+            progress = {"completed": succeeded, "failed": failed, "unsynced": 0}
+
+            if batch_id not in self._cancelled:
+                job.status = "in_progress"
+            job.completed_count = succeeded
+            job.failed_count = failed
+            db.commit()
+
+            pending = set()
+            with open(job.output_file_path, "a", encoding="utf-8") as output:
+
+                async def process(item: Dict[str, Any]):
+                    try:
+                        line, ok = await self._execute_item(api_format, proxy_api_key, item)
+                    finally:
+                        semaphore.release()
+
+                    output.write(json.dumps(line, ensure_ascii=False) + "\n")
+                    output.flush()
+
+                    progress["completed" if ok else "failed"] += 1
+                    progress["unsynced"] += 1
+                    if progress["unsynced"] >= settings.batch_checkpoint_interval:
+                        self._sync_progress(db, job, progress)
+
+                for _, item in _iter_jsonl(job.input_file_path):
+                    if item["custom_id"] in done_ids:
+                        continue
+
+                    await semaphore.acquire()
+                    if batch_id in self._cancelled:
+                        semaphore.release()
+                        break
+
+                    task = asyncio.create_task(process(item))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+
+                if pending:
+                    await asyncio.gather(*pending)
+
+            self._sync_progress(db, job, progress)
+            job.status = "cancelled" if batch_id in self._cancelled else "completed"
+            job.completed_at = datetime.utcnow()
+            db.commit()
+            self._cancelled.discard(batch_id)
+            logger.info(f"Batch job {batch_id} {job.status}: {progress['completed']} succeeded, {progress['failed']} failed")
+
+        except asyncio.CancelledError:
+            # 进程关闭：保持当前状态，下次启动时恢复
+            raise
+        except Exception as e:
+            logger.error(f"Batch job {batch_id} failed: {e}")
+            db.rollback()
+            job = db.query(BatchJob).filter(BatchJob.id == batch_id).first()
+            if job:
+                job.status = "failed"
+                job.error_message = str(e)
+                job.completed_at = datetime.utcnow()
+                db.commit()
+        finally:
+            db.close()
+
+    def _sync_progress(self, db: Session, job: BatchJob, progress: Dict[str, int]):
+        """同步进度到数据库"""
+        job.completed_count = progress["completed"]
+        job.failed_count = progress["failed"]
+        progress["unsynced"] = 0
+        db.commit()
+
+    async def _execute_item(self, api_format: str, proxy_api_key: str, item: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """通过常规代理路径执行单条请求，速率受限或服务过载时退避重试"""
+        custom_id = item["custom_id"]
+        attempt = 0
+
+        while True:
+            db = SessionLocal()
+            try:
+                proxy_service = ProxyService(db)
+                if api_format == "openai":
+                    response = await proxy_service.proxy_openai_request(
+                        proxy_api_key, OpenAIRequest(**item["body"]), priority="batch"
+                    )
+                else:
+                    response = await proxy_service.proxy_anthropic_request(
+                        proxy_api_key, AnthropicRequest(**item["params"]), priority="batch"
+                    )
+                return _format_success(api_format, custom_id, response), True
+            except (RateLimitError, ServiceOverloadedError) as e:
+                if attempt >= settings.batch_max_retries:
+                    status_code = 503 if isinstance(e, ServiceOverloadedError) else 429
+                    return _format_error(api_format, custom_id, status_code, str(e)), False
+            except QuotaExceededError as e:
+                # 配额在当前周期内不会恢复，不重试
+                return _format_error(api_format, custom_id, 429, str(e)), False
+            except (LLMProviderError, ContextWindowExceededError) as e:
+                return _format_error(api_format, custom_id, 400, str(e)), False
+            except Exception as e:
+                logger.error(f"Batch item {custom_id} failed: {e}")
+                return _format_error(api_format, custom_id, 500, str(e)), False
+            finally:
+                db.close()
+
+            attempt += 1
+            await asyncio.sleep(settings.batch_retry_delay_seconds * attempt)
+
+
+batch_runner = BatchRunner()
@@ -0,0 +1,98 @@
+from typing import List, Optional
+from app.database import SessionLocal
+from app.config import settings
+from app.models.credential import Credential
+from app.models.model_config import ModelConfig
+from app.adapters.factory import LLMAdapterFactory
+from app.utils.security import decrypt_api_key_async
+from app.utils.cache import AsyncTTLCache
+from app.exceptions import LLMProviderError
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 凭证ID -> (凭证指纹, 模型列表)
+model_catalog_cache = AsyncTTLCache(
+    "model_catalog",
+    ttl_seconds=settings.catalog_ttl_seconds,
+    stale_seconds=settings.catalog_stale_seconds
+)
+
+# 代理API密钥 -> 模型列表（/api/v1/models）
+proxy_models_cache = AsyncTTLCache(
+    "proxy_models",
+    ttl_seconds=settings.proxy_models_cache_ttl_seconds,
+    stale_seconds=settings.proxy_models_cache_stale_seconds,
+    max_entries=10000
+)
+
+
+def _credential_fingerprint(credential: Credential) -> str:
+    """凭证指纹：密钥、地址或提供商变化后旧目录自动失效"""
+    raw = f"{credential.provider}|{credential.api_url or ''}|{credential.api_key_encrypted}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+async def get_model_catalog(credential: Credential, force: bool = False) -> List[str]:
+    """获取凭证的上游模型目录（带缓存，并发调用只请求一次上游）"""
+    fingerprint = _credential_fingerprint(credential)
+    cached = model_catalog_cache.peek(credential.id)
+    if cached is not None and cached[0] != fingerprint:
+        force = True
+
+    # 只捕获普通值，后台刷新时请求的数据库会话可能已经关闭
+    provider = credential.provider
+    api_key_encrypted = credential.api_key_encrypted
+    api_url = credential.api_url
+
+    async def load():
+        api_key = await decrypt_api_key_async(api_key_encrypted)
+        adapter = LLMAdapterFactory.create_adapter(
+            provider=provider,
+            api_key=api_key,
+            api_url=api_url
+        )
+        try:
+            models = await adapter.get_available_models()
+        finally:
+            await adapter.close()
+
+        # 空列表通常意味着上游请求失败，不写入缓存
+        if not models:
+            raise LLMProviderError("Provider returned an empty model catalog")
+        return fingerprint, list(models)
+
+    _, models = await model_catalog_cache.get(credential.id, load, force=force)
+    return list(models)
+
+
+def invalidate_model_catalog(credential_id: str):
+    """使凭证的模型目录缓存失效"""
+    model_catalog_cache.invalidate(credential_id)
+
+
+async def get_proxy_models(proxy_api_key: str) -> List[str]:
+    """获取代理API密钥可用的模型列表（带缓存）"""
+    async def load():
+        db = SessionLocal()
+        try:
+            config: Optional[ModelConfig] = db.query(ModelConfig).filter(
+                ModelConfig.proxy_api_key == proxy_api_key
+            ).first()
+            if not config or not config.is_enabled:
+                return []
+            return [config.model_name]
+        finally:
+            db.close()
+
+    models = await proxy_models_cache.get(proxy_api_key, load)
+    if not models:
+        # 不缓存无效密钥，新建的配置可以立即生效
+        proxy_models_cache.invalidate(proxy_api_key)
+    return list(models)
+
+
+def invalidate_proxy_models(proxy_api_key: str):
+    """使代理API密钥的模型列表缓存失效"""
+    proxy_models_cache.invalidate(proxy_api_key)
@@ -4,9 +4,15 @@ from typing import List, Optional, Dict
 from app.models.credential import Credential
 from app.models.user import User
 from app.schemas.credential import CredentialCreate, CredentialUpdate, CredentialValidate
-from app.utils.security import encrypt_api_key, decrypt_api_key
+from app.utils.security import decrypt_api_key, encrypt_api_key_async, decrypt_api_key_async
+from app.utils.executor import run_crypto
+from app.services.catalog_service import get_model_catalog
+from app.services.usage_service import delete_config_usage
+from app.services.quota_service import delete_config_quota_usage
+from app.services.invalidation_service import publish_credential_change
 from app.adapters.factory import LLMAdapterFactory
 from app.exceptions import CredentialValidationError
+from app.config import settings
 import logging
 import asyncio
 from datetime import datetime
@@ -18,7 +24,7 @@ class CredentialService:
     def __init__(self, db: Session):
         self.db = db
 
-    def create_credential(self, user: User, credential_data: CredentialCreate) -> Credential:
+    async def create_credential(self, user: User, credential_data: CredentialCreate) -> Credential:
         """创建新凭证"""
         # 检查名称是否重复
         existing = self.db.query(Credential).filter(
@@ -32,7 +38,7 @@ class CredentialService:
             raise CredentialValidationError(f"Credential name '{credential_data.name}' already exists")
 
         # 加密API密钥
-        encrypted_api_key = encrypt_api_key(credential_data.api_key)
+        encrypted_api_key = await encrypt_api_key_async(credential_data.api_key)
 
         # 创建凭证
         credential = Credential(
@@ -63,7 +69,7 @@ class CredentialService:
             )
         ).first()
 
-    def update_credential(self, user: User, credential_id: str, update_data: CredentialUpdate) -> Optional[Credential]:
+    async def update_credential(self, user: User, credential_id: str, update_data: CredentialUpdate) -> Optional[Credential]:
         """更新凭证"""
         credential = self.get_credential_by_id(user, credential_id)
         if not credential:
@@ -87,12 +93,15 @@ class CredentialService:
             credential.name = update_data.name
 
         if update_data.api_key is not None:
-            credential.api_key_encrypted = encrypt_api_key(update_data.api_key)
-            # 重置验证状态
+            credential.api_key_encrypted = await encrypt_api_key_async(update_data.api_key)
+            # 重置验证状态，旧密钥的模型验证结果不能再复用
             credential.is_validated = False
             credential.validation_error = None
+            credential.model_validation_results = {}
 
         if update_data.api_url is not None:
+            if update_data.api_url != credential.api_url:
+                credential.model_validation_results = {}
             credential.api_url = update_data.api_url
 
         if update_data.custom_models is not None:
@@ -106,6 +115,7 @@ class CredentialService:
 
         self.db.commit()
         self.db.refresh(credential)
+        publish_credential_change(credential.id)
 
         return credential
 
@@ -115,19 +125,39 @@ class CredentialService:
         if not credential:
             return False
 
+        proxy_api_keys = [config.proxy_api_key for config in credential.model_configs]
+        config_ids = [config.id for config in credential.model_configs]
+        for config in credential.model_configs:
+            delete_config_usage(self.db, config.id)
+            delete_config_quota_usage(self.db, config.id)
         self.db.delete(credential)
         self.db.commit()
+
+        publish_credential_change(credential_id, config_ids, proxy_api_keys, deleted=True)
         return True
 
-    async def validate_credential(self, user: User, credential_id: str) -> CredentialValidate:
-        """验证凭证 - 支持多模型并行验证"""
+    async def validate_credential(self, user: User, credential_id: str, force: bool = False) -> CredentialValidate:
+        """验证凭证 - 提交到后台验证队列并等待结果（重复请求复用同一任务）"""
+        from app.services.validation_service import validation_queue
+
         credential = self.get_credential_by_id(user, credential_id)
         if not credential:
             raise CredentialValidationError("Credential not found")
 
+        job = validation_queue.submit(credential.id, force=force)
+        return await job.wait()
+
+    async def run_validation(
+        self,
+        credential: Credential,
+        semaphore: asyncio.Semaphore,
+        job=None,
+        force: bool = False
+    ) -> CredentialValidate:
+        """执行凭证验证 - 支持多模型并行验证，由后台验证队列调用"""
         try:
             # 解密API密钥
-            api_key = decrypt_api_key(credential.api_key_encrypted)
+            api_key = await decrypt_api_key_async(credential.api_key_encrypted)
 
             # 创建适配器
             adapter = LLMAdapterFactory.create_adapter(
@@ -140,12 +170,20 @@ class CredentialService:
             if credential.custom_models:
                 models_to_validate = credential.custom_models
             else:
-                # 获取默认模型列表
-                models_to_validate = await adapter.get_available_models()
+                # 获取上游模型目录（强制验证时同时刷新目录）
+                models_to_validate = await get_model_catalog(credential, force=force)
+
+            if job is not None:
+                job.total_models = len(models_to_validate)
 
-            # 并行验证所有模型
+            # 并行验证所有模型（复用仍在有效期内的成功结果）
             validation_results = await self._validate_models_parallel(
-                adapter, models_to_validate
+                adapter,
+                models_to_validate,
+                previous_results=credential.model_validation_results or {},
+                semaphore=semaphore,
+                job=job,
+                force=force
             )
 
             # 统计验证结果
@@ -207,25 +245,58 @@ class CredentialService:
                 error_message=str(e)
             )
 
-    async def _validate_models_parallel(self, adapter, models: List[str]) -> Dict[str, Dict]:
-        """并行验证多个模型"""
+    @staticmethod
+    def _is_result_fresh(result: Optional[Dict]) -> bool:
+        """判断已有的模型验证结果是否可复用（只复用有效期内的成功结果，失败的模型总是重新探测）"""
+        if not result or not result.get("is_valid"):
+            return False
+
+        try:
+            validated_at = datetime.fromisoformat(result["validated_at"])
+        except (KeyError, TypeError, ValueError):
+            return False
+
+        age = (datetime.utcnow() - validated_at).total_seconds()
+        return 0 <= age < settings.validation_result_ttl_seconds
+
+    async def _validate_models_parallel(
+        self,
+        adapter,
+        models: List[str],
+        previous_results: Dict[str, Dict],
+        semaphore: asyncio.Semaphore,
+        job=None,
+        force: bool = False
+    ) -> Dict[str, Dict]:
+        """并行验证多个模型（并发受信号量限制）"""
         async def validate_single_model(model_name: str) -> tuple[str, Dict]:
             """验证单个模型"""
+            previous = previous_results.get(model_name)
+            if not force and self._is_result_fresh(previous):
+                if job is not None:
+                    job.record_model_done(reused=True)
+                return model_name, previous
+
             try:
-                is_valid = await adapter.validate_model(model_name)
-                return model_name, {
+                async with semaphore:
+                    is_valid = await adapter.probe_model(model_name)
+                result = {
                     "is_valid": is_valid,
                     "error": None,
                     "validated_at": datetime.utcnow().isoformat()
                 }
             except Exception as e:
                 logger.warning(f"Model {model_name} validation failed: {e}")
-                return model_name, {
+                result = {
                     "is_valid": False,
                     "error": str(e),
                     "validated_at": datetime.utcnow().isoformat()
                 }
 
+            if job is not None:
+                job.record_model_done()
+            return model_name, result
+
         # 创建并行任务
         tasks = [validate_single_model(model) for model in models]
 
@@ -245,8 +316,17 @@ class CredentialService:
         except Exception:
             return "***masked***"
 
-    async def get_available_models(self, user: User, credential_id: str) -> List[str]:
-        """获取凭证支持的可用模型"""
+    async def mask_api_keys(self, credentials: List[Credential]) -> Dict[str, str]:
+        """批量遮盖API密钥（在加解密线程池中一次性完成）"""
+        encrypted_keys = {cred.id: cred.api_key_encrypted for cred in credentials}
+
+        def _mask_all() -> Dict[str, str]:
+            return {cred_id: self.mask_api_key(encrypted) for cred_id, encrypted in encrypted_keys.items()}
+
+        return await run_crypto(_mask_all)
+
+    async def get_available_models(self, user: User, credential_id: str, refresh: bool = False) -> List[str]:
+        """获取凭证支持的可用模型（refresh为True时强制刷新上游模型目录）"""
         credential = self.get_credential_by_id(user, credential_id)
         if not credential:
             raise CredentialValidationError("Credential not found")
@@ -259,22 +339,8 @@ class CredentialService:
             return credential.custom_models
 
         try:
-            # 解密API密钥
-            api_key = decrypt_api_key(credential.api_key_encrypted)
-
-            # 创建适配器
-            adapter = LLMAdapterFactory.create_adapter(
-                provider=credential.provider,
-                api_key=api_key,
-                api_url=credential.api_url
-            )
-
-            # 获取适配器的默认可用模型
-            models = await adapter.get_available_models()
-            await adapter.close()
-
-            return models
+            return await get_model_catalog(credential, force=refresh)
 
         except Exception as e:
             logger.error(f"Failed to get available models: {e}")
-            raise CredentialValidationError(f"Failed to get available models: {str(e)}")
\ No newline at end of file
+            raise CredentialValidationError(f"Failed to get available models: {str(e)}")
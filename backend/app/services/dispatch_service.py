@@ -0,0 +1,123 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+from app.adapters.base import LLMResponse
+from app.adapters.factory import LLMAdapterFactory
+from app.services.stream_service import OpenAIStreamEncoder, AnthropicStreamEncoder
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 返回给客户端的响应格式（模型配置的target_format）
+CLIENT_FORMATS = ("openai", "anthropic")
+
+
+def to_openai_response(response: LLMResponse) -> Dict[str, Any]:
+    """通用响应已经是OpenAI格式"""
+    return response.model_dump()
+
+
+def to_anthropic_response(openai_response: Dict[str, Any]) -> Dict[str, Any]:
+    """将OpenAI响应转换为Anthropic格式"""
+    choices = openai_response.get("choices", [])
+    content = []
+
+    if choices:
+        message = choices[0].get("message", {})
+        text = message.get("content", "")
+        content = [{"type": "text", "text": text}]
+
+    usage = openai_response.get("usage", {})
+    cache_read = usage.get("cache_read_tokens", 0)
+    cache_creation = usage.get("cache_creation_tokens", 0)
+
+    # Anthropic的input_tokens不包含缓存读写部分
+    anthropic_usage = {
+        "input_tokens": usage.get("prompt_tokens", 0) - cache_read - cache_creation,
+        "output_tokens": usage.get("completion_tokens", 0)
+    }
+    if cache_read or cache_creation:
+        anthropic_usage["cache_read_input_tokens"] = cache_read
+        anthropic_usage["cache_creation_input_tokens"] = cache_creation
+
+    return {
+        "id": openai_response.get("id", str(uuid.uuid4())),
+        "type": "message",
+        "role": "assistant",
+        "content": content,
+        "model": openai_response.get("model", "unknown"),
+        "usage": anthropic_usage
+    }
+
+
+# 客户端格式 -> (完整响应转换, 流式编码器工厂(模型, 提示词token数))
+_TRANSCODERS: Dict[str, Tuple[Callable[[LLMResponse], Dict[str, Any]], Callable[[str, int], Any]]] = {
+    "openai": (to_openai_response, lambda model, prompt_tokens: OpenAIStreamEncoder(model)),
+    "anthropic": (
+        lambda response: to_anthropic_response(response.model_dump()),
+        lambda model, prompt_tokens: AnthropicStreamEncoder(model, prompt_tokens)
+    ),
+}
+
+
+@dataclass(frozen=True)
+class Route:
+    """(客户端格式, 提供商) 组合的转发方式，由适配器声明的能力预先生成"""
+    client_format: str
+    provider: str
+    wire_format: str  # 上游原生接口格式
+    forward: str  # 适配器上发送原生请求的方法名（按名称取，便于替换实现）
+    native_stream: bool  # 是否走上游原生流式接口，否则把完整响应转为流
+    native_n: bool  # 上游是否原生支持n>1，否则并发拆分
+    transcode: Callable[[LLMResponse], Dict[str, Any]]  # 通用响应 -> 客户端格式
+    stream_encoder: Callable[[str, int], Any]  # 创建客户端格式的SSE编码器
+
+
+class DispatchTable:
+    """(客户端格式 × 提供商) 转发表
+
+    每个提供商第一次使用（或启动预热）时为所有客户端格式生成路由，之后每个请求只做一次字典查找。
+    适配器按需导入，未使用的提供商不会生成路由。
+    """
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], Route] = {}
+
+    def _build(self, provider: str):
+        adapter_class = LLMAdapterFactory.get_adapter_class(provider)
+        forward = adapter_class.native_forward_name()
+        if not callable(getattr(adapter_class, forward, None)):
+            raise ValueError(f"{adapter_class.__name__} does not implement {forward}")
+        for client_format, (transcode, stream_encoder) in _TRANSCODERS.items():
+            self._routes[(client_format, provider)] = Route(
+                client_format=client_format,
+                provider=provider,
+                wire_format=adapter_class.wire_format,
+                forward=forward,
+                native_stream=adapter_class.supports_native_stream,
+                native_n=adapter_class.supports_native_n,
+                transcode=transcode,
+                stream_encoder=stream_encoder
+            )
+
+    def route(self, client_format: str, provider: str) -> Route:
+        """查找转发路由；不支持的客户端格式或提供商抛出ValueError"""
+        route = self._routes.get((client_format, provider))
+        if route is None:
+            if client_format not in _TRANSCODERS:
+                raise ValueError(f"Unsupported target format: {client_format}")
+            self._build(provider)
+            route = self._routes[(client_format, provider)]
+        return route
+
+    def preload(self, providers: List[str]):
+        """预先生成指定提供商的路由（启动预热使用）"""
+        for provider in providers:
+            if LLMAdapterFactory.is_provider_supported(provider):
+                self._build(provider)
+
+    def clear(self):
+        self._routes.clear()
+
+
+dispatch_table = DispatchTable()
@@ -0,0 +1,80 @@
+from typing import Any, Dict, Optional
+from app.exceptions import ServiceDrainingError
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 等待请求排空时检查进行中请求数的间隔（秒）
+DRAIN_POLL_INTERVAL = 0.05
+
+
+class DrainController:
+    """跟踪进行中的代理请求，停机时拒绝新请求并等待已有请求完成
+
+    - 收到停机信号后就绪检查先失败，负载均衡据此停止转发新请求，此时仍正常处理请求
+    - 开始排空后到达的新请求返回503，客户端可以重试到其他实例
+    - 已经开始的请求（包括流式响应）在截止时间之前继续执行
+    """
+
+    def __init__(self):
+        self.ready = True
+        self.draining = False
+        self.inflight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.draining_since: Optional[float] = None
+
+    def begin(self):
+        """开始处理一个请求（排空期间抛出ServiceDrainingError）"""
+        if self.draining:
+            self.rejected += 1
+            raise ServiceDrainingError("Service is shutting down")
+        self.inflight += 1
+        self.accepted += 1
+
+    def end(self):
+        """请求处理完成"""
+        self.inflight -= 1
+
+    def fail_readiness(self):
+        """让就绪检查失败，继续接受请求"""
+        if self.ready:
+            self.ready = False
+            logger.info("Readiness is now failing")
+
+    def start_draining(self):
+        """停止接受新请求"""
+        self.ready = False
+        if not self.draining:
+            self.draining = True
+            self.draining_since = time.monotonic()
+            logger.info(f"Draining started with {self.inflight} in-flight requests")
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """等待进行中的请求完成（从开始排空时计算截止时间），超时返回False"""
+        deadline = (self.draining_since or time.monotonic()) + timeout
+        while self.inflight > 0:
+            if time.monotonic() >= deadline:
+                logger.warning(f"Drain deadline reached with {self.inflight} requests still in flight")
+                return False
+            await asyncio.sleep(DRAIN_POLL_INTERVAL)
+        return True
+
+    def reset(self):
+        """重新接受请求（测试和重新启动时使用）"""
+        self.ready = True
+        self.draining = False
+        self.draining_since = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "draining": self.draining,
+            "inflight": self.inflight,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+        }
+
+
+drain_controller = DrainController()
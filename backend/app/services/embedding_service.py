@@ -0,0 +1,175 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from app.adapters.base import EmbeddingResponse
+from app.config import settings
+from app.exceptions import LLMProviderError
+from app.utils.tokens import estimate_text_tokens
+import asyncio
+import base64
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+
+EmbeddingSender = Callable[[List[str]], Awaitable[EmbeddingResponse]]
+
+
+class _PendingInput:
+    __slots__ = ("texts", "tokens", "future")
+
+    def __init__(self, texts: List[str], tokens: int, future: asyncio.Future):
+        self.texts = texts
+        self.tokens = tokens
+        self.future = future
+
+
+class _Batch:
+    __slots__ = ("send", "max_inputs", "items", "inputs", "tokens", "timer", "flushed")
+
+    def __init__(self, send: EmbeddingSender, max_inputs: int):
+        self.send = send
+        self.max_inputs = max_inputs
+        self.items: List[_PendingInput] = []
+        self.inputs = 0
+        self.tokens = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.flushed = False
+
+
+class EmbeddingBatcher:
+    """向量化请求的微批处理器
+
+    同一凭证、模型和维度的并发调用在短时间窗口内合并为一次上游请求，结果按输入顺序拆回各调用方。
+    批次达到输入条数或token上限时立即发送，否则在窗口结束时发送；上游返回的用量按各调用方估算token的比例分摊。
+    """
+
+    def __init__(self, window_ms: float, max_inputs: int, max_tokens: int):
+        self.window_ms = window_ms
+        self.max_inputs = max_inputs
+        self.max_tokens = max_tokens
+        self._open: Dict[Hashable, _Batch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.requests = 0
+        self.inputs = 0
+        self.batches = 0
+        self.failed_batches = 0
+
+    async def embed(
+        self,
+        key: Hashable,
+        texts: List[str],
+        send: EmbeddingSender,
+        provider_max_inputs: int,
+        family: str = "openai"
+    ) -> Tuple[List[List[float]], int]:
+        """提交一个调用方的输入，返回 (向量列表, 分摊的token数)"""
+        self.requests += 1
+        self.inputs += len(texts)
+        max_inputs = max(1, min(self.max_inputs, provider_max_inputs))
+
+        futures = []
+        for chunk, tokens in self._chunks(texts, max_inputs, family):
+            futures.append(self._submit(key, chunk, tokens, send, max_inputs))
+
+        results = await asyncio.gather(*futures)
+        vectors = [vector for chunk_vectors, _ in results for vector in chunk_vectors]
+        return vectors, sum(tokens for _, tokens in results)
+
+    def _chunks(self, texts: List[str], max_inputs: int, family: str):
+        """调用方自己的输入超过单批上限时拆成多段"""
+        chunk: List[str] = []
+        chunk_tokens = 0
+        for text in texts:
+            tokens = estimate_text_tokens(text, family)
+            if chunk and (len(chunk) >= max_inputs or chunk_tokens + tokens > self.max_tokens):
+                yield chunk, chunk_tokens
+                chunk, chunk_tokens = [], 0
+            chunk.append(text)
+            chunk_tokens += tokens
+        if chunk:
+            yield chunk, chunk_tokens
+
+    def _submit(self, key: Hashable, texts: List[str], tokens: int, send: EmbeddingSender, max_inputs: int) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        batch = self._open.get(key)
+        if batch is not None and (
+            batch.inputs + len(texts) > batch.max_inputs or batch.tokens + tokens > self.max_tokens
+        ):
+            self._flush(key, batch)
+            batch = None
+
+        if batch is None:
+            batch = _Batch(send, max_inputs)
+            batch.timer = loop.call_later(self.window_ms / 1000, self._flush, key, batch)
+            self._open[key] = batch
+
+        future = loop.create_future()
+        batch.items.append(_PendingInput(texts, tokens, future))
+        batch.inputs += len(texts)
+        batch.tokens += tokens
+
+        if batch.inputs >= batch.max_inputs or batch.tokens >= self.max_tokens:
+            self._flush(key, batch)
+        return future
+
+    def _flush(self, key: Hashable, batch: _Batch):
+        if self._open.get(key) is batch:
+            del self._open[key]
+        if batch.timer is not None:
+            batch.timer.cancel()
+        if batch.flushed:
+            return
+        batch.flushed = True
+
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: _Batch):
+        texts = [text for item in batch.items for text in item.texts]
+        self.batches += 1
+        try:
+            response = await batch.send(texts)
+            if len(response.embeddings) != len(texts):
+                raise LLMProviderError(
+                    f"Provider returned {len(response.embeddings)} embeddings for {len(texts)} inputs"
+                )
+        except Exception as e:
+            self.failed_batches += 1
+            for item in batch.items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        total_tokens = response.usage.get("total_tokens") or response.usage.get("prompt_tokens") or batch.tokens
+        offset = 0
+        for item in batch.items:
+            vectors = response.embeddings[offset:offset + len(item.texts)]
+            offset += len(item.texts)
+            share = round(total_tokens * item.tokens / batch.tokens) if batch.tokens else 0
+            if not item.future.done():
+                item.future.set_result((vectors, share))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": "embedding_batcher",
+            "requests": self.requests,
+            "inputs": self.inputs,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "avg_inputs_per_batch": round(self.inputs / self.batches, 2) if self.batches else None,
+        }
+
+
+def format_embedding(vector: List[float], encoding_format: Optional[str]) -> Any:
+    """按请求的格式返回向量（base64为小端float32）"""
+    if encoding_format == "base64":
+        return base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode()
+    return vector
+
+
+embedding_batcher = EmbeddingBatcher(
+    window_ms=settings.embedding_batch_window_ms,
+    max_inputs=settings.embedding_batch_max_inputs,
+    max_tokens=settings.embedding_batch_max_tokens
+)
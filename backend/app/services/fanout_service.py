@@ -0,0 +1,49 @@
+from typing import Awaitable, Callable, Dict, List
+from app.adapters.base import LLMRequest, LLMResponse
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def merge_responses(responses: List[LLMResponse]) -> LLMResponse:
+    """合并多个单候选响应：choices按顺序重新编号，用量逐项相加"""
+    choices = []
+    usage: Dict[str, int] = {}
+    for response in responses:
+        for choice in response.choices:
+            choices.append({**choice, "index": len(choices)})
+        for key, value in response.usage.items():
+            usage[key] = usage.get(key, 0) + value
+
+    first = responses[0]
+    return LLMResponse(id=first.id, model=first.model, choices=choices, usage=usage)
+
+
+async def fan_out(
+    forward: Callable[[LLMRequest], Awaitable[LLMResponse]],
+    request: LLMRequest,
+    max_concurrency: int
+) -> LLMResponse:
+    """把n>1的请求拆成n个单候选请求并发发往上游，再合并为一个响应
+
+    所有请求共用同一个适配器的连接池，并发数不超过max_concurrency。
+    任意一个请求失败时取消其余请求并抛出该异常。
+    """
+    single = request.model_copy(update={"n": 1})
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one() -> LLMResponse:
+        async with semaphore:
+            return await forward(single)
+
+    tasks = [asyncio.create_task(run_one()) for _ in range(request.n)]
+    try:
+        responses = await asyncio.gather(*tasks)
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    return merge_responses(responses)
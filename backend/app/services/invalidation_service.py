@@ -0,0 +1,257 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from app.config import settings
+from app.services.catalog_service import (
+    model_catalog_cache,
+    proxy_models_cache,
+    invalidate_model_catalog,
+    invalidate_proxy_models
+)
+from app.services.response_cache import response_cache
+from app.services.quota_service import token_quota_manager
+import asyncio
+import json
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 变更事件涉及的实体类型
+CREDENTIAL = "credential"
+MODEL_CONFIG = "model_config"
+# 订阅中断后重新连接时可能漏掉事件，清空全部本地缓存
+RESYNC = "resync"
+
+# Redis断线重连的退避上限（秒）
+MAX_RECONNECT_DELAY = 30.0
+
+
+def apply_change(event: Dict[str, Any]):
+    """根据变更事件清理当前进程内受影响的缓存（缓存在下次访问时重新加载）"""
+    entity = event.get("entity")
+    if entity == RESYNC:
+        model_catalog_cache.clear()
+        proxy_models_cache.clear()
+        response_cache.clear()
+        return
+
+    config_ids = list(event.get("config_ids", ()))
+    if entity == CREDENTIAL:
+        invalidate_model_catalog(event["id"])
+    elif entity == MODEL_CONFIG:
+        config_ids.append(event["id"])
+
+    for proxy_api_key in event.get("proxy_api_keys", ()):
+        invalidate_proxy_models(proxy_api_key)
+    for config_id in config_ids:
+        response_cache.invalidate_config(config_id)
+        if event.get("deleted"):
+            token_quota_manager.forget(config_id)
+
+
+class LocalInvalidationBus:
+    """进程内失效总线：只清理当前进程的缓存，用于单节点部署和测试"""
+
+    backend = "local"
+
+    def __init__(self):
+        self._handlers: List[Callable[[Dict[str, Any]], None]] = [apply_change]
+        self.published = 0
+        self.received = 0
+        self.errors = 0
+
+    def subscribe(self, handler: Callable[[Dict[str, Any]], None]):
+        """注册额外的事件处理函数"""
+        self._handlers.append(handler)
+
+    def _dispatch(self, event: Dict[str, Any]):
+        for handler in self._handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Invalidation handler failed for {event.get('entity')}: {e}")
+
+    def publish(self, event: Dict[str, Any]):
+        """发布变更事件（本进程立即生效）"""
+        self.published += 1
+        self._dispatch(event)
+
+    def start(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "published": self.published,
+            "received": self.received,
+            "errors": self.errors,
+        }
+
+
+class RedisInvalidationBus(LocalInvalidationBus):
+    """基于Redis pub/sub的跨进程失效总线
+
+    - 发布时先清理本进程缓存，再经后台任务广播到频道，不阻塞请求
+    - 每个进程订阅同一频道，收到其他进程的事件后清理本地缓存，跳过自己发出的事件
+    - 连接中断期间的事件会丢失，重新订阅成功后清空全部本地缓存
+    - Redis不可用时各进程仍依赖缓存自身的TTL兜底
+    """
+
+    backend = "redis"
+
+    def __init__(self, redis_url: str, channel: str, client_factory: Optional[Callable[[], Any]] = None):
+        super().__init__()
+        self.redis_url = redis_url
+        self.channel = channel
+        self.instance_id = uuid.uuid4().hex
+        self._client_factory = client_factory or self._default_client
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._subscribed = asyncio.Event()
+        self.connected = False
+        self.reconnects = 0
+        self.dropped = 0
+        self.last_lag_ms: Optional[float] = None
+
+    def _default_client(self):
+        import redis.asyncio as redis
+        return redis.Redis.from_url(self.redis_url)
+
+    def publish(self, event: Dict[str, Any]):
+        """发布变更事件：本进程立即生效，其他进程经Redis异步通知"""
+        super().publish(event)
+        if self._loop is None or self._loop.is_closed():
+            return
+        message = json.dumps({"origin": self.instance_id, "sent_at": time.time(), "event": event})
+        # 服务层可能在线程池中调用，通过事件循环转交给发布任务
+        self._loop.call_soon_threadsafe(self._outbox.put_nowait, message)
+
+    def start(self):
+        """启动发布与订阅任务"""
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._outbox = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._publish_loop()),
+            asyncio.create_task(self._subscribe_loop()),
+        ]
+
+    async def wait_subscribed(self, timeout: float = 5.0):
+        """等待订阅建立（测试和启动检查使用）"""
+        await asyncio.wait_for(self._subscribed.wait(), timeout)
+
+    async def _publish_loop(self):
+        client = self._client_factory()
+        try:
+            while True:
+                message = await self._outbox.get()
+                try:
+                    await client.publish(self.channel, message)
+                except Exception as e:
+                    # 其他进程的缓存会在TTL到期后自然更新
+                    self.dropped += 1
+                    logger.warning(f"Failed to publish cache invalidation: {e}")
+        finally:
+            await client.close()
+
+    async def _subscribe_loop(self):
+        delay = 0.5
+        while True:
+            client = self._client_factory()
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                if self.reconnects:
+                    self._dispatch({"entity": RESYNC})
+                self.connected = True
+                self._subscribed.set()
+                delay = 0.5
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._handle_message(message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation subscription lost: {e}")
+            finally:
+                self.connected = False
+                self._subscribed.clear()
+                await pubsub.close()
+                await client.close()
+
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def _handle_message(self, data: Any):
+        try:
+            payload = json.loads(data)
+        except (TypeError, ValueError):
+            self.errors += 1
+            logger.warning("Ignoring malformed cache invalidation message")
+            return
+        if payload.get("origin") == self.instance_id:
+            return
+
+        self.received += 1
+        sent_at = payload.get("sent_at")
+        if sent_at:
+            self.last_lag_ms = round((time.time() - sent_at) * 1000, 2)
+        self._dispatch(payload.get("event") or {})
+
+    async def shutdown(self):
+        """停止后台任务"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update({
+            "channel": self.channel,
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "dropped": self.dropped,
+            "last_lag_ms": self.last_lag_ms,
+        })
+        return stats
+
+
+def create_invalidation_bus() -> LocalInvalidationBus:
+    """按配置创建失效总线"""
+    if settings.invalidation_bus_backend == "redis":
+        return RedisInvalidationBus(settings.redis_url, settings.invalidation_bus_channel)
+    return LocalInvalidationBus()
+
+
+invalidation_bus = create_invalidation_bus()
+
+
+def publish_credential_change(credential_id: str, config_ids: Iterable[str] = (),
+                              proxy_api_keys: Iterable[str] = (), deleted: bool = False):
+    """凭证修改或删除后通知所有进程"""
+    invalidation_bus.publish({
+        "entity": CREDENTIAL,
+        "id": credential_id,
+        "config_ids": list(config_ids),
+        "proxy_api_keys": list(proxy_api_keys),
+        "deleted": deleted,
+    })
+
+
+def publish_model_config_change(config_id: str, proxy_api_keys: Iterable[str] = (), deleted: bool = False):
+    """模型配置修改、删除或更换密钥后通知所有进程"""
+    invalidation_bus.publish({
+        "entity": MODEL_CONFIG,
+        "id": config_id,
+        "proxy_api_keys": list(proxy_api_keys),
+        "deleted": deleted,
+    })
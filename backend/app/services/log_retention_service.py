@@ -0,0 +1,260 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from typing import Dict, Any, List, Optional, Tuple
+from pathlib import Path
+from datetime import date, datetime, timedelta
+from app.config import settings
+from app.database import engine as default_engine
+from app.models.usage_rollup import UsageRollupMinute
+import asyncio
+import gzip
+import json
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+LOG_TABLE = "request_logs"
+DEFAULT_PARTITION = "request_logs_default"
+PARTITION_PATTERN = re.compile(r"^request_logs_p(\d{8})$")
+
+
+def partition_name(day: date) -> str:
+    """日分区表名"""
+    return f"{LOG_TABLE}_p{day.strftime('%Y%m%d')}"
+
+
+def _day_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class LogRetentionService:
+    """请求日志的分区、归档与过期清理
+
+    - PostgreSQL：request_logs为按created_at划分的原生日分区表，过期分区导出后直接DROP
+    - 其他数据库（SQLite）：按天导出过期数据后分批删除，依赖created_at索引
+    """
+
+    def __init__(self, bind: Optional[Engine] = None):
+        self.engine = bind or default_engine
+
+    @property
+    def is_postgres(self) -> bool:
+        return self.engine.dialect.name == "postgresql"
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """执行一次分区维护与过期清理，返回处理摘要"""
+        now = now or datetime.utcnow()
+        summary: Dict[str, Any] = {"created_partitions": [], "archived_days": [], "deleted_rows": 0}
+
+        if self.is_postgres:
+            summary["created_partitions"] = self.ensure_partitions(now.date())
+
+        if settings.log_retention_days > 0:
+            cutoff = now.date() - timedelta(days=settings.log_retention_days)
+            if self.is_postgres:
+                self._expire_partitions(cutoff, summary)
+                self._expire_by_range(DEFAULT_PARTITION, cutoff, summary)
+            else:
+                self._expire_by_range(LOG_TABLE, cutoff, summary)
+
+        if settings.usage_minute_retention_days > 0:
+            self._prune_minute_rollups(now - timedelta(days=settings.usage_minute_retention_days))
+
+        return summary
+
+    # ==================== PostgreSQL分区 ====================
+
+    def ensure_partitions(self, today: date) -> List[str]:
+        """提前创建今天及之后若干天的日分区；每天单独处理，某一天失败不影响其他天和后续清理"""
+        created = []
+        existing = set(self.list_partitions())
+        for offset in range(settings.log_partition_precreate_days + 1):
+            day = today + timedelta(days=offset)
+            if day in existing:
+                continue
+            try:
+                self._create_partition(day)
+            except Exception as e:
+                logger.error(f"Failed to create request log partition {partition_name(day)}: {e}")
+                continue
+            created.append(partition_name(day))
+        return created
+
+    def _create_partition(self, day: date):
+        """创建日分区
+
+        默认分区中已有该天的行时（例如迁移前写入的当天日志）不能直接创建分区：
+        先建普通表，把这些行从默认分区移入，再作为分区挂载。
+        """
+        name = partition_name(day)
+        start, end = _day_bounds(day)
+        bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        params = {"start": start, "end": end}
+        with self.engine.begin() as conn:
+            in_default = conn.execute(text(
+                f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end LIMIT 1"
+            ), params).first()
+            if in_default is None:
+                conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {LOG_TABLE} FOR VALUES {bounds}"))
+                return
+
+            conn.execute(text(f"CREATE TABLE {name} (LIKE {LOG_TABLE} INCLUDING DEFAULTS)"))
+            moved = conn.execute(text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end "
+                f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+            ), params).rowcount
+            conn.execute(text(f"ALTER TABLE {LOG_TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+        logger.info(f"Moved {moved} request log rows from {DEFAULT_PARTITION} into {name}")
+
+    def list_partitions(self) -> Dict[date, str]:
+        """列出已有的日分区"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :parent"
+            ), {"parent": LOG_TABLE}).all()
+
+        partitions = {}
+        for (name,) in rows:
+            match = PARTITION_PATTERN.match(name)
+            if match:
+                partitions[datetime.strptime(match.group(1), "%Y%m%d").date()] = name
+        return partitions
+
+    def _expire_partitions(self, cutoff: date, summary: Dict[str, Any]):
+        """导出并删除早于cutoff的日分区"""
+        for day, name in sorted(self.list_partitions().items()):
+            if day >= cutoff:
+                continue
+            self._archive(f"SELECT * FROM {name}", {}, day)
+            with self.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {LOG_TABLE} DETACH PARTITION {name}"))
+                conn.execute(text(f"DROP TABLE {name}"))
+            summary["archived_days"].append(day.isoformat())
+            logger.info(f"Dropped expired request log partition {name}")
+
+    # ==================== 按时间范围清理 ====================
+
+    def _expire_by_range(self, table: str, cutoff: date, summary: Dict[str, Any]):
+        """按天导出并分批删除早于cutoff的日志行"""
+        with self.engine.connect() as conn:
+            oldest = conn.execute(text(f"SELECT MIN(created_at) FROM {table}")).scalar()
+        if oldest is None:
+            return
+        if isinstance(oldest, str):
+            oldest = datetime.fromisoformat(oldest)
+
+        day = oldest.date()
+        while day < cutoff:
+            start, end = _day_bounds(day)
+            # 使用不带微秒的字符串边界，兼容SQLite中以文本存储的时间
+            params = {"start": start.strftime("%Y-%m-%d %H:%M:%S"), "end": end.strftime("%Y-%m-%d %H:%M:%S")}
+            rows = self._archive(
+                f"SELECT * FROM {table} WHERE created_at >= :start AND created_at < :end",
+                params,
+                day
+            )
+            if rows:
+                summary["deleted_rows"] += self._delete_range(table, params)
+                summary["archived_days"].append(day.isoformat())
+            day += timedelta(days=1)
+
+    def _delete_range(self, table: str, params: Dict[str, Any]) -> int:
+        """分批删除，避免长事务阻塞日志写入"""
+        deleted = 0
+        while True:
+            with self.engine.begin() as conn:
+                result = conn.execute(text(
+                    f"DELETE FROM {table} WHERE id IN ("
+                    f"SELECT id FROM {table} WHERE created_at >= :start AND created_at < :end LIMIT :limit)"
+                ), {**params, "limit": settings.log_retention_delete_batch_size})
+            deleted += result.rowcount
+            if result.rowcount < settings.log_retention_delete_batch_size:
+                return deleted
+
+    def _prune_minute_rollups(self, before: datetime):
+        """清理过期的分钟级用量汇总（小时/天汇总长期保留）"""
+        with self.engine.begin() as conn:
+            conn.execute(
+                UsageRollupMinute.__table__.delete().where(UsageRollupMinute.bucket_start < before)
+            )
+
+    # ==================== 归档 ====================
+
+    def _archive(self, query: str, params: Dict[str, Any], day: date) -> int:
+        """将查询结果流式写入gzip压缩的JSONL文件，返回行数"""
+        if not settings.log_archive_enabled:
+            with self.engine.connect() as conn:
+                return conn.execute(text(f"SELECT COUNT(*) FROM ({query}) AS expired"), params).scalar()
+
+        archive_dir = Path(settings.log_archive_dir)
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        # 同一天重复归档（例如上次删除中途中断）时写入新文件，不覆盖已有归档
+        path = archive_dir / f"{LOG_TABLE}_{day.isoformat()}.jsonl.gz"
+        sequence = 1
+        while path.exists():
+            path = archive_dir / f"{LOG_TABLE}_{day.isoformat()}.{sequence}.jsonl.gz"
+            sequence += 1
+        tmp_path = path.with_suffix(".gz.tmp")
+
+        count = 0
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(text(query), params)
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                for row in result.mappings():
+                    f.write(json.dumps(dict(row), ensure_ascii=False, default=_json_default))
+                    f.write("\n")
+                    count += 1
+
+        if count:
+            os.replace(tmp_path, path)
+            logger.info(f"Archived {count} request logs for {day} to {path}")
+        else:
+            tmp_path.unlink(missing_ok=True)
+        return count
+
+
+class LogRetentionJob:
+    """定期运行日志保留任务的后台协程"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """启动后台任务"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        while True:
+            try:
+                # 归档和删除都是阻塞IO，放到线程中执行
+                await asyncio.to_thread(LogRetentionService().run_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Request log retention failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def shutdown(self):
+        """停止后台任务"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+log_retention_job = LogRetentionJob(interval_seconds=settings.log_retention_interval_seconds)
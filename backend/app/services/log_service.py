@@ -0,0 +1,199 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from datetime import datetime
+from app.models.credential import Credential
+from app.models.model_config import ModelConfig
+from app.models.request_log import RequestLog
+from app.models.user import User
+from app.exceptions import InvalidCursorError
+from app.utils.datetimes import to_utc_naive
+import base64
+import csv
+import io
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = (
+    "id",
+    "created_at",
+    "model_config_id",
+    "request_id",
+    "method",
+    "path",
+    "source_format",
+    "target_format",
+    "status_code",
+    "response_time_ms",
+    "tokens_used",
+    "prompt_tokens",
+    "completion_tokens",
+    "cache_read_tokens",
+    "cache_creation_tokens",
+    "error_message",
+    "error_type",
+)
+
+
+def encode_cursor(created_at: datetime, log_id: str) -> str:
+    """编码分页游标"""
+    raw = json.dumps([created_at.isoformat(), log_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """解码分页游标"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, log_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return to_utc_naive(datetime.fromisoformat(created_at)), log_id
+    except Exception:
+        raise InvalidCursorError("Invalid cursor")
+
+
+class LogFilters:
+    """请求日志过滤条件"""
+
+    def __init__(
+        self,
+        config_id: Optional[str] = None,
+        status_code: Optional[int] = None,
+        source_format: Optional[str] = None,
+        target_format: Optional[str] = None,
+        min_latency_ms: Optional[int] = None,
+        max_latency_ms: Optional[int] = None,
+        error_type: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ):
+        self.config_id = config_id
+        self.status_code = status_code
+        self.source_format = source_format
+        self.target_format = target_format
+        self.min_latency_ms = min_latency_ms
+        self.max_latency_ms = max_latency_ms
+        self.error_type = error_type
+        self.start = start
+        self.end = end
+
+
+class LogService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _user_config_ids(self, user: User, config_id: Optional[str]) -> List[str]:
+        """获取用户可以查看日志的模型配置ID"""
+        query = self.db.query(ModelConfig.id).join(Credential).filter(Credential.user_id == user.id)
+        if config_id:
+            query = query.filter(ModelConfig.id == config_id)
+        return [row[0] for row in query.all()]
+
+    def _build_query(self, config_ids: List[str], filters: LogFilters):
+        """构建过滤后的查询（不含排序和分页）"""
+        conditions = [RequestLog.model_config_id.in_(config_ids)]
+
+        if filters.status_code is not None:
+            conditions.append(RequestLog.status_code == filters.status_code)
+        if filters.source_format:
+            conditions.append(RequestLog.source_format == filters.source_format)
+        if filters.target_format:
+            conditions.append(RequestLog.target_format == filters.target_format)
+        if filters.min_latency_ms is not None:
+            conditions.append(RequestLog.response_time_ms >= filters.min_latency_ms)
+        if filters.max_latency_ms is not None:
+            conditions.append(RequestLog.response_time_ms <= filters.max_latency_ms)
+        if filters.error_type:
+            conditions.append(RequestLog.error_type == filters.error_type)
+        # 带时区的查询参数转换为UTC，与created_at一致
+        if filters.start is not None:
+            conditions.append(RequestLog.created_at >= to_utc_naive(filters.start))
+        if filters.end is not None:
+            conditions.append(RequestLog.created_at < to_utc_naive(filters.end))
+
+        return self.db.query(RequestLog).filter(and_(*conditions))
+
+    @staticmethod
+    def _after_cursor(query, cursor: Optional[Tuple[datetime, str]]):
+        """按 (created_at, id) 倒序取游标之后的数据"""
+        query = query.order_by(RequestLog.created_at.desc(), RequestLog.id.desc())
+        if cursor is None:
+            return query
+
+        created_at, log_id = cursor
+        return query.filter(
+            or_(
+                RequestLog.created_at < created_at,
+                and_(RequestLog.created_at == created_at, RequestLog.id < log_id)
+            )
+        )
+
+    def list_logs(
+        self,
+        user: User,
+        filters: LogFilters,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """键集分页查询请求日志，任意一页的代价相同"""
+        config_ids = self._user_config_ids(user, filters.config_id)
+        if not config_ids:
+            return {"items": [], "next_cursor": None}
+
+        position = decode_cursor(cursor) if cursor else None
+        query = self._after_cursor(self._build_query(config_ids, filters), position)
+
+        # 多取一条判断是否还有下一页
+        rows = query.limit(limit + 1).all()
+        items = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
+
+        return {"items": items, "next_cursor": next_cursor}
+
+    def iter_logs(self, user: User, filters: LogFilters, batch_size: int = 1000) -> Iterator[RequestLog]:
+        """按键集分批遍历所有匹配的日志，内存占用与总行数无关"""
+        config_ids = self._user_config_ids(user, filters.config_id)
+        if not config_ids:
+            return
+
+        base_query = self._build_query(config_ids, filters)
+        position = None
+        while True:
+            rows = self._after_cursor(base_query, position).limit(batch_size).all()
+            for row in rows:
+                yield row
+            if len(rows) < batch_size:
+                return
+            position = (rows[-1].created_at, rows[-1].id)
+            self.db.expunge_all()
+
+    @staticmethod
+    def _row_values(log: RequestLog) -> Dict[str, Any]:
+        values = {column: getattr(log, column) for column in EXPORT_COLUMNS}
+        if values["created_at"] is not None:
+            values["created_at"] = values["created_at"].isoformat()
+        return values
+
+    def export_jsonl(self, user: User, filters: LogFilters) -> Iterator[str]:
+        """流式导出为JSONL"""
+        for log in self.iter_logs(user, filters):
+            yield json.dumps(self._row_values(log), ensure_ascii=False) + "\n"
+
+    def export_csv(self, user: User, filters: LogFilters) -> Iterator[str]:
+        """流式导出为CSV"""
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+
+        for count, log in enumerate(self.iter_logs(user, filters), start=1):
+            writer.writerow(self._row_values(log))
+            if count % 500 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+
+        yield buffer.getvalue()
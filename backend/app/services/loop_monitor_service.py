@@ -0,0 +1,204 @@
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional
+from app.config import settings
+from app.exceptions import ServiceOverloadedError
+from app.services.scheduler_service import PRIORITY_CLASSES
+import asyncio
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 保留的最近阻塞记录条数
+SLOW_CALLBACK_HISTORY = 20
+
+# 日志中输出的阻塞位置调用栈层数
+SLOW_CALLBACK_STACK_DEPTH = 8
+
+# 定位阻塞位置时跳过标准库和第三方库的栈帧
+_LIBRARY_PATHS = tuple(
+    path for path in {sysconfig.get_paths()["stdlib"], sysconfig.get_paths()["purelib"], sysconfig.get_paths()["platlib"]}
+    if path
+)
+
+
+def _quantile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class LoopLagMonitor:
+    """事件循环延迟监控与准入控制
+
+    - 采样：定时任务比较计划唤醒时间与实际唤醒时间，差值即事件循环延迟
+    - 阻塞检测：看门狗线程发现采样任务超时未运行时，抓取事件循环线程的调用栈，记录正在执行的协程与代码位置
+    - 准入：最近的延迟超过阈值时拒绝低优先级的代理请求（batch先于standard，interactive不拒绝）
+    """
+
+    def __init__(self):
+        self._samples: Deque[float] = deque(maxlen=settings.loop_lag_window)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._last_tick: Optional[float] = None
+        self._reported_tick: Optional[float] = None
+        self._pending_report: Optional[Dict[str, Any]] = None
+        self.slow_callbacks: Deque[Dict[str, Any]] = deque(maxlen=SLOW_CALLBACK_HISTORY)
+        self.slow_callback_count = 0
+        self.shed = {priority: 0 for priority in PRIORITY_CLASSES}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        """在当前事件循环中启动采样任务和看门狗线程"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._sample())
+        if settings.loop_slow_callback_seconds > 0:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def shutdown(self):
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _sample(self):
+        interval = settings.loop_lag_sample_interval_seconds
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self.record(max(now - expected, 0.0))
+            self._last_tick = now
+
+    def record(self, lag: float):
+        """记录一个延迟样本（秒）"""
+        self._samples.append(lag)
+        report = self._pending_report
+        if report is not None:
+            # 阻塞结束后用实际延迟更新看门狗记录的阻塞时长
+            report["blocked_ms"] = round(max(report["blocked_ms"], lag * 1000), 1)
+            self._pending_report = None
+
+    def _watch(self):
+        """看门狗线程：采样任务超过阻塞阈值仍未运行时记录事件循环正在执行的位置（每次阻塞只记录一次）"""
+        threshold = settings.loop_slow_callback_seconds
+        interval = settings.loop_lag_sample_interval_seconds
+        while not self._stopping.wait(min(threshold, interval) / 2):
+            last_tick = self._last_tick
+            if last_tick is None or last_tick == self._reported_tick:
+                continue
+            blocked = time.monotonic() - last_tick - interval
+            if blocked >= threshold:
+                self._reported_tick = last_tick
+                self._report_slow_callback(blocked)
+
+    def _report_slow_callback(self, blocked: float):
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = traceback.extract_stack(frame) if frame is not None else []
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        coroutine = task.get_coro().__qualname__ if task is not None else None
+
+        location = None
+        for entry in reversed(stack):
+            if not entry.filename.startswith(_LIBRARY_PATHS):
+                location = f"{entry.filename}:{entry.lineno} in {entry.name}"
+                break
+        if location is None and stack:
+            location = f"{stack[-1].filename}:{stack[-1].lineno} in {stack[-1].name}"
+
+        report = {
+            "task": task.get_name() if task is not None else None,
+            "coroutine": coroutine,
+            "location": location,
+            "blocked_ms": round(blocked * 1000, 1),
+            "at": time.time(),
+        }
+        self.slow_callbacks.append(report)
+        self.slow_callback_count += 1
+        self._pending_report = report
+        logger.warning(
+            f"Event loop blocked for over {report['blocked_ms']}ms by {coroutine or 'callback'} at {location}\n"
+            + "".join(traceback.format_list(stack[-SLOW_CALLBACK_STACK_DEPTH:]))
+        )
+
+    def recent_lag(self) -> float:
+        """最近的延迟（秒）：最近若干样本的最大值，以及采样任务当前已超时的时长"""
+        lag = max(islice(reversed(self._samples), settings.loop_lag_shed_window), default=0.0)
+        if self._task is not None and self._last_tick is not None:
+            lag = max(lag, time.monotonic() - self._last_tick - settings.loop_lag_sample_interval_seconds)
+        return lag
+
+    @staticmethod
+    def _shed_threshold_ms(priority: str) -> Optional[float]:
+        threshold = {
+            "batch": settings.loop_lag_shed_batch_ms,
+            "standard": settings.loop_lag_shed_standard_ms,
+        }.get(priority)
+        return threshold or None
+
+    def admit(self, priority: str):
+        """准入检查：事件循环延迟超过该优先级的阈值时抛出ServiceOverloadedError"""
+        threshold_ms = self._shed_threshold_ms(priority)
+        if threshold_ms is None:
+            return
+        lag_ms = self.recent_lag() * 1000
+        if lag_ms >= threshold_ms:
+            self.shed[priority] += 1
+            raise ServiceOverloadedError(
+                f"Server is overloaded (event loop lag {lag_ms:.0f}ms), retry later"
+            )
+
+    def lag_quantiles(self) -> Dict[str, Optional[float]]:
+        """延迟分位数（毫秒）"""
+        ordered = sorted(self._samples)
+        result = {
+            f"p{int(q * 100)}": _quantile(ordered, q) for q in (0.5, 0.95, 0.99)
+        }
+        result["max"] = ordered[-1] if ordered else None
+        return {key: None if value is None else round(value * 1000, 2) for key, value in result.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "samples": len(self._samples),
+            "lag_ms": self.lag_quantiles(),
+            "recent_lag_ms": round(self.recent_lag() * 1000, 2),
+            "slow_callbacks": self.slow_callback_count,
+            "recent_slow_callbacks": list(self.slow_callbacks),
+            "shed": dict(self.shed),
+        }
+
+    def reset(self):
+        """清空样本与计数（测试使用）"""
+        self._samples = deque(maxlen=settings.loop_lag_window)
+        self._pending_report = None
+        self.slow_callbacks.clear()
+        self.slow_callback_count = 0
+        self.shed = {priority: 0 for priority in PRIORITY_CLASSES}
+
+
+loop_monitor = LoopLagMonitor()
@@ -6,6 +6,9 @@ from app.models.credential import Credential
 from app.models.user import User
 from app.schemas.model_config import ModelConfigCreate, ModelConfigUpdate, ModelConfigWithCredential
 from app.utils.security import generate_proxy_api_key
+from app.services.usage_service import delete_config_usage
+from app.services.quota_service import delete_config_quota_usage
+from app.services.invalidation_service import publish_model_config_change
 from app.exceptions import CredentialValidationError
 import logging
 
@@ -54,7 +57,16 @@ class ModelService:
             target_format=config_data.target_format,
             is_enabled=config_data.is_enabled,
             proxy_api_key=proxy_api_key,
-            rate_limit=config_data.rate_limit
+            rate_limit=config_data.rate_limit,
+            daily_token_quota=config_data.daily_token_quota,
+            monthly_token_quota=config_data.monthly_token_quota,
+            response_cache_enabled=config_data.response_cache_enabled,
+            response_cache_threshold=config_data.response_cache_threshold,
+            trim_strategy=config_data.trim_strategy,
+            trim_keep_turns=config_data.trim_keep_turns,
+            trim_token_budget=config_data.trim_token_budget,
+            priority_class=config_data.priority_class,
+            scheduler_weight=config_data.scheduler_weight
         )
 
         self.db.add(model_config)
@@ -84,6 +96,15 @@ class ModelService:
                 target_format=config.target_format,
                 is_enabled=config.is_enabled,
                 rate_limit=config.rate_limit,
+                daily_token_quota=config.daily_token_quota,
+                monthly_token_quota=config.monthly_token_quota,
+                response_cache_enabled=config.response_cache_enabled,
+                response_cache_threshold=config.response_cache_threshold,
+                trim_strategy=config.trim_strategy,
+                trim_keep_turns=config.trim_keep_turns,
+                trim_token_budget=config.trim_token_budget,
+                priority_class=config.priority_class,
+                scheduler_weight=config.scheduler_weight,
                 proxy_api_key=config.proxy_api_key,
                 created_at=config.created_at,
                 updated_at=config.updated_at,
@@ -148,8 +169,36 @@ class ModelService:
         if update_data.rate_limit is not None:
             config.rate_limit = update_data.rate_limit
 
+        if update_data.daily_token_quota is not None:
+            config.daily_token_quota = update_data.daily_token_quota or None
+
+        if update_data.monthly_token_quota is not None:
+            config.monthly_token_quota = update_data.monthly_token_quota or None
+
+        if update_data.response_cache_enabled is not None:
+            config.response_cache_enabled = update_data.response_cache_enabled
+
+        if update_data.response_cache_threshold is not None:
+            config.response_cache_threshold = update_data.response_cache_threshold
+
+        if update_data.trim_strategy is not None:
+            config.trim_strategy = None if update_data.trim_strategy == "off" else update_data.trim_strategy
+
+        if update_data.trim_keep_turns is not None:
+            config.trim_keep_turns = update_data.trim_keep_turns
+
+        if update_data.trim_token_budget is not None:
+            config.trim_token_budget = update_data.trim_token_budget or None
+
+        if update_data.priority_class is not None:
+            config.priority_class = update_data.priority_class
+
+        if update_data.scheduler_weight is not None:
+            config.scheduler_weight = update_data.scheduler_weight
+
         self.db.commit()
         self.db.refresh(config)
+        publish_model_config_change(config.id, [config.proxy_api_key])
 
         return config
 
@@ -159,8 +208,12 @@ class ModelService:
         if not config:
             return False
 
+        proxy_api_key = config.proxy_api_key
+        delete_config_usage(self.db, config.id)
+        delete_config_quota_usage(self.db, config.id)
         self.db.delete(config)
         self.db.commit()
+        publish_model_config_change(config_id, [proxy_api_key], deleted=True)
         return True
 
     def regenerate_proxy_api_key(self, user: User, config_id: str) -> Optional[str]:
@@ -169,11 +222,13 @@ class ModelService:
         if not config:
             return None
 
+        old_proxy_key = config.proxy_api_key
         new_proxy_key = generate_proxy_api_key()
         config.proxy_api_key = new_proxy_key
 
         self.db.commit()
         self.db.refresh(config)
+        publish_model_config_change(config.id, [old_proxy_key])
 
         return new_proxy_key
 
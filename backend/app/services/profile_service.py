@@ -0,0 +1,329 @@
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, TypeVar
+from app.config import settings
+import asyncio
+import cProfile
+import marshal
+import random
+import time
+import tracemalloc
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 触发分析的请求头（只对超级用户的代理密钥生效）与返回报告ID的响应头
+PROFILE_HEADER = "X-LLMBridge-Profile"
+PROFILE_ID_HEADER = "X-LLMBridge-Profile-Id"
+
+# 内存分配报告中排除的跟踪来源
+_ALLOCATION_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+# 内存占用超过上一次快照的该倍数（且至少增长指定字节数）时再取一次快照
+PEAK_SNAPSHOT_GROWTH = 1.25
+PEAK_SNAPSHOT_MIN_BYTES = 64 * 1024
+
+# 正在分析的请求；在该请求中创建的子任务继承这个上下文
+_active_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("llmbridge_active_profile", default=None)
+
+
+class _Profiled:
+    """逐步驱动一个协程，只在该协程执行的时间片内开启分析器
+
+    事件循环上同时运行的其他请求不会计入本次分析。
+    """
+
+    def __init__(self, awaitable: Awaitable[T], profile: "RequestProfile"):
+        self._awaitable = awaitable
+        self._profile = profile
+
+    def __await__(self):
+        coro = self._awaitable.__await__() if not hasattr(self._awaitable, "send") else self._awaitable
+        value, error = None, None
+        while True:
+            self._profile._resume()
+            try:
+                yielded = coro.send(value) if error is None else coro.throw(error)
+            except StopIteration as e:
+                return e.value
+            finally:
+                self._profile._suspend()
+            try:
+                value, error = (yield yielded), None
+            except BaseException as e:
+                value, error = None, e
+
+
+async def _run_profiled(coro, profile: "RequestProfile"):
+    return await _Profiled(coro, profile)
+
+
+class _ProfilingTaskFactory:
+    """有请求正在分析时安装到事件循环：分析中的请求创建的子任务（wait_for、并发拆分等）也在分析下执行"""
+
+    def __init__(self):
+        self._installed = 0
+        self._previous = None
+
+    def install(self, loop: asyncio.AbstractEventLoop):
+        if self._installed == 0:
+            self._previous = loop.get_task_factory()
+            loop.set_task_factory(self._create_task)
+        self._installed += 1
+
+    def uninstall(self, loop: asyncio.AbstractEventLoop):
+        self._installed -= 1
+        if self._installed == 0:
+            loop.set_task_factory(self._previous)
+            self._previous = None
+
+    def _create_task(self, loop, coro, **kwargs):
+        profile = _active_profile.get()
+        if profile is not None and not profile._finished:
+            coro = _run_profiled(coro, profile)
+        if self._previous is not None:
+            return self._previous(loop, coro, **kwargs)
+        return asyncio.Task(coro, loop=loop, **kwargs)
+
+
+class RequestProfile:
+    """一次请求的函数耗时分析（cProfile）与可选的内存分配跟踪（tracemalloc）"""
+
+    def __init__(self, path: str, trace_memory: bool, sampled: bool):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.trace_memory = trace_memory
+        self.sampled = sampled
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self._on_loop = 0.0
+        self._step_started = 0.0
+        self._profiler = cProfile.Profile()
+        self._memory = _MemoryTrace() if trace_memory else None
+        self._loop = asyncio.get_running_loop()
+        self._task_factory_installed = False
+        self._finished = False
+
+    def _resume(self):
+        if self._finished:
+            return
+        self._step_started = time.perf_counter()
+        self._profiler.enable()
+
+    def _suspend(self):
+        if self._finished:
+            return
+        self._profiler.disable()
+        self._on_loop += time.perf_counter() - self._step_started
+        if self._memory is not None:
+            self._memory.check_peak()
+
+    async def _step(self, awaitable: Awaitable[T]) -> T:
+        """在分析下执行一步，期间创建的子任务同样被分析"""
+        token = _active_profile.set(self)
+        try:
+            return await _Profiled(awaitable, self)
+        finally:
+            _active_profile.reset(token)
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """在分析下执行代理调用；返回流时包装该流，流结束后才生成报告"""
+        _task_factory.install(self._loop)
+        self._task_factory_installed = True
+        try:
+            result = await self._step(awaitable)
+        except BaseException as e:
+            self.finish(error=str(e) or type(e).__name__)
+            raise
+        if hasattr(result, "__anext__"):
+            wrapped = self._profile_stream(result)
+            # 推进到生成器的try块内，之后即使从未被迭代，关闭时也会关闭上游流并生成报告
+            await wrapped.__anext__()
+            return wrapped
+        self.finish()
+        return result
+
+    async def _profile_stream(self, stream: AsyncIterator[str]) -> AsyncIterator[str]:
+        error = "Client disconnected"
+        try:
+            # 占位，由run消费
+            yield None
+
+            while True:
+                try:
+                    chunk = await self._step(stream.__anext__())
+                except StopAsyncIteration:
+                    error = None
+                    break
+                yield chunk
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            # 上游流关闭、日志与配额结算也计入分析
+            await self._step(stream.aclose())
+            self.finish(error=error)
+
+    def finish(self, error: Optional[str] = None):
+        """生成报告并保存"""
+        if self._finished:
+            return
+        self._finished = True
+        duration = time.perf_counter() - self._started
+        if self._task_factory_installed:
+            _task_factory.uninstall(self._loop)
+
+        self._profiler.create_stats()
+        stats = self._profiler.stats
+        report = {
+            "id": self.id,
+            "path": self.path,
+            "started_at": self.started_at.isoformat(),
+            "sampled": self.sampled,
+            "status": "error" if error else "ok",
+            "error": error,
+            "duration_ms": round(duration * 1000, 2),
+            "on_loop_ms": round(self._on_loop * 1000, 2),
+            "functions": _top_functions(stats, settings.profile_top_n),
+        }
+        if self._memory is not None:
+            report.update(self._memory.report(settings.profile_top_n))
+            self._memory = None
+
+        profile_store.add(report, marshal.dumps(stats))
+        logger.info(f"Profiled {self.path} in {report['duration_ms']}ms, report {self.id}")
+
+
+def _top_functions(stats: Dict[Any, Any], limit: int) -> List[Dict[str, Any]]:
+    """按累计耗时排序的函数"""
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "primitive_calls": primitive_calls,
+            "total_ms": round(total * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        }
+        for (filename, line, name), (primitive_calls, calls, total, cumulative, _) in rows
+    ]
+
+
+class _MemoryTracer:
+    """按需开启tracemalloc，多个请求同时跟踪时共用一次开启，最后一个结束时关闭
+
+    跟踪是进程级的，同时执行的其他请求的内存分配也会出现在报告中。
+    """
+
+    def __init__(self):
+        self._active = 0
+        self._owned = False
+
+    def acquire(self):
+        if self._active == 0:
+            self._owned = not tracemalloc.is_tracing()
+            if self._owned:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        self._active += 1
+
+    def release(self):
+        self._active -= 1
+        if self._active == 0 and self._owned:
+            tracemalloc.stop()
+
+
+class _MemoryTrace:
+    """一次请求的内存跟踪：开始时的基线快照，以及请求期间内存占用创新高时的快照
+
+    只在占用比上一次快照增长超过一定比例时才取新快照，快照次数随内存高点按对数增长。
+    """
+
+    def __init__(self):
+        _memory_tracer.acquire()
+        self.baseline = tracemalloc.take_snapshot()
+        self.baseline_size, _ = tracemalloc.get_traced_memory()
+        self.peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.peak_size = self.baseline_size
+
+    def check_peak(self):
+        current, _ = tracemalloc.get_traced_memory()
+        if current >= max(self.peak_size * PEAK_SNAPSHOT_GROWTH, self.peak_size + PEAK_SNAPSHOT_MIN_BYTES):
+            self.peak_snapshot = tracemalloc.take_snapshot()
+            self.peak_size = current
+
+    def report(self, limit: int) -> Dict[str, Any]:
+        """内存高点时相对基线新增最多的分配位置，以及请求结束后仍保留的内存"""
+        end = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        _memory_tracer.release()
+
+        at_peak = (self.peak_snapshot or end).filter_traces(_ALLOCATION_FILTERS)
+        differences = at_peak.compare_to(self.baseline.filter_traces(_ALLOCATION_FILTERS), "lineno")
+        allocations = [
+            {
+                "location": f"{diff.traceback[0].filename}:{diff.traceback[0].lineno}",
+                "size_kb": round(diff.size_diff / 1024, 2),
+                "count": diff.count_diff,
+            }
+            for diff in differences if diff.size_diff > 0
+        ][:limit]
+        return {
+            "peak_traced_kb": round(peak / 1024, 2),
+            "retained_kb": round((current - self.baseline_size) / 1024, 2),
+            "allocations": allocations,
+        }
+
+
+class ProfileStore:
+    """保留最近的分析报告（内存中），超出数量时淘汰最早的报告"""
+
+    def __init__(self):
+        self._reports: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pstats: Dict[str, bytes] = {}
+
+    def add(self, report: Dict[str, Any], pstats_data: bytes):
+        self._reports[report["id"]] = report
+        self._pstats[report["id"]] = pstats_data
+        while len(self._reports) > settings.profile_max_reports:
+            oldest, _ = self._reports.popitem(last=False)
+            self._pstats.pop(oldest, None)
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        return self._reports.get(report_id)
+
+    def get_pstats(self, report_id: str) -> Optional[bytes]:
+        """pstats格式的原始数据，可用pstats.Stats或snakeviz等工具打开"""
+        return self._pstats.get(report_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """报告摘要，最新的在前"""
+        keys = ("id", "path", "started_at", "sampled", "status", "duration_ms", "on_loop_ms")
+        return [{key: report[key] for key in keys} for report in reversed(self._reports.values())]
+
+    def clear(self):
+        self._reports.clear()
+        self._pstats.clear()
+
+
+def start_profile(path: str, requested: bool) -> Optional[RequestProfile]:
+    """请求头要求的分析（同时跟踪内存），或按配置的比例抽样（只分析函数耗时）；都不满足时返回None"""
+    if requested:
+        return RequestProfile(path, trace_memory=True, sampled=False)
+    if settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate:
+        return RequestProfile(path, trace_memory=False, sampled=True)
+    return None
+
+
+_memory_tracer = _MemoryTracer()
+_task_factory = _ProfilingTaskFactory()
+profile_store = ProfileStore()
@@ -1,13 +1,28 @@
 from sqlalchemy.orm import Session
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional, Tuple
 from app.models.model_config import ModelConfig
 from app.models.credential import Credential
 from app.models.request_log import RequestLog
 from app.adapters.factory import LLMAdapterFactory
-from app.adapters.base import LLMRequest, LLMResponse
-from app.utils.security import decrypt_api_key
-from app.exceptions import LLMProviderError, RateLimitError
-from app.schemas.llm_request import OpenAIRequest, AnthropicRequest
+from app.adapters.base import AbstractLLMAdapter, LLMRequest, LLMResponse, StreamDelta
+from app.utils.security import decrypt_api_key_async
+from app.services.usage_service import record_usage
+from app.services.quota_service import token_quota_manager
+from app.config import settings
+from app.services.response_cache import response_cache, CacheKey, CacheHit
+from app.services.token_service import preflight_check, count_prompt_tokens, PreflightResult
+from app.services.fanout_service import fan_out
+from app.services.embedding_service import embedding_batcher, format_embedding
+from app.services.stream_service import response_deltas
+from app.services.trim_service import trim_for_config, TrimResult
+from app.services.timeout_service import upstream_latency, guard_upstream, TimeoutPolicy
+from app.services.scheduler_service import fair_scheduler, resolve_priority, Ticket
+from app.services.loop_monitor_service import loop_monitor
+from app.services.tracing_service import tracer, instrument_client, SpanKind
+from app.services.dispatch_service import dispatch_table, Route
+from app.utils.tokens import estimate_text_tokens, provider_family
+from app.exceptions import LLMProviderError, RateLimitError, UpstreamTimeoutError, QueueTimeoutError
+from app.schemas.llm_request import OpenAIRequest, AnthropicRequest, CountTokensRequest, EmbeddingRequest
 import time
 import uuid
 import logging
@@ -18,30 +33,173 @@ logger = logging.getLogger(__name__)
 class ProxyService:
     def __init__(self, db: Session):
         self.db = db
+        # 最近一次请求的对话裁剪结果（未裁剪时为None），由接口层写入响应头
+        self.trim_result: Optional[TrimResult] = None
 
     def get_config_by_proxy_key(self, proxy_api_key: str) -> Optional[ModelConfig]:
         """根据代理API密钥获取模型配置"""
-        return self.db.query(ModelConfig).filter(
-            ModelConfig.proxy_api_key == proxy_api_key
-        ).first()
+        with tracer.span("proxy.resolve_config") as span:
+            config = self.db.query(ModelConfig).filter(
+                ModelConfig.proxy_api_key == proxy_api_key
+            ).first()
+            if config is not None:
+                span.set_attribute("llmbridge.model_config_id", config.id)
+            return config
 
     def validate_rate_limit(self, config: ModelConfig) -> bool:
         """验证速率限制"""
         # 简化实现：检查最近1分钟的请求数量
         from datetime import datetime, timedelta
 
-        one_minute_ago = datetime.utcnow() - timedelta(minutes=1)
-        recent_requests = self.db.query(RequestLog).filter(
-            RequestLog.model_config_id == config.id,
-            RequestLog.created_at >= one_minute_ago
-        ).count()
+        with tracer.span("proxy.rate_limit", attributes={"llmbridge.rate_limit": config.rate_limit}) as span:
+            one_minute_ago = datetime.utcnow() - timedelta(minutes=1)
+            recent_requests = self.db.query(RequestLog).filter(
+                RequestLog.model_config_id == config.id,
+                RequestLog.created_at >= one_minute_ago
+            ).count()
+            span.set_attribute("llmbridge.recent_requests", recent_requests)
 
-        return recent_requests < config.rate_limit
+            return recent_requests < config.rate_limit
+
+    def count_tokens(self, proxy_api_key: str, request_data: CountTokensRequest) -> Dict[str, Any]:
+        """本地估算请求的输入token数（不请求上游）"""
+        config = self.get_config_by_proxy_key(proxy_api_key)
+        if not config or not config.is_enabled:
+            raise LLMProviderError("Invalid or disabled API key")
+
+        provider = config.credential.provider if config.credential else None
+        return {
+            "input_tokens": count_prompt_tokens(provider, request_data.messages, system=request_data.system)
+        }
+
+    def _serve_cached(
+        self,
+        config: ModelConfig,
+        request_id: str,
+        path: str,
+        source_format: str,
+        start_time: float,
+        cache_hit: CacheHit
+    ) -> Dict[str, Any]:
+        """返回近似缓存命中的响应（不消耗上游token）"""
+        self._log_request(
+            config=config,
+            request_id=request_id,
+            method="POST",
+            path=path,
+            source_format=source_format,
+            target_format=config.target_format,
+            status_code=200,
+            response_time_ms=int((time.time() - start_time) * 1000)
+        )
+        return cache_hit.response
+
+    @staticmethod
+    def _update_response_cache(cache_key: Optional[CacheKey], cache_hit: Optional[CacheHit], final_response: Dict[str, Any]):
+        """缓存上游响应，抽样验证的请求则与缓存响应比较"""
+        if cache_key is None:
+            return
+        if cache_hit is not None:
+            response_cache.record_verification(cache_hit, final_response)
+        else:
+            response_cache.store(cache_key, final_response)
+
+    def _trim_messages(
+        self,
+        config: ModelConfig,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        max_tokens: Optional[int],
+        system: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """按配置裁剪过长的对话历史，返回发往上游的消息"""
+        result = trim_for_config(config, provider, model, messages, max_tokens, system=system)
+        if result is None or not result.trimmed:
+            return messages
+        self.trim_result = result
+        return result.messages
+
+    def reserve_quota(self, config: ModelConfig, preflight: PreflightResult, n: int = 1):
+        """按 (max_tokens + 提示词估算值) × 候选数 预留token配额"""
+        max_tokens = preflight.max_tokens or settings.token_quota_default_max_tokens
+        return token_quota_manager.reserve(config, (preflight.prompt_tokens + max_tokens) * n)
+
+    @staticmethod
+    async def _acquire_upstream_slot(
+        config: ModelConfig,
+        credential: Credential,
+        priority: str,
+        preflight: PreflightResult,
+        n: int = 1
+    ) -> Ticket:
+        """在上游凭证的并发名额上排队，成本按预留的token数计算"""
+        max_tokens = preflight.max_tokens or settings.token_quota_default_max_tokens
+        with tracer.span("scheduler.wait", attributes={"llmbridge.priority": priority}):
+            return await fair_scheduler.acquire(
+                credential.id, config.id, priority,
+                weight=config.scheduler_weight or 1,
+                cost=(preflight.prompt_tokens + max_tokens) * n
+            )
+
+    @staticmethod
+    async def _complete(
+        route: Route,
+        forward: Callable[[LLMRequest], Awaitable[LLMResponse]],
+        llm_request: LLMRequest
+    ) -> LLMResponse:
+        """发送请求；上游不支持n>1时并发拆分为多个请求后合并"""
+        if llm_request.n > 1 and not route.native_n:
+            return await fan_out(forward, llm_request, settings.fanout_max_concurrency)
+        return await forward(llm_request)
+
+    @staticmethod
+    def _apply_timeouts(adapter: AbstractLLMAdapter, provider: str, model: str) -> TimeoutPolicy:
+        """按该模型最近的上游延迟设置本次请求的超时"""
+        policy = upstream_latency.policy(provider, model)
+        adapter.client.timeout = policy.httpx_timeout()
+        return policy
+
+    @staticmethod
+    def _upstream_attributes(provider: str, llm_request: LLMRequest) -> Dict[str, Any]:
+        """上游请求span的属性（OpenTelemetry GenAI语义约定）"""
+        return {
+            "gen_ai.system": provider,
+            "gen_ai.request.model": llm_request.model,
+            "gen_ai.request.max_tokens": llm_request.max_tokens,
+            "llmbridge.stream": llm_request.stream,
+        }
+
+    @staticmethod
+    def _error_status(error: Exception) -> Tuple[int, Optional[str]]:
+        """失败请求记录的 (状态码, 错误分类)；上游超时记为504并区分超时阶段，排队超时记为429"""
+        if isinstance(error, UpstreamTimeoutError):
+            return 504, error.error_type
+        if isinstance(error, QueueTimeoutError):
+            return 429, error.error_type
+        return 500, None
+
+    @staticmethod
+    def _route(config: ModelConfig, credential: Credential) -> Route:
+        """按模型配置的目标格式和凭证的提供商查找转发路由"""
+        try:
+            return dispatch_table.route(config.target_format, credential.provider)
+        except ValueError as e:
+            raise LLMProviderError(str(e))
+
+    @staticmethod
+    def _usage_total(usage: Dict[str, Any]) -> int:
+        """上游返回的总token数"""
+        total = usage.get("total_tokens")
+        if total is None:
+            total = (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0)
+        return total or 0
 
     async def proxy_openai_request(
         self,
         proxy_api_key: str,
-        request_data: OpenAIRequest
+        request_data: OpenAIRequest,
+        priority: Optional[str] = None
     ) -> Dict[str, Any]:
         """代理OpenAI格式请求"""
         start_time = time.time()
@@ -61,9 +219,73 @@ class ProxyService:
         if not credential or not credential.is_active or not credential.is_validated:
             raise LLMProviderError("Invalid or inactive credential")
 
+        route = self._route(config, credential)
+
+        # 上游并发已满时的排队优先级（请求头只能降低模型配置的优先级）
+        priority = resolve_priority(config.priority_class, priority)
+
+        # 事件循环延迟过高时拒绝低优先级请求
+        loop_monitor.admit(priority)
+
+        # 上游不支持n时需要拆分为n个请求，限制拆分数量
+        n = request_data.n
+        if n > settings.fanout_max_n and not route.native_n:
+            raise LLMProviderError(f"n must be at most {settings.fanout_max_n} for provider {credential.provider}")
+        if n > 1 and request_data.stream:
+            raise LLMProviderError("n > 1 is not supported with stream")
+
+        # 近似重复请求缓存（按配置开启，只用于低温度、单候选请求）
+        cache_key = response_cache.make_key(
+            config,
+            (
+                "openai", request_data.model, request_data.max_tokens, request_data.temperature,
+                request_data.top_p, request_data.frequency_penalty, request_data.presence_penalty
+            ),
+            request_data.messages,
+            temperature=request_data.temperature,
+            stream=request_data.stream
+        ) if n == 1 else None
+        cache_hit = response_cache.lookup(cache_key) if cache_key else None
+        if cache_hit and not cache_hit.verify:
+            return self._serve_cached(config, request_id, "/api/v1/chat/completions", "openai", start_time, cache_hit)
+
+        with tracer.span("proxy.transform"):
+            # 按配置裁剪过长的对话历史（缓存仍按完整对话匹配）
+            messages = self._trim_messages(
+                config, credential.provider, request_data.model, request_data.messages, request_data.max_tokens
+            )
+
+            # 本地预估提示词token并检查上下文窗口，再预留token配额（超出时直接拒绝，不请求上游）
+            preflight = preflight_check(
+                credential.provider, request_data.model, messages, request_data.max_tokens
+            )
+        reservation = self.reserve_quota(config, preflight, n)
+
+        # 转换请求
+        llm_request = LLMRequest(
+            model=request_data.model,
+            messages=messages,
+            max_tokens=preflight.max_tokens,
+            temperature=request_data.temperature,
+            stream=request_data.stream,
+            n=n,
+            prompt_cache=settings.prompt_cache_enabled
+        )
+        if request_data.stream:
+            return await self._open_stream(
+                config, credential, llm_request, preflight, reservation,
+                request_id, "/api/v1/chat/completions", "openai", start_time, priority, route
+            )
+
+        adapter = None
+        ticket = None
+
         try:
+            # 等待上游并发名额
+            ticket = await self._acquire_upstream_slot(config, credential, priority, preflight, llm_request.n)
+
             # 解密API密钥
-            api_key = decrypt_api_key(credential.api_key_encrypted)
+            api_key = await decrypt_api_key_async(credential.api_key_encrypted)
 
             # 创建适配器
             adapter = LLMAdapterFactory.create_adapter(
@@ -71,37 +293,21 @@ class ProxyService:
                 api_key=api_key,
                 api_url=credential.api_url
             )
-
-            # 转换请求
-            llm_request = LLMRequest(
-                model=request_data.model,
-                messages=request_data.messages,
-                max_tokens=request_data.max_tokens,
-                temperature=request_data.temperature,
-                stream=request_data.stream
-            )
-
-            # 根据目标格式转发请求
-            if config.target_format == "openai":
-                if credential.provider == "openai":
-                    response = await adapter.forward_to_openai(llm_request)
-                else:
-                    # Anthropic -> OpenAI format
-                    response = await adapter.forward_to_anthropic(llm_request)
-            else:  # target_format == "anthropic"
-                if credential.provider == "anthropic":
-                    response = await adapter.forward_to_anthropic(llm_request)
-                else:
-                    # OpenAI -> Anthropic format
-                    response = await adapter.forward_to_openai(llm_request)
-
-            # 转换响应为OpenAI格式
-            if config.target_format == "openai":
-                # 对于OpenAI格式，直接返回响应（已经是OpenAI格式）
-                final_response = response.dict()
-            else:
-                # 转换为Anthropic格式
-                final_response = self._convert_to_anthropic_response(response.dict())
+            instrument_client(adapter.client)
+
+            # 通过上游原生接口发送请求
+            forward = getattr(adapter, route.forward)
+            policy = self._apply_timeouts(adapter, credential.provider, llm_request.model)
+            upstream_started = time.monotonic()
+            with tracer.span(
+                "upstream.request", SpanKind.CLIENT, self._upstream_attributes(credential.provider, llm_request)
+            ):
+                response = await guard_upstream(self._complete(route, forward, llm_request), policy.total, "total")
+            upstream_latency.observe(credential.provider, llm_request.model, "total", time.monotonic() - upstream_started)
+
+            # 转换为目标格式的响应
+            with tracer.span("proxy.transform_response"):
+                final_response = route.transcode(response)
 
             # 记录日志
             self._log_request(
@@ -113,16 +319,24 @@ class ProxyService:
                 target_format=config.target_format,
                 status_code=200,
                 response_time_ms=int((time.time() - start_time) * 1000),
-                tokens_used=response.usage.get("total_tokens", 0)
+                tokens_used=response.usage.get("total_tokens", 0),
+                prompt_tokens=response.usage.get("prompt_tokens", 0),
+                completion_tokens=response.usage.get("completion_tokens", 0),
+                cache_read_tokens=response.usage.get("cache_read_tokens", 0),
+                cache_creation_tokens=response.usage.get("cache_creation_tokens", 0)
             )
 
-            await adapter.close()
+            token_quota_manager.commit(reservation, self._usage_total(response.usage))
+            self._update_response_cache(cache_key, cache_hit, final_response)
+
             return final_response
 
         except Exception as e:
             logger.error(f"Proxy request failed: {e}")
+            token_quota_manager.release(reservation)
 
             # 记录错误日志
+            status_code, error_type = self._error_status(e)
             self._log_request(
                 config=config,
                 request_id=request_id,
@@ -130,17 +344,27 @@ class ProxyService:
                 path="/api/v1/chat/completions",
                 source_format="openai",
                 target_format=config.target_format,
-                status_code=500,
+                status_code=status_code,
                 response_time_ms=int((time.time() - start_time) * 1000),
-                error_message=str(e)
+                error_message=str(e),
+                error_type=error_type
             )
 
+            if isinstance(e, (UpstreamTimeoutError, QueueTimeoutError)):
+                raise
             raise LLMProviderError(f"Request failed: {str(e)}")
 
+        finally:
+            if ticket is not None:
+                fair_scheduler.release(ticket)
+            if adapter is not None:
+                await adapter.close()
+
     async def proxy_anthropic_request(
         self,
         proxy_api_key: str,
-        request_data: AnthropicRequest
+        request_data: AnthropicRequest,
+        priority: Optional[str] = None
     ) -> Dict[str, Any]:
         """代理Anthropic格式请求"""
         start_time = time.time()
@@ -160,9 +384,70 @@ class ProxyService:
         if not credential or not credential.is_active or not credential.is_validated:
             raise LLMProviderError("Invalid or inactive credential")
 
+        route = self._route(config, credential)
+
+        # 上游并发已满时的排队优先级（请求头只能降低模型配置的优先级）
+        priority = resolve_priority(config.priority_class, priority)
+
+        # 事件循环延迟过高时拒绝低优先级请求
+        loop_monitor.admit(priority)
+
+        # 近似重复请求缓存（按配置开启，只用于低温度请求）
+        cache_key = response_cache.make_key(
+            config,
+            ("anthropic", request_data.model, request_data.max_tokens, request_data.temperature),
+            request_data.messages,
+            system=request_data.system,
+            temperature=request_data.temperature,
+            stream=request_data.stream
+        )
+        cache_hit = response_cache.lookup(cache_key) if cache_key else None
+        if cache_hit and not cache_hit.verify:
+            return self._serve_cached(config, request_id, "/api/v1/messages", "anthropic", start_time, cache_hit)
+
+        with tracer.span("proxy.transform"):
+            # 按配置裁剪过长的对话历史（缓存仍按完整对话匹配）
+            messages = self._trim_messages(
+                config, credential.provider, request_data.model, request_data.messages, request_data.max_tokens,
+                system=request_data.system
+            )
+
+            # 本地预估提示词token并检查上下文窗口，再预留token配额（超出时直接拒绝，不请求上游）
+            preflight = preflight_check(
+                credential.provider, request_data.model, messages, request_data.max_tokens,
+                system=request_data.system
+            )
+        reservation = self.reserve_quota(config, preflight)
+
+        # 构建系统消息
+        messages = messages.copy()
+        if request_data.system:
+            messages.insert(0, {"role": "system", "content": request_data.system})
+
+        # 转换请求
+        llm_request = LLMRequest(
+            model=request_data.model,
+            messages=messages,
+            max_tokens=preflight.max_tokens,
+            temperature=request_data.temperature,
+            stream=request_data.stream,
+            prompt_cache=settings.prompt_cache_enabled
+        )
+        if request_data.stream:
+            return await self._open_stream(
+                config, credential, llm_request, preflight, reservation,
+                request_id, "/api/v1/messages", "anthropic", start_time, priority, route
+            )
+
+        adapter = None
+        ticket = None
+
         try:
+            # 等待上游并发名额
+            ticket = await self._acquire_upstream_slot(config, credential, priority, preflight, llm_request.n)
+
             # 解密API密钥
-            api_key = decrypt_api_key(credential.api_key_encrypted)
+            api_key = await decrypt_api_key_async(credential.api_key_encrypted)
 
             # 创建适配器
             adapter = LLMAdapterFactory.create_adapter(
@@ -170,44 +455,21 @@ class ProxyService:
                 api_key=api_key,
                 api_url=credential.api_url
             )
-
-            # 构建系统消息
-            messages = request_data.messages.copy()
-            if request_data.system:
-                messages.insert(0, {"role": "system", "content": request_data.system})
-
-            # 转换请求
-            llm_request = LLMRequest(
-                model=request_data.model,
-                messages=messages,
-                max_tokens=request_data.max_tokens,
-                temperature=request_data.temperature
-            )
-
-            # 根据目标格式转发请求
-            if config.target_format == "anthropic":
-                if credential.provider == "anthropic":
-                    response = await adapter.forward_to_anthropic(llm_request)
-                else:
-                    # OpenAI -> Anthropic format
-                    response = await adapter.forward_to_openai(llm_request)
-            else:  # target_format == "openai"
-                if credential.provider == "openai":
-                    response = await adapter.forward_to_openai(llm_request)
-                else:
-                    # Anthropic -> OpenAI format
-                    response = await adapter.forward_to_anthropic(llm_request)
-
-            # 转换响应为Anthropic格式
-            if config.target_format == "anthropic":
-                if credential.provider == "anthropic":
-                    final_response = self._convert_to_anthropic_response(response.dict())
-                else:
-                    # 从OpenAI格式转换
-                    final_response = self._convert_to_anthropic_response(response.dict())
-            else:
-                # 保持OpenAI格式
-                final_response = response.dict()
+            instrument_client(adapter.client)
+
+            # 通过上游原生接口发送请求
+            forward = getattr(adapter, route.forward)
+            policy = self._apply_timeouts(adapter, credential.provider, llm_request.model)
+            upstream_started = time.monotonic()
+            with tracer.span(
+                "upstream.request", SpanKind.CLIENT, self._upstream_attributes(credential.provider, llm_request)
+            ):
+                response = await guard_upstream(forward(llm_request), policy.total, "total")
+            upstream_latency.observe(credential.provider, llm_request.model, "total", time.monotonic() - upstream_started)
+
+            # 转换为目标格式的响应
+            with tracer.span("proxy.transform_response"):
+                final_response = route.transcode(response)
 
             # 记录日志
             self._log_request(
@@ -219,16 +481,24 @@ class ProxyService:
                 target_format=config.target_format,
                 status_code=200,
                 response_time_ms=int((time.time() - start_time) * 1000),
-                tokens_used=response.usage.get("total_tokens", 0)
+                tokens_used=response.usage.get("total_tokens", 0),
+                prompt_tokens=response.usage.get("prompt_tokens", 0),
+                completion_tokens=response.usage.get("completion_tokens", 0),
+                cache_read_tokens=response.usage.get("cache_read_tokens", 0),
+                cache_creation_tokens=response.usage.get("cache_creation_tokens", 0)
             )
 
-            await adapter.close()
+            token_quota_manager.commit(reservation, self._usage_total(response.usage))
+            self._update_response_cache(cache_key, cache_hit, final_response)
+
             return final_response
 
         except Exception as e:
             logger.error(f"Proxy request failed: {e}")
+            token_quota_manager.release(reservation)
 
             # 记录错误日志
+            status_code, error_type = self._error_status(e)
             self._log_request(
                 config=config,
                 request_id=request_id,
@@ -236,35 +506,332 @@ class ProxyService:
                 path="/api/v1/messages",
                 source_format="anthropic",
                 target_format=config.target_format,
-                status_code=500,
+                status_code=status_code,
                 response_time_ms=int((time.time() - start_time) * 1000),
-                error_message=str(e)
+                error_message=str(e),
+                error_type=error_type
+            )
+
+            if isinstance(e, (UpstreamTimeoutError, QueueTimeoutError)):
+                raise
+            raise LLMProviderError(f"Request failed: {str(e)}")
+
+        finally:
+            if ticket is not None:
+                fair_scheduler.release(ticket)
+            if adapter is not None:
+                await adapter.close()
+
+    async def _open_stream(
+        self,
+        config: ModelConfig,
+        credential: Credential,
+        llm_request: LLMRequest,
+        preflight: PreflightResult,
+        reservation,
+        request_id: str,
+        path: str,
+        source_format: str,
+        start_time: float,
+        priority: str,
+        route: Route
+    ) -> AsyncIterator[str]:
+        """打开上游流并等待第一个增量事件，返回客户端格式的SSE事件流
+
+        上游在产出内容之前失败时直接抛出错误，客户端收到普通的错误响应，而不是一个只含错误事件的流。
+        上游并发名额在整个流结束后才归还。
+        """
+        adapter = None
+        ticket = None
+        upstream_span = None
+        first_byte_span = None
+        try:
+            ticket = await self._acquire_upstream_slot(config, credential, priority, preflight)
+            api_key = await decrypt_api_key_async(credential.api_key_encrypted)
+            adapter = LLMAdapterFactory.create_adapter(
+                provider=credential.provider,
+                api_key=api_key,
+                api_url=credential.api_url
+            )
+            instrument_client(adapter.client)
+
+            policy = self._apply_timeouts(adapter, credential.provider, llm_request.model)
+            # 上游请求span一直持续到流结束，由_relay_stream结束
+            upstream_span = tracer.start_span(
+                "upstream.request", SpanKind.CLIENT, attributes=self._upstream_attributes(credential.provider, llm_request)
             )
+            first_byte_span = tracer.start_span("upstream.first_byte", parent=upstream_span.context)
+            upstream_started = time.monotonic()
+            with tracer.use_span(upstream_span):
+                if route.native_stream:
+                    deltas = adapter.stream_chat(llm_request)
+                    first = await guard_upstream(anext(deltas, None), min(policy.first_byte, policy.total), "first_byte")
+                    upstream_latency.observe(
+                        credential.provider, llm_request.model, "first_byte", time.monotonic() - upstream_started
+                    )
+                else:
+                    # 上游按非流式请求，否则会返回SSE而无法解析为完整响应
+                    complete_request = llm_request.model_copy(update={"stream": False})
+                    deltas = response_deltas(getattr(adapter, route.forward)(complete_request))
+                    # 完整响应生成后才有第一个事件，按整个请求的截止时间等待
+                    first = await guard_upstream(anext(deltas, None), policy.total, "total")
+            first_byte_span.end()
 
+        except Exception as e:
+            logger.error(f"Proxy stream failed: {e}")
+            for span in (first_byte_span, upstream_span):
+                if span is not None:
+                    span.end(error=e)
+            token_quota_manager.release(reservation)
+            if ticket is not None:
+                fair_scheduler.release(ticket)
+            if adapter is not None:
+                await adapter.close()
+
+            status_code, error_type = self._error_status(e)
+            self._log_request(
+                config=config,
+                request_id=request_id,
+                method="POST",
+                path=path,
+                source_format=source_format,
+                target_format=config.target_format,
+                status_code=status_code,
+                response_time_ms=int((time.time() - start_time) * 1000),
+                error_message=str(e),
+                error_type=error_type
+            )
+
+            if isinstance(e, (UpstreamTimeoutError, QueueTimeoutError)):
+                raise
             raise LLMProviderError(f"Request failed: {str(e)}")
 
-    def _convert_to_anthropic_response(self, openai_response: Dict[str, Any]) -> Dict[str, Any]:
-        """将OpenAI响应转换为Anthropic格式"""
-        choices = openai_response.get("choices", [])
-        content = []
+        relay = self._relay_stream(
+            config, route, adapter, deltas, first, llm_request.model, preflight, reservation,
+            request_id, path, source_format, start_time, policy, upstream_started, ticket, upstream_span
+        )
+        # 推进到生成器的try块内，之后即使从未被迭代，关闭时也会在finally中释放资源
+        await relay.__anext__()
+        return relay
+
+    async def _relay_stream(
+        self,
+        config: ModelConfig,
+        route: Route,
+        adapter: AbstractLLMAdapter,
+        deltas: AsyncIterator[StreamDelta],
+        first: Optional[StreamDelta],
+        model: str,
+        preflight: PreflightResult,
+        reservation,
+        request_id: str,
+        path: str,
+        source_format: str,
+        start_time: float,
+        policy: TimeoutPolicy,
+        upstream_started: float,
+        ticket: Ticket,
+        upstream_span
+    ) -> AsyncIterator[str]:
+        """把上游增量事件编码为目标格式的SSE；流结束或客户端断开后关闭上游连接、记录日志并结算配额
+
+        等待每个后续增量时同时受相邻增量间隔和整个请求的截止时间约束（只计等待上游的时间）。
+        第一次产出的None是占位，由_open_stream消费，不会发给客户端。
+        """
+        provider = route.provider
+        encoder = route.stream_encoder(model, preflight.prompt_tokens)
+
+        text_parts: List[str] = []
+        usage = None
+        finish_reason = None
+        # 没有正常结束也没有上游错误时，说明客户端提前断开
+        status_code = 499
+        error_message = "Client disconnected"
+        error_type = None
+        max_gap = 0.0
+        stream_span = tracer.start_span("upstream.stream", parent=upstream_span.context)
+        stream_error = None
+
+        try:
+            yield None
+
+            for event in encoder.start():
+                yield event
+
+            delta = first
+            while delta is not None:
+                text_parts.append(delta.text)
+                usage = delta.usage or usage
+                finish_reason = delta.finish_reason or finish_reason
+                for event in encoder.delta(delta.text):
+                    yield event
+
+                remaining = upstream_started + policy.total - time.monotonic()
+                if policy.inter_chunk < remaining:
+                    deadline, phase = policy.inter_chunk, "inter_chunk"
+                else:
+                    deadline, phase = max(remaining, 0), "total"
+                wait_started = time.monotonic()
+                delta = await guard_upstream(anext(deltas, None), deadline, phase)
+                max_gap = max(max_gap, time.monotonic() - wait_started)
+
+            stream_span.set_attribute("llmbridge.chunks", len(text_parts))
+            stream_span.end()
+            upstream_latency.observe(provider, model, "inter_chunk", max_gap)
+            upstream_latency.observe(provider, model, "total", time.monotonic() - upstream_started)
+            usage = self._stream_usage(usage, preflight, provider, text_parts)
+            status_code, error_message = 200, None
+            for event in encoder.finish(finish_reason or "stop", usage):
+                yield event
 
-        if choices:
-            message = choices[0].get("message", {})
-            text = message.get("content", "")
-            content = [{"type": "text", "text": text}]
+        except Exception as e:
+            logger.error(f"Proxy stream failed: {e}")
+            stream_error = e
+            status_code, error_type = self._error_status(e)
+            error_message = str(e)
+            for event in encoder.error(f"Request failed: {str(e)}"):
+                yield event
+
+        finally:
+            fair_scheduler.release(ticket)
+            await deltas.aclose()
+            await adapter.close()
 
-        usage = openai_response.get("usage", {})
+            # 上游已经生成的内容照常计费
+            usage = self._stream_usage(usage, preflight, provider, text_parts)
+            token_quota_manager.commit(reservation, self._usage_total(usage))
+
+            # 客户端提前断开时流span没有正常结束，按断开记录
+            if stream_error is None and status_code == 499:
+                stream_span.mark_error(error_message)
+            stream_span.end(error=stream_error)
+            upstream_span.set_attribute("gen_ai.response.finish_reasons", finish_reason)
+            upstream_span.set_attribute("gen_ai.usage.input_tokens", usage.get("prompt_tokens", 0))
+            upstream_span.set_attribute("gen_ai.usage.output_tokens", usage.get("completion_tokens", 0))
+            upstream_span.end(error=stream_error)
+            self._log_request(
+                config=config,
+                request_id=request_id,
+                method="POST",
+                path=path,
+                source_format=source_format,
+                target_format=config.target_format,
+                status_code=status_code,
+                response_time_ms=int((time.time() - start_time) * 1000),
+                tokens_used=self._usage_total(usage),
+                prompt_tokens=usage.get("prompt_tokens", 0),
+                completion_tokens=usage.get("completion_tokens", 0),
+                cache_read_tokens=usage.get("cache_read_tokens", 0),
+                cache_creation_tokens=usage.get("cache_creation_tokens", 0),
+                error_message=error_message,
+                error_type=error_type
+            )
 
+    def _stream_usage(
+        self,
+        usage: Optional[Dict[str, int]],
+        preflight: PreflightResult,
+        provider: str,
+        text_parts: List[str]
+    ) -> Dict[str, int]:
+        """流式响应的用量；上游没有返回（或提前中断）时按本地估算"""
+        if usage and self._usage_total(usage):
+            return usage
+        completion_tokens = estimate_text_tokens("".join(text_parts), provider_family(provider))
         return {
-            "id": openai_response.get("id", str(uuid.uuid4())),
-            "type": "message",
-            "role": "assistant",
-            "content": content,
-            "model": openai_response.get("model", "unknown"),
-            "usage": {
-                "input_tokens": usage.get("prompt_tokens", 0),
-                "output_tokens": usage.get("completion_tokens", 0)
-            }
+            "prompt_tokens": preflight.prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": preflight.prompt_tokens + completion_tokens
+        }
+
+    async def proxy_embeddings(
+        self,
+        proxy_api_key: str,
+        request_data: EmbeddingRequest
+    ) -> Dict[str, Any]:
+        """代理OpenAI格式的向量化请求（并发调用方的输入合并为一次上游请求）"""
+        start_time = time.time()
+        request_id = str(uuid.uuid4())
+
+        config = self.get_config_by_proxy_key(proxy_api_key)
+        if not config or not config.is_enabled:
+            raise LLMProviderError("Invalid or disabled API key")
+
+        if not self.validate_rate_limit(config):
+            raise RateLimitError("Rate limit exceeded")
+
+        credential = config.credential
+        if not credential or not credential.is_active or not credential.is_validated:
+            raise LLMProviderError("Invalid or inactive credential")
+
+        adapter_class = LLMAdapterFactory.get_adapter_class(credential.provider)
+        if not adapter_class.max_embedding_inputs:
+            raise LLMProviderError(f"Provider {credential.provider} does not support embeddings")
+
+        texts = [request_data.input] if isinstance(request_data.input, str) else list(request_data.input)
+        if not texts:
+            raise LLMProviderError("input must not be empty")
+
+        family = provider_family(credential.provider)
+        reservation = token_quota_manager.reserve(config, sum(estimate_text_tokens(text, family) for text in texts))
+
+        # 只捕获普通值，批次可能在其他调用方的请求中发送
+        provider = credential.provider
+        api_key_encrypted = credential.api_key_encrypted
+        api_url = credential.api_url
+        model = request_data.model
+        dimensions = request_data.dimensions
+
+        async def send(batch_texts):
+            api_key = await decrypt_api_key_async(api_key_encrypted)
+            adapter = LLMAdapterFactory.create_adapter(provider=provider, api_key=api_key, api_url=api_url)
+            try:
+                return await adapter.create_embeddings(model, batch_texts, dimensions)
+            finally:
+                await adapter.close()
+
+        try:
+            vectors, tokens = await embedding_batcher.embed(
+                (credential.id, model, dimensions), texts, send, adapter_class.max_embedding_inputs, family
+            )
+        except Exception as e:
+            logger.error(f"Embedding request failed: {e}")
+            token_quota_manager.release(reservation)
+            self._log_request(
+                config=config,
+                request_id=request_id,
+                method="POST",
+                path="/api/v1/embeddings",
+                source_format="openai",
+                target_format=config.target_format,
+                status_code=500,
+                response_time_ms=int((time.time() - start_time) * 1000),
+                error_message=str(e)
+            )
+            raise LLMProviderError(f"Request failed: {str(e)}")
+
+        self._log_request(
+            config=config,
+            request_id=request_id,
+            method="POST",
+            path="/api/v1/embeddings",
+            source_format="openai",
+            target_format=config.target_format,
+            status_code=200,
+            response_time_ms=int((time.time() - start_time) * 1000),
+            tokens_used=tokens,
+            prompt_tokens=tokens
+        )
+        token_quota_manager.commit(reservation, tokens)
+
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": index, "embedding": format_embedding(vector, request_data.encoding_format)}
+                for index, vector in enumerate(vectors)
+            ],
+            "model": model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
         }
 
     def _log_request(
@@ -278,24 +845,43 @@ class ProxyService:
         status_code: int,
         response_time_ms: int,
         tokens_used: int = 0,
-        error_message: str = None
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cache_read_tokens: int = 0,
+        cache_creation_tokens: int = 0,
+        error_message: str = None,
+        error_type: Optional[str] = None
     ):
-        """记录请求日志"""
-        log = RequestLog(
-            model_config_id=config.id,
-            request_id=request_id,
-            method=method,
-            path=path,
-            source_format=source_format,
-            target_format=target_format,
-            status_code=status_code,
-            response_time_ms=response_time_ms,
-            tokens_used=tokens_used,
-            error_message=error_message
-        )
+        """记录请求日志，并在同一事务中累加用量汇总"""
+        with tracer.span("db.log_write", attributes={"http.response.status_code": status_code}):
+            log = RequestLog(
+                model_config_id=config.id,
+                request_id=request_id,
+                method=method,
+                path=path,
+                source_format=source_format,
+                target_format=target_format,
+                status_code=status_code,
+                response_time_ms=response_time_ms,
+                tokens_used=tokens_used,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                cache_read_tokens=cache_read_tokens,
+                cache_creation_tokens=cache_creation_tokens,
+                error_message=error_message,
+                error_type=error_type
+            )
 
-        self.db.add(log)
-        self.db.commit()
+            self.db.add(log)
+            record_usage(
+                self.db,
+                model_config_id=config.id,
+                status_code=status_code,
+                response_time_ms=response_time_ms,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens
+            )
+            self.db.commit()
 
     def get_available_models(self, proxy_api_key: str) -> list[str]:
         """获取可用模型列表"""
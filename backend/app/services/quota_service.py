@@ -0,0 +1,220 @@
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.config import settings
+from app.models.model_config import ModelConfig
+from app.models.token_quota import TokenQuotaUsage
+from app.exceptions import QuotaExceededError
+from app.utils.db import upsert_increment
+import asyncio
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+CounterKey = Tuple[str, str, str]  # (model_config_id, period, period_key)
+
+
+def current_periods(now: Optional[datetime] = None) -> Dict[str, str]:
+    """当前的配额周期（UTC）"""
+    now = now or datetime.utcnow()
+    return {"day": now.strftime("%Y-%m-%d"), "month": now.strftime("%Y-%m")}
+
+
+def delete_config_quota_usage(db: Session, model_config_id: str):
+    """删除模型配置的配额用量（不提交事务）"""
+    db.query(TokenQuotaUsage).filter(TokenQuotaUsage.model_config_id == model_config_id).delete(synchronize_session=False)
+    token_quota_manager.forget(model_config_id)
+
+
+class _Counter:
+    __slots__ = ("used", "reserved", "unflushed")
+
+    def __init__(self, used: int = 0):
+        self.used = used  # 已确认的用量（含其他进程已写入数据库的部分）
+        self.reserved = 0  # 进行中的请求预留的token
+        self.unflushed = 0  # 本进程尚未写入数据库的用量
+
+
+class QuotaReservation:
+    """一次请求的配额预留"""
+
+    __slots__ = ("keys", "tokens", "settled")
+
+    def __init__(self, keys: List[CounterKey], tokens: int):
+        self.keys = keys
+        self.tokens = tokens
+        self.settled = False
+
+
+class TokenQuotaManager:
+    """代理密钥的每日/每月token配额
+
+    - 请求前按 max_tokens + 提示词估算值在内存中预留，超出配额直接拒绝，不访问上游
+    - 请求完成后按上游返回的usage结算，失败时释放预留
+    - 后台任务定期把本进程的增量写入数据库，并读回总量以同步其他进程的用量
+    - 每个配额周期只在首次使用时读取一次数据库
+    """
+
+    def __init__(self, flush_interval_seconds: float):
+        self.flush_interval_seconds = flush_interval_seconds
+        self._counters: Dict[CounterKey, _Counter] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _quotas(config: ModelConfig) -> Dict[str, int]:
+        quotas = {}
+        if config.daily_token_quota:
+            quotas["day"] = config.daily_token_quota
+        if config.monthly_token_quota:
+            quotas["month"] = config.monthly_token_quota
+        return quotas
+
+    def _load_counter(self, key: CounterKey) -> _Counter:
+        """首次使用某个周期时从数据库读取已用量"""
+        db = SessionLocal()
+        try:
+            row = db.query(TokenQuotaUsage).filter(
+                TokenQuotaUsage.model_config_id == key[0],
+                TokenQuotaUsage.period == key[1],
+                TokenQuotaUsage.period_key == key[2]
+            ).first()
+            used = row.used_tokens if row else 0
+        finally:
+            db.close()
+
+        with self._lock:
+            return self._counters.setdefault(key, _Counter(used))
+
+    def reserve(self, config: ModelConfig, estimated_tokens: int, now: Optional[datetime] = None) -> QuotaReservation:
+        """检查并预留配额，超出时抛出QuotaExceededError"""
+        quotas = self._quotas(config)
+        if not quotas:
+            return QuotaReservation([], 0)
+
+        periods = current_periods(now)
+        limits = []
+        for period, quota in quotas.items():
+            key = (config.id, period, periods[period])
+            if key not in self._counters:
+                self._load_counter(key)
+            limits.append((key, quota))
+
+        with self._lock:
+            for key, quota in limits:
+                counter = self._counters[key]
+                if counter.used + counter.reserved + estimated_tokens > quota:
+                    label = "Daily" if key[1] == "day" else "Monthly"
+                    raise QuotaExceededError(
+                        f"{label} token quota exceeded ({counter.used}/{quota} tokens used)"
+                    )
+            for key, _ in limits:
+                self._counters[key].reserved += estimated_tokens
+
+        return QuotaReservation([key for key, _ in limits], estimated_tokens)
+
+    def commit(self, reservation: QuotaReservation, actual_tokens: int):
+        """按实际用量结算预留（重复结算会被忽略）"""
+        if reservation.settled or not reservation.keys:
+            return
+        reservation.settled = True
+        with self._lock:
+            for key in reservation.keys:
+                counter = self._counters.get(key)
+                if counter is None:
+                    continue
+                counter.reserved -= reservation.tokens
+                counter.used += actual_tokens
+                counter.unflushed += actual_tokens
+
+    def release(self, reservation: QuotaReservation):
+        """请求失败时释放预留"""
+        self.commit(reservation, 0)
+
+    def get_usage(self, config_id: str, period: str, now: Optional[datetime] = None) -> Optional[int]:
+        """获取内存中的已用量（未加载时返回None）"""
+        counter = self._counters.get((config_id, period, current_periods(now)[period]))
+        return counter.used if counter else None
+
+    def flush(self):
+        """将增量写入数据库，并读回各周期的总用量（阻塞操作）"""
+        with self._lock:
+            deltas = {key: counter.unflushed for key, counter in self._counters.items() if counter.unflushed}
+            for key in deltas:
+                self._counters[key].unflushed = 0
+            keys = list(self._counters)
+
+        if not keys:
+            return
+
+        db = SessionLocal()
+        try:
+            for (config_id, period, period_key), delta in deltas.items():
+                upsert_increment(
+                    db,
+                    TokenQuotaUsage,
+                    {"model_config_id": config_id, "period": period, "period_key": period_key},
+                    {"used_tokens": delta}
+                )
+            db.commit()
+
+            config_ids = list({key[0] for key in keys})
+            rows = db.query(TokenQuotaUsage).filter(TokenQuotaUsage.model_config_id.in_(config_ids)).all()
+            totals = {(row.model_config_id, row.period, row.period_key): row.used_tokens for row in rows}
+        except Exception:
+            db.rollback()
+            with self._lock:
+                for key, delta in deltas.items():
+                    if key in self._counters:
+                        self._counters[key].unflushed += delta
+            raise
+        finally:
+            db.close()
+
+        active_periods = set(current_periods().values())
+        with self._lock:
+            for key in keys:
+                counter = self._counters.get(key)
+                if counter is None:
+                    continue
+                if key[2] not in active_periods and not counter.reserved and not counter.unflushed:
+                    # 已结束的周期不再需要保留在内存中
+                    del self._counters[key]
+                elif key in totals:
+                    counter.used = totals[key] + counter.unflushed
+
+    def forget(self, config_id: str):
+        """丢弃配置的内存计数器（配置删除时调用）"""
+        with self._lock:
+            for key in [key for key in self._counters if key[0] == config_id]:
+                del self._counters[key]
+
+    def start(self):
+        """启动定期同步任务"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Token quota flush failed: {e}")
+
+    async def shutdown(self):
+        """停止同步任务并写入剩余增量"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception as e:
+            logger.error(f"Token quota flush on shutdown failed: {e}")
+
+
+token_quota_manager = TokenQuotaManager(flush_interval_seconds=settings.token_quota_flush_interval_seconds)
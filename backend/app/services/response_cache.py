@@ -0,0 +1,318 @@
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+from collections import OrderedDict
+from functools import lru_cache
+from app.adapters.multimodal import has_images
+from app.config import settings
+from app.models.model_config import ModelConfig
+import copy
+import hashlib
+import itertools
+import random
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# MinHash签名长度与LSH分段：16段×每段4行，候选阈值约为 (1/16)^(1/4) ≈ 0.5
+NUM_BINS = 64
+BANDS = 16
+ROWS = NUM_BINS // BANDS
+SHINGLE_SIZE = 3
+_EMPTY = (1 << 64) - 1
+
+# 抽样验证时，上游新响应与缓存响应的相似度低于该值即记为误命中
+RESPONSE_AGREEMENT_THRESHOLD = 0.5
+
+Signature = Tuple[int, ...]
+
+# 归一化：时间戳、日期、UUID等易变内容替换为占位符
+_VOLATILE_PATTERNS = (
+    (re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"), " <uuid> "),
+    (re.compile(r"\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(z|[+-]\d{2}:?\d{2})?"), " <time> "),
+    (re.compile(r"\d{4}[-/]\d{1,2}[-/]\d{1,2}"), " <date> "),
+    (re.compile(r"\b\d{1,2}:\d{2}(:\d{2})?\b"), " <time> "),
+    (re.compile(r"\b1[5-9]\d{8}(\d{3})?\b"), " <time> "),
+)
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+_TOKEN_PATTERN = re.compile(rf"[{_CJK}]|[^\W{_CJK}]+|[^\w\s]")
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """归一化文本并切分为词（忽略大小写、空白和易变内容）"""
+    text = text.lower()
+    for pattern, placeholder in _VOLATILE_PATTERNS:
+        text = pattern.sub(placeholder, text)
+    return _TOKEN_PATTERN.findall(text)
+
+
+@lru_cache(maxsize=4096)
+def text_signature(text: str) -> Signature:
+    """计算文本的MinHash签名（单次哈希分桶，每个shingle只哈希一次）"""
+    tokens = normalize_tokens(text)
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = [" ".join(tokens)] if tokens else []
+    else:
+        shingles = (" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1))
+
+    bins = [_EMPTY] * NUM_BINS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        index = value % NUM_BINS
+        value //= NUM_BINS
+        if value < bins[index]:
+            bins[index] = value
+    return tuple(bins)
+
+
+def merge_signatures(signatures: List[Signature]) -> Signature:
+    """多个片段并集的签名（逐位取最小值）"""
+    if not signatures:
+        return (_EMPTY,) * NUM_BINS
+    return tuple(min(values) for values in zip(*signatures))
+
+
+def estimate_similarity(a: Signature, b: Signature) -> float:
+    """由签名估算Jaccard相似度"""
+    considered = equal = 0
+    for x, y in zip(a, b):
+        if x == _EMPTY and y == _EMPTY:
+            continue
+        considered += 1
+        if x == y:
+            equal += 1
+    return equal / considered if considered else 1.0
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content", "")
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return f"{message.get('role', '')}: {content}"
+
+
+def _response_text(response: Dict[str, Any]) -> str:
+    """提取OpenAI或Anthropic格式响应中的文本"""
+    choices = response.get("choices")
+    if choices:
+        return (choices[0].get("message") or {}).get("content") or ""
+    content = response.get("content")
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+class CacheKey:
+    """一次请求的缓存查找条件"""
+
+    __slots__ = ("config_id", "scope", "query", "context", "threshold")
+
+    def __init__(self, config_id: str, scope: Hashable, query: Signature, context: Signature, threshold: float):
+        self.config_id = config_id
+        self.scope = scope
+        self.query = query  # 最后一条消息
+        self.context = context  # system提示和之前的对话
+        self.threshold = threshold
+
+
+class CacheHit:
+    """缓存命中结果，verify为True时应继续请求上游以抽样验证"""
+
+    __slots__ = ("entry_id", "response", "similarity", "verify")
+
+    def __init__(self, entry_id: int, response: Dict[str, Any], similarity: float, verify: bool):
+        self.entry_id = entry_id
+        self.response = response
+        self.similarity = similarity
+        self.verify = verify
+
+
+class _Entry:
+    __slots__ = ("config_id", "scope", "query", "context", "band_keys", "response", "expires_at")
+
+    def __init__(self, key: CacheKey, band_keys: List[Hashable], response: Dict[str, Any], expires_at: float):
+        self.config_id = key.config_id
+        self.scope = key.scope
+        self.query = key.query
+        self.context = key.context
+        self.band_keys = band_keys
+        self.response = response
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """近似重复请求的响应缓存
+
+    - 对最后一条消息和之前的上下文分别计算MinHash签名，两者都达到阈值才算命中，
+      避免长system提示相同、问题不同的请求被误判为重复
+    - 最后一条消息的签名按段建立LSH索引，查找只比较同一分段桶内的候选
+    - 条目数有上限，按LRU淘汰，过期条目在访问时清理
+    - 按比例抽样命中的请求仍发往上游，比较新旧响应以估计误命中率
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, verify_sample_rate: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.verify_sample_rate = verify_sample_rate
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[Hashable, Set[int]] = {}
+        self._by_config: Dict[str, Set[int]] = {}
+        self._ids = itertools.count()
+        self._random = random.Random()
+
+        self.lookups = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+        self.verifications = 0
+        self.false_positives = 0
+
+    def make_key(
+        self,
+        config: ModelConfig,
+        scope: Hashable,
+        messages: List[Dict[str, Any]],
+        system: Optional[str] = None,
+        temperature: Optional[float] = None,
+        stream: bool = False
+    ) -> Optional[CacheKey]:
+        """为可缓存的请求生成查找条件（未开启或不适合缓存时返回None）"""
+        if not config.response_cache_enabled or stream or not messages:
+            return None
+        if temperature is None or temperature > settings.response_cache_max_temperature:
+            return None
+        # 相似度只按文本计算，包含图片的请求不缓存
+        if has_images(messages):
+            return None
+
+        context_parts = [text_signature(f"system: {system}")] if system else []
+        context_parts.extend(text_signature(_message_text(message)) for message in messages[:-1])
+        threshold = config.response_cache_threshold or settings.response_cache_default_threshold
+
+        return CacheKey(
+            config_id=config.id,
+            scope=(config.id, scope),
+            query=text_signature(_message_text(messages[-1])),
+            context=merge_signatures(context_parts),
+            threshold=threshold
+        )
+
+    @staticmethod
+    def _band_keys(scope: Hashable, signature: Signature) -> List[Hashable]:
+        keys = []
+        for band in range(BANDS):
+            rows = signature[band * ROWS:(band + 1) * ROWS]
+            # 全空的分段在短文本之间必然相同，不参与索引
+            if all(value == _EMPTY for value in rows):
+                continue
+            keys.append((scope, band, rows))
+        return keys
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for band_key in entry.band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band_key]
+        config_entries = self._by_config.get(entry.config_id)
+        if config_entries is not None:
+            config_entries.discard(entry_id)
+            if not config_entries:
+                del self._by_config[entry.config_id]
+
+    def lookup(self, key: CacheKey) -> Optional[CacheHit]:
+        """查找相似请求的缓存响应"""
+        self.lookups += 1
+        now = time.monotonic()
+
+        candidates = set()
+        for band_key in self._band_keys(key.scope, key.query):
+            candidates.update(self._buckets.get(band_key, ()))
+
+        best_id, best_similarity = None, 0.0
+        for entry_id in candidates:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                continue
+            if entry.expires_at <= now:
+                self._remove(entry_id)
+                continue
+            similarity = min(
+                estimate_similarity(key.query, entry.query),
+                estimate_similarity(key.context, entry.context)
+            )
+            if similarity > best_similarity:
+                best_id, best_similarity = entry_id, similarity
+
+        if best_id is None or best_similarity < key.threshold:
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(best_id)
+        verify = self._random.random() < self.verify_sample_rate
+        return CacheHit(best_id, copy.deepcopy(self._entries[best_id].response), best_similarity, verify)
+
+    def store(self, key: CacheKey, response: Dict[str, Any]):
+        """缓存上游响应"""
+        entry_id = next(self._ids)
+        band_keys = self._band_keys(key.scope, key.query)
+        self._entries[entry_id] = _Entry(key, band_keys, copy.deepcopy(response), time.monotonic() + self.ttl_seconds)
+        for band_key in band_keys:
+            self._buckets.setdefault(band_key, set()).add(entry_id)
+        self._by_config.setdefault(key.config_id, set()).add(entry_id)
+        self.stores += 1
+
+        while len(self._entries) > self.max_entries:
+            oldest_id = next(iter(self._entries))
+            self._remove(oldest_id)
+            self.evictions += 1
+
+    def record_verification(self, hit: CacheHit, fresh_response: Dict[str, Any]):
+        """比较抽样请求的上游响应与缓存响应，不一致时计为误命中并丢弃该条目"""
+        self.verifications += 1
+        agreement = estimate_similarity(
+            text_signature(_response_text(hit.response)),
+            text_signature(_response_text(fresh_response))
+        )
+        if agreement < RESPONSE_AGREEMENT_THRESHOLD:
+            self.false_positives += 1
+            self._remove(hit.entry_id)
+            logger.info(f"Response cache false positive (prompt similarity {hit.similarity:.2f}, response agreement {agreement:.2f})")
+
+    def invalidate_config(self, config_id: str):
+        """丢弃模型配置的所有缓存条目"""
+        for entry_id in list(self._by_config.get(config_id, ())):
+            self._remove(entry_id)
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self._buckets.clear()
+        self._by_config.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            "name": "response_cache",
+            "size": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "misses": self.lookups - self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else None,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "verifications": self.verifications,
+            "false_positives": self.false_positives,
+            "false_positive_rate": round(self.false_positives / self.verifications, 4) if self.verifications else None,
+        }
+
+
+response_cache = ResponseCache(
+    max_entries=settings.response_cache_max_entries,
+    ttl_seconds=settings.response_cache_ttl_seconds,
+    verify_sample_rate=settings.response_cache_verify_sample_rate
+)
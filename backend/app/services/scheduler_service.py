@@ -0,0 +1,224 @@
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from app.config import settings
+from app.exceptions import LLMProviderError, QueueTimeoutError
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 优先级从高到低；上游并发已满时高优先级的排队请求先获得名额
+PRIORITY_CLASSES = ("interactive", "standard", "batch")
+DEFAULT_PRIORITY = "standard"
+
+# 每个优先级保留的最近排队时间样本数（用于分位数统计）
+WAIT_SAMPLE_WINDOW = 1000
+
+
+def resolve_priority(configured: Optional[str], requested: Optional[str]) -> str:
+    """确定请求的优先级：请求头只能在模型配置的优先级基础上降低，不能提升"""
+    base = configured if configured in PRIORITY_CLASSES else DEFAULT_PRIORITY
+    if not requested:
+        return base
+    requested = requested.strip().lower()
+    if requested not in PRIORITY_CLASSES:
+        raise LLMProviderError(f"Invalid priority '{requested}', expected one of {', '.join(PRIORITY_CLASSES)}")
+    return max(base, requested, key=PRIORITY_CLASSES.index)
+
+
+class Ticket:
+    """一个上游并发名额（排队中或已获得）"""
+
+    __slots__ = ("pool_key", "key", "priority", "cost", "future", "enqueued_at")
+
+    def __init__(self, pool_key: str, key: str, priority: str, cost: int):
+        self.pool_key = pool_key
+        self.key = key
+        self.priority = priority
+        self.cost = cost
+        self.future: Optional[asyncio.Future] = None
+        self.enqueued_at = time.monotonic()
+
+
+class _ClassQueue:
+    """同一优先级内按键分队列，使用差额轮询（DRR）在键之间分配名额"""
+
+    def __init__(self):
+        self.queues: Dict[str, Deque[Ticket]] = {}
+        self.order: Deque[str] = deque()
+        self.deficits: Dict[str, float] = {}
+        self.weights: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def push(self, ticket: Ticket, weight: int):
+        queue = self.queues.get(ticket.key)
+        if queue is None:
+            queue = self.queues[ticket.key] = deque()
+            self.order.append(ticket.key)
+            self.deficits[ticket.key] = 0.0
+        self.weights[ticket.key] = weight
+        queue.append(ticket)
+
+    def remove(self, ticket: Ticket):
+        """移除放弃排队的请求"""
+        queue = self.queues.get(ticket.key)
+        if queue is None or ticket not in queue:
+            return
+        queue.remove(ticket)
+        if not queue:
+            self._drop_key(ticket.key)
+
+    def pop(self) -> Ticket:
+        """按DRR取出下一个请求：当前键的差额足够支付队首请求的成本时出队，否则轮到下一个键并补充额度"""
+        while True:
+            key = self.order[0]
+            queue = self.queues[key]
+            if self.deficits[key] >= queue[0].cost:
+                ticket = queue.popleft()
+                self.deficits[key] -= ticket.cost
+                if not queue:
+                    self._drop_key(key)
+                return ticket
+
+            self.order.rotate(-1)
+            next_key = self.order[0]
+            self.deficits[next_key] += settings.scheduler_quantum_tokens * self.weights[next_key]
+
+    def _drop_key(self, key: str):
+        # 队列清空的键不保留差额，避免空闲后积累额度
+        del self.queues[key]
+        del self.deficits[key]
+        del self.weights[key]
+        self.order.remove(key)
+
+
+class _Pool:
+    """一个上游凭证的并发名额与各优先级的等待队列"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.active = 0
+        self.classes = {priority: _ClassQueue() for priority in PRIORITY_CLASSES}
+
+    def has_waiters(self) -> bool:
+        return any(self.classes.values())
+
+
+class _WaitStats:
+    def __init__(self):
+        self.requests = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.wait_ms_sum = 0.0
+        self.max_wait_ms = 0.0
+        self.samples: Deque[float] = deque(maxlen=WAIT_SAMPLE_WINDOW)
+
+    def record(self, wait_ms: float):
+        self.requests += 1
+        self.wait_ms_sum += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.samples.append(wait_ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 1)
+
+
+class FairScheduler:
+    """上游调度器：按凭证限制并发，并发已满时按优先级和键的权重公平分配名额
+
+    - 并发未满且没有排队请求时直接放行
+    - 优先级之间严格按 interactive > standard > batch 的顺序出队
+    - 同一优先级内每个代理密钥一个队列，按差额轮询出队：每轮获得 quantum × 权重 的额度，
+      请求的成本为预估token数，长请求多的密钥不会因此占用更多的上游名额
+    """
+
+    def __init__(self):
+        self._pools: Dict[str, _Pool] = {}
+        self._stats = {priority: _WaitStats() for priority in PRIORITY_CLASSES}
+
+    def _pool(self, pool_key: str) -> _Pool:
+        pool = self._pools.get(pool_key)
+        if pool is None:
+            pool = self._pools[pool_key] = _Pool(settings.scheduler_max_concurrency_per_credential)
+        return pool
+
+    async def acquire(self, pool_key: str, key: str, priority: str, weight: int = 1, cost: int = 1) -> Ticket:
+        """获取上游并发名额；排队超过上限时抛出QueueTimeoutError"""
+        ticket = Ticket(pool_key, key, priority, max(cost, 1))
+        stats = self._stats[priority]
+        pool = self._pool(pool_key)
+
+        if pool.capacity <= 0 or (pool.active < pool.capacity and not pool.has_waiters()):
+            pool.active += 1
+            stats.record(0.0)
+            return ticket
+
+        ticket.future = asyncio.get_running_loop().create_future()
+        pool.classes[priority].push(ticket, max(weight, 1))
+        stats.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), settings.scheduler_max_queue_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # 名额在放弃等待的同时已经分配给了该请求，归还给下一个排队请求
+                self.release(ticket)
+            else:
+                ticket.future.cancel()
+                pool.classes[priority].remove(ticket)
+            if isinstance(e, asyncio.TimeoutError):
+                stats.timeouts += 1
+                raise QueueTimeoutError("Upstream capacity exhausted, request waited too long in queue")
+            raise
+        finally:
+            stats.queued -= 1
+
+        stats.record((time.monotonic() - ticket.enqueued_at) * 1000)
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """归还名额，并分配给下一个排队请求"""
+        pool = self._pools.get(ticket.pool_key)
+        if pool is None:
+            return
+        pool.active -= 1
+
+        while pool.active < pool.capacity or pool.capacity <= 0:
+            queue = next((pool.classes[priority] for priority in PRIORITY_CLASSES if pool.classes[priority]), None)
+            if queue is None:
+                break
+            waiter = queue.pop()
+            if waiter.future.done():
+                continue
+            pool.active += 1
+            waiter.future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": "fair_scheduler",
+            "active": sum(pool.active for pool in self._pools.values()),
+            "classes": {
+                priority: {
+                    "requests": stats.requests,
+                    "queued": stats.queued,
+                    "timeouts": stats.timeouts,
+                    "avg_wait_ms": round(stats.wait_ms_sum / stats.requests, 1) if stats.requests else None,
+                    "p50_wait_ms": stats.quantile(0.5),
+                    "p95_wait_ms": stats.quantile(0.95),
+                    "max_wait_ms": round(stats.max_wait_ms, 1),
+                }
+                for priority, stats in self._stats.items()
+            }
+        }
+
+    def reset(self):
+        self._pools.clear()
+        self._stats = {priority: _WaitStats() for priority in PRIORITY_CLASSES}
+
+
+fair_scheduler = FairScheduler()
@@ -0,0 +1,114 @@
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional
+from app.adapters.base import LLMResponse, StreamDelta
+import json
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# OpenAI结束原因 -> Anthropic stop_reason
+ANTHROPIC_STOP_REASONS = {
+    "stop": "end_turn",
+    "length": "max_tokens",
+}
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """编码一个SSE事件（中文不转义，减少传输量）"""
+    payload = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+
+async def response_deltas(pending: Awaitable[LLMResponse]) -> AsyncIterator[StreamDelta]:
+    """上游不支持原生流式时，把完整响应转为单个增量事件"""
+    response = await pending
+    choice = response.choices[0] if response.choices else {}
+    yield StreamDelta(
+        text=choice.get("message", {}).get("content") or "",
+        finish_reason=choice.get("finish_reason") or "stop",
+        usage=response.usage
+    )
+
+
+class OpenAIStreamEncoder:
+    """把通用增量事件编码为OpenAI chat.completion.chunk流"""
+
+    def __init__(self, model: str):
+        self.id = f"chatcmpl-{uuid.uuid4().hex}"
+        self.model = model
+        self.created = int(time.time())
+
+    def _chunk(self, delta: Dict[str, Any], finish_reason: Optional[str] = None, usage: Optional[Dict[str, int]] = None) -> str:
+        chunk = {
+            "id": self.id,
+            "object": "chat.completion.chunk",
+            "created": self.created,
+            "model": self.model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        if usage is not None:
+            chunk["usage"] = usage
+        return _sse(chunk)
+
+    def start(self) -> List[str]:
+        return [self._chunk({"role": "assistant", "content": ""})]
+
+    def delta(self, text: str) -> List[str]:
+        return [self._chunk({"content": text})] if text else []
+
+    def finish(self, finish_reason: str, usage: Dict[str, int]) -> List[str]:
+        return [self._chunk({}, finish_reason, usage), "data: [DONE]\n\n"]
+
+    def error(self, message: str) -> List[str]:
+        return [_sse({"error": {"message": message, "type": "upstream_error"}})]
+
+
+class AnthropicStreamEncoder:
+    """把通用增量事件编码为Anthropic Messages事件流"""
+
+    def __init__(self, model: str, input_tokens: int):
+        self.id = f"msg_{uuid.uuid4().hex}"
+        self.model = model
+        self.input_tokens = input_tokens
+
+    def start(self) -> List[str]:
+        message = {
+            "id": self.id,
+            "type": "message",
+            "role": "assistant",
+            "content": [],
+            "model": self.model,
+            "stop_reason": None,
+            "stop_sequence": None,
+            "usage": {"input_tokens": self.input_tokens, "output_tokens": 0}
+        }
+        return [
+            _sse({"type": "message_start", "message": message}, "message_start"),
+            _sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+                 "content_block_start"),
+        ]
+
+    def delta(self, text: str) -> List[str]:
+        if not text:
+            return []
+        return [_sse(
+            {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text}},
+            "content_block_delta"
+        )]
+
+    def finish(self, finish_reason: str, usage: Dict[str, int]) -> List[str]:
+        return [
+            _sse({"type": "content_block_stop", "index": 0}, "content_block_stop"),
+            _sse({
+                "type": "message_delta",
+                "delta": {"stop_reason": ANTHROPIC_STOP_REASONS.get(finish_reason, "end_turn"), "stop_sequence": None},
+                "usage": {"output_tokens": usage.get("completion_tokens", 0)}
+            }, "message_delta"),
+            _sse({"type": "message_stop"}, "message_stop"),
+        ]
+
+    def error(self, message: str) -> List[str]:
+        return [_sse({"type": "error", "error": {"type": "api_error", "message": message}}, "error")]
@@ -0,0 +1,101 @@
+from collections import deque
+from typing import Awaitable, Deque, Dict, Optional, Tuple, TypeVar
+from app.config import settings
+from app.exceptions import UpstreamTimeoutError
+import asyncio
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class TimeoutPolicy:
+    """一次上游请求的各阶段截止时间（秒）"""
+
+    __slots__ = ("connect", "first_byte", "inter_chunk", "total")
+
+    def __init__(self, connect: float, first_byte: float, inter_chunk: float, total: float):
+        self.connect = connect
+        self.first_byte = first_byte
+        self.inter_chunk = inter_chunk
+        self.total = total
+
+    def httpx_timeout(self) -> httpx.Timeout:
+        """HTTP客户端的超时：连接阶段精确控制，读写只作为整个请求的兜底，阶段截止时间由guard_upstream控制"""
+        return httpx.Timeout(self.total, connect=self.connect, pool=self.connect)
+
+    def __repr__(self) -> str:
+        return (
+            f"TimeoutPolicy(connect={self.connect:.1f}, first_byte={self.first_byte:.1f}, "
+            f"inter_chunk={self.inter_chunk:.1f}, total={self.total:.1f})"
+        )
+
+
+def _phase_settings(phase: str) -> Tuple[float, float, float]:
+    """阶段的 (默认值, 下限, 上限)"""
+    return (
+        getattr(settings, f"upstream_{phase}_timeout_seconds"),
+        getattr(settings, f"upstream_{phase}_timeout_min_seconds"),
+        getattr(settings, f"upstream_{phase}_timeout_max_seconds"),
+    )
+
+
+class LatencyTracker:
+    """按 (提供商, 模型) 记录最近的上游延迟样本，由延迟分位数推算超时
+
+    学习的阶段：first_byte（流式请求收到第一个增量）、inter_chunk（相邻增量的最长间隔）、total（整个请求）。
+
+    样本数不足时使用配置的默认值；之后取分位数 × 倍数，并限制在配置的上下限之间。
+    超时和失败的请求不记录样本，避免异常延迟抬高截止时间。
+    """
+
+    def __init__(self):
+        self._samples: Dict[Tuple[str, str, str], Deque[float]] = {}
+
+    def observe(self, provider: str, model: str, phase: str, seconds: float):
+        samples = self._samples.get((provider, model, phase))
+        if samples is None:
+            samples = self._samples[(provider, model, phase)] = deque(maxlen=settings.upstream_latency_window)
+        samples.append(seconds)
+
+    def quantile(self, provider: str, model: str, phase: str, q: float) -> Optional[float]:
+        """延迟分位数（样本数不足时返回None）"""
+        samples = self._samples.get((provider, model, phase))
+        if not samples or len(samples) < settings.upstream_latency_min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def timeout(self, provider: str, model: str, phase: str) -> float:
+        default, lower, upper = _phase_settings(phase)
+        observed = self.quantile(provider, model, phase, settings.upstream_timeout_quantile)
+        if observed is None:
+            return default
+        return min(max(observed * settings.upstream_timeout_multiplier, lower), upper)
+
+    def policy(self, provider: str, model: str) -> TimeoutPolicy:
+        return TimeoutPolicy(
+            connect=settings.upstream_connect_timeout_seconds,
+            first_byte=self.timeout(provider, model, "first_byte"),
+            inter_chunk=self.timeout(provider, model, "inter_chunk"),
+            total=self.timeout(provider, model, "total")
+        )
+
+    def clear(self):
+        self._samples.clear()
+
+
+async def guard_upstream(awaitable: Awaitable[T], timeout: float, phase: str) -> T:
+    """等待上游操作，超过截止时间或HTTP客户端超时时抛出UpstreamTimeoutError"""
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise UpstreamTimeoutError(phase, timeout)
+    except (httpx.ConnectTimeout, httpx.PoolTimeout):
+        raise UpstreamTimeoutError("connect", settings.upstream_connect_timeout_seconds)
+    except httpx.TimeoutException:
+        raise UpstreamTimeoutError(phase, timeout)
+
+
+upstream_latency = LatencyTracker()
@@ -0,0 +1,60 @@
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.exceptions import ContextWindowExceededError
+from app.utils.tokens import estimate_messages_tokens, get_context_window, provider_family
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PreflightResult:
+    """请求发往上游前的token预估结果"""
+
+    __slots__ = ("prompt_tokens", "max_tokens", "context_window", "clamped")
+
+    def __init__(self, prompt_tokens: int, max_tokens: Optional[int], context_window: Optional[int], clamped: bool = False):
+        self.prompt_tokens = prompt_tokens
+        self.max_tokens = max_tokens
+        self.context_window = context_window
+        self.clamped = clamped
+
+
+def count_prompt_tokens(provider: str, messages: List[Dict[str, Any]], system: Optional[str] = None) -> int:
+    """按上游提供商的分词器估算提示词token数"""
+    return estimate_messages_tokens(messages, provider_family(provider), system=system)
+
+
+def preflight_check(
+    provider: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    max_tokens: Optional[int],
+    system: Optional[str] = None
+) -> PreflightResult:
+    """检查请求能否放入模型的上下文窗口，必要时缩小max_tokens
+
+    token数是本地估算值，按context_estimate_margin少算后再与窗口比较，避免误拒绝实际放得下的请求。
+    """
+    prompt_tokens = count_prompt_tokens(provider, messages, system)
+    context_window = get_context_window(model)
+    if context_window is None:
+        return PreflightResult(prompt_tokens, max_tokens, None)
+
+    lower_bound = int(prompt_tokens * (1 - settings.context_estimate_margin))
+    if lower_bound >= context_window:
+        raise ContextWindowExceededError(
+            f"Prompt is too long for model {model}: ~{prompt_tokens} tokens, context window is {context_window}"
+        )
+
+    if max_tokens is None or lower_bound + max_tokens <= context_window:
+        return PreflightResult(prompt_tokens, max_tokens, context_window)
+
+    if settings.context_overflow_policy == "reject":
+        raise ContextWindowExceededError(
+            f"Prompt (~{prompt_tokens} tokens) plus max_tokens ({max_tokens}) exceeds "
+            f"the {context_window}-token context window of model {model}"
+        )
+
+    clamped = context_window - lower_bound
+    logger.info(f"Clamped max_tokens for {model} from {max_tokens} to {clamped}")
+    return PreflightResult(prompt_tokens, clamped, context_window, clamped=True)
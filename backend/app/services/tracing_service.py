@@ -0,0 +1,456 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, NamedTuple, Optional
+from app.config import settings
+import asyncio
+import json
+import random
+import re
+import time
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+# W3C Trace Context请求头
+TRACEPARENT_HEADER = "traceparent"
+
+# 不创建服务端span的路径（探活和指标抓取）
+UNTRACED_PATHS = frozenset({"/health", "/ready", "/metrics", "/api/v1/health"})
+
+_TRACEPARENT_PATTERN = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$")
+
+# 请求中记录上游请求发出时间的扩展字段，收到响应头时据此生成upstream.connect span
+_CONNECT_STARTED = "llmbridge_connect_started"
+
+
+class SpanKind:
+    """OTLP的span类型取值"""
+    INTERNAL = 1
+    SERVER = 2
+    CLIENT = 3
+
+
+class SpanContext(NamedTuple):
+    """跨进程传播的追踪上下文"""
+    trace_id: int
+    span_id: int
+    sampled: bool
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """解析traceparent请求头，格式不合法时返回None（按没有上游调用方处理）"""
+    if not value:
+        return None
+    match = _TRACEPARENT_PATTERN.match(value.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags, rest = match.groups()
+    if version == "ff" or (version == "00" and rest):
+        return None
+    context = SpanContext(int(trace_id, 16), int(span_id, 16), bool(int(flags, 16) & 1))
+    if not context.trace_id or not context.span_id:
+        return None
+    return context
+
+
+def format_traceparent(context: SpanContext) -> str:
+    return f"00-{context.trace_id:032x}-{context.span_id:016x}-{'01' if context.sampled else '00'}"
+
+
+def _random_id(bits: int) -> int:
+    return random.getrandbits(bits) or 1
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class Span:
+    """一次被采样的操作，结束后进入导出队列"""
+
+    __slots__ = (
+        "name", "context", "parent_span_id", "kind", "attributes", "events",
+        "start_ns", "end_ns", "error", "_exporter"
+    )
+
+    recording = True
+
+    def __init__(
+        self,
+        exporter: "SpanExporter",
+        name: str,
+        context: SpanContext,
+        parent_span_id: Optional[int],
+        kind: int,
+        attributes: Optional[Dict[str, Any]],
+        start_ns: Optional[int]
+    ):
+        self.name = name
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes else {}
+        self.events: List[Dict[str, Any]] = []
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self._exporter = exporter
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes or {}})
+
+    def end(self, error: Optional[BaseException] = None):
+        """结束span；传入异常时标记为失败。重复调用只有第一次生效"""
+        if self.end_ns is not None:
+            return
+        if error is not None:
+            self.error = str(error) or type(error).__name__
+            self.add_event("exception", {"exception.type": type(error).__name__, "exception.message": str(error)})
+        self.end_ns = time.time_ns()
+        self._exporter.enqueue(self)
+
+    def mark_error(self, message: str):
+        """标记为失败但不结束span（如返回5xx响应）"""
+        self.error = message
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON编码"""
+        span = {
+            "traceId": f"{self.context.trace_id:032x}",
+            "spanId": f"{self.context.span_id:016x}",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "events": [
+                {"name": event["name"], "timeUnixNano": str(event["time_ns"]), "attributes": _otlp_attributes(event["attributes"])}
+                for event in self.events
+            ],
+            # 1=OK 2=ERROR
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = f"{self.parent_span_id:016x}"
+        return span
+
+
+class NonRecordingSpan:
+    """未采样（或未开启追踪）时的span：不记录任何数据，只携带需要继续传播的追踪上下文"""
+
+    __slots__ = ("context",)
+
+    recording = False
+
+    def __init__(self, context: Optional[SpanContext]):
+        self.context = context
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        pass
+
+    def end(self, error: Optional[BaseException] = None):
+        pass
+
+    def mark_error(self, message: str):
+        pass
+
+
+_NO_CONTEXT_SPAN = NonRecordingSpan(None)
+
+# 当前请求中正在执行的span，子任务（wait_for、并发拆分等）继承这个上下文
+_current_span: ContextVar[Optional[Any]] = ContextVar("llmbridge_current_span", default=None)
+
+
+def current_span():
+    return _current_span.get()
+
+
+class Tracer:
+    """创建span并决定是否采样
+
+    - 有上游调用方的traceparent时沿用其采样决定（parent-based），否则按 tracing_sample_rate 抽样
+    - 未采样的span只是一个携带上下文的空对象，开启追踪的开销只在被采样的请求上
+    - tracing_exporter 为 none 时不记录span，但仍把收到的traceparent原样传给上游
+    """
+
+    def __init__(self, exporter: "SpanExporter"):
+        self.exporter = exporter
+
+    def start_span(
+        self,
+        name: str,
+        kind: int = SpanKind.INTERNAL,
+        parent: Optional[SpanContext] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        start_ns: Optional[int] = None
+    ):
+        """创建span（不设为当前span）；未指定parent时以当前span为父span"""
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current is not None else None
+
+        if settings.tracing_exporter == "none":
+            return NonRecordingSpan(parent) if parent is not None else _NO_CONTEXT_SPAN
+        if parent is not None:
+            if not parent.sampled:
+                return NonRecordingSpan(parent)
+            trace_id, parent_span_id = parent.trace_id, parent.span_id
+        else:
+            if random.random() >= settings.tracing_sample_rate:
+                return NonRecordingSpan(SpanContext(_random_id(128), _random_id(64), False))
+            trace_id, parent_span_id = _random_id(128), None
+
+        context = SpanContext(trace_id, _random_id(64), True)
+        return Span(self.exporter, name, context, parent_span_id, kind, attributes, start_ns)
+
+    @contextmanager
+    def span(self, name: str, kind: int = SpanKind.INTERNAL, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+        """在代码块内执行一个span，代码块内创建的span以它为父span"""
+        span = self.start_span(name, kind, attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(error=e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    @contextmanager
+    def use_span(self, span) -> Iterator[Any]:
+        """在代码块内把已有的span设为当前span（不结束它），用于跨越多个步骤的span"""
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+
+
+class FileSpanExporter:
+    """每批span追加为一行OTLP/JSON（与OpenTelemetry Collector的file exporter格式相同），用于测试和本地排查"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _append(self, line: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    async def export(self, payload: Dict[str, Any]):
+        await asyncio.to_thread(self._append, json.dumps(payload, ensure_ascii=False) + "\n")
+
+    async def close(self):
+        pass
+
+
+class OTLPHttpExporter:
+    """以OTLP/HTTP（JSON编码）发送到collector，如本地的 http://localhost:4318/v1/traces"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self._client = httpx.AsyncClient(timeout=10.0)
+
+    async def export(self, payload: Dict[str, Any]):
+        response = await self._client.post(self.endpoint, json=payload)
+        response.raise_for_status()
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class SpanExporter:
+    """结束的span先进入内存队列，由后台任务按批导出，请求路径上不做任何I/O
+
+    队列满时丢弃新的span并计数，导出失败的批次同样丢弃，不影响代理请求。
+    """
+
+    def __init__(self):
+        self._queue: Deque[Span] = deque()
+        self._backend = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def enqueue(self, span: Span):
+        if len(self._queue) >= settings.tracing_max_queue_size:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        if self._wakeup is not None and len(self._queue) >= settings.tracing_max_export_batch:
+            self._wakeup.set()
+
+    def _get_backend(self):
+        if self._backend is None:
+            if settings.tracing_exporter == "otlp":
+                self._backend = OTLPHttpExporter(settings.tracing_otlp_endpoint)
+            elif settings.tracing_exporter == "file":
+                self._backend = FileSpanExporter(settings.tracing_file_path)
+        return self._backend
+
+    @staticmethod
+    def _payload(spans: List[Span]) -> Dict[str, Any]:
+        resource = {"service.name": settings.tracing_service_name, "service.version": settings.app_version}
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes(resource)},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans]}],
+            }]
+        }
+
+    async def flush(self):
+        """导出队列中的全部span"""
+        backend = self._get_backend()
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(len(self._queue), settings.tracing_max_export_batch))]
+            if backend is None:
+                continue
+            try:
+                await backend.export(self._payload(batch))
+                self.exported += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning(f"Failed to export {len(batch)} spans: {e}")
+
+    def start(self):
+        """启动定期导出任务（未开启追踪时不启动）"""
+        if settings.tracing_exporter == "none" or (self._task and not self._task.done()):
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.tracing_export_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def shutdown(self):
+        """停止导出任务并导出剩余的span"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._wakeup = None
+        await self.flush()
+        if self._backend is not None:
+            await self._backend.close()
+            self._backend = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exporter": settings.tracing_exporter,
+            "sample_rate": settings.tracing_sample_rate,
+            "queued": len(self._queue),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def reset(self):
+        """清空队列和计数（用于测试）"""
+        self._queue.clear()
+        self._backend = None
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+
+async def _inject_traceparent(request: httpx.Request):
+    span = _current_span.get()
+    if span is None or span.context is None:
+        return
+    request.headers[TRACEPARENT_HEADER] = format_traceparent(span.context)
+    if span.recording:
+        request.extensions[_CONNECT_STARTED] = time.time_ns()
+
+
+async def _record_connect(response: httpx.Response):
+    started = response.request.extensions.get(_CONNECT_STARTED)
+    if started is None:
+        return
+    span = tracer.start_span(
+        "upstream.connect", SpanKind.INTERNAL,
+        attributes={"server.address": response.request.url.host, "http.response.status_code": response.status_code},
+        start_ns=started
+    )
+    span.end()
+
+
+def instrument_client(client: httpx.AsyncClient):
+    """给上游HTTP客户端加上追踪：请求头携带当前span的traceparent，收到响应头时记录upstream.connect span"""
+    hooks = client.event_hooks
+    hooks["request"].append(_inject_traceparent)
+    hooks["response"].append(_record_connect)
+    client.event_hooks = hooks
+
+
+class TracingMiddleware:
+    """为每个HTTP请求创建服务端span：延续请求头中的traceparent，流式响应发送完毕后才结束"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNTRACED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        inbound = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                inbound = parse_traceparent(value.decode("latin-1"))
+                break
+        method = scope["method"]
+        span = tracer.start_span(
+            f"{method} {scope['path']}", SpanKind.SERVER, parent=inbound,
+            attributes={"http.request.method": method, "url.path": scope["path"]}
+        )
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.mark_error(f"HTTP {message['status']}")
+                route = scope.get("route")
+                if span.recording and getattr(route, "path", None):
+                    span.name = f"{method} {route.path}"
+                    span.set_attribute("http.route", route.path)
+            await send(message)
+
+        token = _current_span.set(span)
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as e:
+            span.end(error=e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+
+span_exporter = SpanExporter()
+tracer = Tracer(span_exporter)
@@ -0,0 +1,137 @@
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.models.model_config import ModelConfig
+from app.utils.tokens import estimate_message_tokens, estimate_messages_tokens, get_context_window, provider_family
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRIM_STRATEGIES = ("drop", "elide")
+
+# elide策略在保留的第一条消息前加入的说明
+ELIDED_NOTE = "[{count} earlier messages omitted]"
+
+
+class TrimResult:
+    """对话裁剪结果"""
+
+    __slots__ = ("messages", "removed", "strategy", "tokens_before", "tokens_after")
+
+    def __init__(self, messages: List[Dict[str, Any]], removed: int, strategy: str, tokens_before: int, tokens_after: int):
+        self.messages = messages
+        self.removed = removed
+        self.strategy = strategy
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+
+    @property
+    def trimmed(self) -> bool:
+        return self.removed > 0
+
+    def header_value(self) -> str:
+        """响应头中报告的裁剪情况"""
+        return f"strategy={self.strategy}; removed={self.removed}; tokens={self.tokens_before}->{self.tokens_after}"
+
+
+def _elide(message: Dict[str, Any], count: int) -> Dict[str, Any]:
+    """在消息内容前加入省略说明（不修改原消息）"""
+    note = ELIDED_NOTE.format(count=count)
+    content = message.get("content")
+    if isinstance(content, list):
+        return {**message, "content": [{"type": "text", "text": note}, *content]}
+    return {**message, "content": f"{note}\n\n{content or ''}"}
+
+
+def trim_messages(
+    messages: List[Dict[str, Any]],
+    family: str,
+    budget: int,
+    keep_turns: int,
+    strategy: str = "drop",
+    system: Optional[str] = None
+) -> TrimResult:
+    """裁剪对话直到估算的提示词token数不超过budget
+
+    系统消息和最后keep_turns轮对话（从倒数第keep_turns条user消息开始）始终保留，
+    中间的轮次从最早的开始整轮移除，保证保留部分仍以user消息开头、角色交替不被打乱。
+    drop直接移除；elide在保留的第一条消息前注明省略了多少条消息。
+    保留部分本身超出预算时不再继续裁剪，由上下文窗口预检处理。
+    """
+    sizes = [estimate_message_tokens(message, family) for message in messages]
+    base = estimate_messages_tokens([], family, system=system)
+    total = base + sum(sizes)
+    if total <= budget:
+        return TrimResult(messages, 0, strategy, total, total)
+
+    # 最后keep_turns轮的起点；没有user消息时至少保留最后一条消息
+    protected_start = max(len(messages) - 1, 0)
+    seen = 0
+    for index in range(len(messages) - 1, -1, -1):
+        if messages[index].get("role") == "user":
+            protected_start = index
+            seen += 1
+            if seen >= keep_turns:
+                break
+
+    tokens_before = total
+    removed = 0
+    cut = 0
+    for index in range(protected_start):
+        role = messages[index].get("role")
+        # 只在轮次边界停止，避免留下没有对应提问的回复
+        if total <= budget and role == "user":
+            break
+        if role != "system":
+            total -= sizes[index]
+            removed += 1
+        cut = index + 1
+
+    if not removed:
+        return TrimResult(messages, 0, strategy, tokens_before, tokens_before)
+
+    kept = [message for message in messages[:cut] if message.get("role") == "system"]
+    rest = messages[cut:]
+    if strategy == "elide" and rest:
+        first = _elide(rest[0], removed)
+        total += estimate_message_tokens(first, family) - sizes[cut]
+        rest = [first, *rest[1:]]
+    kept.extend(rest)
+
+    return TrimResult(kept, removed, strategy, tokens_before, total)
+
+
+def trim_for_config(
+    config: ModelConfig,
+    provider: Optional[str],
+    model: str,
+    messages: List[Dict[str, Any]],
+    max_tokens: Optional[int],
+    system: Optional[str] = None
+) -> Optional[TrimResult]:
+    """按模型配置的裁剪策略裁剪对话（未开启或无法确定预算时返回None）
+
+    预算取配置的trim_token_budget与 (上下文窗口 - max_tokens) 中较小的一个。
+    """
+    if config.trim_strategy not in TRIM_STRATEGIES:
+        return None
+
+    budgets = []
+    if config.trim_token_budget:
+        budgets.append(config.trim_token_budget)
+    context_window = get_context_window(model)
+    if context_window:
+        budgets.append(context_window - (max_tokens or settings.token_quota_default_max_tokens))
+    if not budgets:
+        return None
+
+    result = trim_messages(
+        messages,
+        provider_family(provider),
+        budget=max(min(budgets), 0),
+        keep_turns=config.trim_keep_turns or settings.trim_default_keep_turns,
+        strategy=config.trim_strategy,
+        system=system
+    )
+    if result.trimmed:
+        logger.info(f"Trimmed {result.removed} messages for config {config.id}: {result.header_value()}")
+    return result
@@ -0,0 +1,191 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, func
+from typing import Dict, List, Optional, Any
+from datetime import datetime, timedelta
+from app.models.credential import Credential
+from app.models.model_config import ModelConfig
+from app.models.user import User
+from app.models.usage_rollup import (
+    UsageRollupMinute,
+    UsageRollupHour,
+    UsageRollupDay,
+    LATENCY_BUCKETS_MS,
+    LATENCY_BUCKET_COLUMNS
+)
+from app.utils.db import upsert_increment
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_MODELS = {
+    "minute": UsageRollupMinute,
+    "hour": UsageRollupHour,
+    "day": UsageRollupDay,
+}
+
+# 每种粒度单次查询允许的最大时间范围，保证查询行数有上限
+MAX_RANGE = {
+    "minute": timedelta(days=1),
+    "hour": timedelta(days=31),
+    "day": timedelta(days=366),
+}
+
+COUNTER_COLUMNS = (
+    "request_count",
+    "error_count",
+    "prompt_tokens",
+    "completion_tokens",
+    "latency_ms_sum",
+) + LATENCY_BUCKET_COLUMNS
+
+
+def truncate_time(moment: datetime, granularity: str) -> datetime:
+    """将时间截断到桶起点"""
+    if granularity == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def latency_bucket_column(response_time_ms: int) -> str:
+    """获取延迟所属的直方图桶"""
+    for bound, column in zip(LATENCY_BUCKETS_MS, LATENCY_BUCKET_COLUMNS):
+        if response_time_ms <= bound:
+            return column
+    return LATENCY_BUCKET_COLUMNS[-1]
+
+
+def estimate_percentile(buckets: Dict[str, int], quantile: float) -> Optional[int]:
+    """根据直方图估算延迟分位数（返回所在桶的上界，超出最大桶时返回None）"""
+    total = sum(buckets.get(column, 0) for column in LATENCY_BUCKET_COLUMNS)
+    if total == 0:
+        return None
+
+    target = total * quantile
+    cumulative = 0
+    for bound, column in zip(LATENCY_BUCKETS_MS, LATENCY_BUCKET_COLUMNS):
+        cumulative += buckets.get(column, 0)
+        if cumulative >= target:
+            return bound
+    return None
+
+
+def record_usage(
+    db: Session,
+    model_config_id: str,
+    status_code: int,
+    response_time_ms: int,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    timestamp: Optional[datetime] = None
+):
+    """将一条请求记录累加到分钟/小时/天汇总（不提交事务，由日志写入方一起提交）"""
+    timestamp = timestamp or datetime.utcnow()
+    increments = {
+        "request_count": 1,
+        "error_count": 1 if status_code >= 400 else 0,
+        "prompt_tokens": prompt_tokens or 0,
+        "completion_tokens": completion_tokens or 0,
+        "latency_ms_sum": response_time_ms or 0,
+        latency_bucket_column(response_time_ms or 0): 1,
+    }
+
+    for granularity, model in ROLLUP_MODELS.items():
+        key = {
+            "model_config_id": model_config_id,
+            "bucket_start": truncate_time(timestamp, granularity),
+        }
+        upsert_increment(db, model, key, increments, defaults={column: 0 for column in COUNTER_COLUMNS})
+
+
+def delete_config_usage(db: Session, model_config_id: str):
+    """删除模型配置的所有汇总数据（不提交事务）"""
+    for model in ROLLUP_MODELS.values():
+        db.query(model).filter(model.model_config_id == model_config_id).delete(synchronize_session=False)
+
+
+def _summarize(row: Dict[str, Any]) -> Dict[str, Any]:
+    """由计数字段计算派生指标"""
+    request_count = row.get("request_count") or 0
+    return {
+        "request_count": request_count,
+        "error_count": row.get("error_count") or 0,
+        "prompt_tokens": row.get("prompt_tokens") or 0,
+        "completion_tokens": row.get("completion_tokens") or 0,
+        "avg_latency_ms": round((row.get("latency_ms_sum") or 0) / request_count, 1) if request_count else None,
+        "p50_latency_ms": estimate_percentile(row, 0.5),
+        "p95_latency_ms": estimate_percentile(row, 0.95),
+        "latency_histogram": {column: row.get(column) or 0 for column in LATENCY_BUCKET_COLUMNS},
+    }
+
+
+class UsageService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _user_config_ids(self, user: User, config_id: Optional[str] = None) -> List[str]:
+        """获取用户的模型配置ID"""
+        query = self.db.query(ModelConfig.id).join(Credential).filter(Credential.user_id == user.id)
+        if config_id:
+            query = query.filter(ModelConfig.id == config_id)
+        return [row[0] for row in query.all()]
+
+    def get_series(
+        self,
+        user: User,
+        granularity: str,
+        start: datetime,
+        end: datetime,
+        config_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """按时间桶获取用量序列（多个配置合并）"""
+        model = ROLLUP_MODELS[granularity]
+        if end - start > MAX_RANGE[granularity]:
+            start = end - MAX_RANGE[granularity]
+
+        config_ids = self._user_config_ids(user, config_id)
+        if not config_ids:
+            return []
+
+        columns = [func.sum(getattr(model, column)).label(column) for column in COUNTER_COLUMNS]
+        rows = self.db.query(model.bucket_start, *columns).filter(
+            and_(
+                model.model_config_id.in_(config_ids),
+                model.bucket_start >= truncate_time(start, granularity),
+                model.bucket_start <= end
+            )
+        ).group_by(model.bucket_start).order_by(model.bucket_start).all()
+
+        return [
+            {"bucket_start": row.bucket_start, **_summarize(row._asdict())}
+            for row in rows
+        ]
+
+    def get_summary(self, user: User, hours: int = 24) -> Dict[str, Any]:
+        """获取最近若干小时的用量汇总（基于小时汇总，每个配置最多读取hours+1行）"""
+        now = datetime.utcnow()
+        start = truncate_time(now - timedelta(hours=hours), "hour")
+
+        config_ids = self._user_config_ids(user)
+        if not config_ids:
+            return {"hours": hours, **_summarize({}), "by_config": {}}
+
+        model = UsageRollupHour
+        columns = [func.sum(getattr(model, column)).label(column) for column in COUNTER_COLUMNS]
+        rows = self.db.query(model.model_config_id, *columns).filter(
+            and_(
+                model.model_config_id.in_(config_ids),
+                model.bucket_start >= start
+            )
+        ).group_by(model.model_config_id).all()
+
+        totals = {column: 0 for column in COUNTER_COLUMNS}
+        by_config = {}
+        for row in rows:
+            data = row._asdict()
+            for column in COUNTER_COLUMNS:
+                totals[column] += data.get(column) or 0
+            by_config[row.model_config_id] = _summarize(data)
+
+        return {"hours": hours, **_summarize(totals), "by_config": by_config}
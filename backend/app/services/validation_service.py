@@ -0,0 +1,141 @@
+from typing import Dict, Optional
+from datetime import datetime
+from app.database import SessionLocal
+from app.config import settings
+from app.models.credential import Credential
+from app.schemas.credential import CredentialValidate, CredentialValidationJob
+from app.services.credential_service import CredentialService
+import asyncio
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ValidationJob:
+    """单个凭证的后台验证任务"""
+
+    def __init__(self, credential_id: str, force: bool = False):
+        self.id = str(uuid.uuid4())
+        self.credential_id = credential_id
+        self.force = force
+        self.status = "pending"
+        self.total_models = 0
+        self.completed_models = 0
+        self.reused_models = 0
+        self.result: Optional[CredentialValidate] = None
+        self.error_message: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self._done = asyncio.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def record_model_done(self, reused: bool = False):
+        """记录一个模型验证完成"""
+        self.completed_models += 1
+        if reused:
+            self.reused_models += 1
+
+    def finish(self, result: Optional[CredentialValidate] = None, error_message: Optional[str] = None):
+        """结束任务并唤醒等待者"""
+        self.result = result
+        self.error_message = error_message
+        self.status = "failed" if error_message else "completed"
+        self.finished_at = datetime.utcnow()
+        self._done.set()
+
+    async def wait(self) -> CredentialValidate:
+        """等待任务完成"""
+        await self._done.wait()
+        if self.result is None:
+            return CredentialValidate(is_valid=False, error_message=self.error_message)
+        return self.result
+
+    def to_response(self) -> CredentialValidationJob:
+        return CredentialValidationJob(
+            id=self.id,
+            credential_id=self.credential_id,
+            status=self.status,
+            force=self.force,
+            total_models=self.total_models,
+            completed_models=self.completed_models,
+            reused_models=self.reused_models,
+            result=self.result,
+            error_message=self.error_message,
+            created_at=self.created_at,
+            finished_at=self.finished_at
+        )
+
+
+class ValidationJobQueue:
+    """凭证验证任务队列
+
+    - 同一凭证同时只运行一个验证任务，重复提交直接返回正在运行的任务
+    - 所有任务共享一个全局模型探测并发上限
+    - 每个凭证只保留最近一次任务，供前端轮询进度
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._jobs: Dict[str, ValidationJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取当前事件循环上的探测信号量"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def submit(self, credential_id: str, force: bool = False) -> ValidationJob:
+        """提交验证任务（已有运行中的任务时直接复用）"""
+        existing = self._jobs.get(credential_id)
+        if existing and not existing.is_finished:
+            return existing
+
+        job = ValidationJob(credential_id, force=force)
+        self._jobs[credential_id] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    def get_latest(self, credential_id: str) -> Optional[ValidationJob]:
+        """获取凭证最近一次验证任务"""
+        return self._jobs.get(credential_id)
+
+    def discard(self, credential_id: str):
+        """丢弃凭证的任务记录（凭证删除时调用）"""
+        self._jobs.pop(credential_id, None)
+
+    async def _run(self, job: ValidationJob):
+        """执行验证任务"""
+        db = SessionLocal()
+        try:
+            credential = db.query(Credential).filter(Credential.id == job.credential_id).first()
+            if not credential:
+                job.finish(error_message="Credential not found")
+                return
+
+            job.status = "running"
+            result = await CredentialService(db).run_validation(
+                credential,
+                semaphore=self._get_semaphore(),
+                job=job,
+                force=job.force
+            )
+            job.finish(result=result)
+        except Exception as e:
+            logger.error(f"Validation job {job.id} failed: {e}")
+            job.finish(error_message=str(e))
+        finally:
+            db.close()
+
+
+validation_queue = ValidationJobQueue(max_concurrency=settings.validation_max_concurrency)
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheEntry:
+    __slots__ = ("value", "fetched_at")
+
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+
+
+class AsyncTTLCache:
+    """带过期时间的异步缓存
+
+    - 新鲜期(ttl)内直接返回缓存值
+    - 过期后的宽限期(stale)内先返回旧值，同时在后台刷新（stale-while-revalidate）
+    - 同一个键的并发加载只会触发一次上游请求（single-flight）
+    - 加载期间键被删除时丢弃加载结果，不会把旧值写回缓存
+    - 按LRU淘汰，条目数不超过max_entries
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, stale_seconds: float = 0, max_entries: int = 1024):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # 有加载进行中的键被删除的次数，加载完成时与开始时不同则丢弃结果
+        self._generations: Dict[Hashable, int] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_errors = 0
+
+    async def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        force: bool = False
+    ) -> Any:
+        """获取缓存值，必要时调用loader加载"""
+        entry = self._entries.get(key)
+        if entry is not None and not force:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl_seconds:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if age < self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._start_load(key, loader)
+                return entry.value
+
+        self.misses += 1
+        return await asyncio.shield(self._start_load(key, loader))
+
+    def _start_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """启动（或复用进行中的）加载任务"""
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            return task
+
+        task = asyncio.create_task(self._load(key, loader, self._generations.get(key, 0)))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._on_load_done(key, t))
+        return task
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], generation: int) -> Any:
+        self.loads += 1
+        value = await loader()
+        if self._generations.get(key, 0) == generation:
+            self.set(key, value)
+        return value
+
+    def _on_load_done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            self._inflight.pop(key, None)
+            self._generations.pop(key, None)
+        elif key not in self._inflight:
+            self._generations.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self.load_errors += 1
+            logger.warning(f"Cache '{self.name}' failed to load {key!r}: {task.exception()}")
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """读取缓存值（不触发加载，不区分是否过期）"""
+        entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def set(self, key: Hashable, value: Any):
+        """写入缓存值"""
+        self._entries[key] = _CacheEntry(value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """删除缓存值；进行中的加载结果不再写入，之后的读取重新加载"""
+        self._entries.pop(key, None)
+        if self._inflight.pop(key, None) is not None:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        for key in list(self._inflight):
+            self.invalidate(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+        }
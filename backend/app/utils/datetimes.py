@@ -0,0 +1,9 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """带时区的时间转换为UTC并去掉时区，与数据库中的无时区UTC时间比较"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
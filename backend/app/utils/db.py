@@ -0,0 +1,41 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Optional
+
+
+def upsert_increment(
+    db: Session,
+    model,
+    key: Dict[str, Any],
+    increments: Dict[str, int],
+    defaults: Optional[Dict[str, Any]] = None
+):
+    """按主键累加计数列，行不存在时插入（不提交事务）
+
+    SQLite和PostgreSQL使用 INSERT ... ON CONFLICT DO UPDATE 原子完成，
+    其他数据库退回到先更新、不存在再插入。
+    """
+    values = dict(defaults or {})
+    values.update(increments)
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        table = model.__table__
+        stmt = insert(model).values(**key, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[column] for column in key],
+            set_={column: table.c[column] + stmt.excluded[column] for column in increments}
+        )
+        db.execute(stmt)
+        return
+
+    updated = db.query(model).filter_by(**key).update(
+        {getattr(model, column): getattr(model, column) + value for column, value in increments.items()},
+        synchronize_session=False
+    )
+    if not updated:
+        db.add(model(**key, **values))
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedExecutor:
+    """有界线程池执行器
+
+    用于把bcrypt、Fernet等CPU密集型操作移出事件循环。
+    并发数由信号量限制，超出的任务在事件循环上异步排队等待，不占用线程也不阻塞循环。
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # 队列指标
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.total_run_ms = 0.0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """延迟创建线程池"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=self.name
+            )
+        return self._pool
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取当前事件循环上的信号量（测试中可能存在多个事件循环）"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """在线程池中执行函数并等待结果"""
+        semaphore = self._get_semaphore()
+        enqueued_at = time.perf_counter()
+
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        wait_ms = (time.perf_counter() - enqueued_at) * 1000
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+        self.running += 1
+        started_at = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_pool(), func, *args)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self.total_run_ms += (time.perf_counter() - started_at) * 1000
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取队列指标"""
+        finished = self.completed + self.failed
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "waiting": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait_ms / finished, 3) if finished else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "avg_run_ms": round(self.total_run_ms / finished, 3) if finished else 0.0,
+        }
+
+    def shutdown(self, wait: bool = True):
+        """关闭线程池"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+
+# 加解密专用执行器（bcrypt、Fernet、JWT）
+crypto_executor = BoundedExecutor("crypto", max_workers=settings.crypto_executor_workers)
+
+
+async def run_crypto(func: Callable[..., Any], *args: Any) -> Any:
+    """在加解密执行器中运行函数"""
+    return await crypto_executor.run(func, *args)
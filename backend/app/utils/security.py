@@ -1,9 +1,14 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from cryptography.fernet import Fernet
 from app.config import settings
+from app.utils.executor import run_crypto
+import logging
+
+logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -49,16 +54,35 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
+@lru_cache(maxsize=4)
+def _get_fernet(encryption_key: str) -> Fernet:
+    """获取Fernet实例（按密钥缓存，避免每次调用重新派生）"""
+    return Fernet(encryption_key.encode())
+
+
+def get_encryption_key() -> str:
+    """获取API密钥加密密钥，未配置时生成临时密钥（重启或多进程之间无法解密，仅适用于开发环境）"""
+    if not settings.encryption_key:
+        settings.encryption_key = Fernet.generate_key().decode()
+        # 不记录密钥本身，日志可能被集中收集
+        logger.warning(
+            "ENCRYPTION_KEY is not set, generated a temporary key held in memory only (not persisted); "
+            "API keys encrypted with it cannot be decrypted after a restart. "
+            "Generate a key and set ENCRYPTION_KEY in your .env file"
+        )
+    return settings.encryption_key
+
+
 def encrypt_api_key(api_key: str) -> str:
     """加密API密钥"""
-    fernet = Fernet(settings.encryption_key.encode())
+    fernet = _get_fernet(get_encryption_key())
     encrypted = fernet.encrypt(api_key.encode())
     return encrypted.decode()
 
 
 def decrypt_api_key(encrypted_api_key: str) -> str:
     """解密API密钥"""
-    fernet = Fernet(settings.encryption_key.encode())
+    fernet = _get_fernet(get_encryption_key())
     decrypted = fernet.decrypt(encrypted_api_key.encode())
     return decrypted.decode()
 
@@ -66,4 +90,40 @@ def decrypt_api_key(encrypted_api_key: str) -> str:
 def generate_proxy_api_key() -> str:
     """生成代理API密钥"""
     import secrets
-    return f"llmb_{''.join(secrets.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(32))}"
\ No newline at end of file
+    return f"llmb_{''.join(secrets.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(32))}"
+
+
+# 异步版本：在加解密执行器中运行，避免阻塞事件循环
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """异步验证密码"""
+    return await run_crypto(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """异步生成密码哈希"""
+    return await run_crypto(get_password_hash, password)
+
+
+async def encrypt_api_key_async(api_key: str) -> str:
+    """异步加密API密钥"""
+    return await run_crypto(encrypt_api_key, api_key)
+
+
+async def decrypt_api_key_async(encrypted_api_key: str) -> str:
+    """异步解密API密钥"""
+    return await run_crypto(decrypt_api_key, encrypted_api_key)
+
+
+async def create_token_pair_async(data: dict) -> tuple[str, str]:
+    """异步创建访问令牌和刷新令牌"""
+
+    def _create_pair() -> tuple[str, str]:
+        return create_access_token(data=data), create_refresh_token(data=data)
+
+    return await run_crypto(_create_pair)
+
+
+async def verify_token_async(token: str) -> Optional[dict]:
+    """异步验证令牌"""
+    return await run_crypto(verify_token, token)
@@ -0,0 +1,219 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional
+import hashlib
+import math
+import re
+
+
+class TokenizerProfile(NamedTuple):
+    """某一类模型分词器的近似参数"""
+    chars_per_word_token: float  # 拉丁字母单词平均每个token的字符数
+    tokens_per_cjk_char: float  # 每个中日韩字符的token数
+    digits_per_token: int  # 连续数字每个token包含的位数
+    message_overhead: int  # 每条消息的角色与分隔符开销
+    reply_overhead: int  # 助手回复的起始标记开销
+
+
+# 各提供商分词器的近似值（与官方分词器的误差一般在10%以内）
+TOKENIZER_PROFILES: Dict[str, TokenizerProfile] = {
+    "openai": TokenizerProfile(4.0, 1.0, 3, 4, 3),
+    "anthropic": TokenizerProfile(3.5, 1.2, 3, 4, 3),
+    "gemini": TokenizerProfile(4.0, 0.8, 1, 4, 0),
+    "qwen": TokenizerProfile(4.0, 0.7, 1, 4, 3),
+    "ernie": TokenizerProfile(4.0, 0.7, 1, 4, 3),
+}
+DEFAULT_FAMILY = "openai"
+
+# 提供商到分词器家族的映射
+PROVIDER_FAMILIES = {
+    "openai": "openai",
+    "azure_openai": "openai",
+    "anthropic": "anthropic",
+    "claude_code": "anthropic",
+    "gemini": "gemini",
+    "qwen": "qwen",
+    "ernie": "ernie",
+}
+
+# 模型上下文窗口（按前缀匹配，取最长的前缀）
+# 裸前缀gpt-4只对应原始的8k模型，之后的128k版本（预览版、带日期的版本）需要单独登记
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4.5": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4-1106": 128000,
+    "gpt-4-0125": 128000,
+    "gpt-4-vision": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "o1": 200000,
+    "o3": 200000,
+    "claude": 200000,
+    "gemini-1.5-pro": 2097152,
+    "gemini-1.5-flash": 1048576,
+    "gemini-2": 1048576,
+    "gemini-pro": 32760,
+    "qwen-long": 10000000,
+    "qwen-max": 32768,
+    "qwen-plus": 131072,
+    "qwen-turbo": 131072,
+    "ernie-4.0": 8192,
+    "ernie-3.5": 8192,
+    "ernie-speed": 131072,
+}
+
+# 每种字符类别对应一个分组
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_PIECE_PATTERN = re.compile(
+    rf"(?P<cjk>[{_CJK}]+)|(?P<word>[^\W\d_{_CJK}]+)|(?P<digits>\d+)|(?P<symbol>[^\w\s]+|_+)"
+)
+
+
+def provider_family(provider: Optional[str]) -> str:
+    """获取提供商使用的分词器家族"""
+    return PROVIDER_FAMILIES.get(provider or "", DEFAULT_FAMILY)
+
+
+def get_context_window(model: Optional[str]) -> Optional[int]:
+    """获取模型的上下文窗口（未知模型返回None）"""
+    if not model:
+        return None
+    model = model.lower()
+    matches = [prefix for prefix in MODEL_CONTEXT_WINDOWS if model.startswith(prefix)]
+    if not matches:
+        return None
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+# 不超过该长度的文本直接以文本为键缓存（内存上限约为 2 × 8192 × 该长度 个字符），
+# 更长的文本（粘贴的文档等）只以摘要为键缓存，不保留文本本身
+SHORT_TEXT_MAX_CHARS = 1024
+
+
+class _DigestCache:
+    """以文本的blake2b摘要和长度为键的估算结果LRU，内存占用与文本大小无关"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, namespace: tuple, text: str, compute: Callable[[], int]) -> int:
+        digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        key = (namespace, digest, len(text))
+        value = self._entries.get(key)
+        if value is not None:
+            self.hits += 1
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                # 其他线程刚好淘汰了该条目
+                pass
+            return value
+
+        self.misses += 1
+        value = compute()
+        self._entries[key] = value
+        while len(self._entries) > self.max_entries:
+            try:
+                self._entries.popitem(last=False)
+            except KeyError:
+                break
+        return value
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_long_text_cache = _DigestCache(max_entries=8192)
+
+
+def _count_text(family: str, text: str) -> int:
+    profile = TOKENIZER_PROFILES.get(family, TOKENIZER_PROFILES[DEFAULT_FAMILY])
+    total = 0.0
+    for match in _PIECE_PATTERN.finditer(text):
+        size = match.end() - match.start()
+        if match.lastgroup == "cjk":
+            total += size * profile.tokens_per_cjk_char
+        elif match.lastgroup == "word":
+            total += math.ceil(size / profile.chars_per_word_token)
+        elif match.lastgroup == "digits":
+            total += math.ceil(size / profile.digits_per_token)
+        else:
+            total += math.ceil(size / 2)
+    return math.ceil(total)
+
+
+@lru_cache(maxsize=8192)
+def _count_short_text(family: str, text: str) -> int:
+    return _count_text(family, text)
+
+
+def estimate_text_tokens(text: str, family: str = DEFAULT_FAMILY) -> int:
+    """估算文本的token数（结果按文本缓存）"""
+    if not text:
+        return 0
+    if len(text) <= SHORT_TEXT_MAX_CHARS:
+        return _count_short_text(family, text)
+    return _long_text_cache.get((family,), text, lambda: _count_text(family, text))
+
+
+def _content_text(content: Any) -> str:
+    """提取消息内容中的文本（兼容内容块列表）"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(
+            part.get("text", "") for part in content
+            if isinstance(part, dict) and part.get("type", "text") == "text"
+        )
+    return "" if content is None else str(content)
+
+
+def _count_message(family: str, role: str, text: str) -> int:
+    profile = TOKENIZER_PROFILES.get(family, TOKENIZER_PROFILES[DEFAULT_FAMILY])
+    return profile.message_overhead + _count_text(family, role) + _count_text(family, text)
+
+
+@lru_cache(maxsize=8192)
+def _count_short_message(family: str, role: str, text: str) -> int:
+    return _count_message(family, role, text)
+
+
+def estimate_message_tokens(message: Dict[str, Any], family: str = DEFAULT_FAMILY) -> int:
+    """估算单条消息的token数（结果按消息缓存，多轮对话重复的历史消息不会重复计算）"""
+    role = message.get("role", "")
+    text = _content_text(message.get("content"))
+    if len(text) <= SHORT_TEXT_MAX_CHARS:
+        return _count_short_message(family, role, text)
+    return _long_text_cache.get((family, role), text, lambda: _count_message(family, role, text))
+
+
+def estimate_messages_tokens(
+    messages: List[Dict[str, Any]],
+    family: str = DEFAULT_FAMILY,
+    system: Optional[str] = None
+) -> int:
+    """估算消息列表的token数"""
+    profile = TOKENIZER_PROFILES.get(family, TOKENIZER_PROFILES[DEFAULT_FAMILY])
+    total = profile.reply_overhead
+    if system:
+        total += estimate_message_tokens({"role": "system", "content": system}, family)
+    for message in messages:
+        total += estimate_message_tokens(message, family)
+    return total
+
+
+def token_cache_info() -> Dict[str, Any]:
+    """估算缓存的命中情况"""
+    infos = [_count_short_text.cache_info(), _count_short_message.cache_info()]
+    return {
+        "name": "token_estimates",
+        "size": sum(info.currsize for info in infos) + len(_long_text_cache),
+        "hits": sum(info.hits for info in infos) + _long_text_cache.hits,
+        "misses": sum(info.misses for info in infos) + _long_text_cache.misses,
+    }
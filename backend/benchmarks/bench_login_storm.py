@@ -0,0 +1,69 @@
+"""
+登录风暴下的事件循环延迟基准测试
+
+对比在事件循环上同步执行bcrypt验证与通过加解密执行器执行时的循环延迟。
+运行方式（在backend目录下）：
+    python -m benchmarks.bench_login_storm --logins 40
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from app.utils.security import get_password_hash, verify_password, verify_password_async
+
+
+async def _measure_lag(stop: asyncio.Event, interval: float, samples: list):
+    """周期性调度回调，记录实际唤醒时间与计划时间的差值"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        scheduled = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append((loop.time() - scheduled) * 1000)
+
+
+async def _login_storm(hashed: str, logins: int, offload: bool):
+    """模拟并发登录"""
+    async def login():
+        if offload:
+            return await verify_password_async("password123", hashed)
+        return verify_password("password123", hashed)
+
+    return await asyncio.gather(*[login() for _ in range(logins)])
+
+
+async def run_scenario(hashed: str, logins: int, offload: bool) -> dict:
+    """运行单个场景并汇总延迟分位数"""
+    samples: list = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_measure_lag(stop, 0.005, samples))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    await _login_storm(hashed, logins, offload)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await monitor
+
+    samples.sort()
+    return {
+        "mode": "executor" if offload else "inline",
+        "logins": logins,
+        "elapsed_s": round(elapsed, 3),
+        "lag_p50_ms": round(statistics.median(samples), 2),
+        "lag_p99_ms": round(samples[int(len(samples) * 0.99) - 1], 2),
+        "lag_max_ms": round(samples[-1], 2),
+    }
+
+
+async def main(logins: int):
+    hashed = get_password_hash("password123")
+    for offload in (False, True):
+        print(await run_scenario(hashed, logins, offload))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="登录风暴事件循环延迟基准测试")
+    parser.add_argument("--logins", type=int, default=40, help="并发登录数")
+    args = parser.parse_args()
+    asyncio.run(main(args.logins))
@@ -0,0 +1,60 @@
+"""
+长对话裁剪耗时基准测试
+
+构造包含数百轮对话的历史，测量裁剪到给定token预算所需的时间（分词估算缓存预热后）。
+运行方式（在backend目录下）：
+    python -m benchmarks.bench_trim --turns 500 --budget 8000
+"""
+import argparse
+import statistics
+import time
+from app.services.trim_service import trim_messages
+
+
+def build_history(turns: int) -> list:
+    """构造系统提示 + turns轮中英文混合对话"""
+    messages = [{"role": "system", "content": "You are a helpful assistant. 请用简洁的语言回答。" * 10}]
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"第{turn}个问题：please explain item {turn} in detail，并给出示例。" * 3})
+        messages.append({"role": "assistant", "content": f"Answer {turn}: here is a long explanation of the item. " * 10})
+    return messages
+
+
+def run_scenario(messages: list, budget: int, strategy: str, rounds: int) -> dict:
+    """运行单个场景并汇总耗时分位数"""
+    # 第一次调用填充分词估算缓存，之后的请求只有新追加的消息需要估算
+    cold_started = time.perf_counter()
+    result = trim_messages(messages, "openai", budget, keep_turns=4, strategy=strategy)
+    cold_ms = (time.perf_counter() - cold_started) * 1000
+
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        trim_messages(messages, "openai", budget, keep_turns=4, strategy=strategy)
+        samples.append((time.perf_counter() - started) * 1000)
+
+    samples.sort()
+    return {
+        "strategy": strategy,
+        "messages": len(messages),
+        "removed": result.removed,
+        "tokens": f"{result.tokens_before}->{result.tokens_after}",
+        "cold_ms": round(cold_ms, 3),
+        "p50_ms": round(statistics.median(samples), 3),
+        "p99_ms": round(samples[int(len(samples) * 0.99) - 1], 3),
+    }
+
+
+def main(turns: int, budget: int, rounds: int):
+    messages = build_history(turns)
+    for strategy in ("drop", "elide"):
+        print(run_scenario(messages, budget, strategy, rounds))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="长对话裁剪耗时基准测试")
+    parser.add_argument("--turns", type=int, default=500, help="对话轮数")
+    parser.add_argument("--budget", type=int, default=8000, help="提示词token预算")
+    parser.add_argument("--rounds", type=int, default=500, help="测量次数")
+    args = parser.parse_args()
+    main(args.turns, args.budget, args.rounds)
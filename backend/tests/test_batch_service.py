@@ -0,0 +1,193 @@
+"""
+批处理服务测试用例
+"""
+import io
+import json
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.database import Base
+from app.models import User, Credential, ModelConfig, BatchJob
+from app.services import batch_service as batch_module
+from app.services.batch_service import BatchService, BatchRunner, _load_checkpoint
+from app.exceptions import BatchError, RateLimitError
+
+
+class FakeProxyService:
+    """模拟代理服务：按custom_id中的标记返回成功、失败或限流"""
+
+    calls = []
+
+    def __init__(self, db):
+        self.db = db
+
+    async def proxy_openai_request(self, proxy_api_key, request_data, priority=None):
+        content = request_data.messages[0]["content"]
+        FakeProxyService.calls.append(content)
+        if content == "fail":
+            raise ValueError("upstream error")
+        return {"id": "chatcmpl-1", "choices": [{"message": {"content": content}}]}
+
+    async def proxy_anthropic_request(self, proxy_api_key, request_data, priority=None):
+        content = request_data.messages[0]["content"]
+        FakeProxyService.calls.append(content)
+        if content == "limited":
+            raise RateLimitError("Rate limit exceeded")
+        return {"id": "msg_1", "type": "message", "content": [{"type": "text", "text": content}]}
+
+
+def _openai_line(custom_id: str, content: str) -> str:
+    return json.dumps({
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {"model": "gpt-4", "messages": [{"role": "user", "content": content}]}
+    })
+
+
+class TestBatchService:
+    """批处理服务测试"""
+
+    @pytest.fixture
+    def session_factory(self, tmp_path, monkeypatch):
+        """创建临时数据库并替换批处理模块依赖"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        monkeypatch.setattr(batch_module, "SessionLocal", factory)
+        monkeypatch.setattr(batch_module, "ProxyService", FakeProxyService)
+        monkeypatch.setattr(settings, "batch_storage_dir", str(tmp_path / "batches"))
+        monkeypatch.setattr(settings, "batch_retry_delay_seconds", 0)
+        FakeProxyService.calls = []
+        return factory
+
+    @pytest.fixture
+    def config(self, session_factory):
+        """创建模型配置"""
+        db = session_factory()
+        user = User(username="tester", email="tester@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        credential = Credential(user_id=user.id, name="c", provider="openai", api_key_encrypted="x")
+        db.add(credential)
+        db.flush()
+        config = ModelConfig(credential_id=credential.id, model_name="gpt-4", target_format="openai", proxy_api_key="llmb_test")
+        db.add(config)
+        db.commit()
+        db.refresh(config)
+        db.close()
+        return config
+
+    @pytest.mark.asyncio
+    async def test_rejects_invalid_input(self, session_factory, config):
+        """测试输入校验"""
+        db = session_factory()
+        service = BatchService(db)
+
+        duplicate = "\n".join([_openai_line("a", "x"), _openai_line("a", "y")])
+        with pytest.raises(BatchError, match="duplicate custom_id"):
+            await service.create_openai_batch(config, io.BytesIO(duplicate.encode()), "/v1/chat/completions")
+
+        with pytest.raises(BatchError, match="Invalid JSONL"):
+            await service.create_openai_batch(config, io.BytesIO(b"{not json"), "/v1/chat/completions")
+
+        streaming = json.dumps({
+            "custom_id": "a", "method": "POST", "url": "/v1/chat/completions",
+            "body": {"model": "gpt-4", "messages": [{"role": "user", "content": "x"}], "stream": True}
+        })
+        with pytest.raises(BatchError, match="streaming is not supported"):
+            await service.create_openai_batch(config, io.BytesIO(streaming.encode()), "/v1/chat/completions")
+
+        with pytest.raises(BatchError, match="Unsupported endpoint"):
+            await service.create_openai_batch(config, io.BytesIO(b""), "/v1/embeddings")
+
+        assert db.query(BatchJob).count() == 0
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_openai_batch_runs_to_completion(self, session_factory, config):
+        """测试OpenAI批处理执行并写入结果文件"""
+        db = session_factory()
+        service = BatchService(db)
+        data = "\n".join([_openai_line("a", "hello"), _openai_line("b", "fail"), _openai_line("c", "world")])
+        job = await service.create_openai_batch(config, io.BytesIO(data.encode()), "/v1/chat/completions")
+        assert job.total_count == 3
+
+        await BatchRunner()._run(job.id)
+
+        db.refresh(job)
+        assert job.status == "completed"
+        assert job.completed_count == 2
+        assert job.failed_count == 1
+
+        with open(job.output_file_path) as f:
+            lines = {line["custom_id"]: line for line in map(json.loads, f)}
+        assert lines["a"]["response"]["body"]["choices"][0]["message"]["content"] == "hello"
+        assert lines["b"]["error"]["code"] == "500"
+
+        rendered = service.to_openai_batch(job)
+        assert rendered["request_counts"] == {"total": 3, "completed": 2, "failed": 1}
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_resume_skips_checkpointed_items(self, session_factory, config):
+        """测试从检查点恢复时跳过已完成的请求，并截断不完整的行"""
+        db = session_factory()
+        service = BatchService(db)
+        data = "\n".join([_openai_line("a", "one"), _openai_line("b", "two")])
+        job = await service.create_openai_batch(config, io.BytesIO(data.encode()), "/v1/chat/completions")
+
+        with open(job.output_file_path, "w") as f:
+            f.write(json.dumps({"custom_id": "a", "response": {"status_code": 200}, "error": None}) + "\n")
+            f.write('{"custom_id": "b", "respo')
+
+        await BatchRunner()._run(job.id)
+
+        db.refresh(job)
+        assert FakeProxyService.calls == ["two"]
+        assert job.completed_count == 2
+        done_ids, succeeded, failed = _load_checkpoint(job.output_file_path, "openai")
+        assert done_ids == {"a", "b"}
+        assert (succeeded, failed) == (2, 0)
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_anthropic_batch_retries_rate_limit(self, session_factory, config, monkeypatch):
+        """测试Anthropic批处理在持续限流时记录错误"""
+        monkeypatch.setattr(settings, "batch_max_retries", 2)
+        db = session_factory()
+        service = BatchService(db)
+        requests = [
+            {"custom_id": "ok", "params": {"model": "claude", "messages": [{"role": "user", "content": "hi"}]}},
+            {"custom_id": "rl", "params": {"model": "claude", "messages": [{"role": "user", "content": "limited"}]}},
+        ]
+        job = await service.create_anthropic_batch(config, requests)
+
+        await BatchRunner()._run(job.id)
+
+        db.refresh(job)
+        assert FakeProxyService.calls.count("limited") == 3
+        rendered = service.to_anthropic_batch(job)
+        assert rendered["processing_status"] == "ended"
+        assert rendered["request_counts"]["succeeded"] == 1
+        assert rendered["request_counts"]["errored"] == 1
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_cancel_stops_dispatch(self, session_factory, config):
+        """测试取消后不再发出新请求"""
+        db = session_factory()
+        service = BatchService(db)
+        data = "\n".join([_openai_line(str(i), "x") for i in range(5)])
+        job = await service.create_openai_batch(config, io.BytesIO(data.encode()), "/v1/chat/completions")
+
+        runner = BatchRunner()
+        runner.cancel(job.id)
+        await runner._run(job.id)
+
+        db.refresh(job)
+        assert job.status == "cancelled"
+        assert FakeProxyService.calls == []
+        db.close()
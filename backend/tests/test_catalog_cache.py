@@ -0,0 +1,195 @@
+"""
+模型目录缓存测试用例
+"""
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import User, Credential, ModelConfig
+from app.utils.cache import AsyncTTLCache
+from app.utils.security import encrypt_api_key
+from app.services import catalog_service as catalog_module
+
+
+class TestAsyncTTLCache:
+    """异步TTL缓存测试"""
+
+    @pytest.mark.asyncio
+    async def test_single_flight(self):
+        """并发未命中只触发一次加载"""
+        cache = AsyncTTLCache("test", ttl_seconds=60)
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return ["gpt-4"]
+
+        results = await asyncio.gather(*[cache.get("key", loader) for _ in range(20)])
+
+        assert calls == 1
+        assert all(result == ["gpt-4"] for result in results)
+        assert cache.stats()["loads"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate(self):
+        """过期后先返回旧值，再在后台刷新"""
+        cache = AsyncTTLCache("test", ttl_seconds=0, stale_seconds=60)
+        cache.set("key", "old")
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            return "new"
+
+        assert await cache.get("key", loader) == "old"
+        await asyncio.sleep(0.05)
+        assert cache.peek("key") == "new"
+        assert cache.stats()["stale_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_load_error_not_cached(self):
+        """加载失败时抛出异常且不写入缓存"""
+        cache = AsyncTTLCache("test", ttl_seconds=60)
+
+        async def loader():
+            raise RuntimeError("upstream down")
+
+        with pytest.raises(RuntimeError):
+            await cache.get("key", loader)
+
+        assert cache.peek("key") is None
+        assert cache.stats()["load_errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidate_discards_inflight_load(self):
+        """加载期间删除键时不写回旧值，之后的读取重新加载"""
+        cache = AsyncTTLCache("test", ttl_seconds=0, stale_seconds=60)
+        cache.set("key", "old")
+        release = asyncio.Event()
+        values = iter(["stale", "fresh"])
+
+        async def loader():
+            value = next(values)
+            if value == "stale":
+                await release.wait()
+            return value
+
+        assert await cache.get("key", loader) == "old"
+        cache.invalidate("key")
+        release.set()
+        await asyncio.sleep(0.01)
+        assert cache.peek("key") is None
+
+        assert await cache.get("key", loader) == "fresh"
+        assert cache.peek("key") == "fresh"
+
+    def test_lru_eviction(self):
+        """超过容量时淘汰最久未使用的条目"""
+        cache = AsyncTTLCache("test", ttl_seconds=60, max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 3)
+
+        assert cache.peek("a") is None
+        assert cache.peek("c") == 3
+
+
+class FakeAdapter:
+    calls = 0
+
+    async def get_available_models(self):
+        FakeAdapter.calls += 1
+        await asyncio.sleep(0.01)
+        return ["model-a", "model-b"]
+
+    async def close(self):
+        pass
+
+
+class FakeFactory:
+    @staticmethod
+    def create_adapter(provider, api_key, api_url=None):
+        return FakeAdapter()
+
+
+class TestModelCatalog:
+    """凭证模型目录与代理模型列表缓存测试"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, monkeypatch):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        self.factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        monkeypatch.setattr(catalog_module, "SessionLocal", self.factory)
+        monkeypatch.setattr(catalog_module, "LLMAdapterFactory", FakeFactory)
+        catalog_module.model_catalog_cache.clear()
+        catalog_module.proxy_models_cache.clear()
+        FakeAdapter.calls = 0
+
+    def _create_config(self):
+        db = self.factory()
+        user = User(username="tester", email="tester@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        credential = Credential(
+            user_id=user.id,
+            name="openai",
+            provider="openai",
+            api_key_encrypted=encrypt_api_key("sk-test"),
+        )
+        db.add(credential)
+        db.flush()
+        config = ModelConfig(
+            credential_id=credential.id,
+            model_name="model-a",
+            target_format="openai",
+            proxy_api_key="llm-proxy-key",
+        )
+        db.add(config)
+        db.commit()
+        return db, credential, config
+
+    @pytest.mark.asyncio
+    async def test_catalog_cached_per_credential(self):
+        """并发获取目录只请求一次上游，强制刷新会重新请求"""
+        db, credential, _ = self._create_config()
+
+        results = await asyncio.gather(*[catalog_module.get_model_catalog(credential) for _ in range(10)])
+        assert FakeAdapter.calls == 1
+        assert results[0] == ["model-a", "model-b"]
+
+        await catalog_module.get_model_catalog(credential, force=True)
+        assert FakeAdapter.calls == 2
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_catalog_refetched_when_key_changes(self):
+        """更换API密钥后不再使用旧目录"""
+        db, credential, _ = self._create_config()
+
+        await catalog_module.get_model_catalog(credential)
+        credential.api_key_encrypted = encrypt_api_key("sk-other")
+        await catalog_module.get_model_catalog(credential)
+
+        assert FakeAdapter.calls == 2
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_proxy_models_cached_and_invalidated(self):
+        """代理模型列表命中缓存，配置变更后失效"""
+        db, _, config = self._create_config()
+
+        assert await catalog_module.get_proxy_models("llm-proxy-key") == ["model-a"]
+        assert await catalog_module.get_proxy_models("llm-proxy-key") == ["model-a"]
+        assert catalog_module.proxy_models_cache.stats()["loads"] == 1
+
+        config.is_enabled = False
+        db.commit()
+        catalog_module.invalidate_proxy_models("llm-proxy-key")
+
+        assert await catalog_module.get_proxy_models("llm-proxy-key") == []
+        assert catalog_module.proxy_models_cache.peek("llm-proxy-key") is None
+        db.close()
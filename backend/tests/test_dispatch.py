@@ -0,0 +1,210 @@
+"""
+(客户端格式 × 提供商) 转发表测试用例
+"""
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.adapters.factory import LLMAdapterFactory
+from app.adapters.ernie_adapter import ErnieAdapter
+from app.database import Base
+from app.models import User, Credential, ModelConfig
+from app.schemas.llm_request import OpenAIRequest, AnthropicRequest
+from app.services.dispatch_service import dispatch_table, CLIENT_FORMATS
+from app.services.proxy_service import ProxyService
+from app.utils.security import encrypt_api_key
+
+# 每个提供商的上游原生格式；新增提供商时需要在这里登记
+WIRE_FORMATS = {
+    "openai": "openai",
+    "azure_openai": "openai",
+    "anthropic": "anthropic",
+    "claude_code": "anthropic",
+    "gemini": "gemini",
+    "qwen": "qwen",
+    "ernie": "ernie",
+}
+
+MATRIX = [(client_format, provider) for client_format in CLIENT_FORMATS for provider in WIRE_FORMATS]
+
+API_KEYS = {"claude_code": "cr_test", "ernie": "ak:sk"}
+API_URLS = {"azure_openai": "https://example.openai.azure.com"}
+
+# 各上游原生格式的完整响应（内容均为 pong，用量 3 + 1）
+NATIVE_RESPONSES = {
+    "openai": {
+        "id": "chatcmpl-1", "model": "m",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "pong"}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4}
+    },
+    "anthropic": {
+        "id": "msg_1", "type": "message", "role": "assistant", "model": "m", "stop_reason": "end_turn",
+        "content": [{"type": "text", "text": "pong"}],
+        "usage": {"input_tokens": 3, "output_tokens": 1}
+    },
+    "gemini": {
+        "candidates": [{"content": {"parts": [{"text": "pong"}], "role": "model"}, "finishReason": "STOP"}],
+        "usageMetadata": {"promptTokenCount": 3, "candidatesTokenCount": 1, "totalTokenCount": 4}
+    },
+    "qwen": {
+        "output": {"choices": [{"message": {"role": "assistant", "content": "pong"}, "finish_reason": "stop"}]},
+        "usage": {"input_tokens": 3, "output_tokens": 1, "total_tokens": 4}, "request_id": "r1"
+    },
+    "ernie": {
+        "id": "as-1", "result": "pong", "is_truncated": False,
+        "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4}
+    },
+}
+
+# 原生流式接口的SSE事件
+NATIVE_STREAM_EVENTS = {
+    "gemini": [NATIVE_RESPONSES["gemini"]],
+    "qwen": [NATIVE_RESPONSES["qwen"]],
+    "ernie": [{"result": "pong", "is_end": True, "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4}}],
+}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """替换所有适配器的底层HTTP调用，返回各自原生格式的响应，并记录 (原生格式, 调用方式)
+
+    非流式接口收到stream=true时真实上游会返回SSE，这里直接失败。
+    """
+    sent = []
+
+    async def fake_send_request(self, data, endpoint):
+        assert not data.get("stream"), f"{self.wire_format} request forwarded with stream=true"
+        sent.append((self.wire_format, "request"))
+        return NATIVE_RESPONSES[self.wire_format]
+
+    async def fake_iter_sse_json(self, url, data, headers):
+        sent.append((self.wire_format, "stream"))
+        for event in NATIVE_STREAM_EVENTS[self.wire_format]:
+            yield event
+
+    async def fake_access_token(self):
+        return "token"
+
+    for provider in WIRE_FORMATS:
+        adapter_class = LLMAdapterFactory.get_adapter_class(provider)
+        monkeypatch.setattr(adapter_class, "send_request", fake_send_request)
+        monkeypatch.setattr(adapter_class, "_iter_sse_json", fake_iter_sse_json)
+    monkeypatch.setattr(ErnieAdapter, "get_access_token", fake_access_token)
+    return sent
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    session.add(User(id="u1", username="alice", email="alice@example.com", password_hash="x"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _proxy_key(db, provider, target_format):
+    credential = Credential(
+        user_id="u1", name=provider, provider=provider, api_url=API_URLS.get(provider),
+        api_key_encrypted=encrypt_api_key(API_KEYS.get(provider, "sk-test")), is_validated=True
+    )
+    db.add(credential)
+    db.flush()
+    db.add(ModelConfig(
+        credential_id=credential.id, model_name="m", target_format=target_format,
+        proxy_api_key=f"llm-{provider}-{target_format}"
+    ))
+    db.commit()
+    return f"llm-{provider}-{target_format}"
+
+
+async def _requests(db, key, stream=False):
+    """分别从OpenAI和Anthropic接口发起同一个请求"""
+    service = ProxyService(db)
+    messages = [{"role": "user", "content": "ping"}]
+    results = [
+        await service.proxy_openai_request(key, OpenAIRequest(model="m", messages=messages, stream=stream)),
+        await service.proxy_anthropic_request(key, AnthropicRequest(model="m", messages=messages, max_tokens=16, stream=stream)),
+    ]
+    if stream:
+        results = ["".join([chunk async for chunk in result]) for result in results]
+    return results
+
+
+class TestRouteTable:
+    """转发表内容测试"""
+
+    def test_every_provider_registered(self):
+        """测试覆盖所有已注册的提供商"""
+        assert set(LLMAdapterFactory.get_supported_providers()) == set(WIRE_FORMATS)
+
+    @pytest.mark.parametrize("client_format,provider", MATRIX)
+    def test_route_matches_adapter(self, client_format, provider):
+        """路由指向适配器声明的原生接口，并且只生成一次"""
+        adapter_class = LLMAdapterFactory.get_adapter_class(provider)
+        route = dispatch_table.route(client_format, provider)
+
+        assert route.wire_format == adapter_class.wire_format == WIRE_FORMATS[provider]
+        assert route.forward == f"forward_to_{WIRE_FORMATS[provider]}"
+        assert asyncio.iscoroutinefunction(getattr(adapter_class, route.forward))
+        assert route.native_stream == adapter_class.supports_native_stream
+        assert route.native_n == adapter_class.supports_native_n
+        assert dispatch_table.route(client_format, provider) is route
+
+    def test_unsupported(self):
+        """未知的客户端格式或提供商报错"""
+        with pytest.raises(ValueError):
+            dispatch_table.route("xml", "openai")
+        with pytest.raises(ValueError):
+            dispatch_table.route("openai", "unknown")
+
+
+class TestProxyMatrix:
+    """每个 (目标格式, 提供商) 组合经代理转发的测试"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("client_format,provider", MATRIX)
+    async def test_complete(self, db, upstream, client_format, provider):
+        """非流式请求调用上游原生接口，响应转换为目标格式"""
+        key = _proxy_key(db, provider, client_format)
+
+        for response in await _requests(db, key):
+            if client_format == "openai":
+                assert response["choices"][0]["message"]["content"] == "pong"
+                assert response["usage"]["total_tokens"] == 4
+            else:
+                assert response["type"] == "message"
+                assert response["content"] == [{"type": "text", "text": "pong"}]
+                assert response["usage"] == {"input_tokens": 3, "output_tokens": 1}
+        assert upstream == [(WIRE_FORMATS[provider], "request")] * 2
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("client_format,provider", MATRIX)
+    async def test_stream(self, db, upstream, client_format, provider):
+        """流式请求使用原生流式接口（不支持时把完整响应转为流），按目标格式编码"""
+        key = _proxy_key(db, provider, client_format)
+
+        for body in await _requests(db, key, stream=True):
+            assert "pong" in body
+            if client_format == "openai":
+                assert "chat.completion.chunk" in body and body.endswith("data: [DONE]\n\n")
+            else:
+                assert "event: message_stop" in body
+        mode = "stream" if LLMAdapterFactory.get_adapter_class(provider).supports_native_stream else "request"
+        assert upstream == [(WIRE_FORMATS[provider], mode)] * 2
+
+
+class TestValidateModel:
+    """模型验证测试"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("provider", list(WIRE_FORMATS))
+    async def test_uses_native_forward(self, upstream, provider):
+        """模型验证通过上游原生接口发送请求"""
+        adapter = LLMAdapterFactory.create_adapter(
+            provider=provider, api_key=API_KEYS.get(provider, "sk-test"), api_url=API_URLS.get(provider)
+        )
+        assert await adapter.validate_model("m")
+        assert upstream == [(WIRE_FORMATS[provider], "request")]
+        await adapter.close()
@@ -0,0 +1,140 @@
+"""
+优雅停机与连接排空测试用例
+"""
+import asyncio
+import httpx
+import pytest
+import uvicorn
+from fastapi import FastAPI
+from app.api import proxy as proxy_api
+from app.database import get_db
+from app.adapters.factory import LLMAdapterFactory
+from app.config import settings
+from app.exceptions import ServiceDrainingError
+from app.server import GracefulServer
+from app.services.drain_service import DrainController, drain_controller
+
+
+@pytest.fixture(autouse=True)
+def reset_drain_controller():
+    drain_controller.reset()
+    yield
+    drain_controller.reset()
+
+
+class TestDrainController:
+    """进行中请求计数测试"""
+
+    def test_rejects_new_requests_while_draining(self):
+        """开始排空后拒绝新请求，已有请求不受影响"""
+        controller = DrainController()
+        controller.begin()
+        controller.start_draining()
+
+        with pytest.raises(ServiceDrainingError):
+            controller.begin()
+
+        controller.end()
+        assert controller.stats() == {"draining": True, "inflight": 0, "accepted": 1, "rejected": 1}
+
+    @pytest.mark.asyncio
+    async def test_wait_idle(self):
+        """请求完成后返回True，超过截止时间返回False"""
+        controller = DrainController()
+        controller.begin()
+        controller.start_draining()
+
+        assert await controller.wait_idle(0.05) is False
+
+        asyncio.get_running_loop().call_later(0.05, controller.end)
+        controller.draining_since = None
+        assert await controller.wait_idle(1.0) is True
+
+
+class TestProxyDraining:
+    """代理接口排空测试"""
+
+    @pytest.mark.asyncio
+    async def test_inflight_request_finishes_and_new_request_rejected(self, monkeypatch):
+        """排空期间进行中的请求正常完成，新请求返回503"""
+        release = asyncio.Event()
+
+        class FakeProxyService:
+            trim_result = None
+
+            def __init__(self, db):
+                pass
+
+            async def proxy_openai_request(self, api_key, request_data, priority=None):
+                await release.wait()
+                return {"id": "chatcmpl-1", "choices": []}
+
+        monkeypatch.setattr(proxy_api, "ProxyService", FakeProxyService)
+        app = FastAPI()
+        app.include_router(proxy_api.router)
+        app.dependency_overrides[get_db] = lambda: None
+
+        body = {"model": "gpt-4", "messages": [{"role": "user", "content": "hi"}]}
+        headers = {"Authorization": "Bearer llm-key"}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            inflight = asyncio.create_task(client.post("/api/v1/chat/completions", json=body, headers=headers))
+            while drain_controller.inflight == 0:
+                await asyncio.sleep(0.01)
+
+            drain_controller.start_draining()
+            rejected = await client.post("/api/v1/chat/completions", json=body, headers=headers)
+            assert rejected.status_code == 503
+            assert rejected.headers["retry-after"] == "1"
+
+            release.set()
+            response = await inflight
+            assert response.status_code == 200
+            assert await drain_controller.wait_idle(1.0) is True
+
+
+class TestShutdown:
+    """停机流程测试"""
+
+    @pytest.mark.asyncio
+    async def test_close_all_adapters(self):
+        """停机时关闭仍未释放的上游连接池"""
+        adapter = LLMAdapterFactory.create_adapter("openai", api_key="test")
+        closed = await LLMAdapterFactory.close_all()
+
+        assert closed >= 1
+        assert adapter.client.is_closed
+
+    @pytest.mark.asyncio
+    async def test_signal_flips_readiness_before_exit(self, monkeypatch):
+        """第一次信号只让就绪检查失败并照常接受请求，延迟后才拒绝新请求并停止监听，再次信号立即退出"""
+        monkeypatch.setattr(settings, "shutdown_readiness_delay_seconds", 0.05)
+        server = GracefulServer(uvicorn.Config(FastAPI()))
+
+        server.handle_exit(15, None)
+        assert not drain_controller.ready
+        assert not drain_controller.draining
+        drain_controller.begin()
+        drain_controller.end()
+        assert not server.should_exit
+
+        await asyncio.sleep(0.1)
+        assert drain_controller.draining
+        assert server.should_exit
+
+        second = GracefulServer(uvicorn.Config(FastAPI()))
+        second.handle_exit(15, None)
+        assert second.should_exit
+
+    @pytest.mark.asyncio
+    async def test_second_signal_skips_delay_without_forcing_exit(self, monkeypatch):
+        """等待期间第二次SIGINT立即停止监听，第一次信号的定时器被取消，不会强制退出"""
+        monkeypatch.setattr(settings, "shutdown_readiness_delay_seconds", 0.05)
+        server = GracefulServer(uvicorn.Config(FastAPI()))
+
+        server.handle_exit(2, None)
+        server.handle_exit(2, None)
+        assert drain_controller.draining
+        assert server.should_exit
+
+        await asyncio.sleep(0.1)
+        assert not server.force_exit
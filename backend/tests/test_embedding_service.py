@@ -0,0 +1,226 @@
+"""
+向量化接口与微批处理测试用例
+"""
+import asyncio
+import base64
+import struct
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import User, Credential, ModelConfig, RequestLog
+from app.adapters.base import EmbeddingResponse
+from app.adapters.openai_adapter import OpenAIAdapter
+from app.adapters.gemini_adapter import GeminiAdapter
+from app.adapters.qwen_adapter import QwenAdapter
+from app.schemas.llm_request import EmbeddingRequest
+from app.services.embedding_service import EmbeddingBatcher, format_embedding
+from app.services.proxy_service import ProxyService
+from app.utils.security import encrypt_api_key
+
+
+def _fake_sender(calls, tokens_per_input=3):
+    async def send(texts):
+        calls.append(list(texts))
+        return EmbeddingResponse(
+            model="text-embedding-3-small",
+            embeddings=[[float(len(text))] for text in texts],
+            usage={"prompt_tokens": tokens_per_input * len(texts), "total_tokens": tokens_per_input * len(texts)}
+        )
+    return send
+
+
+class TestEmbeddingBatcher:
+    """微批处理测试"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_upstream_call(self):
+        """并发调用方的输入合并为一次上游请求，结果按顺序拆回"""
+        batcher = EmbeddingBatcher(window_ms=20, max_inputs=100, max_tokens=10000)
+        calls = []
+        send = _fake_sender(calls)
+
+        results = await asyncio.gather(
+            batcher.embed("key", ["a"], send, 2048),
+            batcher.embed("key", ["bb", "ccc"], send, 2048),
+            batcher.embed("key", ["dddd"], send, 2048),
+        )
+
+        assert calls == [["a", "bb", "ccc", "dddd"]]
+        assert [vectors for vectors, _ in results] == [[[1.0]], [[2.0], [3.0]], [[4.0]]]
+        assert sum(tokens for _, tokens in results) == 12
+        assert batcher.stats()["avg_inputs_per_batch"] == 4.0
+
+    @pytest.mark.asyncio
+    async def test_keys_are_batched_separately(self):
+        """不同凭证或模型的输入不会合并"""
+        batcher = EmbeddingBatcher(window_ms=10, max_inputs=100, max_tokens=10000)
+        calls = []
+        send = _fake_sender(calls)
+
+        await asyncio.gather(batcher.embed("a", ["x"], send, 2048), batcher.embed("b", ["y"], send, 2048))
+        assert sorted(calls) == [["x"], ["y"]]
+
+    @pytest.mark.asyncio
+    async def test_provider_limit_splits_batches(self):
+        """超过提供商单次上限时拆成多批，满批立即发送"""
+        batcher = EmbeddingBatcher(window_ms=1000, max_inputs=100, max_tokens=10000)
+        calls = []
+
+        vectors, _ = await asyncio.wait_for(
+            batcher.embed("key", ["a", "b", "c", "d"], _fake_sender(calls), provider_max_inputs=2),
+            timeout=0.5
+        )
+
+        assert calls == [["a", "b"], ["c", "d"]]
+        assert len(vectors) == 4
+
+    @pytest.mark.asyncio
+    async def test_failure_reaches_every_caller(self):
+        """上游失败时批内所有调用方都收到异常"""
+        batcher = EmbeddingBatcher(window_ms=10, max_inputs=100, max_tokens=10000)
+
+        async def send(texts):
+            raise RuntimeError("upstream error")
+
+        results = await asyncio.gather(
+            batcher.embed("key", ["a"], send, 2048),
+            batcher.embed("key", ["b"], send, 2048),
+            return_exceptions=True
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert batcher.stats()["failed_batches"] == 1
+
+    def test_base64_format(self):
+        """base64格式为小端float32"""
+        encoded = format_embedding([0.5, -1.0], "base64")
+        assert struct.unpack("<2f", base64.b64decode(encoded)) == (0.5, -1.0)
+        assert format_embedding([0.5], "float") == [0.5]
+
+
+class TestEmbeddingAdapters:
+    """各提供商向量化请求格式测试"""
+
+    @pytest.mark.asyncio
+    async def test_openai_orders_by_index(self, monkeypatch):
+        """OpenAI响应按index排序"""
+        adapter = OpenAIAdapter(api_key="test")
+
+        async def fake_send_request(data, endpoint):
+            assert endpoint == "embeddings"
+            assert data["dimensions"] == 256
+            return {
+                "data": [{"index": 1, "embedding": [2.0]}, {"index": 0, "embedding": [1.0]}],
+                "usage": {"prompt_tokens": 4, "total_tokens": 4}
+            }
+
+        monkeypatch.setattr(adapter, "send_request", fake_send_request)
+        response = await adapter.create_embeddings("text-embedding-3-small", ["a", "b"], dimensions=256)
+        assert response.embeddings == [[1.0], [2.0]]
+        assert response.usage == {"prompt_tokens": 4, "total_tokens": 4}
+        await adapter.close()
+
+    @pytest.mark.asyncio
+    async def test_gemini_batch_embed(self, monkeypatch):
+        """Gemini使用batchEmbedContents，用量在本地估算"""
+        adapter = GeminiAdapter(api_key="test")
+        sent = []
+
+        async def fake_send_request(data, endpoint):
+            sent.append((endpoint, data))
+            return {"embeddings": [{"values": [1.0]}, {"values": [2.0]}]}
+
+        monkeypatch.setattr(adapter, "send_request", fake_send_request)
+        response = await adapter.create_embeddings("text-embedding-004", ["a", "b"])
+
+        endpoint, data = sent[0]
+        assert endpoint == "models/text-embedding-004:batchEmbedContents"
+        assert data["requests"][1]["content"]["parts"][0]["text"] == "b"
+        assert response.embeddings == [[1.0], [2.0]]
+        assert response.usage["total_tokens"] > 0
+        await adapter.close()
+
+    @pytest.mark.asyncio
+    async def test_qwen_orders_by_text_index(self, monkeypatch):
+        """Qwen响应按text_index排序"""
+        adapter = QwenAdapter(api_key="test")
+
+        async def fake_send_request(data, endpoint):
+            assert data["input"]["texts"] == ["a", "b"]
+            return {
+                "output": {"embeddings": [{"text_index": 1, "embedding": [2.0]}, {"text_index": 0, "embedding": [1.0]}]},
+                "usage": {"total_tokens": 6}
+            }
+
+        monkeypatch.setattr(adapter, "send_request", fake_send_request)
+        response = await adapter.create_embeddings("text-embedding-v3", ["a", "b"])
+        assert response.embeddings == [[1.0], [2.0]]
+        assert response.usage == {"prompt_tokens": 6, "total_tokens": 6}
+        await adapter.close()
+
+
+class TestProxyEmbeddings:
+    """向量化代理接口测试"""
+
+    @pytest.fixture
+    def session_factory(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        db = factory()
+        user = User(username="alice", email="alice@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        credential = Credential(
+            user_id=user.id, name="openai", provider="openai",
+            api_key_encrypted=encrypt_api_key("sk-test"), is_validated=True
+        )
+        db.add(credential)
+        db.flush()
+        db.add(ModelConfig(
+            credential_id=credential.id,
+            model_name="text-embedding-3-small",
+            target_format="openai",
+            proxy_api_key="llm-alice"
+        ))
+        db.commit()
+        db.close()
+        return factory
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_batched(self, session_factory, monkeypatch):
+        """并发的代理请求合并为一次上游调用，各自记录日志"""
+        calls = []
+
+        async def fake_create_embeddings(self, model, inputs, dimensions=None):
+            calls.append(list(inputs))
+            return EmbeddingResponse(
+                model=model,
+                embeddings=[[float(i)] for i in range(len(inputs))],
+                usage={"prompt_tokens": 2 * len(inputs), "total_tokens": 2 * len(inputs)}
+            )
+
+        monkeypatch.setattr(OpenAIAdapter, "create_embeddings", fake_create_embeddings)
+        sessions = [session_factory() for _ in range(2)]
+
+        first, second = await asyncio.gather(
+            ProxyService(sessions[0]).proxy_embeddings(
+                "llm-alice", EmbeddingRequest(model="text-embedding-3-small", input="hello")
+            ),
+            ProxyService(sessions[1]).proxy_embeddings(
+                "llm-alice", EmbeddingRequest(model="text-embedding-3-small", input=["foo", "bar"], encoding_format="base64")
+            ),
+        )
+
+        assert calls == [["hello", "foo", "bar"]]
+        assert first["data"][0]["embedding"] == [0.0]
+        assert [item["index"] for item in second["data"]] == [0, 1]
+        assert isinstance(second["data"][0]["embedding"], str)
+        assert first["usage"]["total_tokens"] + second["usage"]["total_tokens"] == 6
+
+        db = session_factory()
+        assert db.query(RequestLog).filter(RequestLog.path == "/api/v1/embeddings").count() == 2
+        db.close()
+        for session in sessions:
+            session.close()
@@ -0,0 +1,94 @@
+"""
+加解密执行器测试用例
+"""
+import asyncio
+import time
+import pytest
+from app.utils.executor import BoundedExecutor
+from app.utils.security import (
+    encrypt_api_key,
+    encrypt_api_key_async,
+    decrypt_api_key_async,
+    get_password_hash,
+    verify_password_async
+)
+
+
+class TestBoundedExecutor:
+    """有界执行器测试"""
+
+    @pytest.fixture
+    def executor(self):
+        """创建执行器实例"""
+        executor = BoundedExecutor("test", max_workers=2)
+        yield executor
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_run_returns_result(self, executor):
+        """测试返回执行结果"""
+        result = await executor.run(lambda a, b: a + b, 1, 2)
+        assert result == 3
+        assert executor.stats()["completed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_run_propagates_exception(self, executor):
+        """测试异常透传"""
+        def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError, match="boom"):
+            await executor.run(fail)
+        assert executor.stats()["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, executor):
+        """测试并发数受限，多余任务排队等待"""
+        peak = 0
+
+        def work():
+            nonlocal peak
+            peak = max(peak, executor.running)
+            time.sleep(0.05)
+
+        await asyncio.gather(*[executor.run(work) for _ in range(6)])
+
+        stats = executor.stats()
+        assert peak <= 2
+        assert stats["completed"] == 6
+        assert stats["waiting"] == 0
+        assert stats["running"] == 0
+        assert stats["max_wait_ms"] > 0
+
+    @pytest.mark.asyncio
+    async def test_event_loop_not_blocked(self, executor):
+        """测试阻塞任务执行期间事件循环仍可调度"""
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            for _ in range(5):
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        await asyncio.gather(executor.run(time.sleep, 0.1), ticker())
+        assert ticks == 5
+
+
+class TestAsyncSecurityHelpers:
+    """异步加解密函数测试"""
+
+    @pytest.mark.asyncio
+    async def test_encrypt_decrypt_roundtrip(self):
+        """测试加解密往返"""
+        encrypted = await encrypt_api_key_async("sk-test-key")
+        assert encrypted != "sk-test-key"
+        assert await decrypt_api_key_async(encrypted) == "sk-test-key"
+        assert await decrypt_api_key_async(encrypt_api_key("sk-other")) == "sk-other"
+
+    @pytest.mark.asyncio
+    async def test_verify_password(self):
+        """测试异步密码验证"""
+        hashed = get_password_hash("secret123")
+        assert await verify_password_async("secret123", hashed) is True
+        assert await verify_password_async("wrong", hashed) is False
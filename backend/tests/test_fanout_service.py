@@ -0,0 +1,116 @@
+"""
+n>1 并发拆分测试用例
+"""
+import asyncio
+import time
+import pytest
+from app.adapters.base import LLMRequest, LLMResponse
+from app.adapters.openai_adapter import OpenAIAdapter
+from app.services.fanout_service import fan_out, merge_responses
+from app.services.proxy_service import ProxyService
+from app.services.dispatch_service import dispatch_table
+
+
+def _response(text, prompt_tokens=10, completion_tokens=5):
+    return LLMResponse(
+        id=f"resp-{text}",
+        model="claude-sonnet-4-20250514",
+        choices=[{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        usage={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+               "total_tokens": prompt_tokens + completion_tokens}
+    )
+
+
+class TestMergeResponses:
+    """响应合并测试"""
+
+    def test_choices_reindexed_and_usage_summed(self):
+        """choices按顺序编号，用量逐项相加"""
+        merged = merge_responses([_response("a"), _response("b", completion_tokens=7)])
+
+        assert [choice["index"] for choice in merged.choices] == [0, 1]
+        assert [choice["message"]["content"] for choice in merged.choices] == ["a", "b"]
+        assert merged.usage == {"prompt_tokens": 20, "completion_tokens": 12, "total_tokens": 32}
+        assert merged.id == "resp-a"
+
+
+class TestFanOut:
+    """并发拆分测试"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_respect_cap(self):
+        """n个请求并发执行，同时进行的请求数不超过上限"""
+        active = 0
+        peak = 0
+        sent = []
+
+        async def forward(request):
+            nonlocal active, peak
+            sent.append(request.n)
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+            return _response(str(len(sent)))
+
+        started = time.perf_counter()
+        response = await fan_out(forward, LLMRequest(model="claude", messages=[], n=4), max_concurrency=4)
+        elapsed = time.perf_counter() - started
+
+        assert sent == [1, 1, 1, 1]
+        assert len(response.choices) == 4
+        assert peak == 4
+        assert elapsed < 0.15
+
+        peak = 0
+        await fan_out(forward, LLMRequest(model="claude", messages=[], n=5), max_concurrency=2)
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_failure_cancels_remaining(self):
+        """任意一个请求失败时取消其余请求"""
+        cancelled = []
+
+        async def forward(request):
+            if not cancelled:
+                cancelled.append(False)
+                raise RuntimeError("upstream error")
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        with pytest.raises(RuntimeError):
+            await fan_out(forward, LLMRequest(model="claude", messages=[], n=3), max_concurrency=3)
+        assert cancelled.count(True) == 2
+
+
+class TestNativeN:
+    """原生支持n的提供商测试"""
+
+    def test_openai_request_includes_n(self):
+        """OpenAI请求直接携带n"""
+        adapter = OpenAIAdapter(api_key="test")
+        request = LLMRequest(model="gpt-4", messages=[{"role": "user", "content": "hi"}], n=3)
+        assert adapter.transform_request_to_openai(request)["n"] == 3
+        assert "n" not in adapter.transform_request_to_openai(request.model_copy(update={"n": 1}))
+
+    @pytest.mark.asyncio
+    async def test_complete_chooses_strategy(self):
+        """原生支持时只发一个请求，否则拆分为n个请求"""
+        calls = []
+
+        async def forward(request):
+            calls.append(request.n)
+            return _response("x")
+
+        request = LLMRequest(model="gpt-4", messages=[{"role": "user", "content": "hi"}], n=3)
+
+        await ProxyService._complete(dispatch_table.route("openai", "openai"), forward, request)
+        assert calls == [3]
+
+        calls.clear()
+        response = await ProxyService._complete(dispatch_table.route("openai", "anthropic"), forward, request)
+        assert calls == [1, 1, 1]
+        assert len(response.choices) == 3
@@ -0,0 +1,185 @@
+"""
+跨进程缓存失效测试用例
+"""
+import asyncio
+import pytest
+from app.models import ModelConfig
+from app.services.catalog_service import proxy_models_cache, model_catalog_cache
+from app.services.response_cache import response_cache
+from app.services.invalidation_service import (
+    LocalInvalidationBus,
+    RedisInvalidationBus,
+    RESYNC,
+    apply_change
+)
+
+
+class FakeBroker:
+    """内存中的pub/sub频道"""
+
+    def __init__(self):
+        self.queues = []
+
+    def client(self):
+        return FakeRedis(self)
+
+
+class FakeRedis:
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def publish(self, channel, message):
+        for queue in list(self.broker.queues):
+            queue.put_nowait({"type": "message", "channel": channel, "data": message})
+        return len(self.broker.queues)
+
+    def pubsub(self):
+        return FakePubSub(self.broker)
+
+    async def close(self):
+        pass
+
+
+class FakePubSub:
+    def __init__(self, broker):
+        self.broker = broker
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.broker.queues.append(self.queue)
+
+    async def listen(self):
+        yield {"type": "subscribe", "data": 1}
+        while True:
+            item = await self.queue.get()
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def close(self):
+        if self.queue in self.broker.queues:
+            self.broker.queues.remove(self.queue)
+
+
+async def _wait_until(condition, timeout=1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.005)
+
+
+def _cache_response(config_id):
+    config = ModelConfig(id=config_id, response_cache_enabled=True, response_cache_threshold=0.9)
+    key = response_cache.make_key(config, (), [{"role": "user", "content": "what is the refund policy"}], temperature=0)
+    response_cache.store(key, {"choices": [{"message": {"content": "30 days"}}]})
+
+
+class TestApplyChange:
+    """变更事件清理本地缓存"""
+
+    @pytest.mark.asyncio
+    async def test_model_config_change_evicts_entries(self):
+        """模型配置变更清理代理模型列表和响应缓存"""
+        async def load():
+            return ["gpt-4"]
+
+        await proxy_models_cache.get("llm-key", load)
+        _cache_response("config-a")
+        _cache_response("config-b")
+
+        LocalInvalidationBus().publish({"entity": "model_config", "id": "config-a", "proxy_api_keys": ["llm-key"]})
+
+        assert proxy_models_cache.peek("llm-key") is None
+        assert "config-a" not in response_cache._by_config
+        assert "config-b" in response_cache._by_config
+        response_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_resync_clears_everything(self):
+        """重新订阅后清空全部本地缓存"""
+        async def load():
+            return ("fingerprint", ["gpt-4"])
+
+        await model_catalog_cache.get("credential-1", load)
+        _cache_response("config-a")
+
+        apply_change({"entity": RESYNC})
+
+        assert model_catalog_cache.peek("credential-1") is None
+        assert response_cache.stats()["size"] == 0
+
+
+class TestRedisInvalidationBus:
+    """Redis pub/sub跨进程通知测试"""
+
+    @pytest.mark.asyncio
+    async def test_other_workers_receive_events(self):
+        """其他进程收到事件，发布者自身只处理一次"""
+        broker = FakeBroker()
+        workers = [RedisInvalidationBus("redis://test", "test-channel", client_factory=broker.client) for _ in range(2)]
+        seen = [[], []]
+        for worker, events in zip(workers, seen):
+            worker.subscribe(events.append)
+            worker.start()
+            await worker.wait_subscribed()
+
+        try:
+            event = {"entity": "credential", "id": "credential-1", "config_ids": [], "proxy_api_keys": []}
+            workers[0].publish(event)
+            await _wait_until(lambda: seen[1])
+
+            assert seen[0] == [event]
+            assert seen[1] == [event]
+            assert workers[1].stats()["received"] == 1
+            assert workers[1].last_lag_ms is not None
+        finally:
+            for worker in workers:
+                await worker.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_reconnect_triggers_resync(self, monkeypatch):
+        """订阅中断后重连，并清空可能漏掉事件的本地缓存"""
+        monkeypatch.setattr("app.services.invalidation_service.asyncio.sleep", _no_sleep)
+        broker = FakeBroker()
+        worker = RedisInvalidationBus("redis://test", "test-channel", client_factory=broker.client)
+        seen = []
+        worker.subscribe(seen.append)
+        worker.start()
+        await worker.wait_subscribed()
+
+        try:
+            broker.queues[0].put_nowait(ConnectionError("connection reset"))
+            await _wait_until(lambda: seen)
+
+            assert seen == [{"entity": RESYNC}]
+            assert worker.reconnects == 1
+            await _wait_until(lambda: worker.connected)
+        finally:
+            await worker.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_publish_failure_is_counted(self):
+        """Redis不可用时本进程仍生效，失败的广播被计数"""
+        broker = FakeBroker()
+
+        class BrokenRedis(FakeRedis):
+            async def publish(self, channel, message):
+                raise ConnectionError("redis down")
+
+        worker = RedisInvalidationBus("redis://test", "test-channel", client_factory=lambda: BrokenRedis(broker))
+        seen = []
+        worker.subscribe(seen.append)
+        worker.start()
+        try:
+            worker.publish({"entity": "model_config", "id": "config-a"})
+            assert len(seen) == 1
+            await _wait_until(lambda: worker.dropped == 1)
+        finally:
+            await worker.shutdown()
+
+
+_real_sleep = asyncio.sleep
+
+
+async def _no_sleep(delay):
+    await _real_sleep(0)
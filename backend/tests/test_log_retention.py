@@ -0,0 +1,115 @@
+"""
+请求日志保留与归档测试用例
+"""
+import gzip
+import json
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.database import Base
+from app.models import RequestLog, UsageRollupMinute, UsageRollupHour
+from app.services.log_retention_service import LogRetentionService, partition_name
+
+
+class TestLogRetention:
+    """日志保留任务测试（SQLite按天清理）"""
+
+    @pytest.fixture
+    def engine(self, tmp_path, monkeypatch):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+
+        monkeypatch.setattr(settings, "log_retention_days", 7)
+        monkeypatch.setattr(settings, "log_archive_enabled", True)
+        monkeypatch.setattr(settings, "log_archive_dir", str(tmp_path / "archive"))
+        monkeypatch.setattr(settings, "log_retention_delete_batch_size", 2)
+        monkeypatch.setattr(settings, "usage_minute_retention_days", 1)
+        return engine
+
+    def _add_logs(self, engine, created_at, count):
+        db = sessionmaker(bind=engine)()
+        for i in range(count):
+            db.add(RequestLog(
+                model_config_id="config-1",
+                request_id=f"req-{created_at:%Y%m%d}-{i}",
+                status_code=200,
+                response_time_ms=100,
+                created_at=created_at
+            ))
+        db.commit()
+        db.close()
+
+    def test_partition_name(self):
+        """日分区表名包含日期"""
+        assert partition_name(datetime(2026, 10, 19).date()) == "request_logs_p20261019"
+
+    def test_partition_failure_isolated(self, engine, monkeypatch):
+        """某一天的分区创建失败时继续创建其他天"""
+        service = LogRetentionService(engine)
+        today = datetime(2026, 10, 19).date()
+        attempted = []
+
+        def create_partition(day):
+            attempted.append(day)
+            if day == today:
+                raise RuntimeError("default partition contains rows for this day")
+
+        monkeypatch.setattr(settings, "log_partition_precreate_days", 2)
+        monkeypatch.setattr(service, "list_partitions", lambda: {})
+        monkeypatch.setattr(service, "_create_partition", create_partition)
+
+        assert service.ensure_partitions(today) == ["request_logs_p20261020", "request_logs_p20261021"]
+        assert len(attempted) == 3
+
+    def test_expired_days_archived_and_deleted(self, engine, tmp_path):
+        """过期数据按天导出为gzip JSONL后删除，未过期数据保留"""
+        now = datetime(2026, 10, 19, 12, 0)
+        self._add_logs(engine, now - timedelta(days=10, hours=1), 5)
+        self._add_logs(engine, now - timedelta(days=9), 1)
+        self._add_logs(engine, now - timedelta(days=1), 3)
+
+        summary = LogRetentionService(engine).run_once(now=now)
+
+        assert summary["deleted_rows"] == 6
+        assert summary["archived_days"] == ["2026-10-09", "2026-10-10"]
+
+        db = sessionmaker(bind=engine)()
+        assert db.query(RequestLog).count() == 3
+        db.close()
+
+        archive = tmp_path / "archive" / "request_logs_2026-10-09.jsonl.gz"
+        with gzip.open(archive, "rt", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        assert len(rows) == 5
+        assert rows[0]["model_config_id"] == "config-1"
+
+    def test_rearchive_does_not_overwrite(self, engine, tmp_path):
+        """同一天再次归档写入新文件"""
+        now = datetime(2026, 10, 19, 12, 0)
+        service = LogRetentionService(engine)
+
+        self._add_logs(engine, now - timedelta(days=10), 1)
+        service.run_once(now=now)
+        self._add_logs(engine, now - timedelta(days=10), 1)
+        service.run_once(now=now)
+
+        files = sorted(p.name for p in (tmp_path / "archive").iterdir())
+        assert files == ["request_logs_2026-10-09.1.jsonl.gz", "request_logs_2026-10-09.jsonl.gz"]
+
+    def test_minute_rollups_pruned(self, engine):
+        """分钟级汇总超过保留期后删除，小时级汇总保留"""
+        now = datetime(2026, 10, 19, 12, 0)
+        db = sessionmaker(bind=engine)()
+        old_bucket = now - timedelta(days=2)
+        db.add(UsageRollupMinute(model_config_id="config-1", bucket_start=old_bucket, request_count=1))
+        db.add(UsageRollupMinute(model_config_id="config-1", bucket_start=now, request_count=1))
+        db.add(UsageRollupHour(model_config_id="config-1", bucket_start=old_bucket, request_count=1))
+        db.commit()
+
+        LogRetentionService(engine).run_once(now=now)
+
+        assert db.query(UsageRollupMinute).count() == 1
+        assert db.query(UsageRollupHour).count() == 1
+        db.close()
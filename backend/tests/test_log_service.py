@@ -0,0 +1,130 @@
+"""
+请求日志查询测试用例
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import User, Credential, ModelConfig, RequestLog
+from app.services.log_service import LogService, LogFilters, encode_cursor, decode_cursor
+from app.exceptions import InvalidCursorError
+
+
+class TestLogService:
+    """键集分页与导出测试"""
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        yield session
+        session.close()
+
+    def _create_config(self, db, username):
+        user = User(username=username, email=f"{username}@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        credential = Credential(user_id=user.id, name="openai", provider="openai", api_key_encrypted="x")
+        db.add(credential)
+        db.flush()
+        config = ModelConfig(
+            credential_id=credential.id,
+            model_name="gpt-4",
+            target_format="openai",
+            proxy_api_key=f"llm-{username}"
+        )
+        db.add(config)
+        db.flush()
+        return user, config
+
+    @pytest.fixture
+    def data(self, db):
+        user, config = self._create_config(db, "alice")
+        _, other_config = self._create_config(db, "bob")
+
+        base = datetime(2026, 10, 19, 12, 0, 0)
+        for i in range(120):
+            # 每3条共享同一个时间戳，验证相同created_at时按id分页
+            db.add(RequestLog(
+                model_config_id=config.id,
+                source_format="openai" if i % 2 else "anthropic",
+                target_format="openai",
+                status_code=500 if i % 10 == 0 else 200,
+                response_time_ms=i * 10,
+                created_at=base + timedelta(seconds=i // 3)
+            ))
+        db.add(RequestLog(model_config_id=other_config.id, status_code=200, created_at=base))
+        db.commit()
+        return user, config
+
+    def test_cursor_roundtrip(self):
+        """游标编码后可以还原"""
+        moment = datetime(2026, 10, 19, 12, 0, 0, 123456)
+        assert decode_cursor(encode_cursor(moment, "abc")) == (moment, "abc")
+
+        with pytest.raises(InvalidCursorError):
+            decode_cursor("not-a-cursor")
+
+    def test_keyset_pagination_covers_all_rows(self, db, data):
+        """逐页遍历不重复不遗漏，且只返回当前用户的日志"""
+        user, _ = data
+        service = LogService(db)
+
+        seen = []
+        cursor = None
+        while True:
+            page = service.list_logs(user, LogFilters(), limit=25, cursor=cursor)
+            seen.extend(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert len(seen) == 120
+        assert len({log.id for log in seen}) == 120
+        keys = [(log.created_at, log.id) for log in seen]
+        assert keys == sorted(keys, reverse=True)
+
+    def test_filters(self, db, data):
+        """按状态码、格式和延迟范围过滤"""
+        user, config = data
+        service = LogService(db)
+
+        errors = service.list_logs(user, LogFilters(status_code=500), limit=200)["items"]
+        assert len(errors) == 12
+
+        ranged = service.list_logs(
+            user,
+            LogFilters(config_id=config.id, source_format="openai", min_latency_ms=100, max_latency_ms=300),
+            limit=200
+        )["items"]
+        assert all(log.source_format == "openai" and 100 <= log.response_time_ms <= 300 for log in ranged)
+        assert len(ranged) == 10
+
+        assert service.list_logs(user, LogFilters(config_id="other"), limit=10)["items"] == []
+
+    def test_time_range_with_offset(self, db, data):
+        """带时区的时间范围按UTC过滤"""
+        user, _ = data
+        # 2026-10-19 20:00:30+08:00 即 12:00:30 UTC
+        start = datetime(2026, 10, 19, 20, 0, 30, tzinfo=timezone(timedelta(hours=8)))
+        items = LogService(db).list_logs(user, LogFilters(start=start, end=start + timedelta(seconds=10)), limit=200)["items"]
+
+        assert len(items) == 30
+        assert min(log.created_at for log in items) == datetime(2026, 10, 19, 12, 0, 30)
+
+    def test_export(self, db, data):
+        """CSV和JSONL导出包含所有匹配行"""
+        user, _ = data
+        service = LogService(db)
+
+        lines = "".join(service.export_jsonl(user, LogFilters(status_code=500))).splitlines()
+        assert len(lines) == 12
+        assert json.loads(lines[0])["status_code"] == 500
+
+        rows = list(csv.DictReader(io.StringIO("".join(service.export_csv(user, LogFilters())))))
+        assert len(rows) == 120
@@ -0,0 +1,187 @@
+"""
+事件循环延迟监控与准入控制测试用例
+"""
+import asyncio
+import logging
+import time
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.api import proxy as proxy_api
+from app.api.metrics import router as metrics_router
+from app.config import settings
+from app.database import Base, get_db
+from app.exceptions import ServiceOverloadedError
+from app.models import User, Credential, ModelConfig
+from app.schemas.llm_request import OpenAIRequest
+from app.services.loop_monitor_service import LoopLagMonitor, loop_monitor
+from app.services.proxy_service import ProxyService
+from app.utils.security import encrypt_api_key, create_access_token
+
+
+@pytest.fixture(autouse=True)
+def reset_loop_monitor():
+    loop_monitor.reset()
+    yield
+    loop_monitor.reset()
+
+
+async def blocking_handler():
+    """模拟在事件循环上执行的同步阻塞操作"""
+    time.sleep(0.3)
+
+
+class TestSampling:
+    """延迟采样与阻塞检测测试"""
+
+    @pytest.mark.asyncio
+    async def test_blocked_loop_detected(self, monkeypatch, caplog):
+        """阻塞事件循环时记录延迟，并在日志中指出正在执行的协程"""
+        monkeypatch.setattr(settings, "loop_lag_sample_interval_seconds", 0.02)
+        monkeypatch.setattr(settings, "loop_slow_callback_seconds", 0.1)
+        monitor = LoopLagMonitor()
+        monitor.start()
+        try:
+            await asyncio.sleep(0.1)
+            with caplog.at_level(logging.WARNING, logger="app.services.loop_monitor_service"):
+                await asyncio.create_task(blocking_handler())
+                await asyncio.sleep(0.1)
+        finally:
+            await monitor.shutdown()
+
+        stats = monitor.stats()
+        assert stats["lag_ms"]["max"] >= 250
+        assert stats["lag_ms"]["p50"] < 50
+        assert stats["slow_callbacks"] == 1
+
+        report = stats["recent_slow_callbacks"][0]
+        assert report["coroutine"] == "blocking_handler"
+        assert "test_loop_monitor.py" in report["location"]
+        assert report["blocked_ms"] >= 250
+        assert "blocking_handler" in caplog.text
+        assert not monitor.running
+
+
+class TestAdmission:
+    """准入控制测试"""
+
+    def test_shed_by_priority(self):
+        """延迟超过阈值时先拒绝batch，再拒绝standard，interactive始终放行"""
+        monitor = LoopLagMonitor()
+        monitor.record((settings.loop_lag_shed_batch_ms + 1) / 1000)
+
+        monitor.admit("interactive")
+        monitor.admit("standard")
+        with pytest.raises(ServiceOverloadedError):
+            monitor.admit("batch")
+
+        monitor.record((settings.loop_lag_shed_standard_ms + 1) / 1000)
+        with pytest.raises(ServiceOverloadedError):
+            monitor.admit("standard")
+        monitor.admit("interactive")
+        assert monitor.stats()["shed"] == {"interactive": 0, "standard": 1, "batch": 1}
+
+    def test_recovers_after_window(self, monkeypatch):
+        """只按最近的样本判断，延迟恢复后重新接受请求"""
+        monkeypatch.setattr(settings, "loop_lag_shed_window", 3)
+        monitor = LoopLagMonitor()
+        monitor.record(1.0)
+        for _ in range(3):
+            monitor.record(0.001)
+
+        monitor.admit("batch")
+
+    @pytest.mark.asyncio
+    async def test_proxy_request_shed(self, tmp_path):
+        """配置为batch优先级的请求在高延迟时不请求上游，API返回503"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        user = User(username="alice", email="alice@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        credential = Credential(
+            user_id=user.id, name="openai", provider="openai",
+            api_key_encrypted=encrypt_api_key("sk-test"), is_validated=True
+        )
+        db.add(credential)
+        db.flush()
+        db.add(ModelConfig(
+            credential_id=credential.id, model_name="gpt-4o-mini", target_format="openai",
+            proxy_api_key="llm-batch", priority_class="batch"
+        ))
+        db.commit()
+
+        loop_monitor.record(1.0)
+        request = OpenAIRequest(model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}])
+        with pytest.raises(ServiceOverloadedError):
+            await ProxyService(db).proxy_openai_request("llm-batch", request)
+
+        app = FastAPI()
+        app.include_router(proxy_api.router)
+        app.dependency_overrides[get_db] = lambda: db
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post(
+                "/api/v1/chat/completions",
+                json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}]},
+                headers={"Authorization": "Bearer llm-batch"}
+            )
+        db.close()
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        assert loop_monitor.stats()["shed"]["batch"] == 2
+
+
+class TestExposition:
+    """指标输出测试"""
+
+    @pytest.mark.asyncio
+    async def test_metrics_and_health(self, monkeypatch):
+        """延迟分位数出现在/metrics和/api/v1/health中"""
+        monkeypatch.setattr(settings, "metrics_auth_token", "scrape-token")
+        for lag in (0.001, 0.002, 0.05):
+            loop_monitor.record(lag)
+
+        app = FastAPI()
+        app.include_router(metrics_router)
+        app.include_router(proxy_api.router)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            metrics = (await client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})).text
+            health = (await client.get("/api/v1/health")).json()
+
+        assert 'llmbridge_event_loop_lag_seconds{quantile="0.99"} 0.05' in metrics
+        assert 'llmbridge_load_shed_requests_total{priority="batch"} 0.0' in metrics
+        assert health["event_loop"]["lag_ms"]["p50"] == 2.0
+
+    @pytest.mark.asyncio
+    async def test_metrics_requires_auth(self, tmp_path, monkeypatch):
+        """配置了抓取令牌时校验该令牌，未配置时只允许超级用户"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        db.add(User(username="alice", email="alice@example.com", password_hash="x"))
+        db.add(User(username="admin", email="admin@example.com", password_hash="x", is_superuser=True))
+        db.commit()
+
+        app = FastAPI()
+        app.include_router(metrics_router)
+        app.dependency_overrides[get_db] = lambda: db
+
+        def bearer(token):
+            return {"Authorization": f"Bearer {token}"}
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            monkeypatch.setattr(settings, "metrics_auth_token", "scrape-token")
+            assert (await client.get("/metrics")).status_code == 403
+            assert (await client.get("/metrics", headers=bearer("wrong"))).status_code == 401
+            assert (await client.get("/metrics", headers=bearer("scrape-token"))).status_code == 200
+
+            monkeypatch.setattr(settings, "metrics_auth_token", None)
+            user_token = create_access_token({"sub": "alice"})
+            admin_token = create_access_token({"sub": "admin"})
+            assert (await client.get("/metrics", headers=bearer(user_token))).status_code == 403
+            assert (await client.get("/metrics", headers=bearer(admin_token))).status_code == 200
+        db.close()
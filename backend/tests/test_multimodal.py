@@ -0,0 +1,229 @@
+"""
+多模态图片内容测试用例
+"""
+import base64
+import hashlib
+import json
+import tracemalloc
+import httpx
+import pytest
+from pydantic import ValidationError
+from app.adapters.base import LLMRequest
+from app.adapters.anthropic_adapter import AnthropicAdapter
+from app.adapters.ernie_adapter import ErnieAdapter
+from app.adapters.gemini_adapter import GeminiAdapter
+from app.adapters.openai_adapter import OpenAIAdapter
+from app.adapters.qwen_adapter import QwenAdapter, QWEN_MULTIMODAL_ENDPOINT
+from app.adapters.multimodal import Base64Payload, json_content, parse_data_url
+from app.exceptions import LLMProviderError
+from app.models import ModelConfig
+from app.schemas.llm_request import OpenAIRequest, AnthropicRequest
+from app.services.response_cache import ResponseCache
+
+IMAGE_DATA = base64.b64encode(b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4).decode()
+DATA_URL = f"data:image/png;base64,{IMAGE_DATA}"
+
+
+def _openai_messages(url=DATA_URL):
+    return [{
+        "role": "user",
+        "content": [
+            {"type": "text", "text": "What is in this image?"},
+            {"type": "image_url", "image_url": {"url": url, "detail": "low"}}
+        ]
+    }]
+
+
+def _anthropic_messages():
+    return [{
+        "role": "user",
+        "content": [
+            {"type": "image", "source": {"type": "base64", "media_type": "image/jpeg", "data": IMAGE_DATA}},
+            {"type": "text", "text": "Describe it."}
+        ]
+    }]
+
+
+async def _read_body(kwargs):
+    content = kwargs["content"]
+    if isinstance(content, bytes):
+        return content
+    return b"".join([chunk async for chunk in content])
+
+
+def _plain(value):
+    """把请求中的数据引用展开为字符串，用于比较序列化结果"""
+    if isinstance(value, Base64Payload):
+        return b"".join(value.iter_bytes()).decode()
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+class TestContentSchema:
+    """内容块校验测试"""
+
+    def test_image_parts_accepted_without_copy(self):
+        """图片内容块通过校验，base64数据仍是原始字符串对象"""
+        messages = _openai_messages()
+        request = OpenAIRequest(model="gpt-4o", messages=messages)
+
+        assert request.messages[0]["content"][1]["image_url"]["url"] is messages[0]["content"][1]["image_url"]["url"]
+        assert AnthropicRequest(model="claude-3-5-sonnet", messages=_anthropic_messages()).messages
+
+    def test_unknown_part_rejected(self):
+        """未知类型的内容块被拒绝"""
+        with pytest.raises(ValidationError):
+            OpenAIRequest(model="gpt-4o", messages=[{"role": "user", "content": [{"type": "audio", "data": "x"}]}])
+
+
+class TestTranslation:
+    """跨格式图片转换测试"""
+
+    def test_parse_data_url_references_source(self):
+        """data URL解析为媒体类型和原字符串中的一段引用"""
+        media_type, payload = parse_data_url(DATA_URL)
+
+        assert media_type == "image/png"
+        assert payload.source is DATA_URL
+        assert len(payload) == len(IMAGE_DATA)
+        assert parse_data_url("data:image/png;base64,not base64!") is None
+
+    def test_openai_to_anthropic(self):
+        """image_url data URL转为Anthropic base64图片块"""
+        adapter = AnthropicAdapter(api_key="test")
+        anthropic_request = adapter.transform_request_to_anthropic(
+            LLMRequest(model="claude-3-5-sonnet", messages=_openai_messages())
+        )
+
+        text, image = anthropic_request["messages"][0]["content"]
+        assert text == {"type": "text", "text": "What is in this image?"}
+        assert image["source"]["media_type"] == "image/png"
+        assert image["source"]["data"].source is DATA_URL
+        assert _plain(image["source"]["data"]) == IMAGE_DATA
+
+    def test_anthropic_to_openai(self):
+        """Anthropic base64图片块转为image_url data URL"""
+        adapter = OpenAIAdapter(api_key="test")
+        openai_request = adapter.transform_request_to_openai(
+            LLMRequest(model="gpt-4o", messages=_anthropic_messages())
+        )
+
+        image = openai_request["messages"][0]["content"][0]
+        assert image["type"] == "image_url"
+        assert _plain(image["image_url"]["url"]) == f"data:image/jpeg;base64,{IMAGE_DATA}"
+
+    def test_openai_to_gemini(self):
+        """base64图片转为inlineData，远程图片转为fileData"""
+        adapter = GeminiAdapter(api_key="test")
+        messages = _openai_messages()
+        messages[0]["content"].append({"type": "image_url", "image_url": {"url": "https://example.com/cat.webp"}})
+
+        parts = adapter.transform_request_to_gemini(LLMRequest(model="gemini-1.5-flash", messages=messages))["contents"][0]["parts"]
+
+        assert parts[0] == {"text": "What is in this image?"}
+        assert parts[1]["inlineData"]["mimeType"] == "image/png"
+        assert _plain(parts[1]["inlineData"]["data"]) == IMAGE_DATA
+        assert parts[2] == {"fileData": {"mimeType": "image/webp", "fileUri": "https://example.com/cat.webp"}}
+
+    def test_qwen_multimodal_endpoint(self):
+        """通义千问包含图片时使用多模态接口与内容列表"""
+        adapter = QwenAdapter(api_key="test")
+        request = LLMRequest(model="qwen-vl-plus", messages=_openai_messages())
+
+        qwen_request = adapter.transform_request_to_qwen(request)
+
+        assert adapter._generation_endpoint(request) == QWEN_MULTIMODAL_ENDPOINT
+        assert _plain(qwen_request["input"]["messages"][0]["content"]) == [
+            {"text": "What is in this image?"}, {"image": DATA_URL}
+        ]
+        response = adapter.transform_response_from_qwen(
+            {"output": {"choices": [{"message": {"content": [{"text": "A cat."}]}, "finish_reason": "stop"}]}},
+            "qwen-vl-plus"
+        )
+        assert response.choices[0]["message"]["content"] == "A cat."
+
+    def test_ernie_rejects_images(self):
+        """文心一言不支持图片输入"""
+        with pytest.raises(LLMProviderError):
+            ErnieAdapter(api_key="id:secret").transform_request_to_ernie(
+                LLMRequest(model="ernie-4.0", messages=_openai_messages())
+            )
+
+    def test_invalid_data_url(self):
+        """非base64的data URL报错"""
+        with pytest.raises(LLMProviderError):
+            OpenAIAdapter(api_key="test").transform_request_to_openai(
+                LLMRequest(model="gpt-4o", messages=_openai_messages("data:image/png,raw"))
+            )
+
+    def test_response_cache_skips_images(self):
+        """相似度缓存只比较文本，包含图片的请求不缓存"""
+        cache = ResponseCache(max_entries=10, ttl_seconds=60, verify_sample_rate=0)
+        config = ModelConfig(id="c1", response_cache_enabled=True)
+
+        assert cache.make_key(config, "openai", _openai_messages(), temperature=0) is None
+        assert cache.make_key(config, "openai", [{"role": "user", "content": "hi"}], temperature=0) is not None
+
+
+class TestRequestBody:
+    """请求体序列化测试"""
+
+    @pytest.mark.asyncio
+    async def test_body_matches_json(self):
+        """流式写出的请求体与普通JSON序列化一致，并带有准确的Content-Length"""
+        adapter = AnthropicAdapter(api_key="test")
+        data = adapter.transform_request_to_anthropic(LLMRequest(model="claude-3-5-sonnet", messages=_openai_messages()))
+
+        kwargs = json_content(data, {})
+        body = await _read_body(kwargs)
+
+        assert json.loads(body) == _plain(data)
+        assert int(kwargs["headers"]["Content-Length"]) == len(body)
+
+    @pytest.mark.asyncio
+    async def test_sent_with_content_length(self):
+        """上游收到定长请求体（不使用分块传输）"""
+        captured = []
+
+        async def handler(request):
+            captured.append((request.headers, await request.aread()))
+            return httpx.Response(200, json={"id": "msg_1", "content": [{"type": "text", "text": "ok"}], "usage": {}})
+
+        adapter = AnthropicAdapter(api_key="test")
+        adapter.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await adapter.forward_to_anthropic(LLMRequest(model="claude-3-5-sonnet", messages=_openai_messages()))
+
+        headers, body = captured[0]
+        assert "transfer-encoding" not in headers
+        assert int(headers["content-length"]) == len(body)
+        assert json.loads(body)["messages"][0]["content"][1]["source"]["data"] == IMAGE_DATA
+        await adapter.close()
+
+    @pytest.mark.asyncio
+    async def test_10mb_image_peak_memory(self):
+        """10MB图片请求的转换与序列化只在原始数据之外占用少量内存"""
+        image = base64.b64encode(bytes(range(256)) * (10 * 1024 * 1024 // 256)).decode()
+        messages = _openai_messages(f"data:image/png;base64,{image}")
+        size = len(image)
+
+        digest = hashlib.sha256()
+        tracemalloc.start()
+        try:
+            request = OpenAIRequest(model="gpt-4o", messages=messages)
+            data = AnthropicAdapter(api_key="test").transform_request_to_anthropic(
+                LLMRequest(model="claude-3-5-sonnet", messages=request.messages)
+            )
+            kwargs = json_content(data, {})
+            sent = 0
+            async for chunk in kwargs["content"]:
+                digest.update(chunk)
+                sent += len(chunk)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert sent == int(kwargs["headers"]["Content-Length"]) > size
+        assert peak < size * 0.05
@@ -0,0 +1,166 @@
+"""
+按请求性能分析测试用例
+"""
+import asyncio
+import marshal
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.api import proxy as proxy_api
+from app.api import profiles as profiles_api
+from app.adapters.base import LLMResponse, StreamDelta
+from app.adapters.openai_adapter import OpenAIAdapter
+from app.adapters.qwen_adapter import QwenAdapter
+from app.config import settings
+from app.database import Base, get_db
+from app.dependencies import get_current_superuser
+from app.models import User, Credential, ModelConfig
+from app.services.profile_service import profile_store, PROFILE_HEADER, PROFILE_ID_HEADER
+from app.utils.security import encrypt_api_key
+
+BODY = {"model": "test-model", "messages": [{"role": "user", "content": "hi"}]}
+
+
+def build_upstream_payload():
+    """模拟上游调用中的计算与内存分配"""
+    return [str(index) * 20 for index in range(20000)]
+
+
+async def slow_forward(self, request):
+    payload = build_upstream_payload()
+    await asyncio.sleep(0)
+    return LLMResponse(
+        id="chatcmpl-1", model=request.model,
+        choices=[{"index": 0, "message": {"role": "assistant", "content": str(len(payload))}, "finish_reason": "stop"}],
+        usage={"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    )
+
+
+async def qwen_stream(self, request):
+    for text in ("a", "b"):
+        build_upstream_payload()
+        yield StreamDelta(text=text)
+    yield StreamDelta(finish_reason="stop")
+
+
+@pytest.fixture(autouse=True)
+def clear_profiles():
+    profile_store.clear()
+    yield
+    profile_store.clear()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+    for username, is_superuser in (("admin", True), ("tenant", False)):
+        user = User(username=username, email=f"{username}@example.com", password_hash="x", is_superuser=is_superuser)
+        db.add(user)
+        db.flush()
+        for provider in ("openai", "qwen"):
+            credential = Credential(
+                user_id=user.id, name=provider, provider=provider,
+                api_key_encrypted=encrypt_api_key("sk-test"), is_validated=True
+            )
+            db.add(credential)
+            db.flush()
+            db.add(ModelConfig(
+                credential_id=credential.id, model_name="test-model", target_format="openai",
+                proxy_api_key=f"llm-{username}-{provider}"
+            ))
+    db.commit()
+
+    monkeypatch.setattr(OpenAIAdapter, "forward_to_openai", slow_forward)
+    monkeypatch.setattr(QwenAdapter, "stream_chat", qwen_stream)
+    app = FastAPI()
+    app.include_router(proxy_api.router)
+    app.include_router(profiles_api.router)
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_current_superuser] = lambda: User(username="admin", is_superuser=True)
+    yield httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    db.close()
+
+
+def _headers(key, profile=None):
+    headers = {"Authorization": f"Bearer {key}"}
+    if profile:
+        headers[PROFILE_HEADER] = profile
+    return headers
+
+
+class TestRequestProfiling:
+    """请求头触发的分析测试"""
+
+    @pytest.mark.asyncio
+    async def test_admin_profile_report(self, client):
+        """超级用户的请求返回报告ID，报告列出耗时函数与内存分配位置"""
+        async with client:
+            response = await client.post("/api/v1/chat/completions", json=BODY, headers=_headers("llm-admin-openai", "1"))
+            assert response.status_code == 200
+            report_id = response.headers[PROFILE_ID_HEADER]
+
+            report = (await client.get(f"/api/profiles/{report_id}")).json()
+            pstats_data = (await client.get(f"/api/profiles/{report_id}/pstats")).content
+            listing = (await client.get("/api/profiles")).json()
+
+        assert report["status"] == "ok"
+        assert not report["sampled"]
+        assert any("build_upstream_payload" in row["function"] for row in report["functions"])
+        assert any("proxy_openai_request" in row["function"] for row in report["functions"])
+        assert any("test_profiling.py" in row["location"] for row in report["allocations"])
+        assert report["peak_traced_kb"] > 0
+        assert any(name == "build_upstream_payload" for (_, _, name) in marshal.loads(pstats_data))
+        assert [entry["id"] for entry in listing] == [report_id]
+
+    @pytest.mark.asyncio
+    async def test_non_admin_forbidden(self, client):
+        """普通用户的代理密钥不能触发分析"""
+        async with client:
+            response = await client.post("/api/v1/chat/completions", json=BODY, headers=_headers("llm-tenant-openai", "1"))
+        assert response.status_code == 403
+        assert profile_store.list() == []
+
+    @pytest.mark.asyncio
+    async def test_no_header_no_profile(self, client):
+        """没有请求头时不分析"""
+        async with client:
+            response = await client.post("/api/v1/chat/completions", json=BODY, headers=_headers("llm-tenant-openai"))
+        assert response.status_code == 200
+        assert PROFILE_ID_HEADER not in response.headers
+        assert profile_store.list() == []
+
+    @pytest.mark.asyncio
+    async def test_stream_profiled_until_end(self, client):
+        """流式请求在流结束后生成报告，包含流式过程中的调用"""
+        async with client:
+            response = await client.post(
+                "/api/v1/chat/completions", json={**BODY, "stream": True}, headers=_headers("llm-admin-qwen", "1")
+            )
+            assert "[DONE]" in response.text
+
+        report = profile_store.get(response.headers[PROFILE_ID_HEADER])
+        assert report["status"] == "ok"
+        assert next(
+            row for row in report["functions"] if "build_upstream_payload" in row["function"]
+        )["calls"] == 2
+        assert report["on_loop_ms"] <= report["duration_ms"]
+
+
+class TestSampledProfiling:
+    """抽样分析测试"""
+
+    @pytest.mark.asyncio
+    async def test_sample_rate(self, client, monkeypatch):
+        """开启抽样后无请求头的请求也会被分析，但不跟踪内存"""
+        monkeypatch.setattr(settings, "profile_sample_rate", 1.0)
+        async with client:
+            response = await client.post("/api/v1/chat/completions", json=BODY, headers=_headers("llm-tenant-openai"))
+
+        report = profile_store.get(response.headers[PROFILE_ID_HEADER])
+        assert report["sampled"]
+        assert "allocations" not in report
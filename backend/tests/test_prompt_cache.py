@@ -0,0 +1,197 @@
+"""
+提示词缓存测试用例
+"""
+import pytest
+from app.adapters.base import LLMRequest
+from app.adapters.anthropic_adapter import AnthropicAdapter
+from app.adapters.claude_code_adapter import ClaudeCodeAdapter
+from app.adapters import gemini_adapter as gemini_module
+from app.adapters.gemini_adapter import GeminiAdapter
+from app.adapters.prompt_cache import (
+    apply_anthropic_cache_control,
+    split_gemini_cache_prefix,
+    anthropic_usage,
+    openai_usage
+)
+from app.services.dispatch_service import to_anthropic_response
+
+LONG_TEXT = "stable instructions " * 1200  # 约6000个token
+
+
+def _breakpoints(anthropic_request):
+    """统计请求中的cache_control断点"""
+    blocks = list(anthropic_request.get("system") or []) if isinstance(anthropic_request.get("system"), list) else []
+    for message in anthropic_request["messages"]:
+        if isinstance(message["content"], list):
+            blocks.extend(message["content"])
+    return [block for block in blocks if "cache_control" in block]
+
+
+class TestAnthropicCacheControl:
+    """Anthropic缓存断点测试"""
+
+    def test_marks_long_system_and_last_message(self):
+        """长system提示和最后一条消息各加一个断点"""
+        request = {
+            "model": "claude-sonnet-4-20250514",
+            "system": LONG_TEXT,
+            "messages": [
+                {"role": "user", "content": "first"},
+                {"role": "assistant", "content": "answer"},
+                {"role": "user", "content": "second"}
+            ]
+        }
+
+        result = apply_anthropic_cache_control(request)
+
+        assert result["system"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert result["messages"][-1]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert result["messages"][0]["content"] == "first"
+        assert len(_breakpoints(result)) == 2
+
+    def test_short_prompt_untouched(self):
+        """短提示不加断点"""
+        request = {"model": "claude-sonnet-4-20250514", "system": "short", "messages": [{"role": "user", "content": "hi"}]}
+        result = apply_anthropic_cache_control(request)
+
+        assert result["system"] == "short"
+        assert _breakpoints(result) == []
+
+    def test_haiku_requires_longer_prefix(self):
+        """Haiku模型的最小缓存长度更高"""
+        text = "word " * 1500  # 约1500个token
+        request = {"model": "claude-3-haiku-20240307", "system": text, "messages": [{"role": "user", "content": "hi"}]}
+        assert _breakpoints(apply_anthropic_cache_control(request)) == []
+
+    def test_respects_client_breakpoints(self):
+        """客户端自行设置断点时保持原样"""
+        content = [{"type": "text", "text": LONG_TEXT, "cache_control": {"type": "ephemeral"}}]
+        request = {"model": "claude-sonnet-4-20250514", "messages": [{"role": "user", "content": content}]}
+        assert len(_breakpoints(apply_anthropic_cache_control(request))) == 1
+
+    def test_adapter_only_when_enabled(self):
+        """只有启用prompt_cache时适配器才添加断点"""
+        adapter = AnthropicAdapter(api_key="test")
+        messages = [{"role": "system", "content": LONG_TEXT}, {"role": "user", "content": "hi"}]
+
+        plain = adapter.transform_request_to_anthropic(LLMRequest(model="claude-sonnet-4-20250514", messages=messages))
+        cached = adapter.transform_request_to_anthropic(
+            LLMRequest(model="claude-sonnet-4-20250514", messages=messages, prompt_cache=True)
+        )
+
+        assert plain["system"] == LONG_TEXT
+        assert len(_breakpoints(cached)) == 2
+
+    def test_claude_code_keeps_required_system_block(self):
+        """Claude Code的固定系统提示词保留在最前，自定义部分另加断点"""
+        adapter = ClaudeCodeAdapter(api_key="cr_test")
+        request = LLMRequest(
+            model="claude-sonnet-4-20250514",
+            messages=[{"role": "system", "content": LONG_TEXT}, {"role": "user", "content": "hi"}],
+            prompt_cache=True
+        )
+
+        result = adapter.transform_request_to_anthropic(request)
+
+        assert result["system"][0]["text"] == "你是一个编程助手,请根据用户的问题给出详细的回答."
+        assert result["system"][1]["text"] == LONG_TEXT
+        assert len(_breakpoints(result)) == 3
+
+
+class TestCacheUsage:
+    """缓存用量统计测试"""
+
+    def test_anthropic_usage_adds_cached_input(self):
+        """Anthropic的缓存读写token计入prompt_tokens"""
+        usage = anthropic_usage({
+            "input_tokens": 10,
+            "output_tokens": 5,
+            "cache_read_input_tokens": 2000,
+            "cache_creation_input_tokens": 300
+        })
+        assert usage == {
+            "prompt_tokens": 2310,
+            "completion_tokens": 5,
+            "total_tokens": 2315,
+            "cache_read_tokens": 2000,
+            "cache_creation_tokens": 300
+        }
+
+    def test_openai_usage_flattens_details(self):
+        """OpenAI的嵌套明细被展开"""
+        usage = openai_usage({
+            "prompt_tokens": 1500,
+            "completion_tokens": 20,
+            "total_tokens": 1520,
+            "prompt_tokens_details": {"cached_tokens": 1024},
+            "completion_tokens_details": {"reasoning_tokens": 0}
+        })
+        assert usage == {"prompt_tokens": 1500, "completion_tokens": 20, "total_tokens": 1520, "cache_read_tokens": 1024}
+
+    def test_anthropic_response_reports_cache_fields(self):
+        """转换为Anthropic响应时拆分出缓存用量"""
+        response = to_anthropic_response({
+            "id": "x",
+            "model": "claude",
+            "choices": [{"message": {"content": "ok"}}],
+            "usage": {"prompt_tokens": 2310, "completion_tokens": 5, "cache_read_tokens": 2000, "cache_creation_tokens": 300}
+        })
+        assert response["usage"] == {
+            "input_tokens": 10,
+            "output_tokens": 5,
+            "cache_read_input_tokens": 2000,
+            "cache_creation_input_tokens": 300
+        }
+
+
+class TestGeminiCachedContent:
+    """Gemini缓存内容测试"""
+
+    def _request(self, turns):
+        contents = []
+        for text in turns:
+            contents.append({"role": "user", "parts": [{"text": text}]})
+        return {"systemInstruction": {"parts": [{"text": LONG_TEXT * 2}]}, "contents": contents, "generationConfig": {}}
+
+    def test_split_uses_shortest_stable_prefix(self):
+        """只缓存达到最小长度的最短前缀，最后一条消息不缓存"""
+        cached, remaining = split_gemini_cache_prefix(self._request(["a", "b", "c"]))
+
+        assert cached["contents"] == []
+        assert "systemInstruction" in cached
+        assert "systemInstruction" not in remaining
+        assert len(remaining["contents"]) == 3
+
+        assert split_gemini_cache_prefix({"contents": [{"role": "user", "parts": [{"text": "hi"}]}]}) is None
+
+    @pytest.mark.asyncio
+    async def test_cached_content_created_once(self, monkeypatch):
+        """同一前缀只创建一次缓存内容，后续请求引用缓存"""
+        gemini_module.gemini_cached_contents.clear()
+        adapter = GeminiAdapter(api_key="test")
+        sent = []
+
+        async def fake_send_request(data, endpoint):
+            sent.append((endpoint, data))
+            if endpoint == "cachedContents":
+                return {"name": "cachedContents/abc"}
+            return {
+                "candidates": [{"content": {"parts": [{"text": "ok"}]}, "finishReason": "STOP"}],
+                "usageMetadata": {"promptTokenCount": 5000, "candidatesTokenCount": 2, "totalTokenCount": 5002,
+                                  "cachedContentTokenCount": 4800}
+            }
+
+        monkeypatch.setattr(adapter, "send_request", fake_send_request)
+        messages = [{"role": "system", "content": LONG_TEXT * 2}, {"role": "user", "content": "hi"}]
+
+        for _ in range(2):
+            response = await adapter.forward_to_gemini(
+                LLMRequest(model="gemini-1.5-pro", messages=messages, prompt_cache=True)
+            )
+
+        endpoints = [endpoint for endpoint, _ in sent]
+        assert endpoints.count("cachedContents") == 1
+        assert sent[-1][1]["cachedContent"] == "cachedContents/abc"
+        assert "systemInstruction" not in sent[-1][1]
+        assert response.usage["cache_read_tokens"] == 4800
+        await adapter.close()
@@ -0,0 +1,102 @@
+"""
+Token配额测试用例
+"""
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import User, Credential, ModelConfig, TokenQuotaUsage
+from app.exceptions import QuotaExceededError
+from app.services import quota_service as quota_module
+from app.services.quota_service import TokenQuotaManager
+from app.utils.tokens import estimate_messages_tokens
+
+
+class TestTokenQuotaManager:
+    """内存配额计数与持久化测试"""
+
+    NOW = datetime(2026, 10, 19, 12, 0, 0)
+
+    @pytest.fixture
+    def session_factory(self, tmp_path, monkeypatch):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        monkeypatch.setattr(quota_module, "SessionLocal", factory)
+        return factory
+
+    @pytest.fixture
+    def config(self, session_factory):
+        db = session_factory()
+        user = User(username="alice", email="alice@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        credential = Credential(user_id=user.id, name="openai", provider="openai", api_key_encrypted="x")
+        db.add(credential)
+        db.flush()
+        config = ModelConfig(
+            credential_id=credential.id,
+            model_name="gpt-4",
+            target_format="openai",
+            proxy_api_key="llm-alice",
+            daily_token_quota=1000,
+            monthly_token_quota=5000
+        )
+        db.add(config)
+        db.commit()
+        db.refresh(config)
+        db.expunge(config)
+        db.close()
+        return config
+
+    def test_reserve_and_reject(self, config):
+        """预留超出配额时拒绝，结算后按实际用量计数"""
+        manager = TokenQuotaManager(flush_interval_seconds=60)
+
+        first = manager.reserve(config, 600, now=self.NOW)
+        with pytest.raises(QuotaExceededError):
+            manager.reserve(config, 600, now=self.NOW)
+
+        manager.commit(first, 200)
+        assert manager.get_usage(config.id, "day", now=self.NOW) == 200
+
+        second = manager.reserve(config, 600, now=self.NOW)
+        manager.release(second)
+        manager.release(second)
+        assert manager._counters[(config.id, "day", "2026-10-19")].reserved == 0
+
+    def test_unlimited_config_skips_counters(self, config):
+        """未设置配额时不计数也不访问数据库"""
+        config.daily_token_quota = None
+        config.monthly_token_quota = None
+        manager = TokenQuotaManager(flush_interval_seconds=60)
+
+        reservation = manager.reserve(config, 10 ** 9, now=self.NOW)
+        manager.commit(reservation, 10 ** 9)
+        assert manager._counters == {}
+
+    def test_flush_persists_and_reloads(self, config, session_factory):
+        """增量写入数据库，新实例从数据库恢复已用量"""
+        manager = TokenQuotaManager(flush_interval_seconds=60)
+        now = datetime.utcnow()
+
+        manager.commit(manager.reserve(config, 100, now=now), 300)
+        manager.flush()
+        manager.commit(manager.reserve(config, 100, now=now), 200)
+        manager.flush()
+
+        db = session_factory()
+        rows = {row.period: row.used_tokens for row in db.query(TokenQuotaUsage).all()}
+        db.close()
+        assert rows == {"day": 500, "month": 500}
+
+        restarted = TokenQuotaManager(flush_interval_seconds=60)
+        with pytest.raises(QuotaExceededError):
+            restarted.reserve(config, 600, now=now)
+        restarted.reserve(config, 400, now=now)
+
+    def test_estimate_messages_tokens(self):
+        """提示词估算包含每条消息的角色、格式开销和回复起始标记"""
+        messages = [{"role": "user", "content": "a" * 40}, {"role": "assistant", "content": ""}]
+        assert estimate_messages_tokens(messages) == (10 + 4 + 1) + (4 + 3) + 3
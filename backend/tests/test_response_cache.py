@@ -0,0 +1,133 @@
+"""
+近似重复请求缓存测试用例
+"""
+import pytest
+from app.config import settings
+from app.models import ModelConfig
+from app.services.response_cache import (
+    ResponseCache,
+    text_signature,
+    estimate_similarity,
+    normalize_tokens
+)
+
+SYSTEM = "You are a support assistant for an online store. " * 20
+
+
+def _response(text):
+    return {"id": "chatcmpl-1", "choices": [{"message": {"role": "assistant", "content": text}}]}
+
+
+class TestFingerprints:
+    """文本指纹测试"""
+
+    def test_normalization_ignores_volatile_content(self):
+        """空白、大小写和时间戳不影响指纹"""
+        a = "Summarize the report generated at 2026-10-19T08:15:00Z   for   team Alpha"
+        b = "summarize the report generated at 2026-10-20 17:42:11 for team alpha"
+        assert normalize_tokens(a) == normalize_tokens(b)
+        assert text_signature(a) == text_signature(b)
+
+    def test_similarity_estimate(self):
+        """相似文本估算值高，不同文本估算值低"""
+        base = "please list three practical tips for improving sleep quality during a busy work week"
+        similar = base + " thanks"
+        different = "write a haiku about autumn leaves falling on a quiet mountain lake at dawn"
+
+        assert estimate_similarity(text_signature(base), text_signature(similar)) > 0.7
+        assert estimate_similarity(text_signature(base), text_signature(different)) < 0.2
+
+
+class TestResponseCache:
+    """缓存查找、淘汰与抽样验证测试"""
+
+    @pytest.fixture
+    def config(self):
+        return ModelConfig(id="config-1", response_cache_enabled=True, response_cache_threshold=0.8)
+
+    @pytest.fixture
+    def cache(self):
+        return ResponseCache(max_entries=100, ttl_seconds=60, verify_sample_rate=0)
+
+    def _key(self, cache, config, question, system=SYSTEM, temperature=0.0):
+        return cache.make_key(
+            config,
+            ("openai", "gpt-4", 100, temperature),
+            [{"role": "user", "content": question}],
+            system=system,
+            temperature=temperature
+        )
+
+    def test_near_duplicate_hit(self, cache, config):
+        """只差空白和时间戳的请求命中缓存"""
+        cache.store(self._key(cache, config, "What is the refund policy for orders placed on 2026-10-01?"), _response("30 days"))
+
+        hit = cache.lookup(self._key(cache, config, "what is the refund  policy for orders placed on 2026-10-05 ?"))
+
+        assert hit is not None
+        assert hit.response["choices"][0]["message"]["content"] == "30 days"
+        assert cache.stats()["hit_rate"] == 1.0
+
+    def test_same_system_different_question_misses(self, cache, config):
+        """system提示相同但问题不同不会命中"""
+        cache.store(self._key(cache, config, "What is the refund policy?"), _response("30 days"))
+        assert cache.lookup(self._key(cache, config, "How long does shipping to Canada take?")) is None
+
+    def test_different_context_misses(self, cache, config):
+        """问题相同但上下文不同不会命中"""
+        cache.store(self._key(cache, config, "What is the refund policy?"), _response("30 days"))
+        other_system = "You translate English text into French and nothing else. " * 20
+        assert cache.lookup(self._key(cache, config, "What is the refund policy?", system=other_system)) is None
+
+    def test_ineligible_requests(self, cache, config):
+        """未开启、高温度或流式请求不使用缓存"""
+        assert self._key(cache, config, "hi", temperature=settings.response_cache_max_temperature + 0.5) is None
+        assert cache.make_key(config, (), [{"role": "user", "content": "hi"}], temperature=0, stream=True) is None
+
+        config.response_cache_enabled = False
+        assert self._key(cache, config, "hi") is None
+
+    def test_lru_eviction_bounds_memory(self, config):
+        """超出上限时淘汰最久未使用的条目，并清理索引"""
+        cache = ResponseCache(max_entries=3, ttl_seconds=60, verify_sample_rate=0)
+        for i in range(5):
+            cache.store(self._key(cache, config, f"question number {i} about topic {i * 7}"), _response(str(i)))
+
+        stats = cache.stats()
+        assert stats["size"] == 3
+        assert stats["evictions"] == 2
+        indexed = set().union(*cache._buckets.values())
+        assert indexed == set(cache._entries)
+
+    def test_expired_entries_not_served(self, config):
+        """过期条目不会命中"""
+        cache = ResponseCache(max_entries=10, ttl_seconds=0, verify_sample_rate=0)
+        cache.store(self._key(cache, config, "What is the refund policy?"), _response("30 days"))
+        assert cache.lookup(self._key(cache, config, "What is the refund policy?")) is None
+        assert cache.stats()["size"] == 0
+
+    def test_false_positive_sampling(self, config):
+        """抽样验证发现响应不一致时计为误命中并丢弃条目"""
+        cache = ResponseCache(max_entries=10, ttl_seconds=60, verify_sample_rate=1.0)
+        cache.store(self._key(cache, config, "What is the refund policy?"), _response("Refunds are accepted within 30 days"))
+
+        hit = cache.lookup(self._key(cache, config, "What is the refund policy?"))
+        assert hit.verify
+        cache.record_verification(hit, _response("Refunds are accepted within 30 days"))
+        assert cache.stats()["false_positives"] == 0
+
+        hit = cache.lookup(self._key(cache, config, "What is the refund policy?"))
+        cache.record_verification(hit, _response("We ship worldwide using express couriers"))
+
+        stats = cache.stats()
+        assert stats["verifications"] == 2
+        assert stats["false_positives"] == 1
+        assert stats["false_positive_rate"] == 0.5
+        assert stats["size"] == 0
+
+    def test_invalidate_config(self, cache, config):
+        """配置修改后丢弃其缓存"""
+        cache.store(self._key(cache, config, "What is the refund policy?"), _response("30 days"))
+        cache.invalidate_config(config.id)
+        assert cache.stats()["size"] == 0
+        assert cache._buckets == {}
@@ -0,0 +1,192 @@
+"""
+上游公平调度测试用例
+"""
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.database import Base
+from app.models import User, Credential, ModelConfig, RequestLog
+from app.exceptions import LLMProviderError, QueueTimeoutError
+from app.schemas.llm_request import OpenAIRequest
+from app.services.proxy_service import ProxyService
+from app.services.scheduler_service import FairScheduler, fair_scheduler, resolve_priority
+from app.utils.security import encrypt_api_key
+
+
+@pytest.fixture(autouse=True)
+def single_slot(monkeypatch):
+    monkeypatch.setattr(settings, "scheduler_max_concurrency_per_credential", 1)
+    monkeypatch.setattr(settings, "scheduler_quantum_tokens", 1000)
+    fair_scheduler.reset()
+    yield
+    fair_scheduler.reset()
+
+
+async def _grant_order(scheduler, requests):
+    """占住唯一的名额后按顺序排队，逐个归还名额，返回获得名额的顺序"""
+    holder = await scheduler.acquire("cred", "holder", "standard")
+    granted = []
+
+    async def wait(label, key, priority, weight, cost):
+        ticket = await scheduler.acquire("cred", key, priority, weight=weight, cost=cost)
+        granted.append(label)
+        await asyncio.sleep(0)
+        scheduler.release(ticket)
+
+    tasks = []
+    for request in requests:
+        tasks.append(asyncio.create_task(wait(*request)))
+        await asyncio.sleep(0)
+    scheduler.release(holder)
+    await asyncio.gather(*tasks)
+    return granted
+
+
+class TestPriority:
+    """优先级测试"""
+
+    def test_header_can_only_lower(self):
+        """请求头只能降低模型配置的优先级"""
+        assert resolve_priority(None, None) == "standard"
+        assert resolve_priority("interactive", "batch") == "batch"
+        assert resolve_priority("batch", "interactive") == "batch"
+        assert resolve_priority("standard", "Interactive") == "standard"
+        with pytest.raises(LLMProviderError):
+            resolve_priority("standard", "urgent")
+
+    @pytest.mark.asyncio
+    async def test_classes_served_in_order(self):
+        """名额归还后先分配给高优先级的排队请求"""
+        granted = await _grant_order(FairScheduler(), [
+            ("batch", "a", "batch", 1, 1),
+            ("standard", "b", "standard", 1, 1),
+            ("interactive", "c", "interactive", 1, 1),
+        ])
+
+        assert granted == ["interactive", "standard", "batch"]
+
+
+class TestDeficitRoundRobin:
+    """同一优先级内的差额轮询测试"""
+
+    @pytest.mark.asyncio
+    async def test_keys_interleave(self):
+        """一个密钥的大量排队请求不会阻塞另一个密钥"""
+        requests = [(f"a{index}", "a", "standard", 1, 1000) for index in range(6)]
+        requests += [(f"b{index}", "b", "standard", 1, 1000) for index in range(2)]
+
+        granted = await _grant_order(FairScheduler(), requests)
+
+        assert {label[0] for label in granted[:4]} == {"a", "b"}
+        assert granted.index("b1") < granted.index("a3")
+
+    @pytest.mark.asyncio
+    async def test_weights(self):
+        """权重为2的密钥获得两倍的名额"""
+        requests = [(f"a{index}", "a", "standard", 2, 1000) for index in range(8)]
+        requests += [(f"b{index}", "b", "standard", 1, 1000) for index in range(8)]
+
+        granted = await _grant_order(FairScheduler(), requests)
+
+        assert sum(label.startswith("a") for label in granted[:9]) == 6
+
+    @pytest.mark.asyncio
+    async def test_cost_in_tokens(self):
+        """按token成本分配：请求较大的密钥获得的名额较少"""
+        requests = [(f"big{index}", "big", "standard", 1, 4000) for index in range(3)]
+        requests += [(f"small{index}", "small", "standard", 1, 1000) for index in range(8)]
+
+        granted = await _grant_order(FairScheduler(), requests)
+
+        # 每个大请求的成本等于四个小请求
+        assert granted[:10] == [
+            "small0", "small1", "small2", "small3", "big0",
+            "small4", "small5", "small6", "small7", "big1"
+        ]
+
+
+class TestQueueing:
+    """排队超时与统计测试"""
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self, monkeypatch):
+        """排队超时抛出QueueTimeoutError，之后名额照常分配"""
+        monkeypatch.setattr(settings, "scheduler_max_queue_wait_seconds", 0.01)
+        scheduler = FairScheduler()
+        holder = await scheduler.acquire("cred", "a", "standard")
+
+        with pytest.raises(QueueTimeoutError):
+            await scheduler.acquire("cred", "b", "batch")
+        scheduler.release(holder)
+
+        ticket = await scheduler.acquire("cred", "b", "batch")
+        assert scheduler.stats()["classes"]["batch"]["timeouts"] == 1
+        assert scheduler.stats()["active"] == 1
+        scheduler.release(ticket)
+
+    @pytest.mark.asyncio
+    async def test_per_class_wait_stats(self):
+        """按优先级统计排队时间"""
+        scheduler = FairScheduler()
+        holder = await scheduler.acquire("cred", "a", "standard")
+        waiter = asyncio.create_task(scheduler.acquire("cred", "b", "batch"))
+        await asyncio.sleep(0.02)
+        assert scheduler.stats()["classes"]["batch"]["queued"] == 1
+
+        scheduler.release(holder)
+        scheduler.release(await waiter)
+
+        stats = scheduler.stats()["classes"]
+        assert stats["standard"]["max_wait_ms"] == 0
+        assert stats["batch"]["requests"] == 1
+        assert stats["batch"]["p95_wait_ms"] >= 15
+        assert stats["batch"]["queued"] == 0
+
+    @pytest.mark.asyncio
+    async def test_separate_credentials(self):
+        """不同上游凭证的名额互不影响"""
+        scheduler = FairScheduler()
+        first = await scheduler.acquire("cred-1", "a", "standard")
+        second = await asyncio.wait_for(scheduler.acquire("cred-2", "a", "standard"), 1)
+        scheduler.release(first)
+        scheduler.release(second)
+
+
+class TestProxyScheduling:
+    """代理请求排队测试"""
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout_logged(self, tmp_path, monkeypatch):
+        """上游名额被占满时排队超时的请求返回429并记录分类"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        user = User(username="alice", email="alice@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        credential = Credential(
+            user_id=user.id, name="openai", provider="openai",
+            api_key_encrypted=encrypt_api_key("sk-test"), is_validated=True
+        )
+        db.add(credential)
+        db.flush()
+        db.add(ModelConfig(
+            credential_id=credential.id, model_name="gpt-4o-mini", target_format="openai",
+            proxy_api_key="llm-batch", priority_class="batch"
+        ))
+        db.commit()
+
+        monkeypatch.setattr(settings, "scheduler_max_queue_wait_seconds", 0.01)
+        holder = await fair_scheduler.acquire(credential.id, "other", "interactive")
+        request = OpenAIRequest(model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}])
+
+        with pytest.raises(QueueTimeoutError):
+            await ProxyService(db).proxy_openai_request("llm-batch", request, priority="interactive")
+
+        log = db.query(RequestLog).one()
+        assert (log.status_code, log.error_type) == (429, "queue_timeout")
+        assert fair_scheduler.stats()["classes"]["batch"]["timeouts"] == 1
+        fair_scheduler.release(holder)
+        db.close()
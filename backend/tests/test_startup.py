@@ -0,0 +1,122 @@
+"""
+应用启动测试用例
+"""
+from pathlib import Path
+import json
+import os
+import subprocess
+import sys
+import pytest
+from sqlalchemy import create_engine, text
+from app.config import settings
+from app.database import Base
+from app.adapters.base import AbstractLLMAdapter
+from app.adapters.factory import LLMAdapterFactory
+from app.exceptions import SchemaVersionError
+from app import lifespan as lifespan_module
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# 在新进程中测量冷启动：导入app.main，然后执行lifespan启动与停止
+COLD_START_SCRIPT = """
+import asyncio, json, os, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+side_effects = {
+    "database_created": os.path.exists(sys.argv[1]),
+    "adapters_loaded": sorted(m for m in sys.modules if m.startswith("app.adapters.") and m.endswith("_adapter")),
+}
+
+from app.database import Base, engine
+Base.metadata.create_all(bind=engine)
+
+async def run():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        return app.main.startup_report.to_dict()
+
+report = asyncio.run(run())
+print(json.dumps({
+    "import_seconds": imported - started,
+    "startup_ms": report["total_ms"],
+    "phases": [phase["name"] for phase in report["phases"]],
+    **side_effects,
+}))
+"""
+
+
+class TestColdStart:
+    """冷启动耗时与导入副作用测试"""
+
+    def test_cold_start_within_budget(self, tmp_path):
+        """导入没有副作用，导入加启动的总耗时不超过预算"""
+        database = tmp_path / "cold.db"
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}", ENCRYPTION_KEY="", PYTHONWARNINGS="ignore")
+        result = subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT, str(database)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120
+        )
+        assert result.returncode == 0, result.stderr
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+
+        assert report["database_created"] is False
+        assert report["adapters_loaded"] == []
+        assert report["phases"] == ["pools", "schema", "cache_warmup", "background_jobs"]
+
+        total_seconds = report["import_seconds"] + report["startup_ms"] / 1000
+        assert total_seconds < settings.startup_budget_seconds, report
+
+
+class TestAdapterRegistry:
+    """适配器延迟加载测试"""
+
+    def test_adapter_loaded_on_demand(self):
+        """第一次创建适配器时才导入对应模块"""
+        adapter = LLMAdapterFactory.create_adapter("qwen", api_key="test")
+        assert type(adapter).__name__ == "QwenAdapter"
+        assert LLMAdapterFactory.get_adapter_class("qwen") is type(adapter)
+        assert LLMAdapterFactory.create_adapter("anthropic", api_key="cr_test").__class__.__name__ == "ClaudeCodeAdapter"
+
+    def test_unsupported_and_registered_providers(self):
+        """未知提供商报错，注册的适配器出现在支持列表中"""
+        with pytest.raises(ValueError):
+            LLMAdapterFactory.create_adapter("unknown", api_key="test")
+
+        class CustomAdapter(AbstractLLMAdapter):
+            pass
+
+        LLMAdapterFactory.register_adapter("custom", CustomAdapter)
+        try:
+            assert LLMAdapterFactory.is_provider_supported("custom")
+            assert "custom" in LLMAdapterFactory.get_supported_providers()
+            assert LLMAdapterFactory.get_adapter_class("custom") is CustomAdapter
+        finally:
+            LLMAdapterFactory._adapters.pop("custom", None)
+
+
+class TestSchemaCheck:
+    """启动时的迁移版本检查测试"""
+
+    @pytest.fixture
+    def engine(self, tmp_path, monkeypatch):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        monkeypatch.setattr(lifespan_module, "engine", engine)
+        monkeypatch.setattr(settings, "startup_schema_check", "strict")
+        return engine
+
+    def test_strict_rejects_unmigrated_database(self, engine):
+        """未迁移的数据库在strict模式下拒绝启动"""
+        with pytest.raises(SchemaVersionError):
+            lifespan_module.check_schema()
+
+    def test_migrated_database_passes(self, engine):
+        """已迁移到最新版本时通过检查"""
+        _, heads = lifespan_module.get_schema_revisions()
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)"))
+            for head in heads:
+                connection.execute(text("INSERT INTO alembic_version VALUES (:head)"), {"head": head})
+
+        lifespan_module.check_schema()
@@ -0,0 +1,382 @@
+"""
+原生流式转发测试用例
+"""
+import json
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.api import proxy as proxy_api
+from app.database import Base, get_db
+from app.models import User, Credential, ModelConfig, RequestLog
+from app.adapters.factory import LLMAdapterFactory
+from app.adapters.base import LLMRequest, LLMResponse, StreamDelta
+from app.adapters.gemini_adapter import GeminiAdapter
+from app.adapters.qwen_adapter import QwenAdapter
+from app.adapters.ernie_adapter import ErnieAdapter
+from app.adapters.openai_adapter import OpenAIAdapter
+from app.exceptions import LLMProviderError
+from app.schemas.llm_request import OpenAIRequest, AnthropicRequest
+from app.services.proxy_service import ProxyService
+from app.services.scheduler_service import fair_scheduler
+from app.utils.security import encrypt_api_key
+
+
+def _mock_client(body, captured, status_code=200):
+    def handler(request):
+        captured.append(request)
+        return httpx.Response(status_code, content=body.encode(), headers={"Content-Type": "text/event-stream"})
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def _collect(stream):
+    return [delta async for delta in stream]
+
+
+def _request(**kwargs):
+    return LLMRequest(model=kwargs.pop("model", "test-model"), messages=[{"role": "user", "content": "你好"}], **kwargs)
+
+
+def _parse_sse(events):
+    """把SSE文本解析为 (事件名, 数据) 列表"""
+    parsed = []
+    for event in "".join(events).strip().split("\n\n"):
+        name = None
+        data = None
+        for line in event.split("\n"):
+            if line.startswith("event: "):
+                name = line[7:]
+            elif line.startswith("data: "):
+                data = line[6:]
+        parsed.append((name, data if data == "[DONE]" else json.loads(data)))
+    return parsed
+
+
+class TestNativeStreams:
+    """各提供商原生流式接口测试"""
+
+    @pytest.mark.asyncio
+    async def test_gemini_stream(self):
+        """Gemini使用streamGenerateContent?alt=sse，结束原因和用量转为OpenAI格式"""
+        body = (
+            'data: {"candidates": [{"content": {"parts": [{"text": "你"}], "role": "model"}}]}\n\n'
+            'data: {"candidates": [{"content": {"parts": [{"text": "好"}]}, "finishReason": "MAX_TOKENS"}],'
+            ' "usageMetadata": {"promptTokenCount": 3, "candidatesTokenCount": 2, "totalTokenCount": 5}}\n\n'
+        )
+        captured = []
+        adapter = GeminiAdapter(api_key="test")
+        adapter.client = _mock_client(body, captured)
+
+        deltas = await _collect(adapter.stream_chat(_request(model="gemini-1.5-flash")))
+
+        assert captured[0].url.path.endswith("models/gemini-1.5-flash:streamGenerateContent")
+        assert captured[0].url.params["alt"] == "sse"
+        assert [delta.text for delta in deltas] == ["你", "好"]
+        assert deltas[-1].finish_reason == "length"
+        assert deltas[-1].usage["total_tokens"] == 5
+        await adapter.close()
+
+    @pytest.mark.asyncio
+    async def test_qwen_stream(self):
+        """通义千问开启SSE与增量输出，字符串"null"不视为结束"""
+        body = (
+            'id:1\nevent:result\n:HTTP_STATUS/200\n'
+            'data:{"output":{"choices":[{"message":{"content":"你","role":"assistant"},"finish_reason":"null"}]},'
+            '"usage":{"total_tokens":4,"input_tokens":3,"output_tokens":1},"request_id":"r1"}\n\n'
+            'id:2\nevent:result\n:HTTP_STATUS/200\n'
+            'data:{"output":{"choices":[{"message":{"content":"好","role":"assistant"},"finish_reason":"stop"}]},'
+            '"usage":{"total_tokens":5,"input_tokens":3,"output_tokens":2},"request_id":"r1"}\n\n'
+        )
+        captured = []
+        adapter = QwenAdapter(api_key="test")
+        adapter.client = _mock_client(body, captured)
+
+        deltas = await _collect(adapter.stream_chat(_request(model="qwen-turbo")))
+
+        assert captured[0].headers["X-DashScope-SSE"] == "enable"
+        assert json.loads(captured[0].content)["parameters"]["incremental_output"] is True
+        assert [(delta.text, delta.finish_reason) for delta in deltas] == [("你", None), ("好", "stop")]
+        assert deltas[-1].usage == {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}
+        await adapter.close()
+
+    @pytest.mark.asyncio
+    async def test_qwen_stream_error_event(self):
+        """流中的错误事件转为异常"""
+        body = 'id:1\nevent:error\ndata:{"code":"InvalidParameter","message":"bad input","request_id":"r1"}\n\n'
+        adapter = QwenAdapter(api_key="test")
+        adapter.client = _mock_client(body, [])
+
+        with pytest.raises(LLMProviderError, match="InvalidParameter"):
+            await _collect(adapter.stream_chat(_request(model="qwen-turbo")))
+        await adapter.close()
+
+    @pytest.mark.asyncio
+    async def test_ernie_stream(self):
+        """文心一言以stream模式请求，is_end标记结束"""
+        body = (
+            'data: {"id": "as-1", "result": "你", "is_end": false, "is_truncated": false}\n\n'
+            'data: {"id": "as-1", "result": "好", "is_end": true, "is_truncated": false,'
+            ' "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}}\n\n'
+        )
+        captured = []
+        adapter = ErnieAdapter(api_key="key:secret")
+        adapter.access_token = "token"
+        adapter.client = _mock_client(body, captured)
+
+        deltas = await _collect(adapter.stream_chat(_request(model="ERNIE-Bot")))
+
+        assert captured[0].url.params["access_token"] == "token"
+        assert json.loads(captured[0].content)["stream"] is True
+        assert [(delta.text, delta.finish_reason) for delta in deltas] == [("你", None), ("好", "stop")]
+        assert deltas[-1].usage["total_tokens"] == 5
+        await adapter.close()
+
+    @pytest.mark.asyncio
+    async def test_ernie_error_body(self):
+        """错误以普通JSON响应体返回时抛出异常"""
+        adapter = ErnieAdapter(api_key="key:secret")
+        adapter.access_token = "token"
+        adapter.client = _mock_client('{"error_code": 110, "error_msg": "Access token invalid"}', [])
+
+        with pytest.raises(LLMProviderError, match="110"):
+            await _collect(adapter.stream_chat(_request(model="ERNIE-Bot")))
+        await adapter.close()
+
+    @pytest.mark.asyncio
+    async def test_http_error_raised_before_content(self):
+        """上游返回错误状态码时在产出内容之前抛出"""
+        adapter = QwenAdapter(api_key="test")
+        adapter.client = _mock_client('{"code": "InvalidApiKey"}', [], status_code=401)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await _collect(adapter.stream_chat(_request(model="qwen-turbo")))
+        await adapter.close()
+
+
+class TestProxyStreaming:
+    """代理流式转发测试"""
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+        user = User(username="alice", email="alice@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        for provider in ("qwen", "openai"):
+            credential = Credential(
+                user_id=user.id, name=provider, provider=provider,
+                api_key_encrypted=encrypt_api_key("sk-test"), is_validated=True
+            )
+            db.add(credential)
+            db.flush()
+            for target_format in ("openai", "anthropic"):
+                db.add(ModelConfig(
+                    credential_id=credential.id,
+                    model_name="test-model",
+                    target_format=target_format,
+                    proxy_api_key=f"llm-{provider}-{target_format}"
+                ))
+        db.commit()
+        yield db
+        db.close()
+
+    @staticmethod
+    def _fake_qwen_stream(monkeypatch, fail_after=None):
+        async def stream_chat(self, request):
+            for index, text in enumerate(["你", "好"]):
+                if fail_after is not None and index >= fail_after:
+                    raise RuntimeError("upstream reset")
+                yield StreamDelta(text=text)
+            yield StreamDelta(finish_reason="stop", usage={"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5})
+
+        monkeypatch.setattr(QwenAdapter, "stream_chat", stream_chat)
+
+    @pytest.mark.asyncio
+    async def test_openai_sse_from_native_stream(self, db, monkeypatch):
+        """原生流式提供商的增量事件转为OpenAI chunk流，结束后记录用量"""
+        self._fake_qwen_stream(monkeypatch)
+        request = OpenAIRequest(model="qwen-turbo", messages=[{"role": "user", "content": "你好"}], stream=True)
+
+        stream = await ProxyService(db).proxy_openai_request("llm-qwen-openai", request)
+        events = _parse_sse([event async for event in stream])
+
+        chunks = [data for _, data in events[:-1]]
+        assert chunks[0]["choices"][0]["delta"] == {"role": "assistant", "content": ""}
+        assert "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks) == "你好"
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+        assert chunks[-1]["usage"]["total_tokens"] == 5
+        assert events[-1] == (None, "[DONE]")
+
+        log = db.query(RequestLog).one()
+        assert (log.status_code, log.tokens_used, log.completion_tokens) == (200, 5, 2)
+
+    @pytest.mark.asyncio
+    async def test_anthropic_sse(self, db, monkeypatch):
+        """目标格式为Anthropic时输出Messages事件流"""
+        self._fake_qwen_stream(monkeypatch)
+        request = AnthropicRequest(model="qwen-turbo", messages=[{"role": "user", "content": "你好"}], stream=True)
+
+        stream = await ProxyService(db).proxy_anthropic_request("llm-qwen-anthropic", request)
+        events = _parse_sse([event async for event in stream])
+
+        assert [name for name, _ in events] == [
+            "message_start", "content_block_start", "content_block_delta", "content_block_delta",
+            "content_block_stop", "message_delta", "message_stop"
+        ]
+        assert "".join(data["delta"]["text"] for name, data in events if name == "content_block_delta") == "你好"
+        assert events[5][1]["delta"]["stop_reason"] == "end_turn"
+        assert events[5][1]["usage"]["output_tokens"] == 2
+
+    @pytest.mark.asyncio
+    async def test_fallback_for_non_native_provider(self, db, monkeypatch):
+        """不支持原生流式的上游返回完整响应后作为单个增量事件输出"""
+        async def forward_to_openai(self, request):
+            return LLMResponse(
+                id="chatcmpl-1", model="gpt-4",
+                choices=[{"index": 0, "message": {"role": "assistant", "content": "hello"}, "finish_reason": "length"}],
+                usage={"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4}
+            )
+
+        monkeypatch.setattr(OpenAIAdapter, "forward_to_openai", forward_to_openai)
+        request = OpenAIRequest(model="gpt-4", messages=[{"role": "user", "content": "hi"}], stream=True)
+
+        stream = await ProxyService(db).proxy_openai_request("llm-openai-openai", request)
+        chunks = [data for _, data in _parse_sse([event async for event in stream])[:-1]]
+
+        assert [chunk["choices"][0]["delta"].get("content") for chunk in chunks] == ["", "hello", None]
+        assert chunks[-1]["choices"][0]["finish_reason"] == "length"
+
+    @pytest.mark.asyncio
+    async def test_fallback_requests_complete_response(self, db, monkeypatch):
+        """非原生流式的上游按非流式请求，不会收到无法解析的SSE"""
+        sent = []
+
+        def handler(request):
+            body = json.loads(request.content)
+            sent.append(body)
+            if body.get("stream"):
+                return httpx.Response(200, content=b"data: {}\n\n", headers={"Content-Type": "text/event-stream"})
+            return httpx.Response(200, json={
+                "id": "chatcmpl-1", "model": "gpt-4",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "hello"}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4}
+            })
+
+        original = LLMAdapterFactory.create_adapter
+
+        def create_adapter(**kwargs):
+            adapter = original(**kwargs)
+            adapter.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            return adapter
+
+        monkeypatch.setattr(LLMAdapterFactory, "create_adapter", create_adapter)
+        request = OpenAIRequest(model="gpt-4", messages=[{"role": "user", "content": "hi"}], stream=True)
+
+        stream = await ProxyService(db).proxy_openai_request("llm-openai-openai", request)
+        chunks = [data for _, data in _parse_sse([event async for event in stream])[:-1]]
+
+        assert "".join(chunk["choices"][0]["delta"].get("content") or "" for chunk in chunks) == "hello"
+        assert [body.get("stream") for body in sent] == [False]
+        assert db.query(RequestLog).one().status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_failure_before_first_delta_raises(self, db, monkeypatch):
+        """上游在产出内容之前失败时直接抛出错误"""
+        self._fake_qwen_stream(monkeypatch, fail_after=0)
+        request = OpenAIRequest(model="qwen-turbo", messages=[{"role": "user", "content": "你好"}], stream=True)
+
+        with pytest.raises(LLMProviderError):
+            await ProxyService(db).proxy_openai_request("llm-qwen-openai", request)
+        assert db.query(RequestLog).one().status_code == 500
+
+    @pytest.mark.asyncio
+    async def test_failure_mid_stream_emits_error_event(self, db, monkeypatch):
+        """流中途失败时输出错误事件，已生成的内容按估算计费"""
+        self._fake_qwen_stream(monkeypatch, fail_after=1)
+        request = OpenAIRequest(model="qwen-turbo", messages=[{"role": "user", "content": "你好"}], stream=True)
+
+        stream = await ProxyService(db).proxy_openai_request("llm-qwen-openai", request)
+        events = _parse_sse([event async for event in stream])
+
+        assert events[-1][1]["error"]["message"] == "Request failed: upstream reset"
+        log = db.query(RequestLog).one()
+        assert log.status_code == 500
+        assert log.completion_tokens > 0
+
+    @pytest.mark.asyncio
+    async def test_client_disconnect(self, db, monkeypatch):
+        """客户端提前断开时关闭上游流并记录499"""
+        self._fake_qwen_stream(monkeypatch)
+        request = OpenAIRequest(model="qwen-turbo", messages=[{"role": "user", "content": "你好"}], stream=True)
+
+        stream = await ProxyService(db).proxy_openai_request("llm-qwen-openai", request)
+        await stream.__anext__()
+        await stream.aclose()
+
+        assert db.query(RequestLog).one().status_code == 499
+
+    @pytest.mark.asyncio
+    async def test_unstarted_stream_releases_resources(self, db, monkeypatch):
+        """流从未被迭代就关闭时同样归还上游名额、关闭上游流并记录499"""
+        closed = []
+
+        async def stream_chat(self, request):
+            try:
+                yield StreamDelta(text="你")
+                yield StreamDelta(finish_reason="stop")
+            finally:
+                closed.append(True)
+
+        monkeypatch.setattr(QwenAdapter, "stream_chat", stream_chat)
+        request = OpenAIRequest(model="qwen-turbo", messages=[{"role": "user", "content": "你好"}], stream=True)
+
+        stream = await ProxyService(db).proxy_openai_request("llm-qwen-openai", request)
+        assert fair_scheduler.stats()["active"] == 1
+        await stream.aclose()
+
+        assert fair_scheduler.stats()["active"] == 0
+        assert closed == [True]
+        assert db.query(RequestLog).one().status_code == 499
+
+    @pytest.mark.asyncio
+    async def test_stream_with_n_rejected(self, db):
+        """流式请求不支持n>1"""
+        request = OpenAIRequest(model="qwen-turbo", messages=[{"role": "user", "content": "hi"}], stream=True, n=2)
+        with pytest.raises(LLMProviderError):
+            await ProxyService(db).proxy_openai_request("llm-qwen-openai", request)
+
+
+class TestStreamingEndpoint:
+    """流式接口响应测试"""
+
+    @pytest.mark.asyncio
+    async def test_event_stream_response(self, monkeypatch):
+        """stream=true时返回text/event-stream"""
+        class FakeProxyService:
+            trim_result = None
+
+            def __init__(self, db):
+                pass
+
+            async def proxy_openai_request(self, api_key, request_data, priority=None):
+                async def events():
+                    yield "data: {}\n\n"
+                    yield "data: [DONE]\n\n"
+                return events()
+
+        monkeypatch.setattr(proxy_api, "ProxyService", FakeProxyService)
+        app = FastAPI()
+        app.include_router(proxy_api.router)
+        app.dependency_overrides[get_db] = lambda: None
+
+        body = {"model": "qwen-turbo", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/v1/chat/completions", json=body, headers={"Authorization": "Bearer llm-key"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.text == "data: {}\n\ndata: [DONE]\n\n"
@@ -0,0 +1,175 @@
+"""
+自适应上游超时测试用例
+"""
+import asyncio
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.database import Base
+from app.models import User, Credential, ModelConfig, RequestLog
+from app.adapters.base import LLMResponse, StreamDelta
+from app.adapters.openai_adapter import OpenAIAdapter
+from app.adapters.qwen_adapter import QwenAdapter
+from app.exceptions import UpstreamTimeoutError
+from app.schemas.llm_request import OpenAIRequest
+from app.services.proxy_service import ProxyService
+from app.services.timeout_service import LatencyTracker, guard_upstream, upstream_latency
+from app.utils.security import encrypt_api_key
+
+
+@pytest.fixture(autouse=True)
+def clear_latency():
+    upstream_latency.clear()
+    yield
+    upstream_latency.clear()
+
+
+class TestLatencyTracker:
+    """延迟分位数推算超时测试"""
+
+    def test_defaults_until_enough_samples(self):
+        """样本不足时使用配置的默认值"""
+        tracker = LatencyTracker()
+        for _ in range(settings.upstream_latency_min_samples - 1):
+            tracker.observe("openai", "gpt-4o-mini", "first_byte", 0.5)
+
+        policy = tracker.policy("openai", "gpt-4o-mini")
+        assert policy.first_byte == settings.upstream_first_byte_timeout_seconds
+        assert policy.connect == settings.upstream_connect_timeout_seconds
+
+    def test_learned_and_bounded(self, monkeypatch):
+        """学习到的超时为分位数×倍数，并限制在上下限之间；不同模型互不影响"""
+        monkeypatch.setattr(settings, "upstream_timeout_multiplier", 2.0)
+        tracker = LatencyTracker()
+        for index in range(100):
+            tracker.observe("openai", "gpt-4o-mini", "first_byte", 3.0 + index / 100)
+            tracker.observe("openai", "gpt-4o-mini", "inter_chunk", 0.01)
+            tracker.observe("anthropic", "claude-opus", "total", 1000.0 + index)
+
+        assert tracker.timeout("openai", "gpt-4o-mini", "first_byte") == pytest.approx(2 * 3.99)
+        assert tracker.timeout("openai", "gpt-4o-mini", "inter_chunk") == settings.upstream_inter_chunk_timeout_min_seconds
+        assert tracker.timeout("anthropic", "claude-opus", "total") == settings.upstream_total_timeout_max_seconds
+        assert tracker.timeout("openai", "gpt-4o-mini", "total") == settings.upstream_total_timeout_seconds
+
+    def test_window_keeps_recent_samples(self, monkeypatch):
+        """只保留最近的样本，延迟下降后超时随之收紧"""
+        monkeypatch.setattr(settings, "upstream_latency_window", 20)
+        tracker = LatencyTracker()
+        for seconds in [50.0] * 20 + [5.0] * 20:
+            tracker.observe("qwen", "qwen-turbo", "total", seconds)
+
+        assert tracker.quantile("qwen", "qwen-turbo", "total", 0.99) == 5.0
+
+    @pytest.mark.asyncio
+    async def test_guard_classifies_timeouts(self):
+        """截止时间与HTTP连接超时分别归类"""
+        with pytest.raises(UpstreamTimeoutError) as exc_info:
+            await guard_upstream(asyncio.sleep(1), 0.01, "first_byte")
+        assert exc_info.value.error_type == "first_byte_timeout"
+
+        async def connect():
+            raise httpx.ConnectTimeout("timed out")
+
+        with pytest.raises(UpstreamTimeoutError) as exc_info:
+            await guard_upstream(connect(), 10, "total")
+        assert exc_info.value.phase == "connect"
+
+
+class TestProxyTimeouts:
+    """代理请求超时测试"""
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+        user = User(username="alice", email="alice@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        for provider in ("qwen", "openai"):
+            credential = Credential(
+                user_id=user.id, name=provider, provider=provider,
+                api_key_encrypted=encrypt_api_key("sk-test"), is_validated=True
+            )
+            db.add(credential)
+            db.flush()
+            db.add(ModelConfig(
+                credential_id=credential.id, model_name="test-model",
+                target_format="openai", proxy_api_key=f"llm-{provider}"
+            ))
+        db.commit()
+        yield db
+        db.close()
+
+    @staticmethod
+    def _fake_qwen_stream(monkeypatch, delays):
+        async def stream_chat(self, request):
+            for delay in delays:
+                await asyncio.sleep(delay)
+                yield StreamDelta(text="x")
+            yield StreamDelta(finish_reason="stop")
+
+        monkeypatch.setattr(QwenAdapter, "stream_chat", stream_chat)
+
+    @pytest.mark.asyncio
+    async def test_total_timeout_logged(self, db, monkeypatch):
+        """非流式请求超过总时长时记录504和超时阶段"""
+        async def forward_to_openai(self, request):
+            await asyncio.sleep(1)
+
+        monkeypatch.setattr(OpenAIAdapter, "forward_to_openai", forward_to_openai)
+        monkeypatch.setattr(settings, "upstream_total_timeout_seconds", 0.05)
+        request = OpenAIRequest(model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}])
+
+        with pytest.raises(UpstreamTimeoutError):
+            await ProxyService(db).proxy_openai_request("llm-openai", request)
+
+        log = db.query(RequestLog).one()
+        assert (log.status_code, log.error_type) == (504, "total_timeout")
+
+    @pytest.mark.asyncio
+    async def test_successful_request_recorded(self, db, monkeypatch):
+        """成功的请求记录总耗时样本"""
+        async def forward_to_openai(self, request):
+            return LLMResponse(
+                id="chatcmpl-1", model="gpt-4o-mini",
+                choices=[{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+                usage={"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+            )
+
+        monkeypatch.setattr(OpenAIAdapter, "forward_to_openai", forward_to_openai)
+        monkeypatch.setattr(settings, "upstream_latency_min_samples", 1)
+        request = OpenAIRequest(model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}])
+
+        await ProxyService(db).proxy_openai_request("llm-openai", request)
+
+        assert upstream_latency.quantile("openai", "gpt-4o-mini", "total", 0.5) < 1
+        assert db.query(RequestLog).one().error_type is None
+
+    @pytest.mark.asyncio
+    async def test_first_byte_timeout(self, db, monkeypatch):
+        """流式请求迟迟没有第一个增量时直接返回超时错误"""
+        self._fake_qwen_stream(monkeypatch, [1])
+        monkeypatch.setattr(settings, "upstream_first_byte_timeout_seconds", 0.05)
+        request = OpenAIRequest(model="qwen-turbo", messages=[{"role": "user", "content": "hi"}], stream=True)
+
+        with pytest.raises(UpstreamTimeoutError):
+            await ProxyService(db).proxy_openai_request("llm-qwen", request)
+        assert db.query(RequestLog).one().error_type == "first_byte_timeout"
+
+    @pytest.mark.asyncio
+    async def test_inter_chunk_timeout(self, db, monkeypatch):
+        """流中途停顿超过间隔时输出错误事件并记录超时阶段"""
+        self._fake_qwen_stream(monkeypatch, [0, 0, 1])
+        monkeypatch.setattr(settings, "upstream_inter_chunk_timeout_seconds", 0.05)
+        request = OpenAIRequest(model="qwen-turbo", messages=[{"role": "user", "content": "hi"}], stream=True)
+
+        stream = await ProxyService(db).proxy_openai_request("llm-qwen", request)
+        events = [event async for event in stream]
+
+        assert "inter_chunk timeout" in events[-1]
+        log = db.query(RequestLog).one()
+        assert (log.status_code, log.error_type) == (504, "inter_chunk_timeout")
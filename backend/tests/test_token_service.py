@@ -0,0 +1,157 @@
+"""
+本地token估算与上下文窗口检查测试用例
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.database import Base
+from app.models import User, Credential, ModelConfig
+from app.exceptions import ContextWindowExceededError, LLMProviderError
+from app.schemas.llm_request import CountTokensRequest
+from app.services.proxy_service import ProxyService
+from app.services.token_service import preflight_check
+from app.utils.tokens import (
+    estimate_text_tokens,
+    estimate_messages_tokens,
+    get_context_window,
+    provider_family,
+    token_cache_info,
+    _count_short_message
+)
+
+
+class TestTokenEstimation:
+    """分词估算测试"""
+
+    def test_families_differ_on_cjk(self):
+        """中文文本在Qwen等中文优化的分词器上估算更少"""
+        text = "这是一个用于估算token数量的中文句子"
+        assert estimate_text_tokens(text, "qwen") < estimate_text_tokens(text, "openai")
+        assert estimate_text_tokens("", "openai") == 0
+
+    def test_provider_family(self):
+        """提供商映射到分词器家族，未知提供商使用默认值"""
+        assert provider_family("azure_openai") == "openai"
+        assert provider_family("claude_code") == "anthropic"
+        assert provider_family("unknown") == "openai"
+
+    def test_message_counts_are_cached(self):
+        """重复的历史消息只计算一次"""
+        history = [{"role": "user", "content": f"message number {i} for cache test"} for i in range(20)]
+        estimate_messages_tokens(history, "gemini")
+        before = token_cache_info()["hits"]
+        estimate_messages_tokens(history + [{"role": "user", "content": "new turn"}], "gemini")
+        assert token_cache_info()["hits"] - before >= 20
+
+    def test_long_text_cached_by_digest(self):
+        """长文本只按摘要缓存，不保留在缓存中"""
+        document = "pasted document line\n" * 5000
+        short_before = _count_short_message.cache_info().currsize
+        first = estimate_messages_tokens([{"role": "user", "content": document}], "anthropic")
+        before = token_cache_info()["hits"]
+
+        assert estimate_messages_tokens([{"role": "user", "content": document}], "anthropic") == first
+        assert token_cache_info()["hits"] - before == 1
+        assert _count_short_message.cache_info().currsize == short_before
+
+    def test_system_prompt_counted(self):
+        """system提示计入估算"""
+        messages = [{"role": "user", "content": "hi"}]
+        assert estimate_messages_tokens(messages, system="You are helpful") > estimate_messages_tokens(messages)
+
+    def test_context_window_longest_prefix(self):
+        """按最长前缀匹配上下文窗口"""
+        assert get_context_window("gpt-4-0613") == 8192
+        assert get_context_window("gpt-4o-mini") == 128000
+        assert get_context_window("GPT-4-32K") == 32768
+        assert get_context_window("my-custom-model") is None
+
+    @pytest.mark.parametrize("model", [
+        "gpt-4-1106-preview", "gpt-4-0125-preview", "gpt-4-vision-preview", "gpt-4.5-preview", "gpt-4-turbo-2024-04-09"
+    ])
+    def test_context_window_128k_gpt4_variants(self, model):
+        """gpt-4的128k版本不会落到原始gpt-4的8k窗口"""
+        assert get_context_window(model) == 128000
+
+
+class TestPreflight:
+    """上下文窗口预检测试"""
+
+    def test_clamps_max_tokens(self, monkeypatch):
+        """超出窗口时缩小max_tokens"""
+        monkeypatch.setattr(settings, "context_overflow_policy", "clamp")
+        messages = [{"role": "user", "content": "hello"}]
+        result = preflight_check("openai", "gpt-4", messages, 100000)
+
+        assert result.clamped
+        assert result.max_tokens == 8192 - int(result.prompt_tokens * (1 - settings.context_estimate_margin))
+
+    def test_reject_policy(self, monkeypatch):
+        """reject策略下直接拒绝"""
+        monkeypatch.setattr(settings, "context_overflow_policy", "reject")
+        with pytest.raises(ContextWindowExceededError):
+            preflight_check("openai", "gpt-4", [{"role": "user", "content": "hello"}], 100000)
+
+    def test_prompt_too_long(self):
+        """提示词本身超出窗口时拒绝"""
+        messages = [{"role": "user", "content": "word " * 10000}]
+        with pytest.raises(ContextWindowExceededError):
+            preflight_check("openai", "gpt-4", messages, None)
+
+    def test_estimate_margin_before_reject(self, monkeypatch):
+        """估算值略超窗口但在误差余量内时不拒绝"""
+        monkeypatch.setattr(settings, "context_estimate_margin", 0.1)
+        messages = [{"role": "user", "content": "word " * 8400}]
+        result = preflight_check("openai", "gpt-4", messages, None)
+        assert result.prompt_tokens > 8192
+
+        monkeypatch.setattr(settings, "context_estimate_margin", 0.0)
+        with pytest.raises(ContextWindowExceededError):
+            preflight_check("openai", "gpt-4", messages, None)
+
+    def test_unknown_model_passes_through(self):
+        """未知模型不做检查"""
+        result = preflight_check("openai", "my-custom-model", [{"role": "user", "content": "hi"}], 100000)
+        assert result.max_tokens == 100000
+        assert result.context_window is None
+
+
+class TestCountTokens:
+    """count_tokens接口测试"""
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+        user = User(username="alice", email="alice@example.com", password_hash="x")
+        session.add(user)
+        session.flush()
+        credential = Credential(user_id=user.id, name="qwen", provider="qwen", api_key_encrypted="x")
+        session.add(credential)
+        session.flush()
+        session.add(ModelConfig(
+            credential_id=credential.id,
+            model_name="qwen-max",
+            target_format="anthropic",
+            proxy_api_key="llm-alice"
+        ))
+        session.commit()
+        yield session
+        session.close()
+
+    def test_count_tokens_uses_provider_family(self, db):
+        """按凭证提供商的分词器本地估算"""
+        messages = [{"role": "user", "content": "你好，请介绍一下你自己"}]
+        request = CountTokensRequest(model="qwen-max", messages=messages, system="简短回答")
+
+        result = ProxyService(db).count_tokens("llm-alice", request)
+
+        assert result == {"input_tokens": estimate_messages_tokens(messages, "qwen", system="简短回答")}
+
+    def test_count_tokens_invalid_key(self, db):
+        """无效密钥报错"""
+        with pytest.raises(LLMProviderError):
+            ProxyService(db).count_tokens("bad", CountTokensRequest(model="x", messages=[]))
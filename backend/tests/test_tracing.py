@@ -0,0 +1,259 @@
+"""
+分布式追踪测试用例
+"""
+import json
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.api import proxy as proxy_api
+from app.adapters.factory import LLMAdapterFactory
+from app.config import settings
+from app.database import Base, get_db
+from app.models import User, Credential, ModelConfig
+from app.services.tracing_service import (
+    tracer, span_exporter, TracingMiddleware, SpanContext, parse_traceparent, format_traceparent, TRACEPARENT_HEADER
+)
+from app.utils.security import encrypt_api_key
+
+INBOUND = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+
+OPENAI_BODY = {
+    "id": "chatcmpl-1", "object": "chat.completion", "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "hi"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4}
+}
+
+QWEN_STREAM = (
+    'id:1\nevent:result\n:HTTP_STATUS/200\n'
+    'data:{"output":{"choices":[{"message":{"content":"你","role":"assistant"},"finish_reason":"null"}]},'
+    '"usage":{"total_tokens":4,"input_tokens":3,"output_tokens":1},"request_id":"r1"}\n\n'
+    'id:2\nevent:result\n:HTTP_STATUS/200\n'
+    'data:{"output":{"choices":[{"message":{"content":"好","role":"assistant"},"finish_reason":"stop"}]},'
+    '"usage":{"total_tokens":5,"input_tokens":3,"output_tokens":2},"request_id":"r1"}\n\n'
+)
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(settings, "tracing_exporter", "file")
+    monkeypatch.setattr(settings, "tracing_file_path", str(path))
+    monkeypatch.setattr(settings, "tracing_sample_rate", 1.0)
+    span_exporter.reset()
+    yield path
+    span_exporter.reset()
+
+
+async def _exported_spans(path):
+    await span_exporter.flush()
+    spans = []
+    for line in path.read_text().splitlines():
+        for resource in json.loads(line)["resourceSpans"]:
+            for scope in resource["scopeSpans"]:
+                spans.extend(scope["spans"])
+    return {span["name"]: span for span in spans}
+
+
+def _attributes(span):
+    return {item["key"]: next(iter(item["value"].values())) for item in span["attributes"]}
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """两个代理密钥：OpenAI（非流式）和通义千问（原生流式），上游由MockTransport模拟并记录请求"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    user = User(username="alice", email="alice@example.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    for provider in ("openai", "qwen"):
+        credential = Credential(
+            user_id=user.id, name=provider, provider=provider,
+            api_key_encrypted=encrypt_api_key("sk-test"), is_validated=True
+        )
+        db.add(credential)
+        db.flush()
+        db.add(ModelConfig(
+            credential_id=credential.id, model_name="test-model", target_format="openai",
+            proxy_api_key=f"llm-{provider}"
+        ))
+    db.commit()
+
+    captured = []
+
+    def handler(request):
+        captured.append(request)
+        if "dashscope" in request.url.host:
+            return httpx.Response(200, content=QWEN_STREAM.encode(), headers={"Content-Type": "text/event-stream"})
+        return httpx.Response(200, json=OPENAI_BODY)
+
+    original = LLMAdapterFactory.create_adapter
+
+    def create_adapter(**kwargs):
+        adapter = original(**kwargs)
+        adapter.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return adapter
+
+    monkeypatch.setattr(LLMAdapterFactory, "create_adapter", create_adapter)
+    app = FastAPI()
+    app.include_router(proxy_api.router)
+    app.add_middleware(TracingMiddleware)
+    app.dependency_overrides[get_db] = lambda: db
+    yield httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test"), captured
+    db.close()
+
+
+def _request(key, stream=False, traceparent=INBOUND):
+    headers = {"Authorization": f"Bearer {key}"}
+    if traceparent:
+        headers[TRACEPARENT_HEADER] = traceparent
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "stream": stream}
+    return {"json": body, "headers": headers}
+
+
+class TestTraceparent:
+    """W3C traceparent解析测试"""
+
+    def test_parse_and_format(self):
+        """合法的请求头可以往返转换，全零ID、版本ff和格式错误的请求头被忽略"""
+        context = parse_traceparent(INBOUND)
+        assert context == SpanContext(int(TRACE_ID, 16), 0xb7ad6b7169203331, True)
+        assert format_traceparent(context) == INBOUND
+        assert not parse_traceparent(INBOUND[:-2] + "00").sampled
+        for invalid in (
+            "00-00000000000000000000000000000000-b7ad6b7169203331-01",
+            "ff-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01",
+            "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01-extra",
+            "garbage", "", None
+        ):
+            assert parse_traceparent(invalid) is None
+
+
+class TestSampling:
+    """采样决定测试"""
+
+    def test_disabled_propagates_inbound(self, monkeypatch):
+        """未开启追踪时不记录span，但收到的上下文照常传播"""
+        monkeypatch.setattr(settings, "tracing_exporter", "none")
+        inbound = parse_traceparent(INBOUND)
+
+        span = tracer.start_span("test", parent=inbound)
+        assert not span.recording
+        assert span.context == inbound
+        assert tracer.start_span("test").context is None
+
+    def test_parent_based(self, trace_file, monkeypatch):
+        """调用方已采样的请求总是记录，未采样的不记录；没有调用方时按比例抽样"""
+        monkeypatch.setattr(settings, "tracing_sample_rate", 0.0)
+        sampled = parse_traceparent(INBOUND)
+        unsampled = parse_traceparent(INBOUND[:-2] + "00")
+
+        root = tracer.start_span("root")
+        assert not root.recording and not root.context.sampled
+
+        child = tracer.start_span("child", parent=sampled)
+        assert child.recording
+        assert child.context.trace_id == sampled.trace_id and child.parent_span_id == sampled.span_id
+
+        with tracer.use_span(tracer.start_span("child", parent=unsampled)):
+            with tracer.span("grandchild") as grandchild:
+                assert not grandchild.recording
+                assert grandchild.context == unsampled
+
+
+class TestProxyTracing:
+    """代理请求的span与traceparent传播测试"""
+
+    @pytest.mark.asyncio
+    async def test_request_spans(self, trace_file, upstream):
+        """非流式请求的各阶段span属于调用方的trace，上游收到的traceparent指向上游请求span"""
+        client, captured = upstream
+        async with client:
+            response = await client.post("/api/v1/chat/completions", **_request("llm-openai"))
+        assert response.status_code == 200
+
+        spans = await _exported_spans(trace_file)
+        server = spans["POST /api/v1/chat/completions"]
+        upstream_span = spans["upstream.request"]
+
+        assert {span["traceId"] for span in spans.values()} == {TRACE_ID}
+        assert server["parentSpanId"] == "b7ad6b7169203331"
+        assert server["kind"] == 2 and upstream_span["kind"] == 3
+        for name in ("proxy.resolve_config", "proxy.rate_limit", "proxy.transform", "scheduler.wait", "db.log_write"):
+            assert spans[name]["parentSpanId"] == server["spanId"]
+        assert spans["upstream.connect"]["parentSpanId"] == upstream_span["spanId"]
+        assert _attributes(upstream_span)["gen_ai.system"] == "openai"
+        assert _attributes(server)["http.route"] == "/api/v1/chat/completions"
+
+        assert captured[0].headers[TRACEPARENT_HEADER] == f"00-{TRACE_ID}-{upstream_span['spanId']}-01"
+
+    @pytest.mark.asyncio
+    async def test_stream_spans(self, trace_file, upstream):
+        """流式请求记录首字节与流完成span，服务端span在流发送完毕后才结束"""
+        client, captured = upstream
+        async with client:
+            response = await client.post("/api/v1/chat/completions", **_request("llm-qwen", stream=True))
+        assert "[DONE]" in response.text
+
+        spans = await _exported_spans(trace_file)
+        server = spans["POST /api/v1/chat/completions"]
+        upstream_span = spans["upstream.request"]
+        stream_span = spans["upstream.stream"]
+
+        assert spans["upstream.first_byte"]["parentSpanId"] == upstream_span["spanId"]
+        assert stream_span["parentSpanId"] == upstream_span["spanId"]
+        assert _attributes(stream_span)["llmbridge.chunks"] == "2"
+        assert _attributes(upstream_span)["gen_ai.usage.output_tokens"] == "2"
+        assert spans["db.log_write"]["parentSpanId"] == server["spanId"]
+        assert int(server["endTimeUnixNano"]) >= int(stream_span["endTimeUnixNano"])
+        assert captured[0].headers[TRACEPARENT_HEADER] == f"00-{TRACE_ID}-{upstream_span['spanId']}-01"
+
+    @pytest.mark.asyncio
+    async def test_unsampled_forwarded(self, trace_file, upstream):
+        """调用方未采样的请求不导出span，traceparent原样转发给上游"""
+        client, captured = upstream
+        unsampled = INBOUND[:-2] + "00"
+        async with client:
+            await client.post("/api/v1/chat/completions", **_request("llm-openai", traceparent=unsampled))
+
+        await span_exporter.flush()
+        assert not trace_file.exists()
+        assert captured[0].headers[TRACEPARENT_HEADER] == unsampled
+
+
+class TestOTLPExport:
+    """OTLP/HTTP导出测试"""
+
+    @pytest.mark.asyncio
+    async def test_posts_otlp_json(self, monkeypatch):
+        """span按OTLP/JSON格式批量发送到collector"""
+        monkeypatch.setattr(settings, "tracing_exporter", "otlp")
+        monkeypatch.setattr(settings, "tracing_sample_rate", 1.0)
+        span_exporter.reset()
+        received = []
+
+        def handler(request):
+            received.append(request)
+            return httpx.Response(200, json={})
+
+        backend = span_exporter._get_backend()
+        backend._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with tracer.span("parent"):
+            with tracer.span("child", attributes={"llmbridge.n": 2}):
+                pass
+        await span_exporter.shutdown()
+
+        payload = json.loads(received[0].content)
+        assert received[0].url == settings.tracing_otlp_endpoint
+        assert received[0].headers["content-type"] == "application/json"
+        resource = payload["resourceSpans"][0]
+        assert {"key": "service.name", "value": {"stringValue": "llmbridge"}} in resource["resource"]["attributes"]
+        child, parent = resource["scopeSpans"][0]["spans"]
+        assert child["parentSpanId"] == parent["spanId"]
+        assert child["attributes"] == [{"key": "llmbridge.n", "value": {"intValue": "2"}}]
+        assert span_exporter.stats()["exported"] == 2
+        span_exporter.reset()
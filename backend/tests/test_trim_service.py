@@ -0,0 +1,222 @@
+"""
+对话裁剪测试用例
+"""
+import statistics
+import time
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.api import proxy as proxy_api
+from app.database import Base, get_db
+from app.models import User, Credential, ModelConfig
+from app.adapters.base import LLMResponse
+from app.adapters.openai_adapter import OpenAIAdapter
+from app.schemas.model_config import ModelConfigUpdate
+from app.services.model_service import ModelService
+from app.services.trim_service import trim_messages, trim_for_config
+from app.utils.security import encrypt_api_key
+from benchmarks.bench_trim import build_history
+
+
+def _conversation(turns, size=50):
+    messages = [{"role": "system", "content": "You are a helpful assistant."}]
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"question {turn} " + "word " * size})
+        messages.append({"role": "assistant", "content": f"answer {turn} " + "word " * size})
+    return messages
+
+
+class TestTrimMessages:
+    """裁剪算法测试"""
+
+    def test_fits_budget_unchanged(self):
+        """未超出预算时原样返回"""
+        messages = _conversation(3)
+        result = trim_messages(messages, "openai", budget=100000, keep_turns=2)
+
+        assert not result.trimmed
+        assert result.messages is messages
+        assert result.tokens_before == result.tokens_after
+
+    def test_drop_oldest_turns(self):
+        """保留系统提示与最后几轮，从最早的轮次开始整轮移除"""
+        messages = _conversation(20)
+        result = trim_messages(messages, "openai", budget=600, keep_turns=2)
+
+        assert result.trimmed
+        assert result.tokens_after <= 600 < result.tokens_before
+        assert result.messages[0] == messages[0]
+        assert result.messages[1]["role"] == "user"
+        assert result.messages[-4:] == messages[-4:]
+        assert result.removed == len(messages) - len(result.messages)
+        assert result.removed % 2 == 0
+
+    def test_elide_marks_first_kept_message(self):
+        """elide策略在保留的第一条消息前注明省略的消息数"""
+        messages = _conversation(20)
+        result = trim_messages(messages, "openai", budget=600, keep_turns=2, strategy="elide")
+
+        first = result.messages[1]
+        assert first["content"].startswith(f"[{result.removed} earlier messages omitted]")
+        assert first["content"].endswith(messages[len(messages) - len(result.messages) + 1]["content"])
+        assert not messages[1]["content"].startswith("[")
+
+    def test_protected_turns_kept_over_budget(self):
+        """最后几轮本身超出预算时只移除中间轮次"""
+        messages = _conversation(5, size=500)
+        result = trim_messages(messages, "openai", budget=100, keep_turns=3)
+
+        assert result.messages == [messages[0]] + messages[-6:]
+        assert result.tokens_after > 100
+
+    def test_system_messages_in_middle_kept(self):
+        """中间的系统消息不会被移除"""
+        messages = _conversation(10)
+        messages.insert(5, {"role": "system", "content": "Switch to formal tone."})
+        result = trim_messages(messages, "openai", budget=500, keep_turns=1)
+
+        assert {"role": "system", "content": "Switch to formal tone."} in result.messages
+
+    def test_500_turns_sub_millisecond(self):
+        """500轮对话的裁剪（分词估算缓存预热后）保持在毫秒级以内"""
+        messages = build_history(500)
+        trim_messages(messages, "openai", budget=8000, keep_turns=4)
+
+        samples = []
+        for _ in range(50):
+            started = time.perf_counter()
+            result = trim_messages(messages, "openai", budget=8000, keep_turns=4)
+            samples.append(time.perf_counter() - started)
+
+        assert result.tokens_after <= 8000
+        # 基准约0.5ms，留出余量避免测试机负载导致的偶发失败
+        assert statistics.median(samples) < 0.002
+
+
+class TestTrimForConfig:
+    """按配置裁剪测试"""
+
+    def test_disabled(self):
+        """未设置策略时不裁剪"""
+        config = ModelConfig(trim_strategy=None)
+        assert trim_for_config(config, "openai", "gpt-4", _conversation(100), 1000) is None
+
+    def test_budget_from_context_window(self):
+        """预算取配置值与 (上下文窗口 - max_tokens) 中较小的一个"""
+        messages = _conversation(200)
+        config = ModelConfig(trim_strategy="drop", trim_keep_turns=2)
+
+        result = trim_for_config(config, "openai", "gpt-4", messages, 1000)
+        assert result.tokens_after <= 8192 - 1000
+
+        config.trim_token_budget = 2000
+        assert trim_for_config(config, "openai", "gpt-4", messages, 1000).tokens_after <= 2000
+
+        # 未知模型只能使用配置的预算
+        config.trim_token_budget = None
+        assert trim_for_config(config, "openai", "my-custom-model", messages, 1000) is None
+
+
+class TestTrimEndpoint:
+    """接口裁剪测试"""
+
+    @pytest.fixture
+    def session_factory(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        db = factory()
+        user = User(username="alice", email="alice@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        credential = Credential(
+            user_id=user.id, name="openai", provider="openai",
+            api_key_encrypted=encrypt_api_key("sk-test"), is_validated=True
+        )
+        db.add(credential)
+        db.flush()
+        db.add(ModelConfig(
+            credential_id=credential.id,
+            model_name="gpt-4",
+            target_format="openai",
+            proxy_api_key="llm-alice",
+            trim_strategy="drop",
+            trim_keep_turns=2,
+            trim_token_budget=1000
+        ))
+        db.commit()
+        db.close()
+        return factory
+
+    @pytest.mark.asyncio
+    async def test_trimmed_request_and_header(self, session_factory, monkeypatch):
+        """上游收到裁剪后的对话，响应头报告裁剪情况"""
+        sent = []
+
+        async def forward_to_openai(self, request):
+            sent.append(request.messages)
+            return LLMResponse(
+                id="chatcmpl-1", model="gpt-4",
+                choices=[{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+                usage={"prompt_tokens": 900, "completion_tokens": 1, "total_tokens": 901}
+            )
+
+        monkeypatch.setattr(OpenAIAdapter, "forward_to_openai", forward_to_openai)
+        app = FastAPI()
+        app.include_router(proxy_api.router)
+
+        def override_get_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        messages = _conversation(40)[1:]
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post(
+                "/api/v1/chat/completions",
+                json={"model": "gpt-4", "messages": messages, "max_tokens": 100},
+                headers={"Authorization": "Bearer llm-alice"}
+            )
+
+        assert response.status_code == 200
+        assert sent[0][-4:] == messages[-4:]
+        assert len(sent[0]) < len(messages)
+        assert response.headers[proxy_api.TRIM_HEADER].startswith(f"strategy=drop; removed={len(messages) - len(sent[0])};")
+
+
+class TestTrimSettings:
+    """裁剪配置更新测试"""
+
+    def test_off_clears_strategy(self, tmp_path):
+        """off关闭裁剪，预算为0表示按上下文窗口计算"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+        user = User(username="alice", email="alice@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        credential = Credential(user_id=user.id, name="openai", provider="openai", api_key_encrypted="x")
+        db.add(credential)
+        db.flush()
+        config = ModelConfig(
+            credential_id=credential.id, model_name="gpt-4", target_format="openai",
+            proxy_api_key="llm-alice", trim_strategy="elide", trim_token_budget=1000
+        )
+        db.add(config)
+        db.commit()
+
+        service = ModelService(db)
+        updated = service.update_model_config(user, config.id, ModelConfigUpdate(trim_token_budget=0))
+        assert (updated.trim_strategy, updated.trim_token_budget) == ("elide", None)
+
+        updated = service.update_model_config(user, config.id, ModelConfigUpdate(trim_strategy="off"))
+        assert updated.trim_strategy is None
+        db.close()
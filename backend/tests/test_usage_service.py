@@ -0,0 +1,144 @@
+"""
+用量汇总测试用例
+"""
+from datetime import datetime, timedelta, timezone
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.api import stats as stats_api
+from app.database import Base, get_db
+from app.dependencies import get_current_user
+from app.models import User, Credential, ModelConfig, UsageRollupMinute, UsageRollupHour, UsageRollupDay
+from app.services.usage_service import (
+    UsageService,
+    record_usage,
+    delete_config_usage,
+    estimate_percentile,
+    latency_bucket_column
+)
+
+
+class TestUsageRollups:
+    """用量汇总测试"""
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        yield session
+        session.close()
+
+    @pytest.fixture
+    def config(self, db):
+        user = User(username="tester", email="tester@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        credential = Credential(user_id=user.id, name="openai", provider="openai", api_key_encrypted="x")
+        db.add(credential)
+        db.flush()
+        config = ModelConfig(
+            credential_id=credential.id,
+            model_name="gpt-4",
+            target_format="openai",
+            proxy_api_key="llm-proxy-key"
+        )
+        db.add(config)
+        db.commit()
+        return config
+
+    def test_latency_bucket_column(self):
+        """延迟按上界归入直方图桶"""
+        assert latency_bucket_column(0) == "latency_le_100"
+        assert latency_bucket_column(100) == "latency_le_100"
+        assert latency_bucket_column(101) == "latency_le_250"
+        assert latency_bucket_column(120000) == "latency_le_inf"
+
+    def test_estimate_percentile(self):
+        """根据直方图估算分位数"""
+        buckets = {"latency_le_100": 90, "latency_le_1000": 10}
+        assert estimate_percentile(buckets, 0.5) == 100
+        assert estimate_percentile(buckets, 0.95) == 1000
+        assert estimate_percentile({}, 0.5) is None
+
+    def test_record_usage_updates_all_granularities(self, db, config):
+        """每条记录累加到分钟、小时和天汇总"""
+        moment = datetime(2026, 10, 19, 12, 30, 15)
+        record_usage(db, config.id, 200, 80, prompt_tokens=10, completion_tokens=5, timestamp=moment)
+        record_usage(db, config.id, 500, 3000, timestamp=moment + timedelta(seconds=30))
+        record_usage(db, config.id, 200, 400, prompt_tokens=7, completion_tokens=3, timestamp=moment + timedelta(minutes=1))
+        db.commit()
+
+        minutes = db.query(UsageRollupMinute).order_by(UsageRollupMinute.bucket_start).all()
+        assert len(minutes) == 2
+        assert minutes[0].request_count == 2
+        assert minutes[0].error_count == 1
+        assert minutes[0].latency_le_100 == 1
+        assert minutes[0].latency_le_5000 == 1
+
+        hour = db.query(UsageRollupHour).one()
+        assert hour.bucket_start == datetime(2026, 10, 19, 12)
+        assert hour.request_count == 3
+        assert hour.prompt_tokens == 17
+        assert hour.completion_tokens == 8
+        assert hour.latency_ms_sum == 3480
+
+        day = db.query(UsageRollupDay).one()
+        assert day.bucket_start == datetime(2026, 10, 19)
+        assert day.request_count == 3
+
+    def test_summary_and_series(self, db, config):
+        """仪表板汇总和时间序列从汇总表读取"""
+        user = config.credential.user
+        now = datetime.utcnow()
+        for _ in range(4):
+            record_usage(db, config.id, 200, 200, prompt_tokens=100, completion_tokens=50, timestamp=now)
+        record_usage(db, config.id, 429, 50, timestamp=now)
+        db.commit()
+
+        service = UsageService(db)
+        summary = service.get_summary(user, hours=24)
+        assert summary["request_count"] == 5
+        assert summary["error_count"] == 1
+        assert summary["prompt_tokens"] == 400
+        assert summary["p50_latency_ms"] == 250
+        assert summary["by_config"][config.id]["completion_tokens"] == 200
+
+        series = service.get_series(user, "minute", now - timedelta(minutes=5), now)
+        assert len(series) == 1
+        assert series[0]["request_count"] == 5
+
+    @pytest.mark.asyncio
+    async def test_series_with_timezone_offset(self, db, config):
+        """查询参数带时区时转换为UTC后查询"""
+        now = datetime.utcnow()
+        record_usage(db, config.id, 200, 200, prompt_tokens=100, completion_tokens=50, timestamp=now)
+        db.commit()
+
+        app = FastAPI()
+        app.include_router(stats_api.router)
+        app.dependency_overrides[get_db] = lambda: db
+        app.dependency_overrides[get_current_user] = lambda: config.credential.user
+
+        start = (now - timedelta(minutes=5)).replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=8)))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get(
+                "/api/stats/usage", params={"granularity": "minute", "start": start.isoformat()}
+            )
+
+        assert response.status_code == 200
+        assert [point["request_count"] for point in response.json()["points"]] == [1]
+
+    def test_delete_config_usage(self, db, config):
+        """删除模型配置时清理汇总数据"""
+        record_usage(db, config.id, 200, 100)
+        db.commit()
+
+        delete_config_usage(db, config.id)
+        db.commit()
+
+        assert db.query(UsageRollupMinute).count() == 0
+        assert db.query(UsageRollupHour).count() == 0
+        assert db.query(UsageRollupDay).count() == 0
@@ -0,0 +1,139 @@
+"""
+凭证后台验证队列测试用例
+"""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import User, Credential
+from app.utils.security import encrypt_api_key
+from app.services import credential_service as credential_module
+from app.services import validation_service as validation_module
+from app.services.validation_service import ValidationJobQueue
+
+
+class FakeAdapter:
+    """模拟适配器：记录探测次数与最大并发"""
+
+    probed = []
+    running = 0
+    peak = 0
+
+    async def get_available_models(self):
+        return []
+
+    async def probe_model(self, model_name):
+        FakeAdapter.probed.append(model_name)
+        FakeAdapter.running += 1
+        FakeAdapter.peak = max(FakeAdapter.peak, FakeAdapter.running)
+        await asyncio.sleep(0.02)
+        FakeAdapter.running -= 1
+        return not model_name.startswith("bad")
+
+    async def close(self):
+        pass
+
+
+class FakeFactory:
+    @staticmethod
+    def create_adapter(provider, api_key, api_url=None):
+        return FakeAdapter()
+
+
+class TestValidationJobQueue:
+    """验证任务队列测试"""
+
+    @pytest.fixture
+    def session_factory(self, tmp_path, monkeypatch):
+        """创建临时数据库并替换依赖"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        monkeypatch.setattr(validation_module, "SessionLocal", factory)
+        monkeypatch.setattr(credential_module, "LLMAdapterFactory", FakeFactory)
+        FakeAdapter.probed = []
+        FakeAdapter.running = 0
+        FakeAdapter.peak = 0
+        return factory
+
+    def _create_credential(self, factory, models, previous_results=None) -> str:
+        db = factory()
+        user = User(username="tester", email="tester@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        credential = Credential(
+            user_id=user.id,
+            name="c",
+            provider="openai",
+            api_key_encrypted=encrypt_api_key("sk-test"),
+            custom_models=models,
+            model_validation_results=previous_results or {}
+        )
+        db.add(credential)
+        db.commit()
+        credential_id = credential.id
+        db.close()
+        return credential_id
+
+    @pytest.mark.asyncio
+    async def test_concurrent_submits_are_deduplicated(self, session_factory):
+        """测试同一凭证的重复提交复用同一任务"""
+        credential_id = self._create_credential(session_factory, ["m1", "bad-m2"])
+        queue = ValidationJobQueue(max_concurrency=4)
+
+        first = queue.submit(credential_id)
+        second = queue.submit(credential_id)
+        assert first is second
+
+        result = await first.wait()
+        assert first.status == "completed"
+        assert first.total_models == 2
+        assert first.completed_models == 2
+        assert result.available_models == ["m1"]
+        assert result.failed_models == ["bad-m2"]
+        assert sorted(FakeAdapter.probed) == ["bad-m2", "m1"]
+
+    @pytest.mark.asyncio
+    async def test_probe_concurrency_is_bounded(self, session_factory):
+        """测试模型探测并发受限"""
+        credential_id = self._create_credential(session_factory, [f"m{i}" for i in range(10)])
+        queue = ValidationJobQueue(max_concurrency=3)
+
+        await queue.submit(credential_id).wait()
+        assert len(FakeAdapter.probed) == 10
+        assert FakeAdapter.peak <= 3
+
+    @pytest.mark.asyncio
+    async def test_fresh_results_are_reused(self, session_factory):
+        """测试复用有效期内的成功结果，失败和过期结果重新探测"""
+        now = datetime.utcnow()
+        previous = {
+            "fresh": {"is_valid": True, "error": None, "validated_at": now.isoformat()},
+            "stale": {"is_valid": True, "error": None, "validated_at": (now - timedelta(days=2)).isoformat()},
+            "failed": {"is_valid": False, "error": "x", "validated_at": now.isoformat()},
+        }
+        credential_id = self._create_credential(session_factory, ["fresh", "stale", "failed"], previous)
+        queue = ValidationJobQueue(max_concurrency=4)
+
+        job = queue.submit(credential_id)
+        result = await job.wait()
+        assert sorted(FakeAdapter.probed) == ["failed", "stale"]
+        assert job.reused_models == 1
+        assert sorted(result.available_models) == ["failed", "fresh", "stale"]
+
+        FakeAdapter.probed = []
+        await queue.submit(credential_id, force=True).wait()
+        assert sorted(FakeAdapter.probed) == ["failed", "fresh", "stale"]
+
+    @pytest.mark.asyncio
+    async def test_missing_credential_fails_job(self, session_factory):
+        """测试凭证不存在时任务失败"""
+        queue = ValidationJobQueue(max_concurrency=4)
+        job = queue.submit("missing")
+        result = await job.wait()
+        assert job.status == "failed"
+        assert result.is_valid is False
+        assert queue.get_latest("missing") is job
@@ -46,7 +46,13 @@ import { useSnapshot } from 'valtio';
 import { credentialStore } from '../store/credentials';
 import { credentialService } from '../services/credentials';
 import { addNotification } from '../store/ui';
-import { Credential, CredentialCreate, Provider, ModelValidationResult } from '../types/credential';
+import {
+  Credential,
+  CredentialCreate,
+  CredentialValidationJob,
+  Provider,
+  ModelValidationResult
+} from '../types/credential';
 
 // 详细验证结果组件
 const ModelValidationDetails: React.FC<{
@@ -138,6 +144,7 @@ const Credentials: React.FC = () => {
   const [open, setOpen] = useState(false);
   const [editingCredential, setEditingCredential] = useState<Credential | null>(null);
   const [validating, setValidating] = useState<Record<string, boolean>>({});
+  const [validationProgress, setValidationProgress] = useState<Record<string, CredentialValidationJob>>({});
 
   const [formData, setFormData] = useState<CredentialCreate>({
     name: '',
@@ -337,7 +344,13 @@ const Credentials: React.FC = () => {
   const handleValidate = async (credential: Credential) => {
     setValidating({ ...validating, [credential.id]: true });
     try {
-      const result = await credentialService.validateCredential(credential.id);
+      const job = await credentialService.runValidationJob(credential.id, (progress) => {
+        setValidationProgress(prev => ({ ...prev, [credential.id]: progress }));
+      });
+      const result = job.result || {
+        is_valid: false,
+        error_message: job.error_message,
+      };
 
       if (result.is_valid) {
         const successMessage = result.validation_summary ||
@@ -378,6 +391,10 @@ const Credentials: React.FC = () => {
       });
     } finally {
       setValidating({ ...validating, [credential.id]: false });
+      setValidationProgress(prev => {
+        const { [credential.id]: _, ...rest } = prev;
+        return rest;
+      });
     }
   };
 
@@ -581,10 +598,25 @@ const Credentials: React.FC = () => {
                     size="small"
                     onClick={() => handleValidate(credential)}
                     disabled={validating[credential.id]}
-                    title="验证凭证"
+                    title={
+                      validationProgress[credential.id]?.total_models
+                        ? `验证中 ${validationProgress[credential.id].completed_models}/${validationProgress[credential.id].total_models}`
+                        : '验证凭证'
+                    }
                   >
                     {validating[credential.id] ? (
-                      <CircularProgress size={20} />
+                      validationProgress[credential.id]?.total_models ? (
+                        <CircularProgress
+                          size={20}
+                          variant="determinate"
+                          value={
+                            (validationProgress[credential.id].completed_models /
+                              validationProgress[credential.id].total_models) * 100
+                          }
+                        />
+                      ) : (
+                        <CircularProgress size={20} />
+                      )
                     ) : (
                       <VisibilityIcon />
                     )}
@@ -26,6 +26,8 @@ import { credentialStore } from '../store/credentials';
 import { modelStore } from '../store/models';
 import { credentialService } from '../services/credentials';
 import { modelService } from '../services/models';
+import { statsService } from '../services/stats';
+import { UsageSummary } from '../types/usage';
 import { addNotification } from '../store/ui';
 
 const Dashboard: React.FC = () => {
@@ -33,6 +35,7 @@ const Dashboard: React.FC = () => {
   const { credentials } = useSnapshot(credentialStore);
   const { modelConfigs } = useSnapshot(modelStore);
   const [loading, setLoading] = useState(true);
+  const [usage, setUsage] = useState<UsageSummary | null>(null);
 
   useEffect(() => {
     loadDashboardData();
@@ -41,13 +44,15 @@ const Dashboard: React.FC = () => {
   const loadDashboardData = async () => {
     setLoading(true);
     try {
-      const [credentialsData, modelsData] = await Promise.all([
+      const [credentialsData, modelsData, usageData] = await Promise.all([
         credentialService.getCredentials(),
         modelService.getModelConfigs(),
+        statsService.getUsageSummary(24),
       ]);
 
       credentialStore.credentials = credentialsData;
       modelStore.modelConfigs = modelsData;
+      setUsage(usageData);
     } catch (error: any) {
       addNotification({
         type: 'error',
@@ -160,6 +165,42 @@ const Dashboard: React.FC = () => {
         </Grid>
       </Grid>
 
+      {/* 最近24小时用量 */}
+      {usage && (
+        <Grid container spacing={3} mb={4}>
+          {[
+            { label: '24小时请求数', value: usage.request_count.toLocaleString() },
+            {
+              label: '错误率',
+              value: usage.request_count
+                ? `${((usage.error_count / usage.request_count) * 100).toFixed(1)}%`
+                : '-',
+            },
+            {
+              label: 'Token用量',
+              value: (usage.prompt_tokens + usage.completion_tokens).toLocaleString(),
+            },
+            {
+              label: 'P95延迟',
+              value: usage.p95_latency_ms !== null ? `≤ ${usage.p95_latency_ms} ms` : '-',
+            },
+          ].map((item) => (
+            <Grid item xs={12} sm={6} md={3} key={item.label}>
+              <Card>
+                <CardContent>
+                  <Typography color="textSecondary" gutterBottom>
+                    {item.label}
+                  </Typography>
+                  <Typography variant="h5">
+                    {item.value}
+                  </Typography>
+                </CardContent>
+              </Card>
+            </Grid>
+          ))}
+        </Grid>
+      )}
+
       {/* 快速操作 */}
       <Grid container spacing={3} mb={4}>
         <Grid item xs={12} md={6}>
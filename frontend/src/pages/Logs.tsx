@@ -1,31 +1,345 @@
-import React from 'react';
+import React, { useCallback, useEffect, useRef, useState } from 'react';
 import {
   Box,
   Typography,
   Card,
   CardContent,
-  Alert,
+  Button,
+  Chip,
+  CircularProgress,
+  FormControl,
+  IconButton,
+  InputLabel,
+  MenuItem,
+  Select,
+  TextField,
 } from '@mui/material';
+import {
+  Refresh as RefreshIcon,
+  Download as DownloadIcon,
+} from '@mui/icons-material';
+import { format } from 'date-fns';
+import { useSnapshot } from 'valtio';
+import { modelStore } from '../store/models';
+import { modelService } from '../services/models';
+import { logService } from '../services/logs';
+import { addNotification } from '../store/ui';
+import { LogExportFormat, RequestLog, RequestLogFilters } from '../types/log';
+
+// 虚拟滚动参数：只渲染可视区域附近的行
+const ROW_HEIGHT = 44;
+const VIEWPORT_HEIGHT = 600;
+const OVERSCAN = 10;
+const PAGE_SIZE = 100;
+// 距离底部还剩多少行时加载下一页
+const LOAD_MORE_THRESHOLD = 30;
+
+const COLUMNS = [
+  { label: '时间', width: 180 },
+  { label: '模型', width: 180 },
+  { label: '格式', width: 170 },
+  { label: '状态', width: 80 },
+  { label: '延迟', width: 90 },
+  { label: 'Tokens', width: 90 },
+  { label: '错误信息', width: 0 },
+];
 
 const Logs: React.FC = () => {
+  const { modelConfigs } = useSnapshot(modelStore);
+  const [logs, setLogs] = useState<RequestLog[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loading, setLoading] = useState(false);
+  const [scrollTop, setScrollTop] = useState(0);
+  const [filters, setFilters] = useState<RequestLogFilters>({});
+  const [draftFilters, setDraftFilters] = useState<RequestLogFilters>({});
+  const loadingRef = useRef(false);
+  const viewportRef = useRef<HTMLDivElement>(null);
+
+  const modelNames = Object.fromEntries(modelConfigs.map((m) => [m.id, m.model_name]));
+
+  const loadPage = useCallback(async (cursor: string | null, reset: boolean) => {
+    if (loadingRef.current) {
+      return;
+    }
+    loadingRef.current = true;
+    setLoading(true);
+    try {
+      const page = await logService.getLogs(filters, cursor, PAGE_SIZE);
+      setLogs(prev => (reset ? page.items : [...prev, ...page.items]));
+      setNextCursor(page.next_cursor);
+    } catch (error: any) {
+      addNotification({
+        type: 'error',
+        title: '加载失败',
+        message: error.response?.data?.detail || '无法加载请求日志',
+      });
+    } finally {
+      loadingRef.current = false;
+      setLoading(false);
+    }
+  }, [filters]);
+
+  useEffect(() => {
+    if (modelConfigs.length === 0) {
+      modelService.getModelConfigs()
+        .then((configs) => { modelStore.modelConfigs = configs; })
+        .catch(() => undefined);
+    }
+  }, []);
+
+  useEffect(() => {
+    setScrollTop(0);
+    if (viewportRef.current) {
+      viewportRef.current.scrollTop = 0;
+    }
+    loadPage(null, true);
+  }, [loadPage]);
+
+  const handleScroll = (event: React.UIEvent<HTMLDivElement>) => {
+    const top = event.currentTarget.scrollTop;
+    setScrollTop(top);
+
+    const lastVisible = Math.ceil((top + VIEWPORT_HEIGHT) / ROW_HEIGHT);
+    if (nextCursor && logs.length - lastVisible < LOAD_MORE_THRESHOLD) {
+      loadPage(nextCursor, false);
+    }
+  };
+
+  const applyFilters = () => {
+    setFilters({ ...draftFilters });
+  };
+
+  const handleExport = async (exportFormat: LogExportFormat) => {
+    try {
+      await logService.exportLogs(filters, exportFormat);
+    } catch (error: any) {
+      addNotification({
+        type: 'error',
+        title: '导出失败',
+        message: error.response?.data?.detail || '无法导出请求日志',
+      });
+    }
+  };
+
+  const updateNumberFilter = (key: keyof RequestLogFilters, value: string) => {
+    setDraftFilters(prev => ({
+      ...prev,
+      [key]: value === '' ? undefined : Number(value),
+    }));
+  };
+
+  const startIndex = Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN);
+  const endIndex = Math.min(
+    logs.length,
+    Math.ceil((scrollTop + VIEWPORT_HEIGHT) / ROW_HEIGHT) + OVERSCAN
+  );
+  const visibleLogs = logs.slice(startIndex, endIndex);
+
+  const renderCell = (width: number, content: React.ReactNode) => (
+    <Box
+      sx={{
+        width: width || undefined,
+        flex: width ? 'none' : 1,
+        px: 1,
+        overflow: 'hidden',
+        textOverflow: 'ellipsis',
+        whiteSpace: 'nowrap',
+      }}
+    >
+      {content}
+    </Box>
+  );
+
   return (
     <Box>
-      <Typography variant="h4" component="h1" gutterBottom>
-        请求日志
-      </Typography>
+      <Box display="flex" justifyContent="space-between" alignItems="center" mb={3}>
+        <Typography variant="h4" component="h1">
+          请求日志
+        </Typography>
+        <Box display="flex" gap={1}>
+          <Button
+            variant="outlined"
+            startIcon={<DownloadIcon />}
+            onClick={() => handleExport('csv')}
+          >
+            导出CSV
+          </Button>
+          <Button
+            variant="outlined"
+            startIcon={<DownloadIcon />}
+            onClick={() => handleExport('jsonl')}
+          >
+            导出JSONL
+          </Button>
+          <IconButton onClick={() => loadPage(null, true)} color="primary">
+            <RefreshIcon />
+          </IconButton>
+        </Box>
+      </Box>
 
-      <Card>
+      {/* 过滤条件 */}
+      <Card sx={{ mb: 2 }}>
         <CardContent>
-          <Alert severity="info">
-            日志功能正在开发中，敬请期待...
-          </Alert>
-          <Typography variant="body2" color="textSecondary" mt={2}>
-            未来版本将提供详细的请求日志、统计信息和性能监控功能。
-          </Typography>
+          <Box display="flex" gap={2} flexWrap="wrap" alignItems="center">
+            <FormControl size="small" sx={{ minWidth: 180 }}>
+              <InputLabel>模型配置</InputLabel>
+              <Select
+                label="模型配置"
+                value={draftFilters.config_id || ''}
+                onChange={(e) => setDraftFilters(prev => ({
+                  ...prev,
+                  config_id: e.target.value || undefined,
+                }))}
+              >
+                <MenuItem value="">全部</MenuItem>
+                {modelConfigs.map((config) => (
+                  <MenuItem key={config.id} value={config.id}>
+                    {config.model_name} ({config.target_format})
+                  </MenuItem>
+                ))}
+              </Select>
+            </FormControl>
+            <FormControl size="small" sx={{ minWidth: 140 }}>
+              <InputLabel>请求格式</InputLabel>
+              <Select
+                label="请求格式"
+                value={draftFilters.source_format || ''}
+                onChange={(e) => setDraftFilters(prev => ({
+                  ...prev,
+                  source_format: e.target.value || undefined,
+                }))}
+              >
+                <MenuItem value="">全部</MenuItem>
+                <MenuItem value="openai">OpenAI</MenuItem>
+                <MenuItem value="anthropic">Anthropic</MenuItem>
+              </Select>
+            </FormControl>
+            <FormControl size="small" sx={{ minWidth: 160 }}>
+              <InputLabel>错误类型</InputLabel>
+              <Select
+                label="错误类型"
+                value={draftFilters.error_type || ''}
+                onChange={(e) => setDraftFilters(prev => ({
+                  ...prev,
+                  error_type: e.target.value || undefined,
+                }))}
+              >
+                <MenuItem value="">全部</MenuItem>
+                <MenuItem value="connect_timeout">连接超时</MenuItem>
+                <MenuItem value="first_byte_timeout">首字节超时</MenuItem>
+                <MenuItem value="inter_chunk_timeout">流式间隔超时</MenuItem>
+                <MenuItem value="total_timeout">总时长超时</MenuItem>
+              </Select>
+            </FormControl>
+            <TextField
+              size="small"
+              label="状态码"
+              type="number"
+              sx={{ width: 110 }}
+              value={draftFilters.status_code ?? ''}
+              onChange={(e) => updateNumberFilter('status_code', e.target.value)}
+            />
+            <TextField
+              size="small"
+              label="最小延迟(ms)"
+              type="number"
+              sx={{ width: 140 }}
+              value={draftFilters.min_latency_ms ?? ''}
+              onChange={(e) => updateNumberFilter('min_latency_ms', e.target.value)}
+            />
+            <TextField
+              size="small"
+              label="最大延迟(ms)"
+              type="number"
+              sx={{ width: 140 }}
+              value={draftFilters.max_latency_ms ?? ''}
+              onChange={(e) => updateNumberFilter('max_latency_ms', e.target.value)}
+            />
+            <Button variant="contained" onClick={applyFilters}>
+              查询
+            </Button>
+          </Box>
         </CardContent>
       </Card>
+
+      <Card>
+        {/* 表头 */}
+        <Box
+          display="flex"
+          alignItems="center"
+          sx={{ height: ROW_HEIGHT, borderBottom: 1, borderColor: 'divider', fontWeight: 'bold' }}
+        >
+          {COLUMNS.map((column) => (
+            <React.Fragment key={column.label}>
+              {renderCell(column.width, column.label)}
+            </React.Fragment>
+          ))}
+        </Box>
+
+        {/* 虚拟滚动区域 */}
+        <Box
+          ref={viewportRef}
+          onScroll={handleScroll}
+          sx={{ height: VIEWPORT_HEIGHT, overflowY: 'auto', position: 'relative' }}
+        >
+          <Box sx={{ height: logs.length * ROW_HEIGHT, position: 'relative' }}>
+            {visibleLogs.map((log, offset) => (
+              <Box
+                key={log.id}
+                display="flex"
+                alignItems="center"
+                sx={{
+                  position: 'absolute',
+                  top: (startIndex + offset) * ROW_HEIGHT,
+                  left: 0,
+                  right: 0,
+                  height: ROW_HEIGHT,
+                  borderBottom: 1,
+                  borderColor: 'divider',
+                }}
+              >
+                {renderCell(180, log.created_at ? format(new Date(log.created_at), 'yyyy-MM-dd HH:mm:ss') : '-')}
+                {renderCell(180, modelNames[log.model_config_id] || log.model_config_id)}
+                {renderCell(170, `${log.source_format || '-'} → ${log.target_format || '-'}`)}
+                {renderCell(80, (
+                  <Chip
+                    label={log.status_code ?? '-'}
+                    color={log.status_code && log.status_code < 400 ? 'success' : 'error'}
+                    size="small"
+                  />
+                ))}
+                {renderCell(90, log.response_time_ms !== null ? `${log.response_time_ms} ms` : '-')}
+                {renderCell(90, (
+                  <span title={log.cache_read_tokens ? `缓存命中 ${log.cache_read_tokens} tokens` : undefined}>
+                    {log.tokens_used ?? '-'}
+                    {log.cache_read_tokens ? ' ⚡' : ''}
+                  </span>
+                ))}
+                {renderCell(0, (
+                  <Typography variant="body2" color="error" noWrap title={log.error_message || ''}>
+                    {log.error_type ? `[${log.error_type}] ` : ''}
+                    {log.error_message || ''}
+                  </Typography>
+                ))}
+              </Box>
+            ))}
+          </Box>
+
+          {!loading && logs.length === 0 && (
+            <Box p={3}>
+              <Typography color="textSecondary">暂无请求日志</Typography>
+            </Box>
+          )}
+        </Box>
+
+        {loading && (
+          <Box display="flex" justifyContent="center" p={1}>
+            <CircularProgress size={24} />
+          </Box>
+        )}
+      </Card>
     </Box>
   );
 };
 
-export default Logs;
\ No newline at end of file
+export default Logs;
@@ -38,7 +38,7 @@ import { credentialStore } from '../store/credentials';
 import { modelService } from '../services/models';
 import { credentialService } from '../services/credentials';
 import { addNotification } from '../store/ui';
-import { ModelConfigCreate, TargetFormat } from '../types/model';
+import { ModelConfigCreate, PriorityClass, TargetFormat, TrimStrategy } from '../types/model';
 
 const Models: React.FC = () => {
   const { modelConfigs, isLoading } = useSnapshot(modelStore);
@@ -133,6 +133,15 @@ const Models: React.FC = () => {
       target_format: model.target_format,
       is_enabled: model.is_enabled,
       rate_limit: model.rate_limit,
+      daily_token_quota: model.daily_token_quota ?? undefined,
+      monthly_token_quota: model.monthly_token_quota ?? undefined,
+      response_cache_enabled: model.response_cache_enabled,
+      response_cache_threshold: model.response_cache_threshold ?? undefined,
+      trim_strategy: model.trim_strategy ?? undefined,
+      trim_keep_turns: model.trim_keep_turns ?? undefined,
+      trim_token_budget: model.trim_token_budget ?? undefined,
+      priority_class: model.priority_class ?? undefined,
+      scheduler_weight: model.scheduler_weight ?? undefined,
     });
     setErrors({});
     setOpen(true);
@@ -162,6 +171,15 @@ const Models: React.FC = () => {
           target_format: formData.target_format,
           is_enabled: formData.is_enabled,
           rate_limit: formData.rate_limit,
+          daily_token_quota: formData.daily_token_quota ?? 0,
+          monthly_token_quota: formData.monthly_token_quota ?? 0,
+          response_cache_enabled: formData.response_cache_enabled,
+          response_cache_threshold: formData.response_cache_threshold,
+          trim_strategy: formData.trim_strategy ?? 'off',
+          trim_keep_turns: formData.trim_keep_turns,
+          trim_token_budget: formData.trim_token_budget ?? 0,
+          priority_class: formData.priority_class ?? 'standard',
+          scheduler_weight: formData.scheduler_weight ?? 1,
         };
 
         await modelService.updateModelConfig(editingModel.id, updateData);
@@ -488,6 +506,108 @@ const Models: React.FC = () => {
               fullWidth
             />
 
+            <Box display="flex" gap={2}>
+              <TextField
+                label="每日Token配额"
+                type="number"
+                value={formData.daily_token_quota ?? ''}
+                onChange={(e) => setFormData({ ...formData, daily_token_quota: parseInt(e.target.value) || undefined })}
+                inputProps={{ min: 1 }}
+                helperText="留空表示不限制"
+                fullWidth
+              />
+              <TextField
+                label="每月Token配额"
+                type="number"
+                value={formData.monthly_token_quota ?? ''}
+                onChange={(e) => setFormData({ ...formData, monthly_token_quota: parseInt(e.target.value) || undefined })}
+                inputProps={{ min: 1 }}
+                helperText="留空表示不限制"
+                fullWidth
+              />
+            </Box>
+
+            <Box display="flex" gap={2} alignItems="center">
+              <FormControlLabel
+                control={
+                  <Switch
+                    checked={!!formData.response_cache_enabled}
+                    onChange={(e) => setFormData({ ...formData, response_cache_enabled: e.target.checked })}
+                  />
+                }
+                label="缓存近似重复请求"
+              />
+              <TextField
+                label="相似度阈值"
+                type="number"
+                value={formData.response_cache_threshold ?? ''}
+                onChange={(e) => setFormData({ ...formData, response_cache_threshold: parseFloat(e.target.value) || undefined })}
+                inputProps={{ min: 0.5, max: 1, step: 0.01 }}
+                helperText="留空使用默认值0.9，仅对低温度请求生效"
+                disabled={!formData.response_cache_enabled}
+                sx={{ flex: 1 }}
+              />
+            </Box>
+
+            <Box display="flex" gap={2}>
+              <FormControl sx={{ flex: 1 }}>
+                <InputLabel>对话裁剪</InputLabel>
+                <Select
+                  value={formData.trim_strategy ?? ''}
+                  label="对话裁剪"
+                  onChange={(e) => setFormData({ ...formData, trim_strategy: (e.target.value as TrimStrategy) || undefined })}
+                >
+                  <MenuItem value="">不裁剪</MenuItem>
+                  <MenuItem value="drop">移除较早的轮次</MenuItem>
+                  <MenuItem value="elide">移除并注明省略</MenuItem>
+                </Select>
+              </FormControl>
+              <TextField
+                label="保留最后轮数"
+                type="number"
+                value={formData.trim_keep_turns ?? ''}
+                onChange={(e) => setFormData({ ...formData, trim_keep_turns: parseInt(e.target.value) || undefined })}
+                inputProps={{ min: 1, max: 100 }}
+                helperText="留空使用默认值4"
+                disabled={!formData.trim_strategy}
+                sx={{ flex: 1 }}
+              />
+              <TextField
+                label="提示词Token预算"
+                type="number"
+                value={formData.trim_token_budget ?? ''}
+                onChange={(e) => setFormData({ ...formData, trim_token_budget: parseInt(e.target.value) || undefined })}
+                inputProps={{ min: 1 }}
+                helperText="留空按上下文窗口计算"
+                disabled={!formData.trim_strategy}
+                sx={{ flex: 1 }}
+              />
+            </Box>
+
+            <Box display="flex" gap={2}>
+              <FormControl sx={{ flex: 1 }}>
+                <InputLabel>排队优先级</InputLabel>
+                <Select
+                  value={formData.priority_class ?? 'standard'}
+                  label="排队优先级"
+                  onChange={(e) => setFormData({ ...formData, priority_class: e.target.value as PriorityClass })}
+                >
+                  <MenuItem value="interactive">交互（优先）</MenuItem>
+                  <MenuItem value="standard">标准</MenuItem>
+                  <MenuItem value="batch">批量</MenuItem>
+                </Select>
+              </FormControl>
+              <TextField
+                label="调度权重"
+                type="number"
+                value={formData.scheduler_weight ?? ''}
+                onChange={(e) => setFormData({ ...formData, scheduler_weight: parseInt(e.target.value) || undefined })}
+                inputProps={{ min: 1, max: 100 }}
+                helperText="上游并发已满时同一优先级内按权重分配，留空为1"
+                sx={{ flex: 1 }}
+              />
+            </Box>
+
             <FormControlLabel
               control={
                 <Switch
@@ -112,6 +112,11 @@ class ApiClient {
     return response.data;
   }
 
+  async download(url: string, params?: any): Promise<Blob> {
+    const response = await this.client.get(url, { params, responseType: 'blob', timeout: 0 });
+    return response.data;
+  }
+
   // 设置认证token
   setAuthToken(token: string) {
     this.client.defaults.headers.Authorization = `Bearer ${token}`;
@@ -1,5 +1,11 @@
 import { apiClient } from './api';
-import { Credential, CredentialCreate, CredentialUpdate, CredentialValidation } from '../types/credential';
+import {
+  Credential,
+  CredentialCreate,
+  CredentialUpdate,
+  CredentialValidation,
+  CredentialValidationJob
+} from '../types/credential';
 
 export class CredentialService {
   async getCredentials(): Promise<Credential[]> {
@@ -26,9 +32,39 @@ export class CredentialService {
     return apiClient.post<CredentialValidation>(`/credentials/${id}/validate`);
   }
 
+  async startValidationJob(id: string, force = false): Promise<CredentialValidationJob> {
+    return apiClient.post<CredentialValidationJob>(`/credentials/${id}/validation-jobs?force=${force}`);
+  }
+
+  async getLatestValidationJob(id: string): Promise<CredentialValidationJob> {
+    return apiClient.get<CredentialValidationJob>(`/credentials/${id}/validation-jobs/latest`);
+  }
+
+  // 提交后台验证任务并轮询直至完成
+  async runValidationJob(
+    id: string,
+    onProgress?: (job: CredentialValidationJob) => void,
+    intervalMs = 1000
+  ): Promise<CredentialValidationJob> {
+    let job = await this.startValidationJob(id);
+    onProgress?.(job);
+
+    while (job.status === 'pending' || job.status === 'running') {
+      await new Promise(resolve => setTimeout(resolve, intervalMs));
+      job = await this.getLatestValidationJob(id);
+      onProgress?.(job);
+    }
+
+    return job;
+  }
+
   async getAvailableModels(id: string): Promise<{ models: string[] }> {
     return apiClient.get<{ models: string[] }>(`/credentials/${id}/models`);
   }
+
+  async refreshAvailableModels(id: string): Promise<{ models: string[] }> {
+    return apiClient.post<{ models: string[] }>(`/credentials/${id}/models/refresh`);
+  }
 }
 
 export const credentialService = new CredentialService();
\ No newline at end of file
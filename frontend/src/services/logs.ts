@@ -0,0 +1,28 @@
+import { apiClient } from './api';
+import { LogExportFormat, RequestLogFilters, RequestLogPage } from '../types/log';
+
+export class LogService {
+  async getLogs(
+    filters: RequestLogFilters = {},
+    cursor?: string | null,
+    limit = 100
+  ): Promise<RequestLogPage> {
+    return apiClient.get<RequestLogPage>('/logs', {
+      ...filters,
+      limit,
+      ...(cursor ? { cursor } : {}),
+    });
+  }
+
+  async exportLogs(filters: RequestLogFilters, format: LogExportFormat): Promise<void> {
+    const blob = await apiClient.download('/logs/export', { ...filters, format });
+    const url = URL.createObjectURL(blob);
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = `request_logs.${format}`;
+    link.click();
+    URL.revokeObjectURL(url);
+  }
+}
+
+export const logService = new LogService();
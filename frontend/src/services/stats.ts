@@ -0,0 +1,21 @@
+import { apiClient } from './api';
+import { UsageGranularity, UsageSeries, UsageSummary } from '../types/usage';
+
+export class StatsService {
+  async getUsageSummary(hours = 24): Promise<UsageSummary> {
+    return apiClient.get<UsageSummary>(`/stats/summary?hours=${hours}`);
+  }
+
+  async getUsageSeries(
+    granularity: UsageGranularity = 'hour',
+    configId?: string
+  ): Promise<UsageSeries> {
+    const params = new URLSearchParams({ granularity });
+    if (configId) {
+      params.append('config_id', configId);
+    }
+    return apiClient.get<UsageSeries>(`/stats/usage?${params.toString()}`);
+  }
+}
+
+export const statsService = new StatsService();
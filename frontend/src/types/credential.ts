@@ -48,6 +48,22 @@ export interface CredentialValidation {
   validation_summary?: string;
 }
 
+export type ValidationJobStatus = 'pending' | 'running' | 'completed' | 'failed';
+
+export interface CredentialValidationJob {
+  id: string;
+  credential_id: string;
+  status: ValidationJobStatus;
+  force: boolean;
+  total_models: number;
+  completed_models: number;
+  reused_models: number;
+  result?: CredentialValidation;
+  error_message?: string;
+  created_at: string;
+  finished_at?: string;
+}
+
 export interface CredentialState {
   credentials: Credential[];
   selectedCredential: Credential | null;
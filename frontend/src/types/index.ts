@@ -1,6 +1,8 @@
 export * from './auth';
 export * from './credential';
 export * from './model';
+export * from './usage';
+export * from './log';
 
 export interface ApiResponse<T = any> {
   data?: T;
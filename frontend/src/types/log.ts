@@ -0,0 +1,38 @@
+export interface RequestLog {
+  id: string;
+  model_config_id: string;
+  request_id: string | null;
+  method: string | null;
+  path: string | null;
+  source_format: string | null;
+  target_format: string | null;
+  status_code: number | null;
+  response_time_ms: number | null;
+  tokens_used: number | null;
+  prompt_tokens: number | null;
+  completion_tokens: number | null;
+  cache_read_tokens: number | null;
+  cache_creation_tokens: number | null;
+  error_message: string | null;
+  error_type: string | null;
+  created_at: string | null;
+}
+
+export interface RequestLogPage {
+  items: RequestLog[];
+  next_cursor: string | null;
+}
+
+export interface RequestLogFilters {
+  config_id?: string;
+  status_code?: number;
+  source_format?: string;
+  target_format?: string;
+  min_latency_ms?: number;
+  max_latency_ms?: number;
+  error_type?: string;
+  start?: string;
+  end?: string;
+}
+
+export type LogExportFormat = 'csv' | 'jsonl';
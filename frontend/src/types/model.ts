@@ -1,5 +1,9 @@
 export type TargetFormat = 'openai' | 'anthropic';
 
+export type TrimStrategy = 'drop' | 'elide';
+
+export type PriorityClass = 'interactive' | 'standard' | 'batch';
+
 export interface ModelConfig {
   id: string;
   credential_id: string;
@@ -7,6 +11,15 @@ export interface ModelConfig {
   target_format: TargetFormat;
   is_enabled: boolean;
   rate_limit: number;
+  daily_token_quota: number | null;
+  monthly_token_quota: number | null;
+  response_cache_enabled: boolean;
+  response_cache_threshold: number | null;
+  trim_strategy: TrimStrategy | null;
+  trim_keep_turns: number | null;
+  trim_token_budget: number | null;
+  priority_class: PriorityClass | null;
+  scheduler_weight: number | null;
   proxy_api_key: string;
   created_at: string;
   updated_at: string;
@@ -23,6 +36,15 @@ export interface ModelConfigCreate {
   target_format: TargetFormat;
   is_enabled?: boolean;
   rate_limit?: number;
+  daily_token_quota?: number;
+  monthly_token_quota?: number;
+  response_cache_enabled?: boolean;
+  response_cache_threshold?: number;
+  trim_strategy?: TrimStrategy;
+  trim_keep_turns?: number;
+  trim_token_budget?: number;
+  priority_class?: PriorityClass;
+  scheduler_weight?: number;
 }
 
 export interface ModelConfigUpdate {
@@ -30,6 +52,17 @@ export interface ModelConfigUpdate {
   target_format?: TargetFormat;
   is_enabled?: boolean;
   rate_limit?: number;
+  // 0 表示取消配额
+  daily_token_quota?: number;
+  monthly_token_quota?: number;
+  response_cache_enabled?: boolean;
+  response_cache_threshold?: number;
+  // 'off' 关闭裁剪，预算为 0 表示按上下文窗口计算
+  trim_strategy?: TrimStrategy | 'off';
+  trim_keep_turns?: number;
+  trim_token_budget?: number;
+  priority_class?: PriorityClass;
+  scheduler_weight?: number;
 }
 
 export interface ModelConfigInfo {
@@ -0,0 +1,26 @@
+export interface UsageStats {
+  request_count: number;
+  error_count: number;
+  prompt_tokens: number;
+  completion_tokens: number;
+  avg_latency_ms: number | null;
+  p50_latency_ms: number | null;
+  p95_latency_ms: number | null;
+  latency_histogram: Record<string, number>;
+}
+
+export interface UsageSeriesPoint extends UsageStats {
+  bucket_start: string;
+}
+
+export type UsageGranularity = 'minute' | 'hour' | 'day';
+
+export interface UsageSeries {
+  granularity: UsageGranularity;
+  points: UsageSeriesPoint[];
+}
+
+export interface UsageSummary extends UsageStats {
+  hours: number;
+  by_config: Record<string, UsageStats>;
+}